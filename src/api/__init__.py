@@ -1,5 +1,5 @@
 """API пакет."""
 from src.api.router import router
-from src.api.dependencies import verify_api_key, get_current_api_key
+from src.api.dependencies import verify_api_key, get_current_api_key, get_tenant
 
-__all__ = ["router", "verify_api_key", "get_current_api_key"]
+__all__ = ["router", "verify_api_key", "get_current_api_key", "get_tenant"]
@@ -3,7 +3,7 @@ from typing import Optional
 from fastapi import HTTPException, Security
 from fastapi.security import APIKeyHeader
 
-from src.config import API_KEY
+from src.config import ADMIN_API_KEY, API_KEY, API_KEYS, DEFAULT_TENANT, TENANT_ALLOW_ANONYMOUS
 
 API_KEY_NAME = "X-API-Key"
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
@@ -21,6 +21,21 @@ async def verify_api_key(api_key: str = Security(api_key_header)) -> str:
     return api_key
 
 
+async def verify_admin_key(api_key: str = Security(api_key_header)) -> str:
+    """Валидировать ключ администратора (ADMIN_API_KEY).
+
+    В отличие от verify_api_key, без настроенного ключа доступ закрыт:
+    ключи тенантов из API_KEYS не дают права управлять очередью.
+    """
+    if not ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Admin API key is not configured")
+
+    if api_key != ADMIN_API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid admin API key")
+
+    return api_key
+
+
 async def get_current_api_key(api_key: str = Security(api_key_header)) -> Optional[str]:
     """Получить текущий API ключ (опционально)."""
     if not API_KEY:
@@ -28,3 +43,32 @@ async def get_current_api_key(api_key: str = Security(api_key_header)) -> Option
     if api_key != API_KEY:
         raise HTTPException(status_code=401, detail="Invalid API key")
     return api_key
+
+
+def resolve_tenant(api_key: Optional[str]) -> Optional[str]:
+    """Тенант по API ключу; None если ключ неверный.
+
+    Без ключа при TENANT_ALLOW_ANONYMOUS — тенант по умолчанию: веб-интерфейс
+    X-API-Key не отправляет.
+    """
+    if not API_KEYS and not API_KEY:
+        return DEFAULT_TENANT
+    if not api_key and TENANT_ALLOW_ANONYMOUS:
+        return DEFAULT_TENANT
+    if api_key in API_KEYS:
+        return API_KEYS[api_key]["tenant"]
+    if API_KEY and api_key == API_KEY:
+        return DEFAULT_TENANT
+    return None
+
+
+async def get_tenant(api_key: str = Security(api_key_header)) -> str:
+    """Определить тенанта по API ключу (для fair-share планирования очереди).
+
+    Без настроенных ключей все запросы относятся к тенанту по умолчанию.
+    Глобальный MLX_WHISPER_API_KEY также соответствует тенанту по умолчанию.
+    """
+    tenant = resolve_tenant(api_key)
+    if tenant is None:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    return tenant
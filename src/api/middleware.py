@@ -0,0 +1,52 @@
+"""HTTP middleware: admission control для эндпоинтов загрузки."""
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from src.api.dependencies import API_KEY_NAME, resolve_tenant
+from src.config import MAX_FILE_SIZE, logger
+from src.services.admission import check_admission
+
+# Эндпоинты, ставящие задачи в очередь транскрипции
+ADMISSION_PATHS = {"/api/v1/transcribe", "/api/v1/transcribe-url"}
+
+
+async def admission_middleware(request: Request, call_next):
+    """Отклонить загрузку до чтения тела, если очередь не сможет её принять.
+
+    Тело запроса читается только обработчиком роута, поэтому ответ 413/429/503
+    отсюда не требует приёма файла, копирования, ffprobe и ffmpeg.
+    """
+    if request.method != "POST" or request.url.path not in ADMISSION_PATHS:
+        return await call_next(request)
+
+    try:
+        content_length = int(request.headers.get("content-length") or 0)
+    except ValueError:
+        content_length = 0
+
+    if request.url.path == "/api/v1/transcribe" and content_length > MAX_FILE_SIZE:
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"File size exceeds maximum allowed ({MAX_FILE_SIZE // (1024 * 1024)} MB)"},
+        )
+
+    tenant = resolve_tenant(request.headers.get(API_KEY_NAME))
+    if tenant is None:
+        # Неверный ключ — 401 вернёт зависимость роута
+        return await call_next(request)
+
+    from src.services.transcription_queue import get_transcription_manager
+
+    decision = check_admission(get_transcription_manager(), tenant, content_length)
+    if not decision.accepted:
+        logger.warning(
+            f"Admission rejected: path={request.url.path}, tenant={tenant}, "
+            f"status={decision.status_code}, reason={decision.detail}, "
+            f"retry_after={decision.retry_after}s"
+        )
+        return JSONResponse(
+            status_code=decision.status_code,
+            content={"detail": decision.detail},
+            headers={"Retry-After": str(decision.retry_after)},
+        )
+    return await call_next(request)
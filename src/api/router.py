@@ -6,8 +6,8 @@ import shutil
 import time
 import uuid
 from concurrent.futures import ThreadPoolExecutor
-from fastapi import APIRouter, UploadFile, Form, HTTPException, Request, Body
-from fastapi.responses import FileResponse, PlainTextResponse
+from fastapi import APIRouter, UploadFile, Form, HTTPException, Request, Body, Depends
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from typing import Optional
 
 
@@ -36,11 +36,13 @@ from src.config import (
     SILENCE_THRESHOLD, SILENCE_DURATION, UPLOADS_DIR, DATA_UPLOADS_DIR,
     MAX_FILE_SIZE, ALLOWED_URL_DOMAINS, MAX_DOWNLOAD_SIZE, DOWNLOAD_TIMEOUT,
     logger, OMLX_ENABLED, OMLX_BASE_URL,
-    OMLX_MODEL, OMLX_MODELS, reload_dotenv,
+    OMLX_MODEL, OMLX_MODELS, reload_dotenv, DEFAULT_TENANT, INFERENCE_PROCESS_POOL,
 )
 from src.models.report import load_segments_file, save_report, generate_report_via_openai_sync
 from src.services.report_types import load_report_types, get_prompt_for_report_type, save_report_prompt, clear_cache
 from src.models.model_cache import ModelCache
+from src.models.model_registry import ModelRegistry
+from src.api.dependencies import get_tenant, verify_admin_key
 from src.utils.download import download_from_url, validate_url
 
 # ThreadPoolExecutor для фоновой генерации отчётов
@@ -107,6 +109,20 @@ def _start_report_generation(job_id: str, report_type: Optional[str] = None):
     _report_executor.submit(run)
 
 
+def _queue_rejected(mgr, tenant: str) -> HTTPException:
+    """429 (503 при drain/остановке) с Retry-After, оценённым по текущему backlog очереди."""
+    from src.services.admission import check_admission
+
+    decision = check_admission(mgr, tenant)
+    retry_after = decision.retry_after if decision.retry_after is not None else 1
+    unavailable = not decision.accepted and decision.status_code == 503
+    return HTTPException(
+        status_code=503 if unavailable else 429,
+        detail=decision.detail if unavailable else "Queue is full, try again later",
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
 def sanitize_floats(value):
     """Заменить NaN и Infinity на None для JSON-совместимости."""
     if isinstance(value, float):
@@ -148,6 +164,8 @@ async def transcribe_audio_endpoint(
     silence_duration: str = Form(None),
     mechanism: str = Form("omlx"),
     include_timestamps: Optional[str] = Form(None),
+    speculative: Optional[str] = Form(None),
+    tenant: str = Depends(get_tenant),
 ):
     """Залогировать файл в очередь транскрипции."""
 
@@ -233,8 +251,11 @@ async def transcribe_audio_endpoint(
         success = mgr.submit({
             "job_id": job_id,
             "source": "upload",
+            "tenant": tenant,
             "original_filename": file.filename,
             "wav_path": converted_wav_path,
+            # Оригинал можно отправить в oMLX как есть, только если таймкоды совпадают с WAV
+            "original_path": None if remove_silence_value else original_path,
             "duration": round(audio_duration, 2) if audio_duration is not None else None,
             "params": {
                 "model": model_value,
@@ -247,11 +268,12 @@ async def transcribe_audio_endpoint(
                 "initial_prompt": initial_prompt,
                 "mechanism": mechanism,
                 "include_timestamps": include_timestamps is not None and include_timestamps.lower() == "true",
+                "speculative": speculative is not None and speculative.lower() == "true",
             },
         })
 
         if not success:
-            raise HTTPException(status_code=429, detail="Queue is full, try again later")
+            raise _queue_rejected(mgr, tenant)
 
         return {"job_id": job_id, "status": "queued"}
 
@@ -271,6 +293,35 @@ async def health_check():
     return {"status": "healthy", "version": "1.0.0"}
 
 
+@router.get("/health/live")
+async def health_live():
+    """Liveness: процесс жив и обслуживает запросы (прогрев моделей не учитывается)."""
+    return {"status": "alive"}
+
+
+@router.get("/health/ready")
+def health_ready():
+    """Readiness: прогрев моделей завершён; состояние прогрева по моделям.
+
+    Пока хотя бы одна модель прогревается — 503. С пулом процессов модели
+    прогреваются в процессах инференса: состояние собирается с них
+    (синхронный обработчик — опрос процессов не блокирует event loop).
+    """
+    if INFERENCE_PROCESS_POOL:
+        from src.services.inference_pool import get_inference_pool
+
+        status = get_inference_pool().get_warmup_status()
+        ready = status["ready"]
+        content = {"status": "ready" if ready else "warming_up", "workers": status["workers"]}
+    else:
+        from src.services.model_warmup import get_model_warmup
+
+        warmup = get_model_warmup()
+        ready = warmup.is_ready()
+        content = {"status": "ready" if ready else "warming_up", "models": warmup.get_status()}
+    return JSONResponse(status_code=200 if ready else 503, content=content)
+
+
 @router.get("/config")
 async def get_config():
     """Получить конфигурацию из .env файла."""
@@ -325,6 +376,8 @@ async def transcribe_url_endpoint(
     silence_duration: str = Form(None),
     mechanism: str = Form("omlx"),
     include_timestamps: Optional[str] = Form(None),
+    speculative: Optional[str] = Form(None),
+    tenant: str = Depends(get_tenant),
 ):
     """Транскрибировать аудио по URL (YouTube, Vimeo, прямые ссылки)."""
 
@@ -391,6 +444,7 @@ async def transcribe_url_endpoint(
         success = mgr.submit({
             "job_id": job_id,
             "source": "url",
+            "tenant": tenant,
             "original_filename": _url_to_filename(url),
             "video_title": video_title,
             "original_url": url,
@@ -408,11 +462,12 @@ async def transcribe_url_endpoint(
                 "mechanism": mechanism,
                 "video_title": video_title,
                 "include_timestamps": include_timestamps is not None and include_timestamps.lower() == "true",
+                "speculative": speculative is not None and speculative.lower() == "true",
             },
         })
 
         if not success:
-            raise HTTPException(status_code=429, detail="Queue is full, try again later")
+            raise _queue_rejected(mgr, tenant)
 
         return {"job_id": job_id, "status": "queued"}
 
@@ -423,14 +478,90 @@ async def transcribe_url_endpoint(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/queue/stats")
+async def get_queue_stats():
+    """Статистика очереди транскрипции: глубина и время ожидания по тенантам."""
+    from src.services.transcription_queue import get_transcription_manager
+
+    return get_transcription_manager().get_stats()
+
+
+@router.get("/queue/workers")
+async def get_queue_workers():
+    """Состояние воркеров: текущая задача, время работы, дедлайн, зависшие воркеры."""
+    from src.services.transcription_queue import get_transcription_manager
+
+    workers = get_transcription_manager().worker_states()
+    return {
+        "workers": workers,
+        "stuck": [w["worker_id"] for w in workers if w["stuck"]],
+    }
+
+
+@router.post("/queue/workers")
+async def resize_queue_workers(
+    body: Optional[dict] = Body(default=None),
+    _api_key: str = Depends(verify_admin_key),
+):
+    """
+    Изменить размер пула воркеров без рестарта (admin, ADMIN_API_KEY).
+
+    Тело запроса: {"workers": 4, "min_workers": 1, "max_workers": 6} — все поля опциональны.
+    Уменьшение graceful: лишние воркеры дорабатывают текущую задачу.
+    """
+    from src.services.transcription_queue import get_transcription_manager
+
+    body = body or {}
+    values = {}
+    for key in ("workers", "min_workers", "max_workers"):
+        if body.get(key) is None:
+            continue
+        try:
+            values[key] = int(body[key])
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail=f"{key} must be an integer")
+        if values[key] < 1:
+            raise HTTPException(status_code=400, detail=f"{key} must be >= 1")
+    return get_transcription_manager().resize(**values)
+
+
+@router.post("/queue/drain")
+async def drain_queue(_api_key: str = Depends(verify_admin_key)):
+    """
+    Перевести очередь в режим drain (admin): новые задачи отклоняются (503),
+    активные дорабатывают текущий чанк и останавливаются с сохранением прогресса.
+    """
+    from src.services.transcription_queue import get_transcription_manager
+
+    mgr = get_transcription_manager()
+    mgr.start_drain()
+    return mgr.load_snapshot()
+
+
+@router.post("/queue/resume")
+async def resume_queue(_api_key: str = Depends(verify_admin_key)):
+    """Выйти из drain (admin) и вернуть в очередь прерванные задачи."""
+    from src.services.transcription_queue import get_transcription_manager
+
+    recovered = get_transcription_manager().resume_intake()
+    return {"status": "ok", "recovered": recovered}
+
+
 @router.get("/omlx/health")
 async def omlx_health():
-    """Проверка доступности oMLX API."""
+    """Проверка доступности oMLX API, состояние circuit breaker и статистика хеджирования."""
+    from src.services.backend_health import get_breaker
+    from src.services.omlx_engine import chunk_latency
+
+    circuit = get_breaker("omlx").stats()
+    hedging = chunk_latency.stats()
     if not OMLX_ENABLED or not OMLX_BASE_URL:
         return {
             "omlx": "disabled",
             "base_url": OMLX_BASE_URL,
             "model": OMLX_MODEL,
+            "circuit": circuit,
+            "hedging": hedging,
         }
     try:
         response = _requests.get(f"{OMLX_BASE_URL}/admin/", timeout=5)
@@ -440,6 +571,8 @@ async def omlx_health():
             "base_url": OMLX_BASE_URL,
             "model": OMLX_MODEL,
             "health_status_code": response.status_code,
+            "circuit": circuit,
+            "hedging": hedging,
         }
     except Exception as e:
         return {
@@ -447,13 +580,18 @@ async def omlx_health():
             "base_url": OMLX_BASE_URL,
             "model": OMLX_MODEL,
             "error": str(e),
+            "circuit": circuit,
+            "hedging": hedging,
         }
 
 
 @router.get("/models")
 async def get_models():
-    """Список поддерживаемых моделей."""
-    return {"supported_models": list(SUPPORTED_MODELS.keys())}
+    """Список поддерживаемых моделей и локальных моделей из MODELS_DIR."""
+    return {
+        "supported_models": list(SUPPORTED_MODELS.keys()),
+        "local_models": ModelRegistry.get_instance().list(),
+    }
 
 
 @router.get("/omlx-models")
@@ -515,6 +653,31 @@ async def delete_job(job_id: str):
     return {"status": "deleted", "job_id": job_id}
 
 
+@router.post("/jobs/{job_id}/retry-failed-chunks")
+async def retry_failed_chunks(job_id: str, tenant: str = Depends(get_tenant)):
+    """Перезапустить split-задачу: повторно отправляются только неудавшиеся чанки.
+
+    Перезапустить можно только задачу своего тенанта; чужая выглядит как несуществующая.
+    """
+    from src.services.transcription_service import TranscriptionService
+    from src.services.transcription_queue import get_transcription_manager
+    from src.services.job_manager import JobManager
+
+    job_manager = JobManager()
+    metadata = job_manager.load(job_id)
+    if metadata is None or (metadata.get("tenant") or DEFAULT_TENANT) != tenant:
+        raise HTTPException(status_code=404, detail="Job not found")
+    mgr = get_transcription_manager()
+    service = TranscriptionService(queue_manager=mgr, job_manager=job_manager)
+    try:
+        queued = service.retry_failed_chunks(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not queued:
+        raise _queue_rejected(mgr, metadata.get("tenant") or DEFAULT_TENANT)
+    return {"status": "queued", "job_id": job_id}
+
+
 @router.delete("/jobs/{job_id}/files/{filename}")
 async def delete_file_from_job(job_id: str, filename: str):
     """Удалить отдельный файл из задания."""
@@ -744,18 +907,65 @@ async def get_report_status(job_id: str):
     return {"job_id": job_id, "status": "generating" if job_id in generating_reports else "idle"}
 
 
+def _pool_query(name: str, *args, timeout: Optional[float] = 10.0) -> dict:
+    """Ответы процессов инференса на запрос name ({"workers": [...]}), 500 — если ответили не все."""
+    from src.services.inference_pool import get_inference_pool
+
+    workers = get_inference_pool().query(name, *args, timeout=timeout)
+    failed = [f"pid={worker['pid']}: {worker['error']}" for worker in workers if "error" in worker]
+    if failed:
+        raise HTTPException(status_code=500, detail=f"Inference workers failed: {'; '.join(failed)}")
+    return {"workers": [{"pid": worker["pid"], **(worker["result"] or {})} for worker in workers]}
+
+
+@router.get("/whisper/stats")
+def get_whisper_stats():
+    """Статистика локального декодирования Whisper: пакеты и спекулятивный режим.
+
+    С пулом процессов декодирование идёт в процессах инференса — счётчики
+    собираются с каждого (синхронный обработчик не блокирует event loop).
+    """
+    if INFERENCE_PROCESS_POOL:
+        return _pool_query("whisper_stats")
+    from src.services.whisper_batcher import get_whisper_batcher
+    from src.services.whisper_speculative import get_speculative_decoder
+
+    return {
+        "batcher": get_whisper_batcher().get_stats(),
+        "speculative": get_speculative_decoder().get_stats(),
+    }
+
+
+@router.get("/inference/pool")
+async def get_inference_pool_stats():
+    """Состояние пула процессов инференса: процессы, задачи, перезапуски."""
+    if not INFERENCE_PROCESS_POOL:
+        return {"enabled": False}
+    from src.services.inference_pool import get_inference_pool
+
+    return {"enabled": True, **get_inference_pool().get_stats()}
+
+
 @router.get("/cache/models")
-async def get_cached_models():
-    """Получить список загруженных моделей из кэша."""
+def get_cached_models():
+    """Получить список загруженных моделей из кэша.
+
+    С пулом процессов у каждого процесса свой кэш — статистика по процессам.
+    """
+    if INFERENCE_PROCESS_POOL:
+        return _pool_query("cache_stats")
     cache = ModelCache.get_instance()
     return cache.get_stats()
 
 
 @router.post("/cache/clear")
-async def clear_cache():
-    """Очистить все модели из кэша."""
-    cache = ModelCache.get_instance()
-    cache.clear()
+def clear_cache():
+    """Очистить все модели из кэша (с пулом процессов — в каждом процессе)."""
+    if INFERENCE_PROCESS_POOL:
+        _pool_query("cache_clear")
+    else:
+        cache = ModelCache.get_instance()
+        cache.clear()
     return {
         "status": "success",
         "message": "Model cache cleared"
@@ -763,24 +973,23 @@ async def clear_cache():
 
 
 @router.post("/cache/preload")
-async def preload_model(model: str = "large"):
-    """Предзагрузить модель в кэш."""
+def preload_model(model: str = "large"):
+    """Предзагрузить модель в кэш (с пулом процессов — в каждый процесс)."""
     try:
-        cache = ModelCache.get_instance()
-        models_dir = os.getenv("MODELS_DIR", "models")
-        model_mapping = {
-            "tiny": os.path.join(models_dir, "whisper-tiny"),
-            "base": os.path.join(models_dir, "whisper-base"),
-            "small": os.path.join(models_dir, "whisper-small"),
-            "medium": os.path.join(models_dir, "whisper-medium"),
-            "turbo": os.path.join(models_dir, "whisper-turbo"),
-            "large": os.path.join(models_dir, "whisper-large"),
+        model_path = ModelRegistry.get_instance().resolve(model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if INFERENCE_PROCESS_POOL:
+        # Загрузка модели может идти минутами — ждём без таймаута
+        workers = _pool_query("preload", model, model_path, timeout=None)["workers"]
+        return {
+            "status": "success",
+            "model": model,
+            "model_path": model_path,
+            "workers": [worker["pid"] for worker in workers],
         }
-        model_path = model_mapping.get(model, os.path.join(models_dir, "whisper-large"))
-
-        if not os.path.exists(model_path):
-            model_path = f"mlx-community/whisper-{model}"
-
+    try:
+        cache = ModelCache.get_instance()
         cache.load_model(model, model_path)
         return {
             "status": "success",
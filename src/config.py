@@ -33,10 +33,15 @@ TRANSCRIPTION_TIMEOUT_SECONDS: int = int(os.getenv("TRANSCRIPTION_TIMEOUT", "360
 
 # Models path
 MODELS_DIR: str = os.getenv("MODELS_DIR", "models")
+# Бюджет памяти ModelCache: при превышении вытесняются давно не использованные модели (0 = без ограничения)
+MODEL_CACHE_MAX_MB: int = int(os.getenv("MODEL_CACHE_MAX_MB", "8192"))
 
 # Results storage
 RESULTS_DIR: str = os.getenv("RESULTS_DIR", "results")
 RESULTS_RETENTION_DAYS: int = int(os.getenv("RESULTS_RETENTION_DAYS", "30"))
+# Сохранять сырые ответы движков в {name}_raw.jsonl.gz (в результате остаётся только имя файла)
+RAW_RESPONSE_RETENTION: bool = os.getenv("RAW_RESPONSE_RETENTION", "false").lower() == "true"
+RAW_RESPONSE_GZIP_LEVEL: int = int(os.getenv("RAW_RESPONSE_GZIP_LEVEL", "6"))
 
 # User uploads storage
 DATA_UPLOADS_DIR: str = "data"
@@ -44,6 +49,40 @@ os.makedirs(DATA_UPLOADS_DIR, exist_ok=True)
 
 # Auth
 API_KEY: Optional[str] = os.getenv("MLX_WHISPER_API_KEY")
+# Ключ администратора для управления очередью (resize, drain); по умолчанию — MLX_WHISPER_API_KEY.
+# Без ключа admin-эндпоинты отклоняются: ключи тенантов (API_KEYS) прав администратора не дают
+ADMIN_API_KEY: Optional[str] = os.getenv("ADMIN_API_KEY") or API_KEY or None
+
+# Tenant-level fair-share scheduling
+DEFAULT_TENANT: str = "default"
+TENANT_DEFAULT_WEIGHT: float = float(os.getenv("TENANT_DEFAULT_WEIGHT", "1.0"))
+TENANT_DEFAULT_MAX_CONCURRENT: int = int(os.getenv("TENANT_DEFAULT_MAX_CONCURRENT", "0"))
+TENANT_DEFAULT_MAX_QUEUED: int = int(os.getenv("TENANT_DEFAULT_MAX_QUEUED", "0"))
+# Запросы без X-API-Key (встроенный веб-интерфейс) относить к тенанту по умолчанию,
+# даже если настроены ключи; неверный ключ по-прежнему даёт 401
+TENANT_ALLOW_ANONYMOUS: bool = os.getenv("TENANT_ALLOW_ANONYMOUS", "false").lower() == "true"
+
+
+def _parse_api_keys(raw: str) -> dict:
+    """Parse API_KEYS env var: 'key:tenant[:weight[:max_concurrent[:max_queued]]]|...'.
+
+    0 для max_concurrent / max_queued означает «без ограничения».
+    """
+    result: dict = {}
+    for entry in raw.split("|"):
+        parts = [p.strip() for p in entry.strip().split(":")]
+        if len(parts) < 2 or not parts[0] or not parts[1]:
+            continue
+        result[parts[0]] = {
+            "tenant": parts[1],
+            "weight": float(parts[2]) if len(parts) > 2 and parts[2] else TENANT_DEFAULT_WEIGHT,
+            "max_concurrent": int(parts[3]) if len(parts) > 3 and parts[3] else TENANT_DEFAULT_MAX_CONCURRENT,
+            "max_queued": int(parts[4]) if len(parts) > 4 and parts[4] else TENANT_DEFAULT_MAX_QUEUED,
+        }
+    return result
+
+
+API_KEYS: dict = _parse_api_keys(os.getenv("API_KEYS", ""))
 
 # Logging
 LOGS_DIR: str = os.getenv("LOGS_DIR", "logs")
@@ -63,6 +102,66 @@ DEFAULT_LANGUAGE: Optional[str] = os.getenv("DEFAULT_LANGUAGE", None)
 # Default model for transcription
 DEFAULT_MODEL: str = os.getenv("DEFAULT_MODEL", "turbo")
 
+def _parse_model_quantization(raw: str) -> dict:
+    """Parse MODEL_QUANTIZATION env var: 'model:bits[:group_size]|...' (group_size по умолчанию 64)."""
+    result: dict = {}
+    for entry in raw.split("|"):
+        parts = [p.strip() for p in entry.strip().split(":")]
+        if len(parts) < 2 or not parts[0] or not parts[1]:
+            continue
+        result[parts[0]] = {
+            "bits": int(parts[1]),
+            "group_size": int(parts[2]) if len(parts) > 2 and parts[2] else 64,
+        }
+    return result
+
+
+# Квантование моделей Whisper при загрузке (квантованные веса сохраняются рядом с исходными)
+MODEL_QUANTIZATION: dict = _parse_model_quantization(os.getenv("MODEL_QUANTIZATION", ""))
+
+# Пакетное декодирование коротких (до 30 с) задач Whisper, пока MLX занят (1 = выключено)
+WHISPER_BATCH_MAX_SIZE: int = int(os.getenv("WHISPER_BATCH_MAX_SIZE", "8"))
+# Сколько ждать наполнения пакета от первой задачи (мс)
+WHISPER_BATCH_WAIT_MS: int = int(os.getenv("WHISPER_BATCH_WAIT_MS", "50"))
+
+# Long-form режим Whisper: длинный файл режется по паузам на независимые окна
+# до 30 с, которые декодируются пакетами без переноса контекста между окнами
+WHISPER_LONGFORM: bool = os.getenv("WHISPER_LONGFORM", "false").lower() == "true"
+# Минимальная длительность аудио для long-form режима (сек)
+WHISPER_LONGFORM_MIN_SEC: float = float(os.getenv("WHISPER_LONGFORM_MIN_SEC", "120"))
+# Паузы короче этого (мс) не разрывают участок речи
+WHISPER_LONGFORM_GAP_MS: int = int(os.getenv("WHISPER_LONGFORM_GAP_MS", "500"))
+
+# Спекулятивное декодирование Whisper (по запросу, speculative=true): черновая
+# модель предлагает токены, основная проверяет их одним проходом декодера
+WHISPER_DRAFT_MODEL: str = os.getenv("WHISPER_DRAFT_MODEL", "base")
+# Сколько токенов черновик предлагает за шаг
+WHISPER_SPECULATIVE_TOKENS: int = int(os.getenv("WHISPER_SPECULATIVE_TOKENS", "4"))
+
+# CPU-механизм (mechanism=cpu): faster-whisper / CTranslate2 для узлов без Apple Silicon
+# Тип весов CTranslate2: int8, int8_float32, float32
+CPU_WHISPER_COMPUTE_TYPE: str = os.getenv("CPU_WHISPER_COMPUTE_TYPE", "int8")
+# Потоков на один инференс (0 = по числу ядер)
+CPU_WHISPER_THREADS: int = int(os.getenv("CPU_WHISPER_THREADS", "0"))
+# Сколько задач одна модель декодирует параллельно
+CPU_WHISPER_WORKERS: int = int(os.getenv("CPU_WHISPER_WORKERS", "1"))
+
+# Пул процессов инференса: локальные модели (whisper, cpu) работают в отдельных
+# долгоживущих процессах, а не в потоках API — OOM модели не роняет сервер
+INFERENCE_PROCESS_POOL: bool = os.getenv("INFERENCE_PROCESS_POOL", "false").lower() == "true"
+# Число процессов инференса (у каждого свой кэш моделей)
+INFERENCE_PROCESSES: int = int(os.getenv("INFERENCE_PROCESSES", "1"))
+# Перезапускать процесс после N задач (0 = без ограничения)
+INFERENCE_MAX_JOBS_PER_PROCESS: int = int(os.getenv("INFERENCE_MAX_JOBS_PER_PROCESS", "50"))
+# Перезапускать процесс, если его память после задачи выше порога, МБ (0 = без ограничения)
+INFERENCE_MAX_RSS_MB: int = int(os.getenv("INFERENCE_MAX_RSS_MB", "0"))
+
+# Фоновый прогрев моделей при старте (загрузка весов + пробный decode на тишине)
+MODEL_WARMUP: bool = os.getenv("MODEL_WARMUP", "true").lower() == "true"
+MODEL_WARMUP_MODELS: list = [
+    m.strip() for m in os.getenv("MODEL_WARMUP_MODELS", DEFAULT_MODEL).split(",") if m.strip()
+]
+
 # Default task for transcription
 DEFAULT_TASK: str = os.getenv("DEFAULT_TASK", "transcribe")
 
@@ -98,6 +197,72 @@ OMLX_MAX_AUDIO_DURATION_SEC: int = int(os.getenv("OMLX_MAX_AUDIO_DURATION_SEC",
 # OMLX silence detection — gap in milliseconds below which adjacent non-silent chunks are merged
 OMLX_SILENCE_GAP_MS: int = int(os.getenv("OMLX_SILENCE_GAP_MS", "2000"))
 
+# OMLX adaptive chunking — размер чанка по измеренной пропускной способности oMLX
+OMLX_ADAPTIVE_CHUNKING: bool = os.getenv("OMLX_ADAPTIVE_CHUNKING", "false").lower() == "true"
+# Сколько чанков одной задачи отправлять в oMLX параллельно
+OMLX_CHUNK_CONCURRENCY: int = max(int(os.getenv("OMLX_CHUNK_CONCURRENCY", "1")), 1)
+# Желаемое время обработки одного чанка на бэкенде (секунды)
+OMLX_TARGET_CHUNK_LATENCY_SEC: float = float(os.getenv("OMLX_TARGET_CHUNK_LATENCY_SEC", "120"))
+# Нижняя граница длины чанка (секунды аудио) — меньше накладные расходы доминируют
+OMLX_MIN_CHUNK_SEC: int = int(os.getenv("OMLX_MIN_CHUNK_SEC", "60"))
+
+# OMLX split mode: silence — чанки по паузам, window — окна фиксированной длины с перекрытием
+OMLX_SPLIT_MODE: str = os.getenv("OMLX_SPLIT_MODE", "silence").lower()
+OMLX_WINDOW_SEC: int = int(os.getenv("OMLX_WINDOW_SEC", "300"))
+OMLX_WINDOW_OVERLAP_SEC: float = float(os.getenv("OMLX_WINDOW_OVERLAP_SEC", "5"))
+
+# OMLX transport — в каком виде аудио уходит в oMLX: wav, flac (без потерь), opus, passthrough (оригинал)
+OMLX_TRANSPORT_CODEC: str = os.getenv("OMLX_TRANSPORT_CODEC", "wav").lower()
+OMLX_OPUS_BITRATE: str = os.getenv("OMLX_OPUS_BITRATE", "32k")
+# Форматы оригинала, которые бэкенд принимает как есть (passthrough)
+OMLX_PASSTHROUGH_FORMATS: set = {
+    ext.strip().lower().lstrip(".")
+    for ext in os.getenv("OMLX_PASSTHROUGH_FORMATS", "mp3,m4a,ogg,opus,flac,webm").split(",")
+    if ext.strip()
+}
+
+# OMLX packing — несколько коротких задач из очереди склеиваются в один запрос
+OMLX_PACKING_ENABLED: bool = os.getenv("OMLX_PACKING_ENABLED", "false").lower() == "true"
+# Задачи не длиннее этого (секунды аудио) считаются короткими
+OMLX_PACK_MAX_CLIP_SEC: float = float(os.getenv("OMLX_PACK_MAX_CLIP_SEC", "60"))
+OMLX_PACK_MAX_JOBS: int = max(int(os.getenv("OMLX_PACK_MAX_JOBS", "8")), 1)
+OMLX_PACK_MAX_AUDIO_SEC: float = float(os.getenv("OMLX_PACK_MAX_AUDIO_SEC", "600"))
+# Сколько воркер ждёт подходящие задачи для пачки (секунды)
+OMLX_PACK_WINDOW_SEC: float = float(os.getenv("OMLX_PACK_WINDOW_SEC", "0.5"))
+# Тишина между клипами в пачке (мс)
+OMLX_PACK_GAP_MS: int = int(os.getenv("OMLX_PACK_GAP_MS", "1500"))
+
+# Тело ответа oMLX дочитывается во временный файл; в памяти держится не больше этого (байт)
+OMLX_RESPONSE_SPOOL_MAX_BYTES: int = int(os.getenv("OMLX_RESPONSE_SPOOL_MAX_BYTES", str(1024 * 1024)))
+
+# OMLX split mode — повторы чанка при сетевых/5xx ошибках, задержка удваивается
+OMLX_CHUNK_RETRIES: int = int(os.getenv("OMLX_CHUNK_RETRIES", "2"))
+OMLX_CHUNK_RETRY_BACKOFF_SEC: float = float(os.getenv("OMLX_CHUNK_RETRY_BACKOFF_SEC", "2"))
+# Чанк не удался после повторов: fail — задача падает, skip — пропуск отмечается и разбивка продолжается
+OMLX_CHUNK_FAILURE_POLICY: str = os.getenv("OMLX_CHUNK_FAILURE_POLICY", "fail").lower()
+
+# OMLX fallback — при деградации oMLX задачи идут в локальный механизм (пусто = без fallback)
+OMLX_FALLBACK_MECHANISM: str = os.getenv("OMLX_FALLBACK_MECHANISM", "").lower()
+OMLX_FALLBACK_MODEL: str = os.getenv("OMLX_FALLBACK_MODEL", DEFAULT_MODEL)
+# Circuit breaker: окно последних запросов, мин. число запросов и доля ошибок для открытия
+OMLX_CIRCUIT_WINDOW: int = int(os.getenv("OMLX_CIRCUIT_WINDOW", "20"))
+OMLX_CIRCUIT_MIN_CALLS: int = int(os.getenv("OMLX_CIRCUIT_MIN_CALLS", "5"))
+OMLX_CIRCUIT_ERROR_RATE: float = float(os.getenv("OMLX_CIRCUIT_ERROR_RATE", "0.5"))
+# Через сколько секунд после открытия пропустить пробный запрос
+OMLX_CIRCUIT_OPEN_SEC: float = float(os.getenv("OMLX_CIRCUIT_OPEN_SEC", "60"))
+# Запрос дольше порога считается ошибкой (0 = не учитывать латентность)
+OMLX_CIRCUIT_SLOW_CALL_SEC: float = float(os.getenv("OMLX_CIRCUIT_SLOW_CALL_SEC", "0"))
+
+# OMLX hedging — дубль запроса чанка, если он не вернулся за перцентиль наблюдаемой латентности
+OMLX_HEDGE_ENABLED: bool = os.getenv("OMLX_HEDGE_ENABLED", "false").lower() == "true"
+OMLX_HEDGE_PERCENTILE: float = float(os.getenv("OMLX_HEDGE_PERCENTILE", "0.95"))
+# Мин. число наблюдений латентности, прежде чем начать хеджировать
+OMLX_HEDGE_MIN_SAMPLES: int = int(os.getenv("OMLX_HEDGE_MIN_SAMPLES", "10"))
+# Бюджет: доля дублей от числа запросов чанков
+OMLX_HEDGE_BUDGET: float = float(os.getenv("OMLX_HEDGE_BUDGET", "0.1"))
+# Куда отправлять дубль (пусто = тот же OMLX_BASE_URL)
+OMLX_HEDGE_BASE_URL: str = os.getenv("OMLX_HEDGE_BASE_URL", "")
+
 # OMLX model selection — alias → display name (env: OMLX_MODELS="alias:display|alias:display")
 def _parse_omlx_models(raw: str) -> dict:
     """Parse OMLX_MODELS env var: 'alias1:Display 1|alias2:Display 2'."""
@@ -136,6 +301,41 @@ DOWNLOAD_TIMEOUT: int = int(os.getenv("DOWNLOAD_TIMEOUT_SECONDS", "600"))
 TRANSCRIBER_WORKERS: int = int(os.getenv("TRANSCRIBER_WORKERS", "3"))
 QUEUE_MAX_SIZE: int = int(os.getenv("QUEUE_MAX_SIZE", "20"))
 
+# Автомасштабирование воркеров между TRANSCRIBER_MIN_WORKERS и TRANSCRIBER_MAX_WORKERS
+# (по умолчанию обе границы равны TRANSCRIBER_WORKERS — пул фиксированный)
+TRANSCRIBER_MIN_WORKERS: int = int(os.getenv("TRANSCRIBER_MIN_WORKERS", str(TRANSCRIBER_WORKERS)))
+TRANSCRIBER_MAX_WORKERS: int = int(os.getenv("TRANSCRIBER_MAX_WORKERS", str(TRANSCRIBER_WORKERS)))
+AUTOSCALE_INTERVAL_SEC: float = float(os.getenv("AUTOSCALE_INTERVAL_SEC", "10"))
+# Простой воркеров (сек), после которого пул уменьшается
+AUTOSCALE_IDLE_SEC: float = float(os.getenv("AUTOSCALE_IDLE_SEC", "120"))
+# Не добавлять воркеры, если RTF бэкенда выше порога (бэкенд уже перегружен; 0 = без ограничения)
+AUTOSCALE_MAX_RTF: float = float(os.getenv("AUTOSCALE_MAX_RTF", "0"))
+
+# Drain: сколько ждать активные задачи при остановке, прежде чем оборвать запросы
+DRAIN_TIMEOUT_SEC: float = float(os.getenv("DRAIN_TIMEOUT_SEC", "120"))
+# Восстанавливать незавершённые задачи при старте сервера
+RECOVER_JOBS_ON_STARTUP: bool = os.getenv("RECOVER_JOBS_ON_STARTUP", "true").lower() == "true"
+
+# Admission control — решение о приёме задачи до чтения тела запроса
+ADMISSION_MAX_BACKLOG_SEC: float = float(os.getenv("ADMISSION_MAX_BACKLOG_SEC", "0"))
+ADMISSION_MAX_QUEUED_AUDIO_SEC: float = float(os.getenv("ADMISSION_MAX_QUEUED_AUDIO_SEC", "0"))
+ADMISSION_MIN_FREE_DISK_MB: int = int(os.getenv("ADMISSION_MIN_FREE_DISK_MB", "1024"))
+# Во сколько раз место на диске под задачу больше тела запроса (tmp + оригинал + WAV)
+ADMISSION_DISK_FACTOR: float = float(os.getenv("ADMISSION_DISK_FACTOR", "3.0"))
+# Начальная оценка real-time factor (сек обработки на сек аудио) до первых измерений
+ADMISSION_DEFAULT_RTF: float = float(os.getenv("ADMISSION_DEFAULT_RTF", "0.3"))
+ADMISSION_MAX_RETRY_AFTER_SEC: int = int(os.getenv("ADMISSION_MAX_RETRY_AFTER_SEC", "3600"))
+
+# Watchdog — дедлайн задачи: min(TRANSCRIPTION_TIMEOUT, base + duration * rtf)
+WATCHDOG_INTERVAL_SEC: float = float(os.getenv("WATCHDOG_INTERVAL_SEC", "5"))
+WATCHDOG_BASE_TIMEOUT_SEC: float = float(os.getenv("WATCHDOG_BASE_TIMEOUT_SEC", "120"))
+WATCHDOG_TIMEOUT_RTF: float = float(os.getenv("WATCHDOG_TIMEOUT_RTF", "1.0"))
+# Действие при превышении дедлайна: fail | requeue
+WATCHDOG_ON_TIMEOUT: str = os.getenv("WATCHDOG_ON_TIMEOUT", "fail").lower()
+WATCHDOG_MAX_REQUEUES: int = int(os.getenv("WATCHDOG_MAX_REQUEUES", "1"))
+# Воркер считается зависшим, если не освободился за столько секунд после отмены
+WATCHDOG_STUCK_GRACE_SEC: float = float(os.getenv("WATCHDOG_STUCK_GRACE_SEC", "60"))
+
 # Audio extensions
 AUDIO_EXTENSIONS: set = {
     ".wav",
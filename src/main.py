@@ -14,40 +14,36 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from contextlib import asynccontextmanager
 
-from src.config import HOST, PORT, DEBUG, DEFAULT_MODEL, logger
+from src.config import (
+    HOST, PORT, DEBUG, INFERENCE_PROCESS_POOL, MODEL_WARMUP, MODEL_WARMUP_MODELS,
+    RECOVER_JOBS_ON_STARTUP, logger,
+)
 from src.api import router
-from src.models.model_cache import ModelCache
+from src.api.middleware import admission_middleware
+from src.services.model_warmup import get_model_warmup
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Предзагрузка моделей при запуске сервера."""
-    try:
-        cache = ModelCache.get_instance()
-        models_dir = os.getenv("MODELS_DIR", "models")
-        model_mapping = {
-            "tiny": os.path.join(models_dir, "whisper-tiny"),
-            "base": os.path.join(models_dir, "whisper-base"),
-            "small": os.path.join(models_dir, "whisper-small"),
-            "medium": os.path.join(models_dir, "whisper-medium"),
-            "turbo": os.path.join(models_dir, "whisper-turbo"),
-            "large": os.path.join(models_dir, "whisper-large"),
-        }
-        model_path = model_mapping.get(DEFAULT_MODEL, os.path.join(models_dir, "whisper-large"))
-
-        if not os.path.exists(model_path):
-            model_path = f"mlx-community/whisper-{DEFAULT_MODEL}"
-
-        logger.info(f"Preloading model '{DEFAULT_MODEL}' from {model_path}")
-        cache.load_model(DEFAULT_MODEL, model_path)
-        logger.info(f"Model '{DEFAULT_MODEL}' preloaded successfully")
-    except Exception as e:
-        logger.warning(f"Failed to preload model: {e}")
+    """Фоновый прогрев моделей и инициализация очереди при запуске сервера."""
+    # Прогрев не блокирует старт: готовность — в /api/v1/health/ready
+    if INFERENCE_PROCESS_POOL:
+        # Модели живут в процессах инференса — каждый прогревает их у себя
+        from src.services.inference_pool import get_inference_pool
+        get_inference_pool().start(MODEL_WARMUP_MODELS if MODEL_WARMUP else ())
+    elif MODEL_WARMUP:
+        get_model_warmup().start(MODEL_WARMUP_MODELS)
+        logger.info(f"Model warmup started in background: {', '.join(MODEL_WARMUP_MODELS)}")
 
     # Инициализация очереди транскрипции (ленивый singleton)
     from src.services.transcription_queue import get_transcription_manager
-    get_transcription_manager()
+    mgr = get_transcription_manager()
     logger.info("Transcription queue manager initialized")
+    if RECOVER_JOBS_ON_STARTUP:
+        try:
+            mgr.recover_jobs()
+        except Exception as e:
+            logger.warning(f"Failed to recover unfinished jobs: {e}")
 
     yield
 
@@ -56,6 +52,9 @@ async def lifespan(app: FastAPI):
     if mgr is not None:
         mgr.shutdown()
         logger.info("Transcription queue manager shut down")
+    if INFERENCE_PROCESS_POOL:
+        from src.services.inference_pool import get_inference_pool
+        get_inference_pool().shutdown()
 
 
 # Initialize FastAPI app
@@ -75,6 +74,9 @@ app.mount("/static", StaticFiles(directory="src/static"), name="static")
 # Include API router
 app.include_router(router)
 
+# Admission control до чтения тела загрузки
+app.middleware("http")(admission_middleware)
+
 
 @app.get("/", include_in_schema=False)
 async def read_root(request: Request):
@@ -1,16 +1,97 @@
 """Менеджер кэширования моделей Whisper."""
 
 import logging
-from typing import Dict, Any, Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from src.config import MODEL_CACHE_MAX_MB
+from src.models.model_registry import quantization_for
 
 logger = logging.getLogger("mlx_whisper")
 
+# mlx_whisper.transcribe загружает модель в float16 (fp16=True по умолчанию)
+DEFAULT_DTYPE = "float16"
+
+
+def _load_weights(
+    model_path: str, dtype: str, quantization: Optional[Dict[str, int]] = None
+) -> Any:
+    """Загрузить веса модели целиком (локальный каталог из реестра, иначе HuggingFace repo)."""
+    from src.models.model_registry import load_whisper_model
+
+    return load_whisper_model(model_path, dtype, quantization)
+
+
+def _model_nbytes(model: Any) -> int:
+    """Размер параметров модели в байтах."""
+    from mlx.utils import tree_flatten
+
+    return sum(getattr(value, "nbytes", 0) for _, value in tree_flatten(model.parameters()))
+
+
+def _bind_transcriber(model: Any, model_path: Optional[str]) -> None:
+    """Подставить модель в ModelHolder mlx_whisper, чтобы transcribe() не грузил её заново.
+
+    ModelHolder — глобальный; вызывать под MLX_LOCK (mlx_slot).
+    """
+    from mlx_whisper.transcribe import ModelHolder
+
+    ModelHolder.model = model
+    ModelHolder.model_path = model_path
+
+
+def _release_transcriber(model: Any = None) -> None:
+    """Отвязать модель от ModelHolder mlx_whisper, чтобы её память освободилась.
+
+    model=None — отвязать любую.
+    """
+    try:
+        from mlx_whisper.transcribe import ModelHolder
+    except ImportError:
+        return
+    if model is None or ModelHolder.model is model:
+        ModelHolder.model = None
+        ModelHolder.model_path = None
+
+
+class _CachedModel:
+    """Загруженная модель и её статистика."""
+
+    def __init__(
+        self,
+        model: Any,
+        path: str,
+        dtype: str,
+        nbytes: int,
+        load_sec: float,
+        quantization: Optional[Dict[str, int]] = None,
+    ) -> None:
+        self.model = model
+        self.path = path
+        self.dtype = dtype
+        self.nbytes = nbytes
+        self.load_sec = load_sec
+        self.quantization = quantization
+        self.hits = 0
+        self.last_used = time.time()
+        # Для RTF: секунды аудио и секунды транскрипции этой моделью
+        self.audio_sec = 0.0
+        self.busy_sec = 0.0
+
 
 class ModelCache:
-    """Кэширует загруженные модели Whisper для повторного использования."""
+    """Кэширует загруженные модели Whisper для повторного использования.
+
+    Модели хранятся по ключу (имя, dtype) в порядке использования. Когда
+    суммарный размер весов превышает MODEL_CACHE_MAX_MB, вытесняются давно
+    не использованные (LRU). Только что загруженная модель не вытесняется,
+    даже если одна превышает бюджет.
+    """
 
     _instance: Optional["ModelCache"] = None
-    _models: Dict[str, Any] = {}
+    _models: "OrderedDict[Tuple[str, str], _CachedModel]" = OrderedDict()
 
     def __new__(cls) -> "ModelCache":
         """Синглтон: возвращает единственный инстанс."""
@@ -24,6 +105,12 @@ class ModelCache:
         if self._initialized:
             return
         self._initialized = True
+        self._lock = threading.RLock()
+        self._budget_bytes = MODEL_CACHE_MAX_MB * 1024 * 1024
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._load_sec_total = 0.0
         logger.info("ModelCache initialized")
 
     @classmethod
@@ -33,7 +120,13 @@ class ModelCache:
             cls._instance = cls()
         return cls._instance
 
-    def load_model(self, model_name: str, model_path: str) -> Any:
+    @classmethod
+    def reset(cls) -> None:
+        """Сбросить синглтон и выгрузить модели (для тестов)."""
+        cls._models.clear()
+        cls._instance = None
+
+    def load_model(self, model_name: str, model_path: str, dtype: str = DEFAULT_DTYPE) -> Any:
         """
         Загрузить модель если нет в кэше, вернуть из кэша если есть.
 
@@ -43,39 +136,55 @@ class ModelCache:
             Имя модели (tiny, base, small, medium, large, turbo)
         model_path : str
             Путь к модели (локальный или HuggingFace repo)
+        dtype : str
+            Тип весов (имя атрибута mlx.core: float16, float32)
 
         Returns
         -------
         Any
-            Загруженная модель
+            Загруженная модель (mlx_whisper Whisper)
         """
-        if model_name in self._models:
-            logger.debug(f"Model '{model_name}' loaded from cache")
-            return self._models[model_name]
-
-        logger.info(f"Loading model '{model_name}' from {model_path}")
-        try:
-            # Импорт mlx_whisper.transcribe только здесь
-            from mlx_whisper.transcribe import transcribe
-            # Модель загружается внутри transcribe при первом вызове
-            # Мы используем заглушку для инициализации
-            import mlx.core as mx
-            import mlx.nn as nn
-            import mlx.optimizers as optim
-            import mlx.utils
-            # Загрузка модели через mlx-whisper
-            # transcribe использует internal loading
-            self._models[model_name] = {
-                "path": model_path,
-                "loaded": True,
-            }
-            logger.info(f"Model '{model_name}' loaded and cached")
-            return self._models[model_name]
-        except Exception as e:
-            logger.error(f"Failed to load model '{model_name}': {e}")
-            raise
+        key = (model_name, dtype)
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None and entry.path == model_path:
+                self._models.move_to_end(key)
+                entry.hits += 1
+                entry.last_used = time.time()
+                self._hits += 1
+                logger.debug(f"Model '{model_name}' ({dtype}) loaded from cache")
+                return entry.model
+
+            self._misses += 1
+            quantization = quantization_for(model_name)
+            logger.info(f"Loading model '{model_name}' ({dtype}) from {model_path}")
+            started = time.monotonic()
+            try:
+                model = _load_weights(model_path, dtype, quantization)
+            except Exception as e:
+                logger.error(f"Failed to load model '{model_name}': {e}")
+                raise
+            load_sec = time.monotonic() - started
+            self._load_sec_total += load_sec
+
+            self._models.pop(key, None)
+            self._models[key] = _CachedModel(
+                model, model_path, dtype, _model_nbytes(model), load_sec, quantization
+            )
+            self._evict(keep=key)
+            logger.info(f"Model '{model_name}' ({dtype}) loaded and cached in {load_sec:.1f}s")
+            return model
+
+    def activate(self, model_name: str, model_path: str, dtype: str = DEFAULT_DTYPE) -> Any:
+        """Взять модель из кэша (загрузив при промахе) и отдать её mlx_whisper.transcribe.
 
-    def get_model(self, model_name: str) -> Optional[Any]:
+        Вызывать под MLX_LOCK: ModelHolder mlx_whisper — глобальный.
+        """
+        model = self.load_model(model_name, model_path, dtype)
+        _bind_transcriber(model, model_path)
+        return model
+
+    def get_model(self, model_name: str, dtype: str = DEFAULT_DTYPE) -> Optional[Any]:
         """
         Получить модель из кэша.
 
@@ -83,22 +192,41 @@ class ModelCache:
         ----------
         model_name : str
             Имя модели
+        dtype : str
+            Тип весов
 
         Returns
         -------
         Any or None
             Модель если есть в кэше, None если нет
         """
-        return self._models.get(model_name)
+        with self._lock:
+            entry = self._models.get((model_name, dtype))
+            return entry.model if entry is not None else None
+
+    def record_run(
+        self, model_name: str, audio_sec: Optional[float], elapsed_sec: float,
+        dtype: str = DEFAULT_DTYPE,
+    ) -> None:
+        """Учесть транскрипцию моделью для RTF (время обработки / длительность аудио)."""
+        if not audio_sec:
+            return
+        with self._lock:
+            entry = self._models.get((model_name, dtype))
+            if entry is not None:
+                entry.audio_sec += audio_sec
+                entry.busy_sec += elapsed_sec
 
     def clear(self) -> None:
         """Очистить все модели из кэша (для освобождения памяти)."""
         logger.info("Clearing model cache")
-        self._models.clear()
+        with self._lock:
+            self._models.clear()
+            _release_transcriber()
 
     def clear_model(self, model_name: str) -> bool:
         """
-        Удалить конкретную модель из кэша.
+        Удалить конкретную модель из кэша (все dtype).
 
         Parameters
         ----------
@@ -110,15 +238,61 @@ class ModelCache:
         bool
             True если модель была удалена, False если её не было
         """
-        if model_name in self._models:
-            del self._models[model_name]
+        with self._lock:
+            keys = [key for key in self._models if key[0] == model_name]
+            for key in keys:
+                _release_transcriber(self._models.pop(key).model)
+        if keys:
             logger.info(f"Model '{model_name}' removed from cache")
-            return True
-        return False
+        return bool(keys)
 
     def get_stats(self) -> Dict[str, Any]:
         """Получить статистику по кэшу."""
-        return {
-            "loaded_models": list(self._models.keys()),
-            "count": len(self._models),
-        }
+        with self._lock:
+            requests = self._hits + self._misses
+            memory = sum(entry.nbytes for entry in self._models.values())
+            return {
+                "loaded_models": [name for name, _ in self._models],
+                "count": len(self._models),
+                "models": [
+                    {
+                        "name": name,
+                        "dtype": dtype,
+                        "path": entry.path,
+                        "size_mb": round(entry.nbytes / (1024 * 1024), 1),
+                        "quantization": entry.quantization,
+                        "rtf": round(entry.busy_sec / entry.audio_sec, 4) if entry.audio_sec else None,
+                        "load_sec": round(entry.load_sec, 2),
+                        "hits": entry.hits,
+                        "last_used": entry.last_used,
+                    }
+                    for (name, dtype), entry in self._models.items()
+                ],
+                "memory_mb": round(memory / (1024 * 1024), 1),
+                "budget_mb": MODEL_CACHE_MAX_MB if self._budget_bytes > 0 else None,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / requests, 3) if requests else 0.0,
+                "evictions": self._evictions,
+                "load_sec_total": round(self._load_sec_total, 2),
+            }
+
+    def _evict(self, keep: Tuple[str, str]) -> None:
+        """Вытеснить давно не использованные модели, пока кэш не уложится в бюджет."""
+        if self._budget_bytes <= 0:
+            return
+        while sum(entry.nbytes for entry in self._models.values()) > self._budget_bytes:
+            key = next(iter(self._models))
+            if key == keep:
+                logger.warning(
+                    f"Model '{key[0]}' ({key[1]}) alone exceeds MODEL_CACHE_MAX_MB={MODEL_CACHE_MAX_MB}"
+                )
+                return
+            entry = self._models.pop(key)
+            self._evictions += 1
+            _release_transcriber(entry.model)
+            logger.info(
+                f"Evicted model '{key[0]}' ({key[1]}, {entry.nbytes / (1024 * 1024):.0f} MB) "
+                f"from cache"
+            )
+
@@ -0,0 +1,346 @@
+"""Реестр локальных моделей Whisper и загрузка весов из safetensors."""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from src.config import MODEL_QUANTIZATION, MODELS_DIR, SUPPORTED_MODELS
+
+logger = logging.getLogger("mlx_whisper")
+
+# Модели, которых нет локально, берутся с HuggingFace Hub
+HUB_REPO_TEMPLATE = "mlx-community/whisper-{name}"
+
+_WEIGHT_FILES = ("weights.safetensors", "weights.npz")
+
+# Допустимые параметры квантования MLX
+_QUANT_BITS = (4, 8)
+_QUANT_GROUP_SIZES = (32, 64, 128)
+
+# Типы тензоров safetensors → имена dtype mlx.core
+_SAFETENSORS_DTYPES = {
+    "F16": "float16",
+    "BF16": "bfloat16",
+    "F32": "float32",
+    "F64": "float64",
+}
+
+
+@dataclass
+class ModelInfo:
+    """Локальная модель: где лежит и что внутри (без чтения весов)."""
+
+    name: str
+    path: str
+    architecture: str
+    weights_file: str
+    size_bytes: int
+    dtype: Optional[str] = None
+    quantization: Optional[Dict[str, Any]] = None
+    dims: Dict[str, Any] = field(default_factory=dict)
+    # Квантование при загрузке из MODEL_QUANTIZATION (None — веса как есть)
+    quantize: Optional[Dict[str, int]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        info = asdict(self)
+        info["size_mb"] = round(self.size_bytes / (1024 * 1024), 1)
+        return info
+
+
+def quantization_for(name: str) -> Optional[Dict[str, int]]:
+    """Параметры квантования модели при загрузке ({"bits", "group_size"}) или None."""
+    spec = MODEL_QUANTIZATION.get(name)
+    if spec is None:
+        return None
+    if spec["bits"] not in _QUANT_BITS or spec["group_size"] not in _QUANT_GROUP_SIZES:
+        logger.warning(f"Ignoring unsupported quantization for model '{name}': {spec}")
+        return None
+    return dict(spec)
+
+
+def quantized_dir(model_dir: str, quantization: Dict[str, int]) -> str:
+    """Каталог квантованных весов рядом с исходными: {model_dir}/q{bits}-g{group_size}."""
+    return os.path.join(model_dir, f"q{quantization['bits']}-g{quantization['group_size']}")
+
+
+def read_safetensors_header(path: str) -> Dict[str, Any]:
+    """Заголовок safetensors (имена, dtype, формы тензоров) через mmap — веса не читаются."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        (length,) = struct.unpack("<Q", mapped[:8])
+        return json.loads(mapped[8:8 + length])
+
+
+def _weights_dtype(header: Dict[str, Any]) -> Optional[str]:
+    """Основной тип весов: dtype с наибольшим числом элементов среди float-тензоров."""
+    counts: Counter = Counter()
+    for name, tensor in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = _SAFETENSORS_DTYPES.get(tensor.get("dtype"))
+        if dtype is not None:
+            elements = 1
+            for dim in tensor.get("shape", []):
+                elements *= dim
+            counts[dtype] += elements
+    return counts.most_common(1)[0][0] if counts else None
+
+
+def _inspect(model_dir: str) -> Optional[ModelInfo]:
+    """Описать каталог модели; None, если это не модель mlx_whisper."""
+    config_path = os.path.join(model_dir, "config.json")
+    weights = next(
+        (os.path.join(model_dir, name) for name in _WEIGHT_FILES
+         if os.path.isfile(os.path.join(model_dir, name))),
+        None,
+    )
+    if weights is None or not os.path.isfile(config_path):
+        return None
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    dirname = os.path.basename(os.path.normpath(model_dir))
+    name = dirname[len("whisper-"):] if dirname.startswith("whisper-") else dirname
+    dtype = None
+    if weights.endswith(".safetensors"):
+        try:
+            dtype = _weights_dtype(read_safetensors_header(weights))
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f"Failed to read safetensors header of {weights}: {e}")
+    return ModelInfo(
+        name=name,
+        path=model_dir,
+        architecture=config.get("model_type", "whisper"),
+        weights_file=weights,
+        size_bytes=os.path.getsize(weights),
+        dtype=dtype,
+        quantization=config.get("quantization"),
+        dims={key: value for key, value in config.items() if key.startswith("n_")},
+    )
+
+
+class ModelRegistry:
+    """Реестр моделей в MODELS_DIR: каталог сканируется один раз при первом обращении.
+
+    Модель доступна по алиасу (whisper-turbo → turbo) и по имени каталога.
+    Модели из SUPPORTED_MODELS, которых нет локально, резолвятся в repo
+    HuggingFace.
+    """
+
+    _instance: Optional["ModelRegistry"] = None
+
+    def __init__(self, models_dir: Optional[str] = None) -> None:
+        self._models_dir = models_dir or MODELS_DIR
+        self._models: Dict[str, ModelInfo] = {}
+        self._scanned = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls) -> "ModelRegistry":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def reset(cls) -> None:
+        """Сбросить синглтон (для тестов)."""
+        cls._instance = None
+
+    def scan(self, force: bool = False) -> List[ModelInfo]:
+        """Просканировать MODELS_DIR (повторно — только с force=True)."""
+        with self._lock:
+            if self._scanned and not force:
+                return self._unique()
+            models: Dict[str, ModelInfo] = {}
+            if os.path.isdir(self._models_dir):
+                for entry in sorted(os.listdir(self._models_dir)):
+                    model_dir = os.path.join(self._models_dir, entry)
+                    if not os.path.isdir(model_dir):
+                        continue
+                    try:
+                        info = _inspect(model_dir)
+                    except (OSError, ValueError) as e:
+                        logger.warning(f"Skipping model directory {model_dir}: {e}")
+                        continue
+                    if info is not None:
+                        info.quantize = quantization_for(info.name) or quantization_for(entry)
+                        models[info.name] = info
+                        models.setdefault(entry, info)
+            self._models = models
+            self._scanned = True
+            logger.info(f"Model registry: {len(self._unique())} local models in {self._models_dir}")
+            return self._unique()
+
+    def get(self, name: str) -> Optional[ModelInfo]:
+        self.scan()
+        return self._models.get(name)
+
+    def resolve(self, name: str) -> str:
+        """Путь к локальной модели или repo HuggingFace, если её нет в MODELS_DIR.
+
+        С Hub берутся только модели из SUPPORTED_MODELS; ValueError для
+        неизвестного имени, которого нет и локально.
+        """
+        info = self.get(name)
+        if info is not None:
+            return info.path
+        if name not in SUPPORTED_MODELS:
+            raise ValueError(
+                f"Unknown model '{name}'. Supported: {', '.join(SUPPORTED_MODELS)} "
+                f"or a model directory in {self._models_dir}"
+            )
+        return HUB_REPO_TEMPLATE.format(name=name)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [info.to_dict() for info in self.scan()]
+
+    def _unique(self) -> List[ModelInfo]:
+        seen: Dict[str, ModelInfo] = {}
+        for info in self._models.values():
+            seen.setdefault(info.path, info)
+        return list(seen.values())
+
+
+def load_whisper_model(
+    path_or_repo: str, dtype: str, quantization: Optional[Dict[str, int]] = None
+) -> Any:
+    """Собрать модель mlx_whisper из весов каталога модели.
+
+    Веса читаются mx.load, приводятся к dtype и материализуются целиком
+    (mx.eval в _build_model) — модель в памяти процесса своя, общей с
+    другими процессами копии нет. Повторная загрузка того же файла быстрее
+    только за счёт page cache ОС. Конфигурация локальных моделей берётся
+    из реестра; модели не из MODELS_DIR загружаются штатным загрузчиком
+    mlx_whisper (с HuggingFace Hub).
+
+    quantization={"bits", "group_size"} квантует веса при первой загрузке и
+    сохраняет их в quantized_dir(); следующие загрузки читают готовые
+    квантованные веса. Уже квантованная модель загружается как есть.
+    """
+    import mlx.core as mx
+
+    target = getattr(mx, dtype)
+    info = next(
+        (model for model in ModelRegistry.get_instance().scan()
+         if os.path.abspath(model.path) == os.path.abspath(path_or_repo)),
+        None,
+    )
+    if info is None:
+        from mlx_whisper.load_models import load_model
+
+        model = load_model(path_or_repo, dtype=target)
+        if quantization is not None and not _is_quantized(model):
+            _quantize(model, quantization)
+        return model
+
+    if quantization is None or info.quantization:
+        return _build_model(info.path, info.weights_file, target)
+
+    cached_dir = quantized_dir(info.path, quantization)
+    cached_weights = os.path.join(cached_dir, "weights.safetensors")
+    if os.path.isfile(cached_weights):
+        return _build_model(cached_dir, cached_weights, target)
+
+    logger.info(
+        f"Quantizing model '{info.name}' to {quantization['bits']} bits "
+        f"(group {quantization['group_size']})"
+    )
+    model = _build_model(info.path, info.weights_file, target)
+    _quantize(model, quantization)
+    try:
+        _save_quantized(model, info.path, cached_dir, quantization)
+    except OSError as e:
+        logger.warning(f"Failed to save quantized weights to {cached_dir}: {e}")
+    return model
+
+
+def _build_model(model_dir: str, weights_file: str, target: Any) -> Any:
+    """Модель из config.json и файла весов каталога (веса приводятся к target)."""
+    import mlx.core as mx
+    import mlx.nn as nn
+    from mlx.utils import tree_unflatten
+    from mlx_whisper import whisper
+
+    with open(os.path.join(model_dir, "config.json"), "r", encoding="utf-8") as f:
+        config = json.load(f)
+    config.pop("model_type", None)
+    quantization = config.pop("quantization", None)
+
+    weights = mx.load(weights_file)
+    weights = {
+        name: value.astype(target) if mx.issubdtype(value.dtype, mx.floating) else value
+        for name, value in weights.items()
+    }
+    model = whisper.Whisper(whisper.ModelDimensions(**config), target)
+    if quantization is not None:
+        nn.quantize(
+            model,
+            **quantization,
+            class_predicate=lambda p, m: (
+                isinstance(m, (nn.Linear, nn.Embedding)) and f"{p}.scales" in weights
+            ),
+        )
+    model.update(tree_unflatten(list(weights.items())))
+    mx.eval(model.parameters())
+    return model
+
+
+def _is_quantized(model: Any) -> bool:
+    import mlx.nn as nn
+
+    return any(
+        isinstance(module, (nn.QuantizedLinear, nn.QuantizedEmbedding))
+        for _, module in model.named_modules()
+    )
+
+
+def _quantize(model: Any, quantization: Dict[str, int]) -> None:
+    """Квантовать Linear/Embedding, у которых размер входа кратен group_size."""
+    import mlx.core as mx
+    import mlx.nn as nn
+
+    group_size = quantization["group_size"]
+    nn.quantize(
+        model,
+        group_size=group_size,
+        bits=quantization["bits"],
+        class_predicate=lambda p, m: (
+            isinstance(m, (nn.Linear, nn.Embedding)) and m.weight.shape[-1] % group_size == 0
+        ),
+    )
+    mx.eval(model.parameters())
+
+
+def _save_quantized(
+    model: Any, source_dir: str, target_dir: str, quantization: Dict[str, int]
+) -> None:
+    """Сохранить квантованные веса и config.json атомарно (через временный каталог)."""
+    import shutil
+
+    import mlx.core as mx
+    from mlx.utils import tree_flatten
+
+    with open(os.path.join(source_dir, "config.json"), "r", encoding="utf-8") as f:
+        config = json.load(f)
+    config["quantization"] = {
+        "group_size": quantization["group_size"],
+        "bits": quantization["bits"],
+    }
+    tmp_dir = f"{target_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    try:
+        mx.save_safetensors(
+            os.path.join(tmp_dir, "weights.safetensors"), dict(tree_flatten(model.parameters()))
+        )
+        with open(os.path.join(tmp_dir, "config.json"), "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2)
+        os.replace(tmp_dir, target_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    logger.info(f"Quantized weights saved to {target_dir}")
@@ -1,7 +1,6 @@
 """Реализация транскрибации с помощью MLX-Transcriber."""
 
 import gc
-import os
 import time
 from typing import Any, Optional
 
@@ -17,9 +16,10 @@ try:
 except ImportError:
     mx = None
 
-from src.utils.audio import get_audio_duration
-from src.config import logger
+from src.utils.audio import get_audio_duration, read_wav_pcm
+from src.config import AUDIO_SAMPLE_RATE, logger
 from src.models.model_cache import ModelCache
+from src.models.model_registry import ModelRegistry
 
 
 def _clear_memory():
@@ -74,39 +74,23 @@ def transcribe_audio(
         - duration: продолжительность аудио
         - segments: сегменты с таймстемпами (если word_timestamps=True)
     """
-    # Получаем путь к модели
-    models_dir = os.getenv("MODELS_DIR", "models")
-
-    # Сопоставляем имена моделей
-    model_mapping = {
-        "tiny": os.path.join(models_dir, "whisper-tiny"),
-        "base": os.path.join(models_dir, "whisper-base"),
-        "small": os.path.join(models_dir, "whisper-small"),
-        "medium": os.path.join(models_dir, "whisper-medium"),
-        "turbo": os.path.join(models_dir, "whisper-turbo"),
-        "large": os.path.join(models_dir, "whisper-large"),
-    }
-
-    model_path = model_mapping.get(model, os.path.join(models_dir, "whisper-large"))
-
-    # Проверяем существование модели
-    if not os.path.exists(model_path):
-        # Используем модель из HuggingFace
-        model_path = f"mlx-community/whisper-{model}"
+    # Локальная модель из MODELS_DIR или repo HuggingFace
+    model_path = ModelRegistry.get_instance().resolve(model)
 
-    # Кэшируем модель
+    # Модель из кэша: transcribe() использует загруженный экземпляр
     cache = ModelCache.get_instance()
-    cached_model = cache.get_model(model)
-    if cached_model is None:
-        # Модель не в кэше, загружаем
-        cache.load_model(model, model_path)
-
-    # Измеряем длительность аудио
-    try:
-        audio_duration = get_audio_duration(file_path)
-    except Exception as e:
-        logger.error(f"Failed to get audio duration for {file_path}: {e}")
-        audio_duration = None
+    cache.activate(model, model_path)
+
+    # Канонический WAV читаем сразу в память (без ffmpeg); иначе — ffprobe/ffmpeg
+    audio = read_wav_pcm(file_path)
+    if audio is not None:
+        audio_duration = len(audio) / AUDIO_SAMPLE_RATE
+    else:
+        try:
+            audio_duration = get_audio_duration(file_path)
+        except Exception as e:
+            logger.error(f"Failed to get audio duration for {file_path}: {e}")
+            audio_duration = None
 
     # Подготавливаем параметры
     transcribe_options = {
@@ -128,7 +112,7 @@ def transcribe_audio(
     try:
         start_time = time.time()
         result = transcribe(
-            audio=file_path,
+            audio=audio if audio is not None else file_path,
             path_or_hf_repo=model_path,
             **transcribe_options
         )
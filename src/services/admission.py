@@ -0,0 +1,112 @@
+"""Admission control: решение о приёме задачи до чтения тела запроса."""
+
+import math
+import shutil
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from src.config import (
+    ADMISSION_DISK_FACTOR,
+    ADMISSION_MAX_BACKLOG_SEC,
+    ADMISSION_MAX_QUEUED_AUDIO_SEC,
+    ADMISSION_MAX_RETRY_AFTER_SEC,
+    ADMISSION_MIN_FREE_DISK_MB,
+    DATA_UPLOADS_DIR,
+)
+
+
+@dataclass
+class AdmissionDecision:
+    """Результат проверки: accepted либо код ответа + Retry-After."""
+
+    accepted: bool
+    status_code: int = 200
+    detail: str = ""
+    retry_after: Optional[int] = None
+
+
+def _clamp_retry_after(seconds: float, minimum: int = 1) -> int:
+    return int(min(max(math.ceil(seconds), minimum), ADMISSION_MAX_RETRY_AFTER_SEC))
+
+
+def evaluate_admission(
+    snapshot: Dict[str, Any],
+    content_length: int = 0,
+    tenant_depth: int = 0,
+    tenant_quota: int = 0,
+    free_disk_bytes: Optional[int] = None,
+) -> AdmissionDecision:
+    """Принять решение по снимку нагрузки очереди (см. load_snapshot()).
+
+    429 — очередь/квота/backlog переполнены (клиенту стоит повторить позже),
+    503 — сервис не может принять работу (остановка, drain, нет места на диске).
+    Retry-After оценивается по backlog: время до освобождения слота
+    или до снижения backlog ниже порога.
+    """
+    backlog = float(snapshot.get("backlog_sec") or 0.0)
+    pending_jobs = max(int(snapshot.get("pending_jobs") or 0), 1)
+    per_slot = backlog / pending_jobs
+
+    if snapshot.get("shutdown") or snapshot.get("draining"):
+        detail = "Service is shutting down" if snapshot.get("shutdown") else "Service is draining"
+        return AdmissionDecision(False, 503, detail, _clamp_retry_after(per_slot, 30))
+
+    if free_disk_bytes is not None:
+        required = ADMISSION_MIN_FREE_DISK_MB * 1024 * 1024 + content_length * ADMISSION_DISK_FACTOR
+        if free_disk_bytes < required:
+            return AdmissionDecision(
+                False, 503, "Insufficient disk space, try again later",
+                _clamp_retry_after(per_slot, 30),
+            )
+
+    max_size = int(snapshot.get("max_size") or 0)
+    if max_size > 0 and int(snapshot.get("queued") or 0) >= max_size:
+        return AdmissionDecision(
+            False, 429, "Queue is full, try again later", _clamp_retry_after(per_slot)
+        )
+
+    if tenant_quota > 0 and tenant_depth >= tenant_quota:
+        return AdmissionDecision(
+            False, 429, "Tenant queue quota exceeded, try again later",
+            _clamp_retry_after(per_slot),
+        )
+
+    pending_audio = float(snapshot.get("pending_audio_sec") or 0.0)
+    if ADMISSION_MAX_QUEUED_AUDIO_SEC > 0 and pending_audio >= ADMISSION_MAX_QUEUED_AUDIO_SEC:
+        rtf = float(snapshot.get("rtf") or 0.0)
+        workers = max(int(snapshot.get("workers") or 1), 1)
+        excess = (pending_audio - ADMISSION_MAX_QUEUED_AUDIO_SEC) * rtf / workers
+        return AdmissionDecision(
+            False, 429, "Too much audio queued, try again later",
+            _clamp_retry_after(max(excess, per_slot)),
+        )
+
+    if ADMISSION_MAX_BACKLOG_SEC > 0 and backlog >= ADMISSION_MAX_BACKLOG_SEC:
+        return AdmissionDecision(
+            False, 429, "Transcription backlog is too long, try again later",
+            _clamp_retry_after(max(backlog - ADMISSION_MAX_BACKLOG_SEC, per_slot)),
+        )
+
+    return AdmissionDecision(True)
+
+
+def free_disk_bytes(path: str = DATA_UPLOADS_DIR) -> Optional[int]:
+    """Свободное место на диске с каталогом данных (None если не удалось определить)."""
+    try:
+        return shutil.disk_usage(path).free
+    except OSError:
+        return None
+
+
+def check_admission(manager: Any, tenant: str, content_length: int = 0) -> AdmissionDecision:
+    """Проверить, может ли очередь принять новую задачу тенанта."""
+    from src.services.fair_queue import load_tenant_policies
+
+    policy = load_tenant_policies().get(tenant)
+    return evaluate_admission(
+        manager.load_snapshot(),
+        content_length=content_length,
+        tenant_depth=manager.tenant_depth(tenant),
+        tenant_quota=policy.max_queued if policy else 0,
+        free_disk_bytes=free_disk_bytes(),
+    )
@@ -0,0 +1,176 @@
+"""Circuit breaker и метрики здоровья удалённых бэкендов транскрипции (oMLX)."""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from src.config import (
+    OMLX_CIRCUIT_WINDOW,
+    OMLX_CIRCUIT_MIN_CALLS,
+    OMLX_CIRCUIT_ERROR_RATE,
+    OMLX_CIRCUIT_OPEN_SEC,
+    OMLX_CIRCUIT_SLOW_CALL_SEC,
+)
+
+logger = logging.getLogger("mlx_whisper")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Circuit breaker по доле ошибок в скользящем окне последних запросов.
+
+    closed → open: в окне не меньше min_calls запросов и доля ошибок
+    (включая запросы медленнее slow_call_sec) достигла error_rate.
+    open → half_open: через open_sec пропускается один пробный запрос.
+    half_open → closed при его успехе (автоматический fail-back),
+    → open при ошибке.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_calls: int = 5,
+        error_rate: float = 0.5,
+        open_sec: float = 60.0,
+        slow_call_sec: float = 0.0,
+    ) -> None:
+        self.name = name
+        self._window = max(window, 1)
+        self._min_calls = max(min_calls, 1)
+        self._error_rate = error_rate
+        self._open_sec = open_sec
+        self._slow_call_sec = slow_call_sec
+        self._lock = threading.Lock()
+        # (успех, латентность) последних запросов
+        self._calls: Deque[Tuple[bool, float]] = deque(maxlen=self._window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._transitions = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow_request(self, now: Optional[float] = None) -> bool:
+        """Можно ли направить задачу в бэкенд (в half_open — один пробный запрос)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if now - self._opened_at < self._open_sec:
+                    return False
+                self._set_state(HALF_OPEN)
+            # Пробный запрос; если он так и не отчитался — через open_sec пускаем следующий
+            if self._probe_started is None or now - self._probe_started >= self._open_sec:
+                self._probe_started = now
+                return True
+            return False
+
+    def record_success(self, latency: float, now: Optional[float] = None) -> None:
+        if self._slow_call_sec > 0 and latency > self._slow_call_sec:
+            self.record_failure(f"slow call: {latency:.1f}s", latency=latency, now=now)
+            return
+        with self._lock:
+            self._calls.append((True, latency))
+            if self._state != CLOSED:
+                logger.info(f"Backend '{self.name}' recovered, closing circuit")
+                self._calls.clear()
+                self._calls.append((True, latency))
+                self._set_state(CLOSED)
+
+    def record_failure(
+        self, error: str, latency: float = 0.0, now: Optional[float] = None
+    ) -> None:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._calls.append((False, latency))
+            self._last_error = error
+            if self._state == HALF_OPEN:
+                self._open(now)
+                return
+            if self._state == OPEN:
+                return
+            failures = sum(1 for ok, _ in self._calls if not ok)
+            if len(self._calls) >= self._min_calls and failures / len(self._calls) >= self._error_rate:
+                self._open(now)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._calls.clear()
+            self._state = CLOSED
+            self._probe_started = None
+            self._last_error = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Состояние цепи, доля ошибок и латентность по окну последних запросов."""
+        with self._lock:
+            calls = list(self._calls)
+            latencies = sorted(lat for ok, lat in calls if ok)
+            failures = sum(1 for ok, _ in calls if not ok)
+            return {
+                "state": self._state,
+                "calls": len(calls),
+                "error_rate": round(failures / len(calls), 3) if calls else 0.0,
+                "latency_p50_sec": round(_percentile(latencies, 0.5), 3),
+                "latency_p95_sec": round(_percentile(latencies, 0.95), 3),
+                "last_error": self._last_error,
+                "transitions": self._transitions,
+            }
+
+    def _open(self, now: float) -> None:
+        if self._state != OPEN:
+            logger.warning(f"Backend '{self.name}' degraded, opening circuit: {self._last_error}")
+        self._opened_at = now
+        self._probe_started = None
+        self._set_state(OPEN)
+
+    def _set_state(self, state: str) -> None:
+        if state != self._state:
+            self._state = state
+            self._transitions += 1
+        if state == CLOSED:
+            self._probe_started = None
+
+
+def _percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    index = min(int(round(q * (len(values) - 1))), len(values) - 1)
+    return float(values[index])
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str = "omlx") -> CircuitBreaker:
+    """Circuit breaker бэкенда (один на процесс)."""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                name,
+                window=OMLX_CIRCUIT_WINDOW,
+                min_calls=OMLX_CIRCUIT_MIN_CALLS,
+                error_rate=OMLX_CIRCUIT_ERROR_RATE,
+                open_sec=OMLX_CIRCUIT_OPEN_SEC,
+                slow_call_sec=OMLX_CIRCUIT_SLOW_CALL_SEC,
+            )
+            _breakers[name] = breaker
+        return breaker
+
+
+def reset_breakers() -> None:
+    """Сбросить все circuit breaker'ы (для тестов)."""
+    with _breakers_lock:
+        _breakers.clear()
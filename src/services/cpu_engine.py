@@ -0,0 +1,209 @@
+"""CPUWhisperEngine — механизм транскрибации на CPU через faster-whisper (CTranslate2, int8)."""
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.config import (
+    AUDIO_SAMPLE_RATE,
+    CPU_WHISPER_COMPUTE_TYPE,
+    CPU_WHISPER_THREADS,
+    CPU_WHISPER_WORKERS,
+    MODELS_DIR,
+    logger,
+)
+from src.services.engine_base import (
+    CancellationToken,
+    TranscriptionCancelled,
+    TranscriptionEngine,
+    _build_formatted_text_from_segments,
+)
+from src.utils.audio import get_audio_duration, read_wav_pcm
+from src.utils.raw_artifact import RawArtifactWriter
+
+# Имена моделей сервиса → имена моделей faster-whisper
+_CPU_MODEL_NAMES = {
+    "large": "large-v3",
+    "turbo": "large-v3-turbo",
+}
+
+
+def cpu_model_path(model: str) -> str:
+    """Локальная CTranslate2-модель {MODELS_DIR}/faster-whisper-{model} или имя для загрузки с hub."""
+    local = os.path.join(MODELS_DIR, f"faster-whisper-{model}")
+    if os.path.isdir(local):
+        return local
+    return _CPU_MODEL_NAMES.get(model, model)
+
+
+class CPUWhisperEngine(TranscriptionEngine):
+    """Механизм транскрибации на CPU для узлов без Apple Silicon.
+
+    Whisper в CTranslate2 с int8-весами (CPU_WHISPER_COMPUTE_TYPE) и
+    CPU_WHISPER_THREADS потоками на инференс. Модели загружаются один раз
+    на процесс; CPU_WHISPER_WORKERS задач декодируются одной моделью
+    параллельно, остальные ждут в очереди CTranslate2. Декодирование
+    жадное, как у WhisperEngine.
+
+    model — принудительная модель (для fallback вместо oMLX).
+    """
+
+    name = "cpu"
+
+    _models: Dict[str, Any] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, model: Optional[str] = None) -> None:
+        self.model = model
+
+    def resolve_model(self, requested: Optional[str]) -> Optional[str]:
+        return self.model or requested or "large"
+
+    @classmethod
+    def reset(cls) -> None:
+        """Выгрузить модели (для тестов)."""
+        with cls._lock:
+            cls._models.clear()
+
+    @classmethod
+    def _load(cls, model: str) -> Any:
+        """Модель faster-whisper из кэша процесса (загрузка при первом обращении)."""
+        with cls._lock:
+            loaded = cls._models.get(model)
+            if loaded is not None:
+                return loaded
+            try:
+                from faster_whisper import WhisperModel
+            except ImportError:
+                raise ImportError(
+                    "faster-whisper package is required for mechanism=cpu. "
+                    "Install it with: pip install faster-whisper"
+                )
+            path = cpu_model_path(model)
+            logger.info(
+                f"Loading CPU model '{model}' from {path} "
+                f"({CPU_WHISPER_COMPUTE_TYPE}, threads={CPU_WHISPER_THREADS or 'auto'})"
+            )
+            started = time.monotonic()
+            loaded = WhisperModel(
+                path,
+                device="cpu",
+                compute_type=CPU_WHISPER_COMPUTE_TYPE,
+                cpu_threads=CPU_WHISPER_THREADS,
+                num_workers=CPU_WHISPER_WORKERS,
+            )
+            cls._models[model] = loaded
+            logger.info(f"CPU model '{model}' loaded in {time.monotonic() - started:.1f}s")
+            return loaded
+
+    def transcribe(self, file_path: str, **params) -> Dict[str, Any]:
+        """Выполнить транскрипцию через faster-whisper на CPU.
+
+        Параметры — как у WhisperEngine. cancel_token проверяется между
+        сегментами: faster-whisper декодирует окна лениво, по мере чтения.
+        """
+        model = self.resolve_model(params.get("model", "large"))
+        language = params.get("language")
+        include_timestamps = params.get("include_timestamps", True)
+        cancel_token: Optional[CancellationToken] = params.get("cancel_token")
+
+        audio = read_wav_pcm(file_path)
+        if audio is not None:
+            audio_duration: Optional[float] = len(audio) / AUDIO_SAMPLE_RATE
+        else:
+            try:
+                audio_duration = get_audio_duration(file_path)
+            except Exception as e:
+                logger.error(f"Failed to get audio duration for {file_path}: {e}")
+                audio_duration = None
+
+        transcribe_options: Dict[str, Any] = {
+            "language": language,
+            "task": params.get("task", "transcribe"),
+            "beam_size": 1,
+            "word_timestamps": params.get("word_timestamps", False),
+            "condition_on_previous_text": params.get("condition_on_previous_text", True),
+            "initial_prompt": params.get("initial_prompt"),
+        }
+        if params.get("no_speech_threshold") is not None:
+            transcribe_options["no_speech_threshold"] = params["no_speech_threshold"]
+        if params.get("hallucination_silence_threshold") is not None:
+            transcribe_options["hallucination_silence_threshold"] = params[
+                "hallucination_silence_threshold"
+            ]
+
+        start_time = time.time()
+        try:
+            cpu_model = self._load(model)
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            segments_iter, info = cpu_model.transcribe(
+                audio if audio is not None else file_path, **transcribe_options
+            )
+            segments: List[Dict[str, Any]] = []
+            for segment in segments_iter:
+                segments.append(_segment_to_dict(len(segments), segment))
+                # Как у WhisperEngine: при drain доводим до конца, прерываем только abort
+                if cancel_token is not None:
+                    cancel_token.raise_if_aborted()
+        except TranscriptionCancelled:
+            logger.info(f"CPU transcription cancelled for {file_path}")
+            raise
+        except Exception as e:
+            logger.error(f"CPU transcription failed for {file_path}: {e}")
+            raise
+
+        transcribe_duration = time.time() - start_time
+        result: Dict[str, Any] = {
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": info.language,
+            "transcribe_duration": transcribe_duration,
+        }
+        if audio_duration is not None:
+            result["audio_duration"] = audio_duration
+
+        raw_file = None
+        raw_path = params.get("raw_path")
+        if raw_path:
+            writer = RawArtifactWriter(raw_path)
+            try:
+                writer.write_json({"engine": self.name, "model": model}, result)
+                raw_file = writer.close()
+            except (TypeError, ValueError, OSError) as e:
+                writer.discard()
+                logger.warning(f"Failed to save CPU raw response: {e}")
+
+        return {
+            "segments": segments,
+            "text": _build_formatted_text_from_segments(
+                segments, include_timestamps=include_timestamps
+            ),
+            "speaker_detected": False,
+            "transcription_duration": round(transcribe_duration, 2),
+            "raw_response": None,
+            "raw_file": raw_file,
+        }
+
+
+def _segment_to_dict(index: int, segment: Any) -> Dict[str, Any]:
+    """Segment faster-whisper → сегмент в формате mlx_whisper.transcribe (id с нуля)."""
+    result: Dict[str, Any] = {
+        "id": index,
+        "seek": segment.seek,
+        "start": segment.start,
+        "end": segment.end,
+        "text": segment.text,
+        "tokens": list(segment.tokens),
+        "temperature": segment.temperature,
+        "avg_logprob": segment.avg_logprob,
+        "compression_ratio": segment.compression_ratio,
+        "no_speech_prob": segment.no_speech_prob,
+    }
+    if segment.words is not None:
+        result["words"] = [
+            {"word": w.word, "start": w.start, "end": w.end, "probability": w.probability}
+            for w in segment.words
+        ]
+    return result
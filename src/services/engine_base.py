@@ -0,0 +1,184 @@
+"""Базовые типы механизмов транскрибации без зависимости от MLX.
+
+TranscriptionEngine, токены отмены и форматирование текста используют и
+движки, которым MLX не нужен (oMLX, CPU, пул процессов), поэтому они живут
+отдельно от WhisperEngine. whisper_engines реэкспортирует их.
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+
+class TranscriptionCancelled(Exception):
+    """Транскрипция прервана через CancellationToken."""
+    pass
+
+
+# Причина отмены при drain: движок дорабатывает текущий чанк/запрос и
+# останавливается в ближайшей точке между чанками.
+DRAIN_REASON = "drain"
+
+
+class CancellationToken:
+    """Потокобезопасный флаг отмены задачи, передаваемый в engine.transcribe()."""
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        # Жёсткая отмена (пользователь, таймаут) перекрывает мягкий drain
+        if not self._event.is_set() or self.reason == DRAIN_REASON:
+            self.reason = reason
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    @property
+    def aborted(self) -> bool:
+        """Отмена, прерывающая текущую операцию немедленно (всё, кроме drain)."""
+        return self._event.is_set() and self.reason != DRAIN_REASON
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Ждать отмены до timeout секунд. True если отменено."""
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise TranscriptionCancelled(self.reason or "cancelled")
+
+    def raise_if_aborted(self) -> None:
+        if self.aborted:
+            raise TranscriptionCancelled(self.reason or "cancelled")
+
+
+class AnyCancellationToken:
+    """Отмена группы задач, выполняемых одним запросом: срабатывает при отмене любой.
+
+    Интерфейс — как у CancellationToken; reason берётся у первой жёстко
+    отменённой задачи, иначе у первой отменённой (drain).
+    """
+
+    def __init__(self, tokens: List[CancellationToken]) -> None:
+        self._tokens = list(tokens)
+
+    def _first(self) -> Optional[CancellationToken]:
+        cancelled = [token for token in self._tokens if token.cancelled]
+        aborted = [token for token in cancelled if token.aborted]
+        return (aborted or cancelled or [None])[0]
+
+    @property
+    def reason(self) -> Optional[str]:
+        token = self._first()
+        return token.reason if token is not None else None
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        for token in self._tokens:
+            token.cancel(reason)
+
+    @property
+    def cancelled(self) -> bool:
+        return any(token.cancelled for token in self._tokens)
+
+    @property
+    def aborted(self) -> bool:
+        return any(token.aborted for token in self._tokens)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.cancelled:
+            remaining = 0.05 if deadline is None else min(0.05, deadline - time.monotonic())
+            if remaining <= 0:
+                return False
+            time.sleep(remaining)
+        return True
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancelled:
+            raise TranscriptionCancelled(self.reason or "cancelled")
+
+    def raise_if_aborted(self) -> None:
+        if self.aborted:
+            raise TranscriptionCancelled(self.reason or "cancelled")
+
+
+class TranscriptionEngine(ABC):
+    """Абстрактный базовый класс для механизмов транскрибации."""
+
+    # Имя механизма — записывается в metadata задачи как engine_used
+    name = "engine"
+
+    def resolve_model(self, requested: Optional[str]) -> Optional[str]:
+        """Модель, которую механизм фактически использует для запрошенной."""
+        return requested
+
+    @abstractmethod
+    def transcribe(self, file_path: str, **params) -> Dict[str, Any]:
+        """
+        Транскрибировать аудиофайл.
+
+        Parameters
+        ----------
+        file_path : str
+            Путь к аудиофайлу
+        **params
+            Параметры транскрипции (language, model, task и др.);
+            cancel_token : CancellationToken — движок периодически проверяет
+            его и прерывает работу исключением TranscriptionCancelled;
+            raw_path : str — куда потоково записать сырой ответ
+            (RawArtifactWriter), в результате остаётся только raw_file
+
+        Returns
+        -------
+        dict
+            Нормализованный результат:
+            {
+                "segments": [...],
+                "text": str,
+                "speaker_detected": bool,
+                "transcription_duration": float,
+                "raw_response": str | None,  # optional: сырой ответ API (устарело)
+                "raw_file": str | None,  # optional: имя артефакта, записанного в params["raw_path"]
+            }
+        """
+
+
+def _build_formatted_text_from_segments(
+    segments: list[dict],
+    *,
+    include_timestamps: bool = True,
+) -> str:
+    """Собрать текст из сегментов.
+
+    Спикеры определяются автоматически: если хотя бы один сегмент
+    имеет speaker != 0, рендерятся метки спикеров.
+    Иначе — текст без меток.
+
+    При include_timestamps=True — формат [MM:SS]: Текст.
+    При include_timestamps=False — только текст, без префикса.
+    """
+    # Автоопределение: спикеры есть, если хотя бы у одного сегмента
+    # speaker != 0
+    has_speakers = any(seg.get("speaker", 0) != 0 for seg in segments)
+
+    lines: list[str] = []
+    for seg in segments:
+        start = seg.get("start", 0)
+        speaker = seg.get("speaker", 0)
+        text = seg.get("text", "").strip()
+        if not text:
+            continue
+        if include_timestamps:
+            minutes = int(start) // 60
+            seconds = int(start) % 60
+            if has_speakers:
+                lines.append(f"[{minutes:02d}:{seconds:02d}] Спикер {speaker} : {text}")
+            else:
+                lines.append(f"[{minutes:02d}:{seconds:02d}]: {text}")
+        else:
+            lines.append(text)
+    return "\n".join(lines)
@@ -0,0 +1,235 @@
+"""Weighted fair-share очередь задач транскрипции по тенантам (API-ключам)."""
+
+import time
+from collections import deque
+from dataclasses import dataclass
+from queue import Empty, Full, Queue
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from src.config import (
+    API_KEYS,
+    DEFAULT_TENANT,
+    TENANT_DEFAULT_MAX_CONCURRENT,
+    TENANT_DEFAULT_MAX_QUEUED,
+    TENANT_DEFAULT_WEIGHT,
+)
+
+
+class TenantQuotaExceeded(Full):
+    """Тенант исчерпал свою квоту на количество задач в очереди."""
+    pass
+
+
+@dataclass
+class TenantPolicy:
+    """Вес и лимиты тенанта. 0 в лимитах означает «без ограничения»."""
+
+    weight: float = TENANT_DEFAULT_WEIGHT
+    max_concurrent: int = TENANT_DEFAULT_MAX_CONCURRENT
+    max_queued: int = TENANT_DEFAULT_MAX_QUEUED
+
+
+def load_tenant_policies() -> Dict[str, TenantPolicy]:
+    """Собрать политики тенантов из API_KEYS (первый ключ тенанта задаёт лимиты)."""
+    policies: Dict[str, TenantPolicy] = {DEFAULT_TENANT: TenantPolicy()}
+    for entry in API_KEYS.values():
+        tenant = entry["tenant"]
+        if tenant in policies and tenant != DEFAULT_TENANT:
+            continue
+        policies[tenant] = TenantPolicy(
+            weight=max(float(entry["weight"]), 0.01),
+            max_concurrent=int(entry["max_concurrent"]),
+            max_queued=int(entry["max_queued"]),
+        )
+    return policies
+
+
+@dataclass
+class _TenantState:
+    policy: TenantPolicy
+    pending: Deque[Tuple[float, Any]]
+    running: int = 0
+    pass_value: float = 0.0
+    submitted: int = 0
+    dispatched: int = 0
+    rejected: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+
+class FairQueue(Queue):
+    """Bounded очередь с weighted fair dispatch между тенантами.
+
+    Элементы должны иметь атрибут ``tenant``. Каждый тенант получает
+    собственную FIFO-подочередь; ``get()`` выбирает тенанта с минимальным
+    виртуальным временем (stride scheduling: шаг = 1 / weight), пропуская
+    тенантов, у которых исчерпан лимит одновременных задач. Воркер обязан
+    вызвать ``release(tenant)`` после завершения задачи. ``put()`` поднимает
+    TenantQuotaExceeded, если подочередь тенанта достигла ``max_queued``.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 0,
+        policies: Optional[Dict[str, TenantPolicy]] = None,
+    ) -> None:
+        self._policies = policies if policies is not None else load_tenant_policies()
+        super().__init__(maxsize=maxsize)
+
+    # -- Queue internals (вызываются под self.mutex) -------------------------
+
+    def _init(self, maxsize: int) -> None:
+        self._tenants: Dict[str, _TenantState] = {}
+        self._vtime = 0.0
+        self._size = 0
+
+    def _qsize(self) -> int:
+        return self._size
+
+    def _put(self, item: Any) -> None:
+        # Проверка квоты и вставка — в одной критической секции Queue.put()
+        state = self._state(getattr(item, "tenant", DEFAULT_TENANT))
+        limit = state.policy.max_queued
+        if limit > 0 and len(state.pending) >= limit:
+            state.rejected += 1
+            raise TenantQuotaExceeded()
+        if not state.pending:
+            # Тенант возвращается из простоя — не даём ему накопленный кредит
+            state.pass_value = max(state.pass_value, self._vtime)
+        state.pending.append((time.monotonic(), item))
+        state.submitted += 1
+        self._size += 1
+
+    def _get(self) -> Any:
+        tenant = self._pick()
+        assert tenant is not None, "_get() called without an eligible tenant"
+        return self._pop(tenant)
+
+    # -- Public API ----------------------------------------------------------
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Any:
+        """Взять следующую задачу по fair-share среди тенантов с свободными слотами."""
+        with self.not_empty:
+            if not block:
+                if self._pick() is None:
+                    raise Empty
+            elif timeout is None:
+                while self._pick() is None:
+                    self.not_empty.wait()
+            else:
+                if timeout < 0:
+                    raise ValueError("'timeout' must be a non-negative number")
+                endtime = time.monotonic() + timeout
+                while self._pick() is None:
+                    remaining = endtime - time.monotonic()
+                    if remaining <= 0.0:
+                        raise Empty
+                    self.not_empty.wait(remaining)
+            item = self._get()
+            self.not_full.notify()
+            return item
+
+    def get_matching(self, predicate: Callable[[Any], bool], limit: int = 1) -> List[Any]:
+        """Без ожидания взять до limit задач, для которых predicate(item) истинно.
+
+        Рассматриваются только головы подочередей (FIFO тенанта сохраняется),
+        порядок тенантов и лимиты max_concurrent — как в get(). predicate
+        вызывается под мьютексом очереди.
+        """
+        taken: List[Any] = []
+        with self.mutex:
+            while len(taken) < limit:
+                tenant = self._pick(predicate)
+                if tenant is None:
+                    break
+                taken.append(self._pop(tenant))
+            if taken:
+                self.not_full.notify(len(taken))
+        return taken
+
+    def release(self, tenant: str) -> None:
+        """Освободить слот тенанта после завершения задачи."""
+        with self.mutex:
+            state = self._tenants.get(tenant)
+            if state is not None and state.running > 0:
+                state.running -= 1
+            self.not_empty.notify_all()
+
+    def depth(self, tenant: str) -> int:
+        """Количество задач тенанта в очереди."""
+        with self.mutex:
+            state = self._tenants.get(tenant)
+            return len(state.pending) if state else 0
+
+    def eligible(self) -> int:
+        """Сколько задач можно выдать прямо сейчас с учётом max_concurrent тенантов."""
+        with self.mutex:
+            total = 0
+            for state in self._tenants.values():
+                cap = state.policy.max_concurrent
+                if cap > 0:
+                    total += min(len(state.pending), max(cap - state.running, 0))
+                else:
+                    total += len(state.pending)
+            return total
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Метрики по тенантам: глубина очереди, занятые слоты, время ожидания."""
+        now = time.monotonic()
+        with self.mutex:
+            result: Dict[str, Dict[str, Any]] = {}
+            for name, state in self._tenants.items():
+                oldest = now - state.pending[0][0] if state.pending else 0.0
+                result[name] = {
+                    "weight": state.policy.weight,
+                    "max_concurrent": state.policy.max_concurrent,
+                    "max_queued": state.policy.max_queued,
+                    "queued": len(state.pending),
+                    "running": state.running,
+                    "submitted": state.submitted,
+                    "dispatched": state.dispatched,
+                    "rejected": state.rejected,
+                    "avg_wait_sec": round(state.total_wait / state.dispatched, 3)
+                    if state.dispatched else 0.0,
+                    "max_wait_sec": round(state.max_wait, 3),
+                    "oldest_wait_sec": round(oldest, 3),
+                }
+            return result
+
+    # -- Helpers -------------------------------------------------------------
+
+    def _state(self, tenant: str) -> _TenantState:
+        state = self._tenants.get(tenant)
+        if state is None:
+            policy = self._policies.get(tenant) or self._policies.get(DEFAULT_TENANT) or TenantPolicy()
+            state = _TenantState(policy=policy, pending=deque(), pass_value=self._vtime)
+            self._tenants[tenant] = state
+        return state
+
+    def _pick(self, predicate: Optional[Callable[[Any], bool]] = None) -> Optional[str]:
+        best: Optional[str] = None
+        best_pass = 0.0
+        for name, state in self._tenants.items():
+            if not state.pending:
+                continue
+            cap = state.policy.max_concurrent
+            if cap > 0 and state.running >= cap:
+                continue
+            if predicate is not None and not predicate(state.pending[0][1]):
+                continue
+            if best is None or state.pass_value < best_pass:
+                best, best_pass = name, state.pass_value
+        return best
+
+    def _pop(self, tenant: str) -> Any:
+        state = self._tenants[tenant]
+        enqueued_at, item = state.pending.popleft()
+        wait = time.monotonic() - enqueued_at
+        self._vtime = state.pass_value
+        state.pass_value += 1.0 / state.policy.weight
+        state.running += 1
+        state.dispatched += 1
+        state.total_wait += wait
+        state.max_wait = max(state.max_wait, wait)
+        self._size -= 1
+        return item
@@ -0,0 +1,576 @@
+"""Пул процессов для локального инференса (whisper, cpu) вне процесса API."""
+
+import itertools
+import multiprocessing
+import os
+import pickle
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.config import (
+    INFERENCE_MAX_JOBS_PER_PROCESS,
+    INFERENCE_MAX_RSS_MB,
+    INFERENCE_PROCESSES,
+    logger,
+)
+from src.services.engine_base import (
+    CancellationToken,
+    TranscriptionCancelled,
+    TranscriptionEngine,
+)
+
+# Период опроса pipe и токена отмены в родителе (сек)
+_POLL_SEC = 0.25
+# Сколько ждать кооперативной отмены в процессе, прежде чем убить его (сек)
+_ABORT_GRACE_SEC = 10.0
+# Сколько ждать штатного завершения процесса при перезапуске/остановке (сек)
+_STOP_TIMEOUT_SEC = 5.0
+# Сколько ждать ответа процесса на запрос состояния (сек)
+_QUERY_TIMEOUT_SEC = 2.0
+
+
+class InferenceWorkerCrashed(RuntimeError):
+    """Процесс инференса завершился посреди задачи (OOM, сигнал, segfault)."""
+    pass
+
+
+def _rss_bytes() -> int:
+    """Память текущего процесса: RSS либо активная память MLX, что больше.
+
+    Буферы Metal на Apple Silicon не всегда попадают в RSS, поэтому
+    учитывается и mx.get_active_memory(). Без /proc (macOS) берётся пиковый
+    ru_maxrss — он не убывает, для порога перезапуска этого достаточно.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        rss = peak if sys.platform == "darwin" else peak * 1024
+    mx = sys.modules.get("mlx.core")
+    if mx is not None:
+        try:
+            rss = max(rss, int(mx.get_active_memory()))
+        except Exception:
+            pass
+    return rss
+
+
+def _run_job(
+    mechanism: str,
+    model: Optional[str],
+    file_path: str,
+    params: Dict[str, Any],
+    cancel_token: CancellationToken,
+) -> Dict[str, Any]:
+    """Выполнить задачу локальным механизмом в процессе инференса."""
+    from src.services import whisper_engines
+
+    engine = whisper_engines.create_local_engine(mechanism, model)
+    try:
+        return engine.transcribe(file_path, cancel_token=cancel_token, **params)
+    finally:
+        if engine.name == "whisper":
+            with whisper_engines.mlx_slot():
+                whisper_engines._clear_memory()
+
+
+def _picklable(error: BaseException) -> BaseException:
+    """Исключение для передачи в родителя; непереносимые — как RuntimeError."""
+    try:
+        pickle.loads(pickle.dumps(error))
+        return error
+    except Exception:
+        return RuntimeError(f"{type(error).__name__}: {error}")
+
+
+def _warmup_status() -> Dict[str, Any]:
+    """Состояние прогрева моделей в процессе инференса."""
+    from src.services.model_warmup import get_model_warmup
+
+    warmup = get_model_warmup()
+    return {"ready": warmup.is_ready(), "models": warmup.get_status()}
+
+
+def _cache_stats() -> Dict[str, Any]:
+    from src.models.model_cache import ModelCache
+
+    return ModelCache.get_instance().get_stats()
+
+
+def _cache_clear() -> None:
+    from src.models.model_cache import ModelCache
+
+    ModelCache.get_instance().clear()
+
+
+def _preload(model: str, model_path: str) -> None:
+    from src.models.model_cache import ModelCache
+
+    ModelCache.get_instance().load_model(model, model_path)
+
+
+def _whisper_stats() -> Dict[str, Any]:
+    """Счётчики пакетного и спекулятивного декодирования процесса."""
+    from src.services.whisper_batcher import get_whisper_batcher
+    from src.services.whisper_speculative import get_speculative_decoder
+
+    return {
+        "batcher": get_whisper_batcher().get_stats(),
+        "speculative": get_speculative_decoder().get_stats(),
+    }
+
+
+# Запросы API к процессу по query-каналу: имя → функция в процессе инференса
+_QUERIES: Dict[str, Callable[..., Any]] = {
+    "warmup": _warmup_status,
+    "cache_stats": _cache_stats,
+    "cache_clear": _cache_clear,
+    "preload": _preload,
+    "whisper_stats": _whisper_stats,
+}
+
+
+def _serve_queries(query: Any) -> None:
+    """Отвечать на запросы (qid, name, args) ответом (qid, status, payload)."""
+    while True:
+        try:
+            qid, name, args = query.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            reply: Tuple[int, str, Any] = (qid, "ok", _QUERIES[name](*args))
+        except Exception as e:
+            reply = (qid, "error", _picklable(e))
+        try:
+            query.send(reply)
+        except (OSError, ValueError):
+            return
+
+
+def _worker_main(
+    conn: Any,
+    control: Any,
+    query: Any,
+    warm_models: List[str],
+    handler: Callable[..., Dict[str, Any]],
+) -> None:
+    """Точка входа процесса инференса.
+
+    Задачи (seq, mechanism, model, file_path, params) приходят по conn,
+    ответ — (status, payload, rss). Отмены (seq, reason) приходят по
+    control и обрабатываются отдельным потоком: движок видит их через свой
+    CancellationToken, как в потоке API. Запросы состояния (_QUERIES)
+    обслуживает свой поток по query — и во время задачи. None в conn —
+    штатное завершение.
+    """
+    lock = threading.Lock()
+    current: Dict[str, Any] = {"seq": None, "token": None}
+    reasons: Dict[int, str] = {}
+
+    def listen() -> None:
+        while True:
+            try:
+                seq, reason = control.recv()
+            except (EOFError, OSError):
+                return
+            with lock:
+                reasons[seq] = reason
+                if current["seq"] == seq:
+                    current["token"].cancel(reason)
+
+    threading.Thread(target=listen, name="inference-control", daemon=True).start()
+
+    if warm_models:
+        from src.services.model_warmup import get_model_warmup
+
+        get_model_warmup().start(warm_models)
+    # После start(): модели прогрева уже зарегистрированы и видны в "warmup"
+    threading.Thread(target=_serve_queries, args=(query,), name="inference-query", daemon=True).start()
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return  # родитель завершился
+        if message is None:
+            return
+        seq, mechanism, model, file_path, params = message
+        token = CancellationToken()
+        with lock:
+            current.update(seq=seq, token=token)
+            # Отмена могла прийти раньше, чем процесс взял задачу
+            if seq in reasons:
+                token.cancel(reasons[seq])
+        try:
+            reply: Tuple[str, Any] = ("ok", handler(mechanism, model, file_path, params, token))
+        except Exception as e:
+            reply = ("error", _picklable(e))
+        with lock:
+            current.update(seq=None, token=None)
+            reasons.clear()
+        conn.send((*reply, _rss_bytes()))
+
+
+class _Worker:
+    """Процесс инференса и его каналы на стороне API."""
+
+    def __init__(self, process: Any, conn: Any, control: Any, query: Any) -> None:
+        self.process = process
+        self.conn = conn
+        self.control = control
+        self.query = query
+        # Запросы к процессу идут по одному: ответ сопоставляется по qid
+        self.query_lock = threading.Lock()
+        self.jobs = 0
+        self.rss = 0
+        self.busy = False
+
+
+def _stop_worker(worker: _Worker, graceful: bool) -> None:
+    """Завершить процесс: штатно (None в pipe) или сразу kill."""
+    if graceful and worker.process.is_alive():
+        try:
+            worker.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        worker.process.join(_STOP_TIMEOUT_SEC)
+    if worker.process.is_alive():
+        worker.process.kill()
+        worker.process.join(_STOP_TIMEOUT_SEC)
+    for channel in (worker.conn, worker.control, worker.query):
+        try:
+            channel.close()
+        except OSError:
+            pass
+
+
+class InferencePool:
+    """Долгоживущие процессы для локального инференса.
+
+    Каждый процесс владеет своим кэшем моделей и выполняет одну задачу за
+    раз; задачи приходят по pipe. Процесс перезапускается после
+    INFERENCE_MAX_JOBS_PER_PROCESS задач или если его память после задачи
+    превысила INFERENCE_MAX_RSS_MB. Падение процесса (OOM, сигнал) завершает
+    его задачу ошибкой InferenceWorkerCrashed — API продолжает работать,
+    вместо процесса запускается новый.
+
+    Процессы создаются через spawn: fork процесса с потоками FastAPI и
+    контекстом Metal небезопасен.
+    """
+
+    _instance: Optional["InferencePool"] = None
+
+    def __init__(
+        self,
+        processes: int = INFERENCE_PROCESSES,
+        max_jobs: int = INFERENCE_MAX_JOBS_PER_PROCESS,
+        max_rss_mb: int = INFERENCE_MAX_RSS_MB,
+        handler: Callable[..., Dict[str, Any]] = _run_job,
+    ) -> None:
+        self._processes = max(1, processes)
+        self._max_jobs = max_jobs
+        self._max_rss_mb = max_rss_mb
+        self._handler = handler
+        self._context = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._warm_models: List[str] = []
+        self._seq = itertools.count(1)
+        self._started = False
+        self._closed = False
+        self._stats = {"jobs": 0, "recycled": 0, "crashed": 0, "killed": 0}
+
+    @classmethod
+    def get_instance(cls) -> "InferencePool":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def reset(cls) -> None:
+        """Остановить процессы и сбросить синглтон (для тестов)."""
+        if cls._instance is not None:
+            cls._instance.shutdown()
+        cls._instance = None
+
+    def start(self, warm_models: Iterable[str] = ()) -> None:
+        """Запустить процессы; warm_models прогреваются в каждом из них."""
+        with self._lock:
+            if self._started or self._closed:
+                return
+            self._warm_models = list(warm_models)
+            for _ in range(self._processes):
+                worker = self._spawn()
+                self._workers.append(worker)
+                self._idle.put(worker)
+            self._started = True
+        logger.info(f"Inference pool started: {self._processes} process(es)")
+
+    def _spawn(self) -> _Worker:
+        conn, child_conn = self._context.Pipe()
+        control, child_control = self._context.Pipe()
+        query, child_query = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, child_control, child_query, self._warm_models, self._handler),
+            name="inference-worker",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        child_control.close()
+        child_query.close()
+        return _Worker(process, conn, control, query)
+
+    def run(
+        self,
+        mechanism: str,
+        model: Optional[str],
+        file_path: str,
+        params: Dict[str, Any],
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> Dict[str, Any]:
+        """Выполнить задачу в свободном процессе и вернуть результат движка.
+
+        Ошибки движка пробрасываются как есть. Если задача отменена, а
+        процесс не остановился за _ABORT_GRACE_SEC, он убивается.
+        """
+        self.start()
+        worker = self._acquire(cancel_token)
+        seq = next(self._seq)
+        try:
+            worker.conn.send((seq, mechanism, model, file_path, params))
+            status, payload = self._wait(worker, seq, cancel_token)
+        except TranscriptionCancelled:
+            self._replace(worker, "killed")
+            raise
+        except (InferenceWorkerCrashed, OSError) as e:
+            self._replace(worker, "crashed")
+            if isinstance(e, InferenceWorkerCrashed):
+                raise
+            raise InferenceWorkerCrashed(f"Inference worker pipe broken: {e}") from e
+        self._release(worker)
+        if status == "error":
+            raise payload
+        return payload
+
+    def _acquire(self, cancel_token: Optional[CancellationToken]) -> _Worker:
+        """Свободный живой процесс; ожидание прерывается отменой задачи."""
+        while True:
+            if self._closed:
+                raise RuntimeError("Inference pool is shut down")
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            try:
+                worker = self._idle.get(timeout=_POLL_SEC)
+            except queue.Empty:
+                continue
+            if worker.process.is_alive():
+                worker.busy = True
+                return worker
+            logger.warning(f"Idle inference worker pid={worker.process.pid} died, restarting")
+            self._replace(worker, "crashed")
+
+    def _wait(
+        self, worker: _Worker, seq: int, cancel_token: Optional[CancellationToken]
+    ) -> Tuple[str, Any]:
+        """Ждать ответа процесса, пересылая ему отмену задачи."""
+        sent_reason: Optional[str] = None
+        aborted_at: Optional[float] = None
+        while True:
+            try:
+                if worker.conn.poll(_POLL_SEC):
+                    status, payload, rss = worker.conn.recv()
+                    worker.jobs += 1
+                    worker.rss = rss
+                    with self._lock:
+                        self._stats["jobs"] += 1
+                    return status, payload
+            except EOFError:
+                worker.process.join(_POLL_SEC)
+                raise InferenceWorkerCrashed(
+                    f"Inference worker pid={worker.process.pid} died "
+                    f"(exit code {worker.process.exitcode})"
+                )
+            if not worker.process.is_alive():
+                raise InferenceWorkerCrashed(
+                    f"Inference worker pid={worker.process.pid} died "
+                    f"(exit code {worker.process.exitcode})"
+                )
+            if cancel_token is None or not cancel_token.cancelled:
+                continue
+            if cancel_token.reason != sent_reason:
+                sent_reason = cancel_token.reason
+                worker.control.send((seq, sent_reason))
+            if cancel_token.aborted:
+                aborted_at = aborted_at or time.monotonic()
+                if time.monotonic() - aborted_at > _ABORT_GRACE_SEC:
+                    logger.warning(
+                        f"Inference worker pid={worker.process.pid} ignored cancel "
+                        f"({sent_reason}), killing"
+                    )
+                    raise TranscriptionCancelled(sent_reason or "cancelled")
+
+    def _release(self, worker: _Worker) -> None:
+        """Вернуть процесс в пул или перезапустить его по лимитам."""
+        worker.busy = False
+        reason = None
+        if self._max_jobs > 0 and worker.jobs >= self._max_jobs:
+            reason = f"{worker.jobs} jobs"
+        elif self._max_rss_mb > 0 and worker.rss > self._max_rss_mb * 1024 * 1024:
+            reason = f"rss {worker.rss / (1024 * 1024):.0f} MB"
+        if reason is None:
+            self._idle.put(worker)
+            return
+        logger.info(f"Recycling inference worker pid={worker.process.pid}: {reason}")
+        self._replace(worker, "recycled")
+
+    def _replace(self, worker: _Worker, kind: str) -> None:
+        """Заменить процесс новым; старый завершается в фоне."""
+        worker.busy = False
+        with self._lock:
+            self._stats[kind] += 1
+            if worker in self._workers:
+                self._workers.remove(worker)
+            replacement = None if self._closed else self._spawn()
+            if replacement is not None:
+                self._workers.append(replacement)
+        if kind == "crashed":
+            logger.error(
+                f"Inference worker pid={worker.process.pid} crashed "
+                f"(exit code {worker.process.exitcode}), restarting"
+            )
+        threading.Thread(
+            target=_stop_worker,
+            args=(worker, kind == "recycled"),
+            name="inference-reaper",
+            daemon=True,
+        ).start()
+        if replacement is not None:
+            self._idle.put(replacement)
+
+    def shutdown(self) -> None:
+        """Завершить все процессы (задачи к этому моменту уже остановлены очередью)."""
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            _stop_worker(worker, graceful=True)
+        if workers:
+            logger.info(f"Inference pool shut down: {len(workers)} process(es)")
+
+    def query(
+        self, name: str, *args: Any, timeout: Optional[float] = _QUERY_TIMEOUT_SEC
+    ) -> List[Dict[str, Any]]:
+        """Выполнить запрос name (_QUERIES) во всех процессах параллельно.
+
+        По процессу — {"pid", "result"} или {"pid", "error"}: процесс не
+        ответил за timeout (None — ждать без ограничения), упал или запрос
+        завершился исключением.
+        """
+        self.start()
+        with self._lock:
+            workers = list(self._workers)
+        if not workers:
+            return []
+        with ThreadPoolExecutor(max_workers=len(workers), thread_name_prefix="inference-query") as executor:
+            futures = [executor.submit(self._query, worker, name, args, timeout) for worker in workers]
+        replies: List[Dict[str, Any]] = []
+        for worker, future in zip(workers, futures):
+            try:
+                replies.append({"pid": worker.process.pid, "result": future.result()})
+            except Exception as e:
+                replies.append({"pid": worker.process.pid, "error": str(e)})
+        return replies
+
+    def _query(
+        self, worker: _Worker, name: str, args: Tuple[Any, ...], timeout: Optional[float]
+    ) -> Any:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not worker.query_lock.acquire(timeout=-1 if timeout is None else timeout):
+            raise TimeoutError(f"Inference worker pid={worker.process.pid} is busy with another query")
+        try:
+            qid = next(self._seq)
+            worker.query.send((qid, name, args))
+            while True:
+                if worker.query.poll(_POLL_SEC):
+                    reply_id, status, payload = worker.query.recv()
+                    if reply_id != qid:
+                        continue  # запоздалый ответ на запрос, не дождавшийся таймаута
+                    if status == "error":
+                        raise payload
+                    return payload
+                if not worker.process.is_alive():
+                    raise InferenceWorkerCrashed(f"Inference worker pid={worker.process.pid} died")
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError(
+                        f"Inference worker pid={worker.process.pid} did not answer '{name}' in {timeout}s"
+                    )
+        finally:
+            worker.query_lock.release()
+
+    def get_warmup_status(self) -> Dict[str, Any]:
+        """Прогрев в процессах; ready — хотя бы один процесс закончил прогрев.
+
+        Перезапущенный процесс прогревается заново, пока задачи берут
+        остальные, поэтому готовность падает, только когда прогретых
+        процессов не осталось. Не ответивший процесс считается неготовым.
+        """
+        workers = []
+        for reply in self.query("warmup"):
+            status = reply.pop("result", None) or {"ready": False, "models": {}}
+            workers.append({**reply, **status})
+        return {"ready": any(worker["ready"] for worker in workers), "workers": workers}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            workers = list(self._workers)
+            stats = dict(self._stats)
+        return {
+            "processes": self._processes,
+            "max_jobs_per_process": self._max_jobs,
+            "max_rss_mb": self._max_rss_mb,
+            **stats,
+            "workers": [
+                {
+                    "pid": worker.process.pid,
+                    "alive": worker.process.is_alive(),
+                    "busy": worker.busy,
+                    "jobs": worker.jobs,
+                    "rss_mb": round(worker.rss / (1024 * 1024), 1),
+                }
+                for worker in workers
+            ],
+        }
+
+
+def get_inference_pool() -> InferencePool:
+    return InferencePool.get_instance()
+
+
+class PooledEngine(TranscriptionEngine):
+    """Локальный механизм (whisper/cpu), выполняемый в пуле процессов.
+
+    Параметры и результат — как у исходного механизма; cancel_token
+    остаётся в API и пересылается процессу по control-каналу.
+    """
+
+    def __init__(self, mechanism: str = "whisper", model: Optional[str] = None) -> None:
+        self.name = "cpu" if mechanism == "cpu" else "whisper"
+        self.model = model
+
+    def resolve_model(self, requested: Optional[str]) -> Optional[str]:
+        return self.model or requested or "large"
+
+    def transcribe(self, file_path: str, **params) -> Dict[str, Any]:
+        cancel_token = params.pop("cancel_token", None)
+        return get_inference_pool().run(self.name, self.model, file_path, params, cancel_token)
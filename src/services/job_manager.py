@@ -149,8 +149,11 @@ class JobManager:
     def _save(self, job_id: str, metadata: Dict[str, Any]) -> None:
         path = _job_file(job_id)
         os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
+        # Атомарная запись: воркеры и API читают metadata параллельно
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(metadata, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
 
     def delete(self, job_id: str) -> bool:
         """Удалить задание целиком (всю папку с файлами)."""
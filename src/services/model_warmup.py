@@ -0,0 +1,149 @@
+"""Фоновый прогрев моделей Whisper и состояние готовности для /health/ready."""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from src.models.model_cache import ModelCache
+from src.models.model_registry import ModelRegistry
+from src.services.whisper_engines import CancellationToken, _mlx_transcribe, mlx_slot
+
+logger = logging.getLogger("mlx_whisper")
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+# Длина пробного аудио (тишина, 16 кГц)
+_WARMUP_SAMPLES = 16000
+
+
+class _ModelState:
+    """Состояние прогрева одной модели."""
+
+    def __init__(self) -> None:
+        self.state = PENDING
+        self.error: Optional[str] = None
+        self.warmup_sec: Optional[float] = None
+        self.done = threading.Event()
+
+
+class ModelWarmup:
+    """Прогревает модели в фоновом потоке, не блокируя старт сервера.
+
+    Для каждой модели: загрузка весов в ModelCache и пробная транскрипция
+    секунды тишины — компилирует ядра MLX и заполняет кэши. Задачи Whisper
+    ждут готовности своей модели (wait_ready), а не старта сервера; модели
+    вне списка прогрева не ждут. Ошибка прогрева не блокирует задачи:
+    модель загрузится при первой транскрипции.
+    """
+
+    _instance: Optional["ModelWarmup"] = None
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._models: Dict[str, _ModelState] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def get_instance(cls) -> "ModelWarmup":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def reset(cls) -> None:
+        """Сбросить синглтон (для тестов)."""
+        cls._instance = None
+
+    def start(self, models: Iterable[str]) -> None:
+        """Запустить прогрев моделей в фоне (повторный вызов игнорируется)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            names = [name for name in dict.fromkeys(models) if name not in self._models]
+            for name in names:
+                self._models[name] = _ModelState()
+            self._thread = threading.Thread(
+                target=self._run, args=(names,), name="model-warmup", daemon=True
+            )
+        self._thread.start()
+
+    def wait_ready(
+        self,
+        model: str,
+        cancel_token: Optional[CancellationToken] = None,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """Дождаться окончания прогрева модели (успешного или нет).
+
+        Возвращает False только по таймауту. Ожидание прерывается отменой задачи.
+        """
+        entry = self._models.get(model)
+        if entry is None or entry.done.is_set():
+            return True
+        logger.info(f"Waiting for model '{model}' warmup")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not entry.done.wait(0.25):
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+        return True
+
+    def is_ready(self) -> bool:
+        """Прогрев завершён для всех моделей (неудачный прогрев тоже завершён)."""
+        return all(entry.done.is_set() for entry in self._models.values())
+
+    def get_status(self) -> Dict[str, Any]:
+        """Состояние прогрева по моделям."""
+        return {
+            name: {
+                "state": entry.state,
+                "warmup_sec": entry.warmup_sec,
+                "error": entry.error,
+            }
+            for name, entry in list(self._models.items())
+        }
+
+    def _run(self, models: Iterable[str]) -> None:
+        for name in models:
+            entry = self._models[name]
+            entry.state = LOADING
+            started = time.monotonic()
+            try:
+                self._warm(name)
+            except Exception as e:
+                entry.state = FAILED
+                entry.error = str(e)
+                logger.warning(f"Model '{name}' warmup failed: {e}")
+            else:
+                entry.state = READY
+                entry.warmup_sec = round(time.monotonic() - started, 2)
+                logger.info(f"Model '{name}' warmed up in {entry.warmup_sec:.1f}s")
+            finally:
+                entry.done.set()
+
+    @staticmethod
+    def _warm(name: str) -> None:
+        """Загрузить модель и прогнать пробный decode на тишине под MLX_LOCK."""
+        import numpy as np
+
+        model_path = ModelRegistry.get_instance().resolve(name)
+        silence = np.zeros(_WARMUP_SAMPLES, dtype=np.float32)
+        with mlx_slot():
+            ModelCache.get_instance().activate(name, model_path)
+            _mlx_transcribe(
+                audio=silence,
+                path_or_hf_repo=model_path,
+                language="en",
+                condition_on_previous_text=False,
+                verbose=None,
+            )
+
+
+def get_model_warmup() -> ModelWarmup:
+    """Синглтон прогрева моделей."""
+    return ModelWarmup.get_instance()
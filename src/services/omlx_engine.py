@@ -2,16 +2,24 @@
 
 from __future__ import annotations
 
+import codecs
 import json
 import logging
 import math
 import os
 import re
 import struct
+import tempfile
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from difflib import SequenceMatcher
 from io import BytesIO
+from queue import Empty, Queue
 import requests
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from requests import Response
+from typing import TYPE_CHECKING, Any, Deque, Dict, Iterator, List, Optional, Tuple
 
 from src.config import (
     OMLX_API_KEY,
@@ -20,24 +28,446 @@ from src.config import (
     OMLX_ENABLED,
     OMLX_MAX_AUDIO_DURATION_SEC,
     OMLX_SILENCE_GAP_MS,
+    OMLX_ADAPTIVE_CHUNKING,
+    OMLX_CHUNK_CONCURRENCY,
+    OMLX_TARGET_CHUNK_LATENCY_SEC,
+    OMLX_MIN_CHUNK_SEC,
+    OMLX_SPLIT_MODE,
+    OMLX_WINDOW_SEC,
+    OMLX_WINDOW_OVERLAP_SEC,
+    OMLX_PACK_GAP_MS,
+    OMLX_TRANSPORT_CODEC,
+    OMLX_OPUS_BITRATE,
+    OMLX_RESPONSE_SPOOL_MAX_BYTES,
+    OMLX_CHUNK_RETRIES,
+    OMLX_CHUNK_RETRY_BACKOFF_SEC,
+    OMLX_CHUNK_FAILURE_POLICY,
+    OMLX_HEDGE_ENABLED,
+    OMLX_HEDGE_PERCENTILE,
+    OMLX_HEDGE_MIN_SAMPLES,
+    OMLX_HEDGE_BUDGET,
+    OMLX_HEDGE_BASE_URL,
 )
-from src.services.whisper_engines import (
+from src.services.backend_health import get_breaker
+from src.services.engine_base import (
+    CancellationToken,
+    TranscriptionCancelled,
     TranscriptionEngine,
     _build_formatted_text_from_segments,
 )
-from src.utils.audio import get_audio_duration
+from src.utils.audio import TRANSPORT_FORMATS, audio_mime_type, get_audio_duration
+from src.utils.chunking import plan_adaptive_chunks, plan_chunks
+from src.utils.http import AbortableSession, RequestAborted, run_abortable
+from src.utils.json_stream import ArrayStream, ObjectStream, StringStream
+from src.utils.raw_artifact import RawArtifactWriter
 
 if TYPE_CHECKING:
     from pydub import AudioSegment  # noqa: F401
 
 logger = logging.getLogger("mlx_whisper")
 
+# Размер куска при чтении тела ответа oMLX
+_RESPONSE_READ_BYTES = 64 * 1024
+
 
 class OMLXModelNotFoundError(Exception):
     """Модель не найдена в oMLX API."""
     pass
 
 
+class ChunkFailedError(Exception):
+    """Чанк split-транскрипции не удался после всех повторов (политика fail).
+
+    chunk_report — retried/failed диапазоны для metadata задачи.
+    """
+
+    def __init__(self, message: str, chunk_report: Dict[str, Any]) -> None:
+        super().__init__(message)
+        self.chunk_report = chunk_report
+
+
+class _ChunkLatency:
+    """Латентность запросов чанков (сек на секунду аудио) и бюджет дублей.
+
+    Наблюдения используются для размера чанков (adaptive chunking) и для
+    хеджирования. Дубль разрешён, если накоплено OMLX_HEDGE_MIN_SAMPLES
+    наблюдений и доля дублей от всех запросов чанков ниже OMLX_HEDGE_BUDGET.
+    """
+
+    def __init__(self, maxlen: int = 200) -> None:
+        self._lock = threading.Lock()
+        self._samples: Deque[float] = deque(maxlen=maxlen)
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def record(self, latency: float, audio_sec: float) -> None:
+        if audio_sec <= 0:
+            return
+        with self._lock:
+            self._samples.append(latency / audio_sec)
+
+    def rtf(self, q: float = 0.5, min_samples: int = 3) -> Optional[float]:
+        """Перцентиль q латентности на секунду аудио; None — мало наблюдений."""
+        with self._lock:
+            if len(self._samples) < max(min_samples, 1):
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(q * (len(ordered) - 1)), len(ordered) - 1)]
+
+    def start_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def hedge_delay(self, audio_sec: float) -> Optional[float]:
+        """Через сколько секунд отправить дубль; None — не хеджировать."""
+        with self._lock:
+            if audio_sec <= 0 or len(self._samples) < OMLX_HEDGE_MIN_SAMPLES:
+                return None
+            if self.hedges >= OMLX_HEDGE_BUDGET * max(self.requests, 1):
+                return None
+            ordered = sorted(self._samples)
+            index = min(int(OMLX_HEDGE_PERCENTILE * (len(ordered) - 1)), len(ordered) - 1)
+            return ordered[index] * audio_sec
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.hedges >= OMLX_HEDGE_BUDGET * max(self.requests, 1):
+                return False
+            self.hedges += 1
+            return True
+
+    def record_win(self) -> None:
+        with self._lock:
+            self.hedge_wins += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            ordered = sorted(self._samples)
+            return {
+                "enabled": OMLX_HEDGE_ENABLED,
+                "samples": len(self._samples),
+                "rtf_p50": round(ordered[len(ordered) // 2], 4) if ordered else None,
+                "requests": self.requests,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self.requests = self.hedges = self.hedge_wins = 0
+
+
+chunk_latency = _ChunkLatency()
+
+
+def is_backend_failure(exc: Optional[BaseException]) -> bool:
+    """Ошибка говорит о недоступности/деградации oMLX, а не о проблеме самого запроса.
+
+    Проходит по цепочке __cause__ (ChunkFailedError оборачивает исходную ошибку).
+    """
+    while exc is not None:
+        if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+            return True
+        if isinstance(exc, requests.HTTPError):
+            status = exc.response.status_code if exc.response is not None else None
+            if status is None or status >= 500 or status == 429:
+                return True
+        exc = exc.__cause__
+    return False
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    """Сетевые ошибки, таймауты, 5xx/408/429 и битый JSON — повод повторить чанк."""
+    if isinstance(exc, (TranscriptionCancelled, OMLXModelNotFoundError)):
+        return False
+    if isinstance(exc, requests.HTTPError):
+        status = exc.response.status_code if exc.response is not None else None
+        return status is None or status >= 500 or status in (408, 429)
+    return isinstance(exc, (requests.RequestException, ValueError))
+
+
+def _target_chunk_sec(total_sec: float) -> float:
+    """Целевая длина чанка (сек аудио) по измеренной пропускной способности.
+
+    Чанк должен обрабатываться ~OMLX_TARGET_CHUNK_LATENCY_SEC, а чанков должно
+    хватить на OMLX_CHUNK_CONCURRENCY параллельных запросов. Результат
+    ограничен OMLX_MIN_CHUNK_SEC..OMLX_MAX_AUDIO_DURATION_SEC.
+    """
+    target = float(OMLX_MAX_AUDIO_DURATION_SEC)
+    rtf = chunk_latency.rtf()
+    if rtf:
+        target = min(target, OMLX_TARGET_CHUNK_LATENCY_SEC / rtf)
+    if OMLX_CHUNK_CONCURRENCY > 1 and total_sec > 0:
+        target = min(target, math.ceil(total_sec / OMLX_CHUNK_CONCURRENCY))
+    return max(target, float(min(OMLX_MIN_CHUNK_SEC, OMLX_MAX_AUDIO_DURATION_SEC)))
+
+
+def _plan_windows(total_ms: int, window_ms: int, overlap_ms: int) -> List[Tuple[int, int]]:
+    """Окна фиксированной длины window_ms, соседние перекрываются на overlap_ms."""
+    step = max(window_ms - overlap_ms, 1)
+    windows: List[Tuple[int, int]] = []
+    start = 0
+    while start < total_ms:
+        end = min(start + window_ms, total_ms)
+        windows.append((start, end))
+        if end >= total_ms:
+            break
+        start += step
+    return windows
+
+
+# Сегмент, кончающийся ближе этого к краю окна, считается обрезанным границей окна
+_WINDOW_EDGE_SEC = 0.25
+_MIN_TEXT_SIMILARITY = 0.5
+
+
+def _text_similarity(a: str, b: str) -> float:
+    a = " ".join(a.lower().split())
+    b = " ".join(b.lower().split())
+    if not a or not b:
+        return 0.0
+    if a.startswith(b) or b.startswith(a) or a.endswith(b) or b.endswith(a):
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def _match_overlap(
+    prev: List[Dict[str, Any]], nxt: List[Dict[str, Any]], lo: float, hi: float
+) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Пары (сегмент предыдущего окна, сегмент следующего) — одна и та же реплика в перекрытии."""
+    in_prev = [s for s in prev if s["end"] > lo and s["start"] < hi]
+    pairs = []
+    for seg in nxt:
+        if seg["start"] >= hi:
+            break
+        best, best_score = None, _MIN_TEXT_SIMILARITY
+        for cand in in_prev:
+            intersect = min(cand["end"], seg["end"]) - max(cand["start"], seg["start"])
+            if intersect <= 0 and abs(cand["start"] - seg["start"]) > 1.0:
+                continue
+            score = _text_similarity(cand.get("text", ""), seg.get("text", ""))
+            if score >= best_score:
+                best, best_score = cand, score
+        if best is not None:
+            pairs.append((best, seg))
+    return pairs
+
+
+def _map_window_speakers(
+    pairs: List[Tuple[Dict[str, Any], Dict[str, Any]]],
+    segments: List[Dict[str, Any]],
+    used_globals: set,
+) -> Dict[int, int]:
+    """Сопоставить локальные speaker ID окна глобальным по совпавшим репликам перекрытия.
+
+    Голос пары — длительность пересечения сегментов; пары распределяются
+    жадно по убыванию голосов (один локальный ID — один глобальный). ID без
+    совпадений сохраняет свой номер, если он не занят в этом окне (как при
+    склейке по первому появлению), иначе берёт свободный из уже известных
+    глобальных, и только потом — новый.
+    """
+    votes: Dict[Tuple[int, int], float] = {}
+    for prev_seg, seg in pairs:
+        key = (int(seg.get("speaker", 0)), int(prev_seg.get("speaker", 0)))
+        weight = max(min(prev_seg["end"], seg["end"]) - max(prev_seg["start"], seg["start"]), 0.01)
+        votes[key] = votes.get(key, 0.0) + weight
+
+    mapping: Dict[int, int] = {}
+    taken: set = set()
+    for (local_id, global_id), _ in sorted(votes.items(), key=lambda kv: -kv[1]):
+        if local_id not in mapping and global_id not in taken:
+            mapping[local_id] = global_id
+            taken.add(global_id)
+
+    next_global = max(used_globals | taken, default=-1) + 1
+    for seg in segments:
+        local_id = int(seg.get("speaker", 0))
+        if local_id in mapping:
+            continue
+        free = sorted(used_globals - taken)
+        if local_id not in taken:
+            global_id = local_id
+        elif free:
+            global_id = free[0]
+        else:
+            global_id = next_global
+            next_global += 1
+        mapping[local_id] = global_id
+        taken.add(global_id)
+        next_global = max(next_global, global_id + 1)
+    return mapping
+
+
+def _stitch_windows(
+    windows: List[Tuple[Tuple[int, int], List[Dict[str, Any]]]]
+) -> List[Dict[str, Any]]:
+    """Склеить сегменты перекрывающихся окон (таймкоды уже абсолютные).
+
+    В перекрытии соседних окон реплики сопоставляются по тексту и таймкодам:
+    дубликаты отбрасываются, а реплика, обрезанная концом предыдущего окна,
+    заменяется полной версией из следующего. Остальные сегменты делятся по
+    середине перекрытия. Speaker ID окон приводятся к общим по совпавшим репликам.
+    """
+    merged: List[Dict[str, Any]] = []
+    used_globals: set = set()
+    prev_end: Optional[float] = None
+
+    for (start_ms, end_ms), window_segments in windows:
+        segments = sorted((dict(s) for s in window_segments), key=lambda s: s["start"])
+        lo = start_ms / 1000.0
+        overlapping = prev_end is not None and lo < prev_end
+        hi = prev_end if overlapping else lo
+        pairs = _match_overlap(merged, segments, lo, hi) if overlapping else []
+
+        mapping = _map_window_speakers(pairs, segments, used_globals)
+        for seg in segments:
+            seg["speaker"] = mapping[int(seg.get("speaker", 0))]
+        used_globals.update(mapping.values())
+
+        if overlapping:
+            cut = (lo + hi) / 2
+            matched = {id(seg): prev_seg for prev_seg, seg in pairs}
+            replaced: set = set()
+            kept: List[Dict[str, Any]] = []
+            for seg in segments:
+                prev_seg = matched.get(id(seg))
+                if prev_seg is not None and prev_seg["start"] < cut:
+                    # Дубликат; берём полную версию, если в предыдущем окне реплика обрезана
+                    if prev_seg["end"] >= hi - _WINDOW_EDGE_SEC:
+                        replaced.add(id(prev_seg))
+                        kept.append(seg)
+                    continue
+                if prev_seg is not None or seg["start"] >= cut:
+                    kept.append(seg)
+            merged = [
+                s for s in merged
+                if id(s) not in replaced and not (s["start"] >= cut and s["start"] >= lo)
+            ]
+            segments = kept
+
+        merged.extend(segments)
+        prev_end = end_ms / 1000.0
+
+    merged.sort(key=lambda s: s["start"])
+    return merged
+
+
+def _chunk_codec() -> str:
+    """Кодек для чанков, нарезанных в памяти (passthrough для них невозможен — WAV)."""
+    return OMLX_TRANSPORT_CODEC if OMLX_TRANSPORT_CODEC in ("flac", "opus") else "wav"
+
+
+def _export_chunk(segment: "AudioSegment") -> bytes:
+    """Экспортировать фрагмент аудио в транспортный кодек oMLX."""
+    buf = BytesIO()
+    codec = _chunk_codec()
+    if codec == "flac":
+        segment.export(buf, format="flac")
+    elif codec == "opus":
+        segment.export(buf, format="ogg", codec="libopus", bitrate=OMLX_OPUS_BITRATE)
+    else:
+        segment.export(buf, format="wav")
+    return buf.getvalue()
+
+
+def _unpack_segments(
+    segments: List[Dict[str, Any]], offsets: List[Tuple[str, int, int]], gap_ms: int
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Разнести сегменты склеенного запроса по клипам по offset map.
+
+    Клип владеет своим интервалом плюс половиной пауз вокруг; сегмент
+    относится к клипу по середине. Таймкоды переводятся в локальные и
+    ограничиваются длиной клипа.
+    """
+    result: Dict[str, List[Dict[str, Any]]] = {key: [] for key, _, _ in offsets}
+    half_gap = gap_ms / 2000.0
+    for seg in segments:
+        middle = (seg["start"] + seg["end"]) / 2
+        key, start_ms, end_ms = next(
+            (entry for entry in offsets if middle < entry[2] / 1000.0 + half_gap), offsets[-1]
+        )
+        start, length = start_ms / 1000.0, (end_ms - start_ms) / 1000.0
+        local = dict(seg)
+        local["start"] = round(min(max(seg["start"] - start, 0.0), length), 3)
+        local["end"] = round(min(max(seg["end"] - start, 0.0), length), 3)
+        result[key].append(local)
+    return result
+
+
+class _ChunkCheckpoint:
+    """Сохранение плана и сегментов готовых чанков в <job_dir>/chunks/.
+
+    plan.json фиксирует границы чанков: при resume используется тот же план,
+    даже если настройки нарезки изменились. chunk_NNNN.json содержит уже
+    нормализованные сегменты со смещёнными таймкодами. Без директории
+    (checkpoint_dir=None) все методы — no-op.
+    """
+
+    def __init__(self, directory: Optional[str]) -> None:
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory or "", name)
+
+    def _write(self, name: str, payload: Dict[str, Any]) -> None:
+        path = self._path(name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _read(self, name: str) -> Optional[Dict[str, Any]]:
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def load_plan(self) -> Optional[List[Tuple[int, int]]]:
+        data = self._read("plan.json")
+        if data is None:
+            return None
+        return [(int(start), int(end)) for start, end in data.get("chunks", [])]
+
+    def load_plan_info(self) -> Dict[str, Any]:
+        data = self._read("plan.json") or {}
+        return data.get("info") or {}
+
+    def save_plan(
+        self, chunks: List[Tuple[int, int]], info: Optional[Dict[str, Any]] = None
+    ) -> None:
+        if self.directory:
+            self._write("plan.json", {"chunks": [list(c) for c in chunks], "info": info or {}})
+
+    def load_chunk(self, index: int) -> Optional[List[Dict[str, Any]]]:
+        data = self._read(f"chunk_{index:04d}.json")
+        return data.get("segments", []) if data is not None else None
+
+    def save_chunk(
+        self, index: int, start_ms: int, end_ms: int, segments: List[Dict[str, Any]]
+    ) -> None:
+        if self.directory:
+            self._write(
+                f"chunk_{index:04d}.json",
+                {"index": index, "start_ms": start_ms, "end_ms": end_ms, "segments": segments},
+            )
+
+    def completed(self) -> List[int]:
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            int(name[6:10])
+            for name in os.listdir(self.directory)
+            if re.fullmatch(r"chunk_\d{4}\.json", name)
+        )
+
+
 def _detect_silence_chunks(
     audio_segment: "AudioSegment",
     chunk_duration_ms: int = 100,
@@ -147,21 +577,199 @@ def _normalize_segments(items: Any) -> Optional[List[Dict[str, Any]]]:
         return None
 
     for item in items:
-        if not isinstance(item, dict):
-            continue
-        start = float(item.get("Start", item.get("start", 0)))
-        end = float(item.get("End", item.get("end", 0)))
-        speaker = int(item.get("Speaker", item.get("speaker", 0)))
-        content = str(item.get("Content", item.get("content", item.get("text", ""))))
-        segments.append({
-            "start": start,
-            "end": end,
-            "speaker": speaker,
-            "text": content,
-        })
+        segment = _normalize_item(item)
+        if segment is not None:
+            segments.append(segment)
     return segments if segments else None
 
 
+def _normalize_item(item: Any) -> Optional[Dict[str, Any]]:
+    """Один сырой сегмент (VibeVoice или Whisper) в единый формат; не-dict → None."""
+    if not isinstance(item, dict):
+        return None
+    return {
+        "start": float(item.get("Start", item.get("start", 0))),
+        "end": float(item.get("End", item.get("end", 0))),
+        "speaker": int(item.get("Speaker", item.get("speaker", 0))),
+        "text": str(item.get("Content", item.get("content", item.get("text", "")))),
+    }
+
+
+class _ResponseParser:
+    """Потоковый разбор ответа oMLX в нормализованные сегменты.
+
+    Семантика та же, что у _normalize_segments, но тело не собирается
+    целиком: элементы массива разбираются по мере поступления, поле "text"
+    VibeVoice декодируется кусками и сразу режется на сегменты, а
+    _repair_truncated_json применяется только к обрезанному хвосту.
+    В памяти — нормализованные сегменты и один незавершённый элемент.
+    """
+
+    def __init__(self) -> None:
+        self.chars = 0
+        self._kind: Optional[str] = None
+        self._stream: Any = None
+        self._scalar: List[str] = []
+        self._items: List[Dict[str, Any]] = []
+        # Объектный формат: поле "segments" и массив внутри строки "text"
+        self._segments: List[Dict[str, Any]] = []
+        self._segments_count = 0
+        self._has_speaker = False
+        self._text_array: Optional[ArrayStream] = None
+        self._text_plain = False
+        self._text_items: List[Dict[str, Any]] = []
+
+    def feed(self, text: str) -> None:
+        self.chars += len(text)
+        if self._kind is None:
+            text = text.lstrip()
+            if not text:
+                return
+            if text[0] == "[":
+                self._kind, self._stream = "list", ArrayStream()
+            elif text[0] == "{":
+                self._kind, self._stream = "object", ObjectStream(self._select)
+            else:
+                self._kind = "scalar"
+        if self._kind == "scalar":
+            self._scalar.append(text)
+        elif self._kind == "list":
+            for raw in self._stream.feed(text):
+                self._add(self._items, json.loads(raw))
+        else:
+            for key, value in self._stream.feed(text):
+                if key == "segments":
+                    for raw in value:
+                        item = json.loads(raw)
+                        self._segments_count += 1
+                        if isinstance(item, dict) and ("Speaker" in item or "speaker" in item):
+                            self._has_speaker = True
+                        self._add(self._segments, item)
+                else:
+                    self._feed_text(value)
+
+    def close(self) -> Optional[List[Dict[str, Any]]]:
+        """Завершить разбор; ValueError, если внешний JSON пустой, битый или обрезан."""
+        if self._kind is None:
+            raise ValueError("Empty oMLX response")
+        if self._kind == "scalar":
+            json.loads("".join(self._scalar))
+            return None
+        if not self._stream.done:
+            raise ValueError("Truncated oMLX response JSON")
+        if self._stream.leftover.strip():
+            raise ValueError("Extra data after oMLX response JSON")
+        if self._kind == "list":
+            return self._items or None
+        if self._text_array is not None and not self._text_array.done:
+            # Поле "text" обрезано посередине сегмента — восстанавливаем хвост
+            for item in _repair_truncated_json(self._text_array.partial) or []:
+                self._add(self._text_items, item)
+        if self._segments_count and (self._has_speaker or self._text_array is None):
+            return self._segments or None
+        if self._text_array is not None:
+            return self._text_items or None
+        return None
+
+    @staticmethod
+    def _select(key: str, first: str) -> Any:
+        if key == "segments" and first == "[":
+            return ArrayStream()
+        if key == "text" and first == '"':
+            return StringStream()
+        return None
+
+    def _feed_text(self, decoded: str) -> None:
+        if self._text_array is None:
+            if self._text_plain:
+                return
+            # Как и в _normalize_segments: сегменты в "text" только если строка начинается с '['
+            if not decoded.startswith("["):
+                self._text_plain = True
+                return
+            self._text_array = ArrayStream()
+        for raw in self._text_array.feed(decoded):
+            try:
+                self._add(self._text_items, json.loads(raw))
+            except ValueError:
+                for item in _repair_truncated_json(raw) or []:
+                    self._add(self._text_items, item)
+
+    @staticmethod
+    def _add(target: List[Dict[str, Any]], item: Any) -> None:
+        segment = _normalize_item(item)
+        if segment is not None:
+            target.append(segment)
+
+
+def _spool_body(response: Any) -> Any:
+    """Дочитать тело успешного ответа во временный файл, освободив соединение.
+
+    До OMLX_RESPONSE_SPOOL_MAX_BYTES тело лежит в памяти, дальше — на диске,
+    так что размер ответа не влияет на пиковую память. Тело ошибки (4xx/5xx)
+    небольшое и читается целиком — его разбирают response.json()/raise_for_status().
+    """
+    if not isinstance(response, Response):
+        return response
+    if response.status_code >= 400:
+        response.content  # noqa: B018 — дочитать тело до закрытия сессии
+        return response
+    spool = tempfile.SpooledTemporaryFile(max_size=OMLX_RESPONSE_SPOOL_MAX_BYTES)
+    try:
+        for chunk in response.iter_content(_RESPONSE_READ_BYTES):
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    finally:
+        response.close()
+    spool.seek(0)
+    response.spooled_body = spool
+    return response
+
+
+def _response_body(response: Any) -> Any:
+    """Spool-файл тела (перемотанный в начало) или response.text, если spool нет."""
+    spool = getattr(response, "spooled_body", None) if isinstance(response, Response) else None
+    if spool is None:
+        return response.text
+    spool.seek(0)
+    return spool
+
+
+def _discard_raw_body(result: Optional[Dict[str, Any]]) -> None:
+    """Закрыть spool-файл тела непринятого ответа (проигравшая хедж-попытка)."""
+    body = result.pop("raw_body", None) if result else None
+    if body is not None and hasattr(body, "close"):
+        body.close()
+
+
+def _iter_response_text(response: Any, close: bool = True) -> Iterator[str]:
+    """Тело ответа кусками текста: из spool-файла, иначе response.text одним куском.
+
+    close=False оставляет spool открытым (для записи в сырой артефакт).
+    """
+    spool = getattr(response, "spooled_body", None) if isinstance(response, Response) else None
+    if spool is None:
+        yield response.text
+        return
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+    try:
+        while True:
+            chunk = spool.read(_RESPONSE_READ_BYTES)
+            if not chunk:
+                break
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+    finally:
+        if close:
+            spool.close()
+
+
 def _repair_truncated_json(text_field: str) -> Optional[List[Dict[str, Any]]]:
     """Восстановить сегменты из обрезанного JSON-строки.
 
@@ -225,10 +833,17 @@ def _reconcile_speaker_ids(segments: List[Dict[str, Any]]) -> List[Dict[str, Any
     return segments
 
 
-
 class OMLXEngine(TranscriptionEngine):
     """Механизм транскрибации через oMLX API."""
 
+    name = "omlx"
+
+    def __init__(self) -> None:
+        self._cancel_token: Optional[CancellationToken] = None
+        self._checkpoint_dir: Optional[str] = None
+        self._raw_path: Optional[str] = None
+        self._raw: Optional[RawArtifactWriter] = None
+
     def transcribe(self, file_path: str, **params) -> Dict[str, Any]:
         """
         Транскрибировать аудиофайл через oMLX API.
@@ -236,8 +851,26 @@ class OMLXEngine(TranscriptionEngine):
         Параметры, специфичные для oMLX:
         - language: язык аудио
         - include_timestamps: включать ли временные метки в текст
+        - cancel_token: отмена проверяется между чанками и обрывает текущий HTTP-запрос
+        - checkpoint_dir: куда сохранять сегменты готовых чанков (resume после рестарта)
+        - transport_path: сжатая (flac/opus) или оригинальная копия для отправки целиком
+        - raw_path: куда писать сырые ответы oMLX (по записи на запрос/чанк)
         """
+        self._raw_path = params.get("raw_path")
+        self._raw = None
+        try:
+            result = self._transcribe(file_path, **params)
+        finally:
+            raw_file = self._raw.close() if self._raw is not None else None
+            self._raw = None
+        result["raw_file"] = raw_file
+        return result
+
+    def _transcribe(self, file_path: str, **params) -> Dict[str, Any]:
+        """Тело transcribe(): целиком или с разбивкой на чанки."""
         include_timestamps = params.get("include_timestamps", True)
+        self._cancel_token = params.get("cancel_token")
+        self._checkpoint_dir = params.get("checkpoint_dir")
         omlx_model = params.get("model")
         if not OMLX_ENABLED or not OMLX_BASE_URL:
             raise RuntimeError("oMLX не настроен: проверьте OMLX_BASE_URL и OMLX_ENABLED")
@@ -245,9 +878,15 @@ class OMLXEngine(TranscriptionEngine):
         language = params.get("language")
         start_time = time.time()
 
-        # Проверка длительности: если > 60 мин — разбить по тишине
+        # Проверка длительности: если > 60 мин (или > адаптивного размера чанка) — разбить по тишине
         duration_sec = get_audio_duration(file_path)
-        if duration_sec and duration_sec > OMLX_MAX_AUDIO_DURATION_SEC:
+        if OMLX_SPLIT_MODE == "window":
+            split_above = float(OMLX_WINDOW_SEC)
+        elif OMLX_ADAPTIVE_CHUNKING:
+            split_above = _target_chunk_sec(duration_sec or 0)
+        else:
+            split_above = float(OMLX_MAX_AUDIO_DURATION_SEC)
+        if duration_sec and duration_sec > split_above:
             return self._split_and_transcribe(
                 file_path,
                 language=language,
@@ -256,7 +895,14 @@ class OMLXEngine(TranscriptionEngine):
                 start_time=start_time,
             )
 
+        # Сжатая/оригинальная копия, подготовленная при постановке в очередь
+        transport_path = params.get("transport_path")
+        if transport_path and os.path.exists(transport_path):
+            file_path = transport_path
+        if self._raw_path:
+            self._raw = RawArtifactWriter(self._raw_path)
         seg_result = self._transcribe_file(file_path, language=language, model=omlx_model)
+        self._store_raw(seg_result, {"engine": self.name, "model": omlx_model or OMLX_MODEL})
         all_segments: List[Dict[str, Any]] = list(seg_result["segments"])
 
         # Рехилиация speaker IDs — маппинг локальных ID в глобальные
@@ -278,6 +924,323 @@ class OMLXEngine(TranscriptionEngine):
             "raw_response": None,
         }
 
+    def transcribe_packed(
+        self, clips: List[Tuple[str, str]], **params
+    ) -> Dict[str, Dict[str, Any]]:
+        """Транскрибировать несколько коротких клипов одним запросом.
+
+        clips — пары (ключ, путь к WAV). Клипы склеиваются через
+        OMLX_PACK_GAP_MS тишины, сегменты ответа разносятся обратно по
+        offset map. Возвращает результат в формате transcribe() для каждого ключа.
+        raw_paths — {ключ: путь сырого артефакта}: тело общего ответа
+        записывается в артефакт каждой задачи вместе с её интервалом в склейке.
+        """
+        from pydub import AudioSegment
+
+        include_timestamps = params.get("include_timestamps", True)
+        raw_paths: Dict[str, str] = params.get("raw_paths") or {}
+        self._cancel_token = params.get("cancel_token")
+        self._checkpoint_dir = None
+        # Тело ответа остаётся открытым до _store_packed_raw
+        self._raw_path = next(iter(raw_paths.values()), None)
+        self._raw = None
+        if not OMLX_ENABLED or not OMLX_BASE_URL:
+            raise RuntimeError("oMLX не настроен: проверьте OMLX_BASE_URL и OMLX_ENABLED")
+        start_time = time.time()
+
+        packed = AudioSegment.empty()
+        offsets: List[Tuple[str, int, int]] = []
+        for key, path in clips:
+            clip = AudioSegment.from_file(path)
+            if offsets:
+                packed += AudioSegment.silent(duration=OMLX_PACK_GAP_MS, frame_rate=clip.frame_rate)
+            start_ms = len(packed)
+            packed += clip
+            offsets.append((key, start_ms, len(packed)))
+
+        self._check_cancelled()
+        seg_result, _ = self._transcribe_chunk(
+            _export_chunk(packed),
+            language=params.get("language"),
+            model=params.get("model"),
+            audio_sec=len(packed) / 1000.0,
+        )
+        duration = time.time() - start_time
+        logger.info(f"oMLX packed request: {len(clips)} clips, {len(packed) / 1000.0:.1f}s audio")
+        raw_files = self._store_packed_raw(
+            seg_result, raw_paths, offsets, params.get("model") or OMLX_MODEL
+        )
+
+        results: Dict[str, Dict[str, Any]] = {}
+        for key, segments in _unpack_segments(seg_result["segments"], offsets, OMLX_PACK_GAP_MS).items():
+            segments = _reconcile_speaker_ids(segments)
+            results[key] = {
+                "segments": segments,
+                "text": _build_formatted_text_from_segments(
+                    segments, include_timestamps=include_timestamps
+                ),
+                "speaker_detected": bool(segments and any(s.get("speaker", 0) != 0 for s in segments)),
+                "transcription_duration": round(duration, 2),
+                "raw_response": None,
+                "raw_file": raw_files.get(key),
+            }
+        return results
+
+    def _store_packed_raw(
+        self,
+        result: Dict[str, Any],
+        raw_paths: Dict[str, str],
+        offsets: List[Tuple[str, int, int]],
+        model: Optional[str],
+    ) -> Dict[str, Optional[str]]:
+        """Записать тело пакетного ответа в сырой артефакт каждой задачи пачки."""
+        body = result.pop("raw_body", None)
+        if body is None or not raw_paths:
+            _discard_raw_body({"raw_body": body})
+            return {}
+        if not isinstance(body, str):
+            spool = body
+            try:
+                body = spool.read().decode("utf-8", errors="replace")
+            finally:
+                spool.close()
+        raw_files: Dict[str, Optional[str]] = {}
+        for key, start_ms, end_ms in offsets:
+            if key not in raw_paths:
+                continue
+            meta = {
+                "engine": self.name,
+                "model": model,
+                "packed_clips": len(offsets),
+                "clip_start": start_ms / 1000.0,
+                "clip_end": end_ms / 1000.0,
+            }
+            writer = RawArtifactWriter(raw_paths[key])
+            try:
+                writer.write_body(meta, body, parsed=True)
+                raw_files[key] = writer.close()
+            except OSError as e:
+                writer.discard()
+                logger.warning(f"Failed to save packed oMLX raw response for {key}: {e}")
+        return raw_files
+
+    def resolve_model(self, requested: Optional[str]) -> Optional[str]:
+        return requested or OMLX_MODEL
+
+    def _check_cancelled(self) -> None:
+        if self._cancel_token is not None:
+            self._cancel_token.raise_if_cancelled()
+
+    def _backoff(self, delay: float) -> None:
+        """Пауза перед повтором; отмена задачи прерывает ожидание."""
+        if self._cancel_token is None:
+            time.sleep(delay)
+        elif self._cancel_token.wait(delay):
+            self._cancel_token.raise_if_cancelled()
+
+    def _request_chunk(
+        self,
+        audio_bytes: bytes,
+        language: Optional[str],
+        model: Optional[str],
+        audio_sec: float,
+    ) -> Dict[str, Any]:
+        """Один запрос чанка; при OMLX_HEDGE_ENABLED — с хеджированием."""
+        chunk_latency.start_request()
+        delay = chunk_latency.hedge_delay(audio_sec) if OMLX_HEDGE_ENABLED else None
+        if delay is None:
+            started = time.monotonic()
+            result = self._transcribe_segment(audio_bytes, language=language, model=model)
+            chunk_latency.record(time.monotonic() - started, audio_sec)
+            return result
+        return self._hedged_segment(audio_bytes, language, model, audio_sec, delay)
+
+    def _hedged_segment(
+        self,
+        audio_bytes: bytes,
+        language: Optional[str],
+        model: Optional[str],
+        audio_sec: float,
+        delay: float,
+    ) -> Dict[str, Any]:
+        """Запрос чанка с дублем через delay секунд; первый успешный ответ побеждает.
+
+        У каждой попытки свой CancellationToken: проигравшая попытка
+        обрывается (её HTTP-соединение закрывается), отмена задачи
+        обрывает обе.
+        """
+        outcomes: "Queue[Tuple[int, Optional[Dict[str, Any]], Optional[BaseException], float]]" = Queue()
+        tokens: List[CancellationToken] = []
+        base_urls = [OMLX_BASE_URL, OMLX_HEDGE_BASE_URL or OMLX_BASE_URL]
+        # После выбора победителя ответы проигравших не нужны: их spool закрывается
+        settled = threading.Event()
+        settle_lock = threading.Lock()
+
+        def deliver(outcome: Tuple[int, Optional[Dict[str, Any]], Optional[BaseException], float]) -> None:
+            with settle_lock:
+                if not settled.is_set():
+                    outcomes.put(outcome)
+                    return
+            _discard_raw_body(outcome[1])
+
+        def launch(attempt: int) -> None:
+            token = CancellationToken()
+            tokens.append(token)
+
+            def run() -> None:
+                started = time.monotonic()
+                try:
+                    result = self._transcribe_segment(
+                        audio_bytes, language=language, model=model,
+                        base_url=base_urls[attempt], cancel_token=token,
+                    )
+                    deliver((attempt, result, None, time.monotonic() - started))
+                except BaseException as e:  # noqa: BLE001 — передаём в ожидающий поток
+                    deliver((attempt, None, e, time.monotonic() - started))
+
+            threading.Thread(target=run, name=f"omlx-hedge-{attempt}", daemon=True).start()
+
+        def abort_all(reason: str) -> None:
+            for token in tokens:
+                token.cancel(reason)
+
+        launch(0)
+        hedge_at = time.monotonic() + delay
+        errors: List[BaseException] = []
+        pending = 1
+        try:
+            while pending:
+                if self._cancel_token is not None and self._cancel_token.aborted:
+                    abort_all(self._cancel_token.reason or "cancelled")
+                    self._cancel_token.raise_if_aborted()
+                if len(tokens) == 1 and time.monotonic() >= hedge_at:
+                    if chunk_latency.try_spend():
+                        logger.info(
+                            f"oMLX chunk exceeded p{OMLX_HEDGE_PERCENTILE * 100:.0f} "
+                            f"latency ({delay:.1f}s), sending hedge request"
+                        )
+                        launch(1)
+                        pending += 1
+                    else:
+                        hedge_at = float("inf")
+                try:
+                    attempt, result, error, latency = outcomes.get(timeout=0.1)
+                except Empty:
+                    continue
+                pending -= 1
+                if error is None and result is not None:
+                    chunk_latency.record(latency, audio_sec)
+                    if attempt == 1:
+                        chunk_latency.record_win()
+                    return result
+                errors.append(error)  # type: ignore[arg-type]
+                if len(tokens) == 1:
+                    # Основной запрос упал до отправки дубля — обычная ошибка чанка
+                    break
+            raise errors[0]
+        finally:
+            abort_all("hedge lost")
+            with settle_lock:
+                settled.set()
+                while True:
+                    try:
+                        _, lost, _, _ = outcomes.get_nowait()
+                    except Empty:
+                        break
+                    _discard_raw_body(lost)
+
+    def _transcribe_chunk(
+        self,
+        audio_bytes: bytes,
+        language: Optional[str] = None,
+        model: Optional[str] = None,
+        audio_sec: float = 0.0,
+    ) -> Tuple[Dict[str, Any], int]:
+        """_transcribe_segment с повторами и экспоненциальной задержкой.
+
+        Возвращает (результат, число повторов); после OMLX_CHUNK_RETRIES
+        повторов пробрасывает последнюю ошибку.
+        """
+        retries = 0
+        while True:
+            self._check_cancelled()
+            try:
+                return self._request_chunk(audio_bytes, language, model, audio_sec), retries
+            except Exception as e:
+                if not _is_retryable(e) or retries >= OMLX_CHUNK_RETRIES:
+                    raise
+                delay = OMLX_CHUNK_RETRY_BACKOFF_SEC * (2 ** retries)
+                retries += 1
+                logger.warning(
+                    f"oMLX chunk request failed ({e}), retry {retries}/{OMLX_CHUNK_RETRIES} "
+                    f"in {delay:.1f}s"
+                )
+                self._backoff(delay)
+
+    def _post(
+        self,
+        url: str,
+        files: Dict[str, Any],
+        data: Dict[str, Any],
+        headers: Dict[str, str],
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> requests.Response:
+        """POST в oMLX API; при наличии cancel_token запрос обрывается по отмене.
+
+        cancel_token переопределяет токен задачи для отдельной попытки.
+        Исход запроса (ошибка/5xx или успех с латентностью) учитывается
+        circuit breaker'ом oMLX.
+        """
+        token = cancel_token or self._cancel_token
+        if token is not None:
+            token.raise_if_cancelled()
+        breaker = get_breaker("omlx")
+        started = time.monotonic()
+        try:
+            response = self._send(url, files, data, headers, token)
+        except TranscriptionCancelled:
+            raise
+        except Exception as e:
+            breaker.record_failure(str(e), latency=time.monotonic() - started)
+            raise
+        status = getattr(response, "status_code", None)
+        if isinstance(status, int) and status >= 500:
+            breaker.record_failure(f"HTTP {status}", latency=time.monotonic() - started)
+        else:
+            breaker.record_success(time.monotonic() - started)
+        return response
+
+    def _send(
+        self,
+        url: str,
+        files: Dict[str, Any],
+        data: Dict[str, Any],
+        headers: Dict[str, str],
+        token: Optional[CancellationToken] = None,
+    ) -> requests.Response:
+        """Отправить запрос; тело ответа дочитывается в spool-файл (_spool_body)."""
+        if token is None:
+            return _spool_body(requests.post(
+                url, files=files, data=data, headers=headers, timeout=(10, 3600),
+                stream=True,
+            ))
+        session = AbortableSession()
+        try:
+            # Тело читается внутри прерываемого вызова — отмена обрывает и скачивание
+            return run_abortable(
+                session,
+                lambda s: _spool_body(s.post(
+                    url, files=files, data=data, headers=headers, timeout=(10, 3600),
+                    stream=True,
+                )),
+                # drain не обрывает запрос — чанк дорабатывается и сохраняется
+                should_abort=lambda: token.aborted,
+            )
+        except RequestAborted:
+            raise TranscriptionCancelled(token.reason or "cancelled")
+        finally:
+            session.close()
+
     def _transcribe_file(
         self,
         file_path: str,
@@ -296,10 +1259,8 @@ class OMLXEngine(TranscriptionEngine):
             headers["Authorization"] = f"Bearer {OMLX_API_KEY}"
 
         with open(file_path, "rb") as f:
-            files = {"file": (os.path.basename(file_path), f, "audio/wav")}
-            response = requests.post(
-                url, files=files, data=data, headers=headers, timeout=(10, 3600)
-            )
+            files = {"file": (os.path.basename(file_path), f, audio_mime_type(file_path))}
+            response = self._post(url, files=files, data=data, headers=headers)
 
         if response.status_code == 404:
             try:
@@ -313,42 +1274,26 @@ class OMLXEngine(TranscriptionEngine):
                 pass
 
         response.raise_for_status()
-
-        raw_text = response.text
-        items = json.loads(raw_text)
-        logger.info(f"oMLX raw response (first 500): {raw_text[:500]}")
-        segments = _normalize_segments(items) or []
-        if segments:
-            speaker_counts: Dict[int, int] = {}
-            for seg in segments:
-                sid = seg.get("speaker", 0)
-                speaker_counts[sid] = speaker_counts.get(sid, 0) + 1
-            logger.info(f"oMLX diarization result: {dict(speaker_counts)}")
-        text = "\n".join(seg["text"] for seg in segments)
-
-        if not segments:
-            logger.warning(
-                f"oMLX API returned empty segments "
-                f"(raw response length: {len(raw_text)}, items count: {len(items) if isinstance(items, list) else 'N/A'})"
-            )
-
-        return {
-            "segments": segments,
-            "text": text,
-            "raw_response": raw_text,
-        }
+        return self._parse_response(response)
 
     def _transcribe_segment(
         self,
         audio_bytes: bytes,
         language: Optional[str] = None,
         model: Optional[str] = None,
+        base_url: Optional[str] = None,
+        cancel_token: Optional[CancellationToken] = None,
     ) -> Dict[str, Any]:
-        """Транскрибировать один сегмент (байты WAV) через oMLX API."""
-        url = f"{OMLX_BASE_URL}/audio/transcriptions"
+        """Транскрибировать один сегмент (байты WAV) через oMLX API.
+
+        base_url и cancel_token переопределяют бэкенд и токен отмены
+        для отдельной попытки (хеджирование).
+        """
+        url = f"{base_url or OMLX_BASE_URL}/audio/transcriptions"
 
         bio = BytesIO(audio_bytes)
-        files = {"file": ("segment.wav", bio, "audio/wav")}
+        ext, mime, _ = TRANSPORT_FORMATS[_chunk_codec()]
+        files = {"file": (f"segment{ext}", bio, mime)}
         data: Dict[str, Any] = {"model": model or OMLX_MODEL, "diarize": True}
         if language:
             data["language"] = language
@@ -357,8 +1302,8 @@ class OMLXEngine(TranscriptionEngine):
         if OMLX_API_KEY:
             headers["Authorization"] = f"Bearer {OMLX_API_KEY}"
 
-        response = requests.post(
-            url, files=files, data=data, headers=headers, timeout=(10, 3600)
+        response = self._post(
+            url, files=files, data=data, headers=headers, cancel_token=cancel_token
         )
 
         if response.status_code == 404:
@@ -373,29 +1318,90 @@ class OMLXEngine(TranscriptionEngine):
                 pass
 
         response.raise_for_status()
+        return self._parse_response(response)
+
+    def _parse_response(self, response: Any) -> Dict[str, Any]:
+        """Разобрать тело успешного ответа потоково (см. _ResponseParser).
 
-        raw_text = response.text
-        items = json.loads(raw_text)
-        logger.info(f"oMLX raw response (first 500): {raw_text[:500]}")
-        segments = _normalize_segments(items) or []
+        Если сырые ответы сохраняются, тело (spool-файл) остаётся открытым в
+        "raw_body" — его забирает _store_raw, когда ответ принят (проигравшая
+        хедж-попытка в артефакт не попадает).
+        """
+        keep_body = self._raw_path is not None
+        parser = _ResponseParser()
+        for text in _iter_response_text(response, close=not keep_body):
+            parser.feed(text)
+        segments = parser.close() or []
+        logger.debug(f"oMLX response: {parser.chars} chars, {len(segments)} segments")
         if segments:
             speaker_counts: Dict[int, int] = {}
             for seg in segments:
                 sid = seg.get("speaker", 0)
                 speaker_counts[sid] = speaker_counts.get(sid, 0) + 1
             logger.info(f"oMLX diarization result: {dict(speaker_counts)}")
-        text = "\n".join(seg["text"] for seg in segments)
-
-        if not segments:
+        else:
             logger.warning(
-                f"oMLX API returned empty segments "
-                f"(raw response length: {len(raw_text)}, items count: {len(items) if isinstance(items, list) else 'N/A'})"
+                f"oMLX API returned empty segments (raw response length: {parser.chars})"
             )
 
-        return {
+        result: Dict[str, Any] = {
             "segments": segments,
-            "text": text,
-            "raw_response": raw_text,
+            "text": "\n".join(seg["text"] for seg in segments),
+            "raw_response": None,
+        }
+        if keep_body:
+            result["raw_body"] = _response_body(response)
+        return result
+
+    def _store_raw(self, result: Dict[str, Any], meta: Dict[str, Any]) -> None:
+        """Дописать тело принятого ответа в сырой артефакт задачи.
+
+        raw_body появляется только после успешного _ResponseParser.close(),
+        поэтому тело — валидный JSON и копируется как есть.
+        """
+        body = result.pop("raw_body", None)
+        if body is None or self._raw is None:
+            return
+        try:
+            self._raw.write_body(meta, body, parsed=True)
+        except OSError as e:
+            logger.warning(f"Failed to save oMLX raw response: {e}")
+
+    def _plan(self, audio: "AudioSegment") -> Tuple[List[Tuple[int, int]], Dict[str, Any]]:
+        """Границы чанков и параметры, по которым они выбраны (для metadata)."""
+        if OMLX_SPLIT_MODE == "window":
+            overlap_sec = min(OMLX_WINDOW_OVERLAP_SEC, OMLX_WINDOW_SEC / 2)
+            windows = _plan_windows(len(audio), OMLX_WINDOW_SEC * 1000, int(overlap_sec * 1000))
+            return windows, {
+                "mode": "window",
+                "window_sec": OMLX_WINDOW_SEC,
+                "overlap_sec": overlap_sec,
+                "concurrency": OMLX_CHUNK_CONCURRENCY,
+            }
+        total_sec = len(audio) / 1000.0
+        non_silent = _detect_silence_chunks(audio, gap_ms=OMLX_SILENCE_GAP_MS)
+        max_chunk_ms = OMLX_MAX_AUDIO_DURATION_SEC * 1000
+        if not OMLX_ADAPTIVE_CHUNKING:
+            return plan_chunks(non_silent, max_chunk_ms), {
+                "mode": "silence",
+                "adaptive": False,
+                "max_chunk_sec": OMLX_MAX_AUDIO_DURATION_SEC,
+                "concurrency": OMLX_CHUNK_CONCURRENCY,
+            }
+        target_sec = _target_chunk_sec(total_sec)
+        rtf = chunk_latency.rtf()
+        chunks = plan_adaptive_chunks(non_silent, int(target_sec * 1000), max_chunk_ms)
+        logger.info(
+            f"Adaptive chunk plan: target {target_sec:.0f}s, {len(chunks)} chunks "
+            f"(rtf={rtf if rtf is None else round(rtf, 3)}, concurrency={OMLX_CHUNK_CONCURRENCY})"
+        )
+        return chunks, {
+            "mode": "silence",
+            "adaptive": True,
+            "target_chunk_sec": round(target_sec, 1),
+            "max_chunk_sec": OMLX_MAX_AUDIO_DURATION_SEC,
+            "concurrency": OMLX_CHUNK_CONCURRENCY,
+            "rtf": round(rtf, 4) if rtf is not None else None,
         }
 
     def _split_and_transcribe(
@@ -406,43 +1412,116 @@ class OMLXEngine(TranscriptionEngine):
         include_timestamps: bool = True,
         start_time: float = 0,
     ) -> Dict[str, Any]:
-        """Разбить аудио по тишине на сегменты ≤ 60 мин и транскрибировать каждый."""
+        """Разбить аудио по тишине на чанки и транскрибировать каждый (до OMLX_CHUNK_CONCURRENCY параллельно)."""
         from pydub import AudioSegment
 
         if start_time == 0:
             start_time = time.time()
 
         audio = AudioSegment.from_file(file_path)
-        non_silent = _detect_silence_chunks(audio, gap_ms=OMLX_SILENCE_GAP_MS)
-
-        if not non_silent:
-            return {"segments": [], "text": "", "raw_response": None}
-
-        all_segments: List[Dict[str, Any]] = []
-        max_chunk_ms = OMLX_MAX_AUDIO_DURATION_SEC * 1000
-
-        for start_ms, end_ms in non_silent:
-            duration_ms = end_ms - start_ms
-            for chunk_start in range(0, duration_ms, max_chunk_ms):
-                abs_start = start_ms + chunk_start
-                abs_end = min(abs_start + max_chunk_ms, end_ms)
+        checkpoint = _ChunkCheckpoint(self._checkpoint_dir)
 
-                segment = audio[abs_start:abs_end]
-                buf = BytesIO()
-                segment.export(buf, format="wav")
+        chunks = checkpoint.load_plan()
+        if chunks is None:
+            chunks, plan_info = self._plan(audio)
+            checkpoint.save_plan(chunks, plan_info)
+        else:
+            plan_info = checkpoint.load_plan_info()
+            logger.info(
+                f"Resuming split transcription: {len(checkpoint.completed())}/{len(chunks)} "
+                f"chunks already done"
+            )
 
-                seg_result = self._transcribe_segment(
-                    buf.getvalue(), language=language, model=model
+        if not chunks:
+            return {"segments": [], "text": "", "raw_response": None}
+        if self._raw_path:
+            # При resume дописываем к ответам уже готовых чанков
+            self._raw = RawArtifactWriter(self._raw_path, append=bool(checkpoint.completed()))
+
+        report: Dict[str, Any] = {
+            "chunks_total": len(chunks),
+            "retried_chunks": [],
+            "failed_chunks": [],
+            "plan": {
+                **plan_info,
+                "chunks": [[round(s / 1000.0, 3), round(e / 1000.0, 3)] for s, e in chunks],
+            },
+        }
+        chunk_segments: Dict[int, List[Dict[str, Any]]] = {}
+        pending: List[int] = []
+        for index in range(len(chunks)):
+            saved = checkpoint.load_chunk(index)
+            if saved is not None:
+                chunk_segments[index] = saved
+            else:
+                pending.append(index)
+
+        def run_chunk(index: int) -> None:
+            abs_start, abs_end = chunks[index]
+            self._check_cancelled()
+            chunk_bytes = _export_chunk(audio[abs_start:abs_end])
+
+            chunk_range = {
+                "index": index,
+                "start": round(abs_start / 1000.0, 3),
+                "end": round(abs_end / 1000.0, 3),
+            }
+            try:
+                seg_result, retries = self._transcribe_chunk(
+                    chunk_bytes, language=language, model=model,
+                    audio_sec=(abs_end - abs_start) / 1000.0,
                 )
+            except (TranscriptionCancelled, OMLXModelNotFoundError):
+                raise
+            except Exception as e:
+                report["failed_chunks"].append({**chunk_range, "error": str(e)})
+                message = (
+                    f"Chunk {index + 1}/{len(chunks)} "
+                    f"({chunk_range['start']:.1f}-{chunk_range['end']:.1f}s) failed: {e}"
+                )
+                if OMLX_CHUNK_FAILURE_POLICY != "skip":
+                    raise ChunkFailedError(message, report) from e
+                # Пропуск: чанк не сохраняется в checkpoint — его можно перезапустить позже
+                logger.error(f"{message}; skipping")
+                return
+            if retries:
+                report["retried_chunks"].append({**chunk_range, "retries": retries})
+            self._store_raw(seg_result, {"engine": self.name, "chunk": chunk_range})
+
+            # Offset correction: смещение сегмента к таймкодам
+            offset_sec = abs_start / 1000.0
+            for seg in seg_result["segments"]:
+                seg["start"] += offset_sec
+                seg["end"] += offset_sec
+
+            checkpoint.save_chunk(index, abs_start, abs_end, seg_result["segments"])
+            chunk_segments[index] = seg_result["segments"]
+
+        concurrency = min(OMLX_CHUNK_CONCURRENCY, len(pending))
+        if concurrency <= 1:
+            for index in pending:
+                run_chunk(index)
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="omlx-chunk") as pool:
+                futures = [pool.submit(run_chunk, index) for index in pending]
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+        for key in ("retried_chunks", "failed_chunks"):
+            report[key].sort(key=lambda c: c["index"])
 
-                # Offset correction: смещение сегмента к таймкодам
-                offset_sec = abs_start / 1000.0
-                for seg in seg_result["segments"]:
-                    seg["start"] += offset_sec
-                    seg["end"] += offset_sec
-
-                all_segments.extend(seg_result["segments"])
-
+        all_segments: List[Dict[str, Any]] = []
+        if plan_info.get("mode") == "window":
+            all_segments = _stitch_windows(
+                [(chunks[index], chunk_segments[index]) for index in sorted(chunk_segments)]
+            )
+        else:
+            for index in sorted(chunk_segments):
+                all_segments.extend(chunk_segments[index])
         all_segments = _reconcile_speaker_ids(all_segments)
 
         formatted_text = _build_formatted_text_from_segments(
@@ -455,4 +1534,5 @@ class OMLXEngine(TranscriptionEngine):
             "speaker_detected": bool(all_segments and any(s.get("speaker", 0) != 0 for s in all_segments)),
             "transcription_duration": round(time.time() - start_time, 2),
             "raw_response": None,
+            "chunk_report": report,
         }
@@ -6,19 +6,59 @@ import os
 import threading
 import time
 import uuid
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
-from queue import Queue, Full
-from typing import Any, Dict, Optional
+from queue import Full
+from typing import Any, Dict, List, Optional, Set
 
+from src.services.fair_queue import FairQueue
 from src.services.job_manager import JobManager, JobStatus
-from src.config import TRANSCRIBER_WORKERS, QUEUE_MAX_SIZE
+from src.config import (
+    TRANSCRIBER_WORKERS,
+    TRANSCRIBER_MIN_WORKERS,
+    TRANSCRIBER_MAX_WORKERS,
+    AUTOSCALE_INTERVAL_SEC,
+    AUTOSCALE_IDLE_SEC,
+    AUTOSCALE_MAX_RTF,
+    QUEUE_MAX_SIZE,
+    DEFAULT_TENANT,
+    ADMISSION_DEFAULT_RTF,
+    TRANSCRIPTION_TIMEOUT_SECONDS,
+    WATCHDOG_INTERVAL_SEC,
+    WATCHDOG_BASE_TIMEOUT_SEC,
+    WATCHDOG_TIMEOUT_RTF,
+    WATCHDOG_ON_TIMEOUT,
+    WATCHDOG_MAX_REQUEUES,
+    WATCHDOG_STUCK_GRACE_SEC,
+    DRAIN_TIMEOUT_SEC,
+    OMLX_PACKING_ENABLED,
+    OMLX_PACK_MAX_CLIP_SEC,
+    OMLX_PACK_MAX_JOBS,
+    OMLX_PACK_MAX_AUDIO_SEC,
+    OMLX_PACK_WINDOW_SEC,
+    OMLX_TRANSPORT_CODEC,
+    OMLX_OPUS_BITRATE,
+    OMLX_PASSTHROUGH_FORMATS,
+    CONVERSION_TIMEOUT_SECONDS,
+    RAW_RESPONSE_RETENTION,
+)
+from src.utils.audio import encode_for_transport
 from src.utils.files import build_job_path
+from src.utils.raw_artifact import RawArtifactWriter, raw_artifact_path
 
 # Module-level references for worker methods — patchable at module level
 import src.models.transcription as _transcription_module
 from src.api.router import sanitize_result as _sanitize_result
-from src.services.whisper_engines import get_engine
+from src.services.whisper_engines import (
+    DRAIN_REASON,
+    AnyCancellationToken,
+    CancellationToken,
+    TranscriptionCancelled,
+    get_engine,
+    get_fallback_engine,
+    mlx_slot,
+)
+from src.services.omlx_engine import is_backend_failure
 
 logger = logging.getLogger("mlx_whisper")
 
@@ -28,7 +68,15 @@ class JobPayload:
     job_id: str
     wav_path: str
     params: Dict[str, Any]
-    cancelled: bool = field(default=False)
+    tenant: str = field(default=DEFAULT_TENANT)
+    cancel_token: CancellationToken = field(default_factory=CancellationToken)
+    # Номер попытки: растёт при повторной постановке в очередь после таймаута
+    attempt: int = 0
+    requeue: bool = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_token.cancelled
 
 
 class TranscriptionQueueManager:
@@ -36,7 +84,6 @@ class TranscriptionQueueManager:
 
     _instance: Optional["TranscriptionQueueManager"] = None
     _lock = threading.Lock()
-    _transcription_lock = threading.Lock()
 
     def __new__(cls, **kwargs) -> "TranscriptionQueueManager":
         with cls._lock:
@@ -45,37 +92,183 @@ class TranscriptionQueueManager:
                 cls._instance._initialized = False
             return cls._instance
 
-    def __init__(self, workers: Optional[int] = None, max_size: Optional[int] = None):
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_size: Optional[int] = None,
+        min_workers: Optional[int] = None,
+        max_workers: Optional[int] = None,
+    ):
         if self._initialized:
             return
         self._initialized = True
-        self._workers = workers if workers is not None else TRANSCRIBER_WORKERS
+        # _workers — целевое число воркеров; меняется автоскейлером и resize()
+        self._workers = max(workers if workers is not None else TRANSCRIBER_WORKERS, 1)
+        self._min_workers = max(
+            min(min_workers if min_workers is not None else TRANSCRIBER_MIN_WORKERS, self._workers), 1
+        )
+        self._max_workers = max(
+            max_workers if max_workers is not None else TRANSCRIBER_MAX_WORKERS, self._workers
+        )
+        # Потолок пула потоков: границы можно менять в рантайме только в его пределах
+        self._worker_ceiling = self._max_workers
         self._max_size = max_size if max_size is not None else QUEUE_MAX_SIZE
-        self._queue: Queue = Queue(maxsize=self._max_size)
+        self._queue: FairQueue = FairQueue(maxsize=self._max_size)
         self._executor = ThreadPoolExecutor(
-            max_workers=self._workers, thread_name_prefix="transcriber"
+            max_workers=self._worker_ceiling, thread_name_prefix="transcriber"
         )
+        self._scale_lock = threading.Lock()
+        self._worker_ids: Set[int] = set()
+        self._idle_since: Optional[float] = None
         self._meta = JobManager()
         self._shutdown = False
+        # Drain: новые задачи не принимаются и не выдаются воркерам
+        self._draining = False
         self._worker_futures: list = []
+        # Длительность аудио (сек) задач в очереди и в работе — для оценки backlog
+        self._load_lock = threading.Lock()
+        self._audio_by_job: Dict[str, float] = {}
+        # Задачи в очереди и в работе — для отмены через cancel_token
+        self._payloads: Dict[str, JobPayload] = {}
+        self._rtf = ADMISSION_DEFAULT_RTF
+        # Сжатие аудио для oMLX идёт, пока задача ждёт в очереди
+        self._encoder = ThreadPoolExecutor(max_workers=2, thread_name_prefix="transport-encoder")
+        self._transport: Dict[str, Future] = {}
+        # worker_id → текущая задача воркера (для watchdog и интроспекции)
+        self._active: Dict[int, Dict[str, Any]] = {}
+        self._watchdog = threading.Thread(
+            target=self._watchdog_loop, name="transcriber-watchdog", daemon=True
+        )
+        self._autoscaler = threading.Thread(
+            target=self._autoscale_loop, name="transcriber-autoscaler", daemon=True
+        )
         self._start_workers()
+        self._watchdog.start()
+        self._autoscaler.start()
 
     def _start_workers(self) -> None:
-        for i in range(self._workers):
-            future = self._executor.submit(self._worker_loop, i)
-            self._worker_futures.append(future)
+        self._spawn_workers()
         logger.info(
-            f"TranscriptionQueueManager started: workers={self._workers}, "
-            f"queue_max={self._max_size}"
+            f"TranscriptionQueueManager started: workers={self._workers} "
+            f"[{self._min_workers}..{self._max_workers}], queue_max={self._max_size}"
         )
 
+    def _spawn_workers(self) -> None:
+        """Запустить недостающие воркеры до целевого числа."""
+        with self._scale_lock:
+            if self._shutdown:
+                return
+            # Воркеры, вышедшие через _should_exit, больше не нужны stop()
+            self._worker_futures = [f for f in self._worker_futures if not f.done()]
+            for worker_id in range(self._workers):
+                if worker_id in self._worker_ids:
+                    continue
+                self._worker_ids.add(worker_id)
+                self._worker_futures.append(
+                    self._executor.submit(self._worker_loop, worker_id)
+                )
+
+    def _should_exit(self, worker_id: int) -> bool:
+        """Воркер с номером >= целевого числа завершается после текущей задачи."""
+        with self._scale_lock:
+            if self._shutdown or worker_id >= self._workers:
+                self._worker_ids.discard(worker_id)
+                return True
+            return False
+
+    def resize(
+        self,
+        workers: Optional[int] = None,
+        min_workers: Optional[int] = None,
+        max_workers: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Изменить границы автоскейлинга и/или целевое число воркеров без рестарта.
+
+        Значения ограничиваются диапазоном [1, потолок пула]. Уменьшение
+        graceful: лишние воркеры дорабатывают текущую задачу и завершаются.
+        """
+        with self._scale_lock:
+            ceiling = self._worker_ceiling
+            if min_workers is not None:
+                self._min_workers = min(max(min_workers, 1), ceiling)
+            if max_workers is not None:
+                self._max_workers = min(max(max_workers, 1), ceiling)
+            self._min_workers = min(self._min_workers, self._max_workers)
+            target = workers if workers is not None else self._workers
+            target = min(max(target, self._min_workers), self._max_workers)
+            previous, self._workers = self._workers, target
+            self._idle_since = None
+        if target != previous:
+            logger.info(f"Transcriber workers resized: {previous} -> {target}")
+        self._spawn_workers()
+        return self.scaling_state()
+
+    def scaling_state(self) -> Dict[str, Any]:
+        """Целевое и фактическое число воркеров, границы автоскейлинга."""
+        with self._scale_lock:
+            return {
+                "workers": self._workers,
+                "running_workers": len(self._worker_ids),
+                "min_workers": self._min_workers,
+                "max_workers": self._max_workers,
+                "worker_ceiling": self._worker_ceiling,
+            }
+
+    def autoscale_tick(self, now: Optional[float] = None) -> int:
+        """Один шаг автоскейлера. Возвращает новое целевое число воркеров.
+
+        Рост — если задач, которые можно выдать (с учётом max_concurrent
+        тенантов), больше, чем свободных воркеров, и RTF бэкенда не выше
+        AUTOSCALE_MAX_RTF. Сокращение — если свободные воркеры простаивают
+        дольше AUTOSCALE_IDLE_SEC.
+        """
+        now = time.monotonic() if now is None else now
+        eligible = self._queue.eligible()
+        with self._load_lock:
+            busy = len(self._active)
+            rtf = self._rtf
+        target = self._workers
+        idle = max(target - busy, 0)
+        new_target = target
+
+        if eligible > idle:
+            self._idle_since = None
+            if AUTOSCALE_MAX_RTF > 0 and rtf > AUTOSCALE_MAX_RTF:
+                logger.debug(f"Autoscaler: backend rtf {rtf:.2f} too high, not scaling up")
+            else:
+                new_target = min(self._max_workers, target + eligible - idle)
+        elif eligible == 0 and idle > 0:
+            if self._idle_since is None:
+                self._idle_since = now
+            elif now - self._idle_since >= AUTOSCALE_IDLE_SEC:
+                new_target = max(self._min_workers, target - idle)
+                self._idle_since = now
+        else:
+            self._idle_since = None
+
+        if new_target != target:
+            self.resize(workers=new_target)
+        return self._workers
+
+    def _autoscale_loop(self) -> None:
+        while not self._shutdown:
+            time.sleep(AUTOSCALE_INTERVAL_SEC)
+            if self._min_workers >= self._max_workers:
+                continue
+            try:
+                self.autoscale_tick()
+            except Exception as e:
+                logger.error(f"Autoscaler tick failed: {e}")
+
     def submit(self, payload: Dict[str, Any]) -> bool:
-        """Submit a job to the queue. Returns False if queue is full or shutting down."""
-        if self._shutdown:
+        """Submit a job to the queue. Returns False if queue is full, draining or shutting down."""
+        if self._shutdown or self._draining:
             return False
         job_id = payload.get("job_id", str(uuid.uuid4()))
         wav_path = payload["wav_path"]
         params = payload.get("params", {})
+        tenant = payload.get("tenant") or DEFAULT_TENANT
+        duration = payload.get("duration", params.get("duration"))
 
         self._meta.create(
             job_id=job_id,
@@ -88,18 +281,79 @@ class TranscriptionQueueManager:
             task=params.get("task"),
             word_timestamps=params.get("word_timestamps", False),
             mechanism=params.get("mechanism"),
-            duration=params.get("duration"),
+            duration=duration,
+            tenant=tenant,
+            # Для восстановления задачи после рестарта
+            wav_path=wav_path,
+            params=params,
         )
 
         try:
-            job_payload = self._build_payload(job_id, wav_path, params)
+            job_payload = self._build_payload(job_id, wav_path, params, tenant=tenant)
+            with self._load_lock:
+                self._audio_by_job[job_id] = float(duration or 0.0)
+                self._payloads[job_id] = job_payload
+            self._prepare_transport(job_id, wav_path, params, payload.get("original_path"))
             self._queue.put_nowait(job_payload)
             return True
         except Full:
+            with self._load_lock:
+                self._audio_by_job.pop(job_id, None)
+                self._payloads.pop(job_id, None)
+            self._drop_transport(job_id)
             return False
 
+    def _prepare_transport(
+        self,
+        job_id: str,
+        wav_path: str,
+        params: Dict[str, Any],
+        original_path: Optional[str] = None,
+    ) -> None:
+        """Подготовить копию аудио для отправки в oMLX (OMLX_TRANSPORT_CODEC).
+
+        flac/opus кодируются в фоне, пока задача ждёт в очереди; passthrough
+        использует оригинал, если его формат есть в OMLX_PASSTHROUGH_FORMATS.
+        """
+        if params.get("mechanism") != "omlx" or OMLX_TRANSPORT_CODEC == "wav":
+            return
+        if OMLX_TRANSPORT_CODEC == "passthrough":
+            ext = os.path.splitext(original_path or "")[1].lower().lstrip(".")
+            if original_path and ext in OMLX_PASSTHROUGH_FORMATS:
+                ready: Future = Future()
+                ready.set_result(original_path)
+                self._transport[job_id] = ready
+            return
+        self._transport[job_id] = self._encoder.submit(
+            encode_for_transport, wav_path, OMLX_TRANSPORT_CODEC, OMLX_OPUS_BITRATE
+        )
+
+    def _drop_transport(self, job_id: str) -> None:
+        future = self._transport.pop(job_id, None)
+        if future is not None:
+            future.cancel()
+
+    def _transport_path(self, job_id: str) -> Optional[str]:
+        """Путь к подготовленной копии аудио; None — отправлять WAV."""
+        future = self._transport.get(job_id)
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=CONVERSION_TIMEOUT_SECONDS)
+        except Exception as e:
+            logger.warning(f"Job {job_id}: transport encoding failed ({e}), sending WAV")
+            return None
+
     def cancel_job(self, job_id: str) -> bool:
-        """Cancel a queued or processing job."""
+        """Cancel a queued or processing job.
+
+        Помимо статуса взводит cancel_token задачи: воркер прерывает
+        engine.transcribe() в ближайшей точке проверки и освобождает слот.
+        """
+        with self._load_lock:
+            payload = self._payloads.get(job_id)
+        if payload is not None:
+            payload.cancel_token.cancel("cancelled")
         meta = self._meta.load(job_id)
         if meta is None:
             return False
@@ -109,16 +363,276 @@ class TranscriptionQueueManager:
             return True
         return False
 
+    def load_snapshot(self) -> Dict[str, Any]:
+        """Текущая нагрузка: длина очереди, аудио-секунды и оценка backlog."""
+        with self._load_lock:
+            pending_audio = sum(self._audio_by_job.values())
+            pending_jobs = len(self._audio_by_job)
+            rtf = self._rtf
+        workers = max(self._workers, 1)
+        return {
+            "queued": self._queue.qsize(),
+            "max_size": self._max_size,
+            "workers": self._workers,
+            "pending_jobs": pending_jobs,
+            "pending_audio_sec": round(pending_audio, 2),
+            "rtf": round(rtf, 4),
+            "backlog_sec": round(pending_audio * rtf / workers, 2),
+            "shutdown": self._shutdown,
+            "draining": self._draining,
+        }
+
+    def tenant_depth(self, tenant: str) -> int:
+        """Количество задач тенанта в очереди."""
+        return self._queue.depth(tenant)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика очереди: размер, воркеры и метрики по тенантам."""
+        workers = self.worker_states()
+        return {
+            **self.load_snapshot(),
+            **self.scaling_state(),
+            "stuck_workers": sum(1 for w in workers if w["stuck"]),
+            "tenants": self._queue.stats(),
+        }
+
+    def worker_states(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Состояние воркеров: текущая задача, время работы, дедлайн, признак зависания."""
+        now = time.monotonic() if now is None else now
+        with self._load_lock:
+            active = {wid: dict(slot) for wid, slot in self._active.items()}
+        with self._scale_lock:
+            worker_ids = sorted(self._worker_ids | set(active))
+        states = []
+        for worker_id in worker_ids:
+            slot = active.get(worker_id)
+            if slot is None:
+                states.append({
+                    "worker_id": worker_id,
+                    "job_id": None,
+                    "elapsed_sec": None,
+                    "deadline_sec": None,
+                    "overdue": False,
+                    "stuck": False,
+                })
+                continue
+            elapsed = now - slot["started"]
+            states.append({
+                "worker_id": worker_id,
+                "job_id": slot["job_id"],
+                "tenant": slot["tenant"],
+                "attempt": slot["attempt"],
+                "audio_sec": slot["audio_sec"],
+                "elapsed_sec": round(elapsed, 2),
+                "deadline_sec": round(slot["deadline"], 2),
+                "overdue": elapsed > slot["deadline"],
+                "stuck": self._is_stuck(slot, now),
+            })
+        return states
+
+    def job_deadline(self, audio_sec: float) -> float:
+        """Дедлайн задачи (сек): растёт с длительностью аудио, но не больше TRANSCRIPTION_TIMEOUT."""
+        if audio_sec <= 0:
+            return float(TRANSCRIPTION_TIMEOUT_SECONDS)
+        scaled = WATCHDOG_BASE_TIMEOUT_SEC + audio_sec * WATCHDOG_TIMEOUT_RTF
+        return float(min(TRANSCRIPTION_TIMEOUT_SECONDS, scaled))
+
+    @staticmethod
+    def _is_stuck(slot: Dict[str, Any], now: float) -> bool:
+        timed_out_at = slot.get("timed_out_at")
+        return timed_out_at is not None and now - timed_out_at > WATCHDOG_STUCK_GRACE_SEC
+
+    def check_deadlines(self, now: Optional[float] = None) -> List[str]:
+        """Отменить задачи, превысившие дедлайн. Возвращает job_id отменённых задач.
+
+        Отмена кооперативная (cancel_token с причиной "timeout"): воркер
+        прерывает engine.transcribe() и сам решает — fail или requeue.
+        Воркер, не освободившийся за WATCHDOG_STUCK_GRACE_SEC, помечается
+        как зависший.
+        """
+        now = time.monotonic() if now is None else now
+        timed_out: List[str] = []
+        with self._load_lock:
+            for worker_id, slot in self._active.items():
+                if slot.get("timed_out_at") is not None:
+                    if self._is_stuck(slot, now) and not slot.get("stuck_reported"):
+                        slot["stuck_reported"] = True
+                        logger.error(
+                            f"Watchdog: worker {worker_id} stuck on job {slot['job_id']} "
+                            f"for {now - slot['started']:.0f}s after timeout"
+                        )
+                    continue
+                if now - slot["started"] <= slot["deadline"]:
+                    continue
+                slot["timed_out_at"] = now
+                slot["token"].cancel("timeout")
+                timed_out.append(slot["job_id"])
+                logger.warning(
+                    f"Watchdog: job {slot['job_id']} on worker {worker_id} exceeded "
+                    f"deadline {slot['deadline']:.0f}s, cancelling"
+                )
+        return timed_out
+
+    def _watchdog_loop(self) -> None:
+        while not self._shutdown:
+            time.sleep(WATCHDOG_INTERVAL_SEC)
+            try:
+                self.check_deadlines()
+            except Exception as e:
+                logger.error(f"Watchdog check failed: {e}")
+
+    def start_drain(self) -> None:
+        """Перестать принимать и выдавать задачи; активным задачам — сигнал drain.
+
+        Активная задача дорабатывает текущий чанк (HTTP-запрос к oMLX не
+        обрывается) и останавливается; готовые чанки уже сохранены, задача
+        остаётся QUEUED и продолжится после resume_intake() или рестарта.
+        """
+        if not self._draining:
+            logger.info("TranscriptionQueueManager draining")
+        self._draining = True
+        with self._load_lock:
+            tokens = [slot["token"] for slot in self._active.values()]
+        for token in tokens:
+            token.cancel(DRAIN_REASON)
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """start_drain() и ожидание освобождения воркеров. True если успели за timeout."""
+        self.start_drain()
+        limit = DRAIN_TIMEOUT_SEC if timeout is None else timeout
+        deadline = time.monotonic() + limit
+        while True:
+            with self._load_lock:
+                if not self._active:
+                    return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def resume_intake(self) -> int:
+        """Выйти из drain и вернуть в очередь прерванные задачи. Возвращает их число."""
+        self._draining = False
+        logger.info("TranscriptionQueueManager resumed intake")
+        return self.recover_jobs()
+
+    def recover_jobs(self) -> int:
+        """Поставить в очередь незавершённые задачи из metadata (QUEUED/PROCESSING).
+
+        Вызывается при старте сервера: задачи, прерванные остановкой или
+        падением процесса, продолжаются; split-задачи oMLX пропускают уже
+        сохранённые чанки. Возвращает число восстановленных задач.
+        """
+        recovered = 0
+        unfinished = (JobStatus.QUEUED.value, JobStatus.PROCESSING.value)
+        # list_all() — от новых к старым; восстанавливаем в порядке поступления
+        for meta in reversed(self._meta.list_all()):
+            if meta.get("status") not in unfinished:
+                continue
+            job_id = meta["job_id"]
+            wav_path = meta.get("wav_path")
+            params = meta.get("params")
+            if not wav_path or params is None or not os.path.exists(wav_path):
+                logger.warning(f"Cannot recover job {job_id}: audio or params missing")
+                self._meta.update_status(
+                    job_id, JobStatus.FAILED, error="Interrupted and cannot be resumed"
+                )
+                continue
+            with self._load_lock:
+                if job_id in self._payloads:
+                    continue
+            # Статус — до постановки в очередь: воркер может завершить задачу сразу
+            self._meta.update_status(job_id, JobStatus.QUEUED)
+            if not self._enqueue_existing(meta):
+                logger.warning(f"Queue full, job {job_id} left for next recovery")
+                break
+            recovered += 1
+        if recovered:
+            logger.info(f"Recovered {recovered} unfinished job(s)")
+        return recovered
+
+    def retry_failed_chunks(self, job_id: str) -> bool:
+        """Перезапустить split-задачу: отправляются только чанки без checkpoint.
+
+        Доступно для завершённой задачи с failed_chunks и для упавшей задачи
+        с сохранённым планом чанков. ValueError — перезапускать нечего;
+        False — очередь заполнена или в режиме drain.
+        """
+        meta = self._meta.load(job_id)
+        if meta is None:
+            raise ValueError("Job not found")
+        status = meta["status"]
+        if status not in (JobStatus.COMPLETED.value, JobStatus.FAILED.value):
+            raise ValueError(f"Job is {status}, wait until it finishes")
+        plan_path = os.path.join(build_job_path(job_id), "chunks", "plan.json")
+        if not os.path.exists(plan_path):
+            raise ValueError("Job has no chunk checkpoint to retry")
+        if status == JobStatus.COMPLETED.value and not meta.get("failed_chunks"):
+            raise ValueError("Job has no failed chunks")
+        if not meta.get("wav_path") or not os.path.exists(meta["wav_path"]):
+            raise ValueError("Job audio is no longer available")
+        if self._shutdown or self._draining:
+            return False
+        self._meta.update_status(
+            job_id, JobStatus.QUEUED, error=None, failed_chunks=[], partial=False
+        )
+        if not self._enqueue_existing(meta):
+            self._meta.update_status(
+                job_id,
+                JobStatus(status),
+                error=meta.get("error"),
+                failed_chunks=meta.get("failed_chunks") or [],
+                partial=bool(meta.get("partial")),
+            )
+            return False
+        logger.info(f"Job {job_id}: retrying failed chunks")
+        return True
+
+    def _enqueue_existing(self, meta: Dict[str, Any]) -> bool:
+        """Поставить в очередь задачу по её metadata (без создания новой). False если очередь полна."""
+        job_id = meta["job_id"]
+        job_payload = self._build_payload(
+            job_id,
+            meta["wav_path"],
+            meta.get("params") or {},
+            tenant=meta.get("tenant") or DEFAULT_TENANT,
+        )
+        with self._load_lock:
+            self._audio_by_job[job_id] = float(meta.get("duration") or 0.0)
+            self._payloads[job_id] = job_payload
+        self._prepare_transport(job_id, meta["wav_path"], meta.get("params") or {})
+        try:
+            self._queue.put_nowait(job_payload)
+        except Full:
+            with self._load_lock:
+                self._audio_by_job.pop(job_id, None)
+                self._payloads.pop(job_id, None)
+            self._drop_transport(job_id)
+            return False
+        return True
+
     def shutdown(self) -> None:
-        """Graceful shutdown: stop workers and drain queue."""
+        """Graceful shutdown: drain, then stop workers.
+
+        Активные задачи дорабатывают текущий чанк в пределах DRAIN_TIMEOUT_SEC;
+        по истечении таймаута их HTTP-запросы обрываются. Прерванные задачи
+        остаются QUEUED и восстанавливаются recover_jobs() при следующем старте.
+        """
         logger.info("TranscriptionQueueManager shutting down...")
-        self._shutdown = True
-        for future in self._worker_futures:
+        if not self.drain():
+            logger.warning("Drain timed out, aborting in-flight jobs")
+            with self._load_lock:
+                tokens = [slot["token"] for slot in self._active.values()]
+            for token in tokens:
+                token.cancel("shutdown")
+        with self._scale_lock:
+            self._shutdown = True
+        for future in list(self._worker_futures):
             try:
                 future.result(timeout=30)
             except Exception:
                 logger.warning("Worker did not complete within 30s timeout")
         self._executor.shutdown(wait=True)
+        self._encoder.shutdown(wait=False, cancel_futures=True)
         logger.info("TranscriptionQueueManager stopped")
 
     @classmethod
@@ -133,18 +647,37 @@ class TranscriptionQueueManager:
             instance._executor.shutdown(wait=False, cancel_futures=True)
         cls._instance = None
 
-    def _build_payload(self, job_id: str, wav_path: str, params: Dict[str, Any]) -> JobPayload:
+    def _build_payload(
+        self,
+        job_id: str,
+        wav_path: str,
+        params: Dict[str, Any],
+        tenant: str = DEFAULT_TENANT,
+    ) -> JobPayload:
         return JobPayload(
             job_id=job_id,
             wav_path=wav_path,
             params=params,
-            cancelled=False,
+            tenant=tenant,
         )
 
+    def _finish(self, job: JobPayload) -> None:
+        """Убрать задачу из учёта нагрузки и освободить слот тенанта."""
+        with self._load_lock:
+            self._audio_by_job.pop(job.job_id, None)
+            self._payloads.pop(job.job_id, None)
+        if not job.requeue:
+            self._drop_transport(job.job_id)
+        self._queue.release(job.tenant)
+        self._queue.task_done()
+
     def _worker_loop(self, worker_id: int) -> None:
         """Main worker loop: get job → check cancelled → transcribe → update."""
         logger.info(f"Worker {worker_id} started")
-        while not self._shutdown:
+        while not self._should_exit(worker_id):
+            if self._draining:
+                time.sleep(0.2)
+                continue
             try:
                 job = self._queue.get(timeout=1.0)
             except Exception:
@@ -152,94 +685,410 @@ class TranscriptionQueueManager:
 
             # Check cancelled before processing
             meta = self._meta.load(job.job_id)
-            if meta and meta["status"] == JobStatus.CANCELLED.value:
-                self._queue.task_done()
+            if job.cancelled or (meta and meta["status"] == JobStatus.CANCELLED.value):
+                self._finish(job)
                 logger.info(f"Worker {worker_id}: job {job.job_id} cancelled, skipping")
                 continue
 
+            batch = self._collect_pack(job)
+            with self._load_lock:
+                audio_by_job = {j.job_id: self._audio_by_job.get(j.job_id) or 0.0 for j in batch}
+            audio_sec = sum(audio_by_job.values())
+            deadline = self.job_deadline(audio_sec)
+
             # Mark as processing
-            self._meta.update_status(job.job_id, JobStatus.PROCESSING)
+            for packed in batch:
+                self._meta.update_status(
+                    packed.job_id, JobStatus.PROCESSING, attempt=packed.attempt, deadline_sec=deadline
+                )
             logger.info(f"Worker {worker_id}: processing job {job.job_id}")
 
+            with self._load_lock:
+                self._active[worker_id] = {
+                    "job_id": job.job_id,
+                    "tenant": job.tenant,
+                    "attempt": job.attempt,
+                    "audio_sec": audio_sec,
+                    "started": time.monotonic(),
+                    "deadline": deadline,
+                    "token": job.cancel_token,
+                    "timed_out_at": None,
+                }
+            if self._draining:
+                # Задача взята из очереди в момент начала drain
+                job.cancel_token.cancel(DRAIN_REASON)
             try:
-                self._worker_process(job)
+                if len(batch) > 1:
+                    self._worker_process_pack(batch)
+                else:
+                    self._worker_process(job)
                 logger.info(f"Worker {worker_id}: job {job.job_id} completed")
             except Exception as e:
                 logger.error(f"Worker {worker_id}: job {job.job_id} failed: {e}")
                 self._meta.update_status(job.job_id, JobStatus.FAILED, error=str(e))
             finally:
-                self._queue.task_done()
+                with self._load_lock:
+                    self._active.pop(worker_id, None)
+                for packed in batch:
+                    self._finish(packed)
+                    if packed.requeue:
+                        self._requeue(packed, audio_by_job[packed.job_id])
 
         logger.info(f"Worker {worker_id} stopped")
 
+    def _packable(self, job: JobPayload, audio_sec: float) -> bool:
+        """Короткая oMLX-задача, которую можно склеить с другими в один запрос."""
+        return (
+            OMLX_PACKING_ENABLED
+            and job.params.get("mechanism") == "omlx"
+            and job.attempt == 0
+            and not job.cancelled
+            and 0 < audio_sec <= OMLX_PACK_MAX_CLIP_SEC
+        )
+
+    def _collect_pack(self, job: JobPayload) -> List[JobPayload]:
+        """Добрать к задаче совместимые короткие задачи из очереди (окно OMLX_PACK_WINDOW_SEC).
+
+        Совместимые — та же модель, язык и task. Для остальных задач
+        возвращает [job].
+        """
+        with self._load_lock:
+            total = self._audio_by_job.get(job.job_id) or 0.0
+        if OMLX_PACK_MAX_JOBS < 2 or not self._packable(job, total):
+            return [job]
+        key = _pack_key(job)
+        batch = [job]
+        window_end = time.monotonic() + OMLX_PACK_WINDOW_SEC
+        while len(batch) < OMLX_PACK_MAX_JOBS and not self._draining:
+            with self._load_lock:
+                audio = dict(self._audio_by_job)
+            room = OMLX_PACK_MAX_AUDIO_SEC - total
+            taken = self._queue.get_matching(
+                lambda item: (
+                    _pack_key(item) == key
+                    and self._packable(item, audio.get(item.job_id, 0.0))
+                    and audio.get(item.job_id, 0.0) <= room
+                ),
+                limit=1,
+            )
+            if not taken:
+                if time.monotonic() >= window_end:
+                    break
+                time.sleep(0.05)
+                continue
+            packed = taken[0]
+            meta = self._meta.load(packed.job_id)
+            if meta and meta["status"] == JobStatus.CANCELLED.value:
+                self._finish(packed)
+                continue
+            batch.append(packed)
+            total += audio.get(packed.job_id, 0.0)
+        return batch
+
+    def _worker_process_pack(self, batch: List[JobPayload]) -> None:
+        """Транскрибировать пачку коротких задач одним запросом к oMLX.
+
+        Запрос обрывается отменой любой задачи пачки. Отменённые задачи
+        завершаются по причине своей отмены, остальные обрабатываются по
+        одной обычным путём — как и при ошибке склейки.
+        """
+        lead = batch[0]
+        start = time.time()
+        engine = get_engine("omlx")
+        raw_paths = {}
+        if RAW_RESPONSE_RETENTION:
+            raw_paths = {
+                job.job_id: raw_artifact_path(build_job_path(job.job_id), _result_base_name(job))
+                for job in batch
+            }
+        try:
+            if not hasattr(engine, "transcribe_packed"):
+                raise RuntimeError(f"engine '{_engine_name(engine, 'omlx')}' does not support packing")
+            results = engine.transcribe_packed(
+                [(job.job_id, job.wav_path) for job in batch],
+                language=lead.params.get("language"),
+                model=lead.params.get("model"),
+                include_timestamps=lead.params.get("include_timestamps", True),
+                cancel_token=AnyCancellationToken([job.cancel_token for job in batch]),
+                raw_paths=raw_paths,
+            )
+        except TranscriptionCancelled:
+            for job in batch:
+                if job.cancel_token.cancelled:
+                    self._finish_cancelled_pack_job(job, time.time() - start)
+                else:
+                    self._process_unpacked(job)
+            return
+        except Exception as e:
+            logger.warning(f"Packed request for {len(batch)} jobs failed ({e}), processing one by one")
+            for job in batch:
+                self._process_unpacked(job)
+            return
+
+        duration = time.time() - start
+        with self._load_lock:
+            total_audio = sum(self._audio_by_job.get(job.job_id) or 0.0 for job in batch)
+        for job in batch:
+            # drain не отменяет уже полученный результат
+            if job.cancel_token.aborted:
+                self._finish_cancelled_pack_job(job, time.time() - start)
+                continue
+            # Время запроса делится между задачами пропорционально длительности аудио
+            with self._load_lock:
+                share = (self._audio_by_job.get(job.job_id) or 0.0) / total_audio if total_audio else 0.0
+            self._observe_rtf(job.job_id, duration * share)
+            self._save_result(
+                job,
+                results.get(job.job_id) or {"text": "", "segments": [], "raw_response": None},
+                engine,
+                "omlx",
+                duration,
+                packed_with=[other.job_id for other in batch if other is not job],
+            )
+
+    def _finish_cancelled_pack_job(self, job: JobPayload, elapsed: float) -> None:
+        """Задача пачки отменена: таймаут, drain/shutdown (в очередь) или отмена."""
+        reason = job.cancel_token.reason
+        if reason == "timeout":
+            self._handle_timeout(job, elapsed)
+        elif reason in (DRAIN_REASON, "shutdown"):
+            self._meta.update_status(job.job_id, JobStatus.QUEUED)
+        else:
+            self._meta.update_status(job.job_id, JobStatus.CANCELLED)
+
+    def _process_unpacked(self, job: JobPayload) -> None:
+        """Обработать задачу из пачки отдельно; ошибка одной не затрагивает остальные."""
+        try:
+            self._worker_process(job)
+        except Exception as e:
+            logger.error(f"Job {job.job_id} failed: {e}")
+
+    def _handle_timeout(self, job: JobPayload, elapsed: float) -> None:
+        """Задача отменена watchdog'ом: пометить FAILED или поставить на повтор."""
+        if WATCHDOG_ON_TIMEOUT == "requeue" and job.attempt < WATCHDOG_MAX_REQUEUES:
+            job.requeue = True
+            logger.warning(
+                f"Job {job.job_id} timed out after {elapsed:.0f}s, "
+                f"requeueing (attempt {job.attempt + 1})"
+            )
+            return
+        self._meta.update_status(
+            job.job_id,
+            JobStatus.FAILED,
+            error=f"Transcription timed out after {elapsed:.0f}s",
+        )
+
+    def _requeue(self, job: JobPayload, audio_sec: float) -> None:
+        """Поставить задачу в очередь заново со свежим cancel_token."""
+        retry = self._build_payload(job.job_id, job.wav_path, job.params, tenant=job.tenant)
+        retry.attempt = job.attempt + 1
+        self._meta.update_status(
+            job.job_id, JobStatus.QUEUED, attempt=retry.attempt, error="requeued after timeout"
+        )
+        with self._load_lock:
+            self._audio_by_job[job.job_id] = audio_sec
+            self._payloads[job.job_id] = retry
+        try:
+            self._queue.put_nowait(retry)
+        except Full:
+            with self._load_lock:
+                self._audio_by_job.pop(job.job_id, None)
+                self._payloads.pop(job.job_id, None)
+            self._meta.update_status(
+                job.job_id,
+                JobStatus.FAILED,
+                error="Transcription timed out and queue is full for retry",
+            )
+
+    def _observe_rtf(self, job_id: str, elapsed: float) -> None:
+        """Обновить скользящую оценку real-time factor по завершённой задаче."""
+        with self._load_lock:
+            audio_sec = self._audio_by_job.get(job_id) or 0.0
+            if audio_sec > 0 and elapsed > 0:
+                self._rtf = 0.8 * self._rtf + 0.2 * (elapsed / audio_sec)
+
+    def _save_result(
+        self,
+        job: JobPayload,
+        result: Dict[str, Any],
+        engine: Any,
+        mechanism: Optional[str],
+        duration: float,
+        **extra: Any,
+    ) -> None:
+        """Записать артефакты задачи (txt, segments) и финальный статус в metadata."""
+        engine_used = _engine_name(engine, mechanism)
+        result = dict(result)
+        raw_file = result.pop("raw_file", None)
+        raw_response = result.pop("raw_response", None)
+        result = _sanitize_result(result)
+        result["transcription_duration"] = round(duration, 2)
+
+        # Сохранить результат транскрипции в файлы
+        job_dir = build_job_path(job.job_id)
+        base_name = _result_base_name(job)
+        if raw_file is None and isinstance(raw_response, str) and RAW_RESPONSE_RETENTION:
+            # Движок вернул сырой ответ строкой вместо записи в raw_path
+            writer = RawArtifactWriter(raw_artifact_path(job_dir, base_name))
+            writer.write_body({}, raw_response)
+            raw_file = writer.close()
+        text_content = result.get("text", "")
+        if text_content:
+            txt_path = os.path.join(job_dir, f"{base_name}.txt")
+            with open(txt_path, "w", encoding="utf-8") as f:
+                f.write(text_content)
+
+        segments = result.get("segments")
+        if segments:
+            segments_json_path = os.path.join(job_dir, f"{base_name}_segments.json")
+            with open(segments_json_path, "w", encoding="utf-8") as f:
+                json.dump({"segments": segments}, f, ensure_ascii=False, indent=2)
+
+        # Check if cancelled during processing
+        status = self._meta.load(job.job_id)
+        final_status = (
+            JobStatus.CANCELLED
+            if status and status["status"] == JobStatus.CANCELLED.value
+            else JobStatus.COMPLETED
+        )
+
+        self._meta.update_status(
+            job.job_id,
+            final_status,
+            transcription_duration=duration,
+            result_file=result.get("result_file"),
+            raw_file=raw_file,
+            engine_used=engine_used,
+            model_used=_engine_model(engine, job.params.get("model")),
+            fallback=engine_used != (mechanism or "whisper"),
+            **_chunk_metadata(result.get("chunk_report")),
+            **extra,
+        )
+
     def _worker_process(self, job: JobPayload) -> None:
-        """Process one job: call engine.transcribe() with lock."""
+        """Process one job: call engine.transcribe().
+
+        Задачи выполняются параллельно; локальный MLX-инференс сериализуется
+        внутри WhisperEngine (MLX_LOCK), запросы к oMLX идут одновременно.
+        """
         import time
 
         mechanism = job.params.get("mechanism", "omlx")
         start = time.time()
         try:
-            with self._transcription_lock:
-                engine = get_engine(mechanism)
-                result = engine.transcribe(
-                    file_path=job.wav_path,
-                    language=job.params.get("language"),
-                    task=job.params.get("task", "transcribe"),
-                    model=job.params.get("model", "large"),
-                    word_timestamps=job.params.get("word_timestamps", False),
-                    condition_on_previous_text=job.params.get(
-                        "condition_on_previous_text", True
-                    ),
-                    no_speech_threshold=job.params.get("no_speech_threshold"),
-                    hallucination_silence_threshold=job.params.get(
-                        "hallucination_silence_threshold"
-                    ),
-                    initial_prompt=job.params.get("initial_prompt"),
-                    include_timestamps=job.params.get("include_timestamps", True),
+            engine = get_engine(mechanism)
+            transcribe_params = dict(
+                language=job.params.get("language"),
+                task=job.params.get("task", "transcribe"),
+                model=job.params.get("model", "large"),
+                word_timestamps=job.params.get("word_timestamps", False),
+                condition_on_previous_text=job.params.get(
+                    "condition_on_previous_text", True
+                ),
+                no_speech_threshold=job.params.get("no_speech_threshold"),
+                hallucination_silence_threshold=job.params.get(
+                    "hallucination_silence_threshold"
+                ),
+                initial_prompt=job.params.get("initial_prompt"),
+                include_timestamps=job.params.get("include_timestamps", True),
+                speculative=job.params.get("speculative", False),
+                cancel_token=job.cancel_token,
+                checkpoint_dir=os.path.join(build_job_path(job.job_id), "chunks"),
+            )
+            transport_path = self._transport_path(job.job_id)
+            if transport_path:
+                transcribe_params["transport_path"] = transport_path
+            if RAW_RESPONSE_RETENTION:
+                # Движок пишет сырой ответ сам, по мере получения
+                transcribe_params["raw_path"] = raw_artifact_path(
+                    build_job_path(job.job_id), _result_base_name(job)
+                )
+            try:
+                result = engine.transcribe(file_path=job.wav_path, **transcribe_params)
+            except TranscriptionCancelled:
+                raise
+            except Exception as e:
+                # Бэкенд деградировал посреди задачи — перенаправляем её в fallback
+                fallback = get_fallback_engine(mechanism) if is_backend_failure(e) else None
+                if fallback is None or _engine_name(engine, mechanism) == fallback.name:
+                    raise
+                logger.warning(
+                    f"Job {job.job_id}: {_engine_name(engine, mechanism)} failed ({e}), "
+                    f"re-routing to {fallback.name}"
                 )
+                engine = fallback
+                result = engine.transcribe(file_path=job.wav_path, **transcribe_params)
+            # drain не отменяет уже полученный результат
+            job.cancel_token.raise_if_aborted()
             duration = time.time() - start
-            result = _sanitize_result(result)
-            result["transcription_duration"] = round(duration, 2)
-
-            # Сохранить результат транскрипции в файлы
-            job_dir = build_job_path(job.job_id)
-            original_filename = job.params.get("original_filename", job.job_id)
-            # Strip extension to match old naming convention (e.g. "test" not "test.wav")
-            base_name = os.path.splitext(original_filename)[0]
-            text_content = result.get("text", "")
-            if text_content:
-                txt_path = os.path.join(job_dir, f"{base_name}.txt")
-                with open(txt_path, "w", encoding="utf-8") as f:
-                    f.write(text_content)
-
-            segments = result.get("segments")
-            if segments:
-                segments_json_path = os.path.join(job_dir, f"{base_name}_segments.json")
-                with open(segments_json_path, "w", encoding="utf-8") as f:
-                    json.dump({"segments": segments}, f, ensure_ascii=False, indent=2)
-
-            # Check if cancelled during processing
-            status = self._meta.load(job.job_id)
-            final_status = (
-                JobStatus.CANCELLED
-                if status and status["status"] == JobStatus.CANCELLED.value
-                else JobStatus.COMPLETED
-            )
+            self._observe_rtf(job.job_id, duration)
+            self._save_result(job, result, engine, mechanism, duration)
 
-            self._meta.update_status(
-                job.job_id,
-                final_status,
-                transcription_duration=duration,
-                result_file=result.get("result_file"),
+        except TranscriptionCancelled:
+            reason = job.cancel_token.reason
+            if reason == "timeout":
+                self._handle_timeout(job, time.time() - start)
+                return
+            if reason in (DRAIN_REASON, "shutdown"):
+                logger.info(f"Job {job.job_id} interrupted by {reason}, will resume later")
+                self._meta.update_status(job.job_id, JobStatus.QUEUED)
+                return
+            logger.info(
+                f"Transcription cancelled for {job.job_id} after {time.time() - start:.1f}s"
             )
-
+            self._meta.update_status(job.job_id, JobStatus.CANCELLED)
         except Exception as e:
             logger.error(f"Transcription failed for {job.job_id}: {e}")
-            self._meta.update_status(job.job_id, JobStatus.FAILED, error=str(e))
+            self._meta.update_status(
+                job.job_id,
+                JobStatus.FAILED,
+                error=str(e),
+                **_chunk_metadata(getattr(e, "chunk_report", None)),
+            )
             raise
         finally:
             if mechanism == "whisper":
-                _transcription_module._clear_memory()
+                with mlx_slot():
+                    _transcription_module._clear_memory()
+
+
+def _result_base_name(job: JobPayload) -> str:
+    """Базовое имя файлов результата: имя оригинала без расширения ("test", не "test.wav")."""
+    return os.path.splitext(job.params.get("original_filename", job.job_id))[0]
+
+
+def _engine_name(engine: Any, mechanism: Optional[str]) -> str:
+    """Имя механизма для metadata (engine_used)."""
+    name = getattr(engine, "name", None)
+    return name if isinstance(name, str) else (mechanism or "whisper")
+
+
+def _engine_model(engine: Any, requested: Optional[str]) -> Optional[str]:
+    """Модель, фактически использованная механизмом (model_used)."""
+    resolve = getattr(type(engine), "resolve_model", None)
+    if resolve is None:
+        return requested
+    model = engine.resolve_model(requested)
+    return model if isinstance(model, str) else requested
+
+
+def _pack_key(job: JobPayload) -> tuple:
+    """Задачи с одинаковым ключом можно отправить одним запросом."""
+    return (job.params.get("model"), job.params.get("language"), job.params.get("task", "transcribe"))
+
+
+def _chunk_metadata(report: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Поля metadata по итогам split-транскрипции: план нарезки, retried/failed диапазоны чанков."""
+    if not report:
+        return {}
+    failed = report.get("failed_chunks") or []
+    return {
+        "chunks_total": report.get("chunks_total"),
+        "chunk_plan": report.get("plan"),
+        "retried_chunks": report.get("retried_chunks") or [],
+        "failed_chunks": failed,
+        "partial": bool(failed),
+    }
 
 
 # Module-level singleton accessor
@@ -162,3 +162,7 @@ class TranscriptionService:
     def cancel_job(self, job_id: str) -> bool:
         """Cancel a queued or processing job via queue manager."""
         return self._qm.cancel_job(job_id)
+
+    def retry_failed_chunks(self, job_id: str) -> bool:
+        """Re-run only the missing chunks of a split job via queue manager."""
+        return self._qm.retry_failed_chunks(job_id)
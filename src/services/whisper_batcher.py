@@ -0,0 +1,342 @@
+"""Пакетное декодирование коротких задач Whisper: несколько 30-секундных окон за один проход."""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from src.config import TRANSCRIBER_MAX_WORKERS, WHISPER_BATCH_MAX_SIZE, WHISPER_BATCH_WAIT_MS
+from src.models.model_cache import ModelCache
+from src.services.whisper_engines import MLX_LOCK, CancellationToken, mlx_slot
+
+logger = logging.getLogger("mlx_whisper")
+
+# Пороги mlx_whisper.transcribe: при их нарушении задача перетранскрибируется
+# обычным путём (с повтором на более высокой температуре)
+_COMPRESSION_RATIO_THRESHOLD = 2.4
+_LOGPROB_THRESHOLD = -1.0
+_NO_SPEECH_THRESHOLD = 0.6
+
+# Длительность одного окна Whisper
+WINDOW_SEC = 30.0
+
+
+class BatchKey(NamedTuple):
+    """Задачи с одинаковым ключом декодируются одним проходом."""
+
+    model: str
+    model_path: str
+    task: str
+    language: Optional[str]
+    initial_prompt: Optional[str]
+
+
+class _BatchItem:
+    """Задача в ожидании пакета: аудио и Future для результата."""
+
+    def __init__(self, audio: np.ndarray, no_speech_threshold: Optional[float]) -> None:
+        self.audio = audio
+        self.no_speech_threshold = no_speech_threshold
+        self.future: Future = Future()
+        self.enqueued = time.monotonic()
+
+
+class WhisperBatcher:
+    """Собирает короткие задачи Whisper в пакеты и декодирует их одним вызовом.
+
+    Пока MLX занят, задачи до 30 секунд ставятся в очередь пакетов. Поток
+    пакетов ждёт до WHISPER_BATCH_WAIT_MS от первой задачи (или
+    WHISPER_BATCH_MAX_SIZE задач), захватывает MLX_LOCK и прогоняет
+    энкодер и декодер по всем окнам с одинаковым BatchKey сразу.
+    Результат возвращается в формате mlx_whisper.transcribe; None — окно
+    не прошло пороги качества, и задача транскрибируется обычным путём.
+
+    Задачу в пакет ставит воркер очереди и ждёт результата, а один воркер
+    держит MLX_LOCK, поэтому пакет из разных запросов не больше
+    TRANSCRIBER_MAX_WORKERS - 1 задач (request_limit). Полный max_size
+    набирают только окна long-form одного файла.
+    """
+
+    _instance: Optional["WhisperBatcher"] = None
+
+    def __init__(
+        self,
+        max_size: int = WHISPER_BATCH_MAX_SIZE,
+        wait_ms: int = WHISPER_BATCH_WAIT_MS,
+    ) -> None:
+        self.max_size = max_size
+        self.request_limit = min(max_size, max(TRANSCRIBER_MAX_WORKERS - 1, 1))
+        self._wait_sec = wait_ms / 1000.0
+        self._cond = threading.Condition()
+        self._pending: Dict[BatchKey, List[_BatchItem]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._batches = 0
+        self._items = 0
+        self._fallbacks = 0
+
+    @classmethod
+    def get_instance(cls) -> "WhisperBatcher":
+        if cls._instance is None:
+            cls._instance = cls()
+            if cls._instance.enabled and cls._instance.request_limit < cls._instance.max_size:
+                logger.info(
+                    f"Whisper batches from separate requests are limited to "
+                    f"{cls._instance.request_limit} jobs by TRANSCRIBER_MAX_WORKERS="
+                    f"{TRANSCRIBER_MAX_WORKERS} (WHISPER_BATCH_MAX_SIZE={cls._instance.max_size})"
+                )
+        return cls._instance
+
+    @classmethod
+    def reset(cls) -> None:
+        """Сбросить синглтон (для тестов)."""
+        cls._instance = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 1
+
+    def should_batch(self, audio_duration: Optional[float]) -> bool:
+        """Ставить ли задачу в пакет: короткое аудио, а MLX занят или пакет уже собирается."""
+        if not self.enabled or audio_duration is None or audio_duration > WINDOW_SEC:
+            return False
+        with self._cond:
+            if self._pending:
+                return True
+        return MLX_LOCK.locked()
+
+    def submit(
+        self,
+        key: BatchKey,
+        audio: np.ndarray,
+        no_speech_threshold: Optional[float] = None,
+    ) -> Future:
+        """Поставить аудио (16 кГц, не длиннее окна) в очередь пакетов."""
+        item = _BatchItem(audio, no_speech_threshold)
+        with self._cond:
+            self._pending.setdefault(key, []).append(item)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="whisper-batcher", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify_all()
+        return item.future
+
+    def transcribe(
+        self,
+        key: BatchKey,
+        audio: np.ndarray,
+        no_speech_threshold: Optional[float] = None,
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Поставить задачу в пакет и дождаться результата."""
+        return self.transcribe_many(key, [audio], no_speech_threshold, cancel_token)[0]
+
+    def transcribe_many(
+        self,
+        key: BatchKey,
+        audios: List[np.ndarray],
+        no_speech_threshold: Optional[float] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        on_done: Optional[Callable[[int, int], None]] = None,
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Поставить окна в пакеты и дождаться всех результатов (в исходном порядке).
+
+        Отмена снимает окна, пока их пакет не начал декодироваться; начатый
+        пакет доводится до конца (как и захваченный mlx_slot). on_done(готово,
+        всего) вызывается по мере готовности окон.
+        """
+        futures = [self.submit(key, audio, no_speech_threshold) for audio in audios]
+        results: List[Optional[Dict[str, Any]]] = []
+        try:
+            for future in futures:
+                while True:
+                    try:
+                        results.append(future.result(timeout=0.25))
+                        break
+                    except FutureTimeout:
+                        if cancel_token is not None and cancel_token.cancelled and future.cancel():
+                            cancel_token.raise_if_cancelled()
+                if on_done is not None:
+                    on_done(len(results), len(futures))
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "request_limit": self.request_limit,
+                "pending": sum(len(items) for items in self._pending.values()),
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "fallbacks": self._fallbacks,
+            }
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    if not self._cond.wait(timeout=30.0):
+                        self._thread = None
+                        return
+                key, items = self._collect()
+            items = [item for item in items if item.future.set_running_or_notify_cancel()]
+            if items:
+                self._process(key, items)
+
+    def _collect(self) -> "tuple[BatchKey, List[_BatchItem]]":
+        """Дождаться пакета (размер или бюджет задержки) и забрать его; под self._cond."""
+        key = min(self._pending, key=lambda k: self._pending[k][0].enqueued)
+        deadline = self._pending[key][0].enqueued + self._wait_sec
+        while len(self._pending[key]) < self.max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._cond.wait(timeout=remaining)
+        items = self._pending[key][: self.max_size]
+        rest = self._pending[key][self.max_size:]
+        if rest:
+            self._pending[key] = rest
+        else:
+            del self._pending[key]
+        return key, items
+
+    def _process(self, key: BatchKey, items: List[_BatchItem]) -> None:
+        try:
+            results = self._decode(key, items)
+        except Exception as e:
+            logger.error(f"Batched Whisper decoding failed ({len(items)} items): {e}")
+            for item in items:
+                item.future.set_exception(e)
+            return
+        fallbacks = sum(result is None for result in results)
+        with self._cond:
+            self._batches += 1
+            self._items += len(items)
+            self._fallbacks += fallbacks
+        logger.info(
+            f"Decoded Whisper batch of {len(items)} ({key.model}), fallbacks: {fallbacks}"
+        )
+        for item, result in zip(items, results):
+            item.future.set_result(result)
+
+    @staticmethod
+    def _decode(key: BatchKey, items: List[_BatchItem]) -> List[Optional[Dict[str, Any]]]:
+        """Энкодер и декодер одним проходом по окнам всех задач пакета."""
+        import mlx.core as mx
+        from mlx_whisper.audio import (
+            N_FRAMES, N_SAMPLES, SAMPLE_RATE, log_mel_spectrogram, pad_or_trim,
+        )
+        from mlx_whisper.decoding import DecodingOptions, decode
+        from mlx_whisper.tokenizer import get_tokenizer
+
+        with mlx_slot():
+            model = ModelCache.get_instance().activate(key.model, key.model_path)
+            mels = []
+            for item in items:
+                # Как в transcribe(): mel с запасом тишины, окно — только кадры аудио + нули
+                mel = log_mel_spectrogram(item.audio, n_mels=model.dims.n_mels, padding=N_SAMPLES)
+                content = mel[: mel.shape[-2] - N_FRAMES]
+                mels.append(pad_or_trim(content, N_FRAMES, axis=-2).astype(mx.float16))
+            options = DecodingOptions(
+                task=key.task,
+                # Англоязычные модели не определяют язык (как в transcribe())
+                language=key.language or (None if model.is_multilingual else "en"),
+                temperature=0.0,
+                prompt=key.initial_prompt,
+            )
+            decoded = decode(model, mx.stack(mels), options)
+            multilingual, num_languages = model.is_multilingual, model.num_languages
+
+        results: List[Optional[Dict[str, Any]]] = []
+        for item, result in zip(items, decoded):
+            tokenizer = get_tokenizer(
+                multilingual,
+                num_languages=num_languages,
+                language=result.language,
+                task=key.task,
+            )
+            duration = len(item.audio) / SAMPLE_RATE
+            results.append(_to_transcript(result, tokenizer, duration, item.no_speech_threshold))
+        return results
+
+
+def _to_transcript(
+    result: Any,
+    tokenizer: Any,
+    duration: float,
+    no_speech_threshold: Optional[float],
+) -> Optional[Dict[str, Any]]:
+    """DecodingResult окна → результат в формате mlx_whisper.transcribe.
+
+    None — окно нужно перетранскрибировать обычным путём (повтор с температурой).
+    """
+    threshold = _NO_SPEECH_THRESHOLD if no_speech_threshold is None else no_speech_threshold
+    silent = result.no_speech_prob > threshold
+    if silent and result.avg_logprob <= _LOGPROB_THRESHOLD:
+        return {"text": "", "segments": [], "language": result.language}
+    too_repetitive = result.compression_ratio > _COMPRESSION_RATIO_THRESHOLD
+    low_confidence = result.avg_logprob < _LOGPROB_THRESHOLD
+    if (too_repetitive or low_confidence) and not silent:
+        return None
+
+    tokens = list(result.tokens)
+    time_precision = 0.02
+    timestamp_begin = tokenizer.timestamp_begin
+
+    def segment(start: float, end: float, seg_tokens: List[int]) -> Dict[str, Any]:
+        return {
+            "seek": 0,
+            "start": start,
+            "end": end,
+            "text": tokenizer.decode([t for t in seg_tokens if t < tokenizer.eot]),
+            "tokens": seg_tokens,
+            "temperature": result.temperature,
+            "avg_logprob": result.avg_logprob,
+            "compression_ratio": result.compression_ratio,
+            "no_speech_prob": result.no_speech_prob,
+        }
+
+    # Сегменты — между парами соседних таймстемп-токенов, как в mlx_whisper.transcribe
+    is_timestamp = [t >= timestamp_begin for t in tokens]
+    slices = [i + 1 for i in range(len(tokens) - 1) if is_timestamp[i] and is_timestamp[i + 1]]
+    if is_timestamp[-2:] == [False, True]:
+        slices.append(len(tokens))
+    segments: List[Dict[str, Any]] = []
+    last = 0
+    for current in slices:
+        seg_tokens = tokens[last:current]
+        segments.append(segment(
+            (seg_tokens[0] - timestamp_begin) * time_precision,
+            (seg_tokens[-1] - timestamp_begin) * time_precision,
+            seg_tokens,
+        ))
+        last = current
+    tail = tokens[last:]
+    if any(t < tokenizer.eot for t in tail):
+        # Незакрытый последний сегмент длится до конца аудио
+        start = (tail[0] - timestamp_begin) * time_precision if is_timestamp[last] else 0.0
+        segments.append(segment(start, max(start, duration), tail))
+
+    for index, seg in enumerate(segments):
+        seg["id"] = index
+    text_tokens = [t for t in tokens if t < tokenizer.eot]
+    return {
+        "text": tokenizer.decode(text_tokens),
+        "segments": segments,
+        "language": result.language,
+    }
+
+
+def get_whisper_batcher() -> WhisperBatcher:
+    """Синглтон пакетного декодера Whisper."""
+    return WhisperBatcher.get_instance()
@@ -1,69 +1,137 @@
-"""Абстракция механизмов транскрибации: TranscriptionEngine ABC + WhisperEngine."""
+"""Абстракция механизмов транскрибации: TranscriptionEngine ABC + WhisperEngine.
+
+MLX, mlx_whisper и спекулятивный декодер импортируются при первой
+локальной транскрипции, поэтому модуль можно импортировать без MLX
+(маршрутизация в oMLX/CPU, пул процессов).
+"""
 
 import gc
-import json
-import os
+import importlib
+import threading
 import time
-from abc import ABC, abstractmethod
-from typing import Any, Dict
-
-import mlx.core as mx
-
-from src.config import logger
+from contextlib import contextmanager, nullcontext
+from types import ModuleType, SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import numpy as np
+
+from src.config import (
+    AUDIO_SAMPLE_RATE,
+    INFERENCE_PROCESS_POOL,
+    OMLX_FALLBACK_MECHANISM,
+    OMLX_FALLBACK_MODEL,
+    WHISPER_DRAFT_MODEL,
+    WHISPER_LONGFORM,
+    WHISPER_LONGFORM_GAP_MS,
+    WHISPER_LONGFORM_MIN_SEC,
+    logger,
+)
 from src.models.model_cache import ModelCache
-from src.utils.audio import get_audio_duration
-
-# Import mlx_whisper.transcribe
-try:
-    from mlx_whisper.transcribe import transcribe as _mlx_transcribe
-except ImportError:
-    raise ImportError("mlx-whisper package is required. Install it with: pip install mlx-whisper")
+from src.models.model_registry import ModelRegistry
+from src.services.engine_base import (  # noqa: F401 — реэкспорт для существующих импортов
+    DRAIN_REASON,
+    AnyCancellationToken,
+    CancellationToken,
+    TranscriptionCancelled,
+    TranscriptionEngine,
+    _build_formatted_text_from_segments,
+)
+from src.utils.audio import get_audio_duration, read_wav_pcm
+from src.utils.raw_artifact import RawArtifactWriter
+
+
+def _transcribe_module() -> ModuleType:
+    """Модуль mlx_whisper.transcribe (импорт тянет MLX — только по требованию)."""
+    try:
+        return importlib.import_module("mlx_whisper.transcribe")
+    except ImportError:
+        raise ImportError("mlx-whisper package is required. Install it with: pip install mlx-whisper")
+
+
+def _mlx_transcribe(**kwargs: Any) -> Dict[str, Any]:
+    """mlx_whisper.transcribe.transcribe с ленивым импортом."""
+    return _transcribe_module().transcribe(**kwargs)
+
+
+# MLX не рассчитан на параллельный инференс из нескольких потоков: локальные
+# модели выполняются по одной, удалённые движки (oMLX) работают параллельно.
+MLX_LOCK = threading.Lock()
+
+
+@contextmanager
+def mlx_slot(cancel_token: Optional[CancellationToken] = None) -> Iterator[None]:
+    """Захватить MLX_LOCK, проверяя отмену задачи во время ожидания."""
+    while not MLX_LOCK.acquire(timeout=0.25):
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+    try:
+        yield
+    finally:
+        MLX_LOCK.release()
+
+
+class _ProgressBar:
+    """Замена tqdm.tqdm внутри mlx_whisper: вызывает callback после каждого окна."""
+
+    def __init__(self, *args: Any, total: Optional[int] = None,
+                 callback: Optional[Callable[[int, Optional[int]], None]] = None,
+                 **kwargs: Any) -> None:
+        self.total = total
+        self.n = 0
+        self._callback = callback
+
+    def __enter__(self) -> "_ProgressBar":
+        return self
+
+    def __exit__(self, *exc: Any) -> bool:
+        return False
+
+    def update(self, n: int = 1) -> None:
+        self.n += n
+        if self._callback is not None:
+            self._callback(self.n, self.total)
+
+
+@contextmanager
+def _progress_hook(callback: Callable[[int, Optional[int]], None]) -> Iterator[None]:
+    """Подменить прогресс-бар mlx_whisper на вызов callback между окнами декодирования.
+
+    mlx_whisper.transcribe не принимает progress callback, но обновляет
+    tqdm после каждого 30-секундного окна — это и есть точка проверки.
+    Исключение из callback прерывает декодирование.
+    """
+    module = _transcribe_module()
+    if not hasattr(module, "tqdm"):
+        yield
+        return
+    original = module.tqdm
+    module.tqdm = SimpleNamespace(
+        tqdm=lambda *args, **kwargs: _ProgressBar(*args, callback=callback, **kwargs)
+    )
+    try:
+        yield
+    finally:
+        module.tqdm = original
 
 
-class TranscriptionEngine(ABC):
-    """Абстрактный базовый класс для механизмов транскрибации."""
+class WhisperEngine(TranscriptionEngine):
+    """Механизм транскрибации на основе MLX Whisper.
 
-    @abstractmethod
-    def transcribe(self, file_path: str, **params) -> Dict[str, Any]:
-        """
-        Транскрибировать аудиофайл.
-
-        Parameters
-        ----------
-        file_path : str
-            Путь к аудиофайлу
-        **params
-            Параметры транскрипции (language, model, task и др.)
-
-        Returns
-        -------
-        dict
-            Нормализованный результат:
-            {
-                "segments": [...],
-                "text": str,
-                "speaker_detected": bool,
-                "transcription_duration": float,
-                "raw_response": str | None,  # optional: сырой ответ API
-            }
-        """
+    model — принудительная модель (для fallback вместо oMLX, где в params
+    может прийти алиас модели oMLX).
+    """
 
+    name = "whisper"
 
-class WhisperEngine(TranscriptionEngine):
-    """Механизм транскрибации на основе MLX Whisper."""
+    def __init__(self, model: Optional[str] = None) -> None:
+        self.model = model
 
-    MODEL_MAPPING = {
-        "tiny": "models/whisper-tiny",
-        "base": "models/whisper-base",
-        "small": "models/whisper-small",
-        "medium": "models/whisper-medium",
-        "turbo": "models/whisper-turbo",
-        "large": "models/whisper-large",
-    }
+    def resolve_model(self, requested: Optional[str]) -> Optional[str]:
+        return self.model or requested or "large"
 
     def transcribe(self, file_path: str, **params) -> Dict[str, Any]:
         """Выполнить транскрипцию через MLX Whisper."""
-        model = params.get("model", "large")
+        model = self.resolve_model(params.get("model", "large"))
         language = params.get("language")
         task = params.get("task", "transcribe")
         word_timestamps = params.get("word_timestamps", False)
@@ -72,26 +140,24 @@ class WhisperEngine(TranscriptionEngine):
         hallucination_silence_threshold = params.get("hallucination_silence_threshold")
         initial_prompt = params.get("initial_prompt")
         include_timestamps = params.get("include_timestamps", True)
+        cancel_token: Optional[CancellationToken] = params.get("cancel_token")
 
-        # Resolve model path
-        models_dir = os.getenv("MODELS_DIR", "models")
-        model_path = self.MODEL_MAPPING.get(model, os.path.join(models_dir, f"whisper-{model}"))
-
-        if not os.path.exists(model_path):
-            model_path = f"mlx-community/whisper-{model}"
+        # Локальная модель из MODELS_DIR или repo HuggingFace
+        model_path = ModelRegistry.get_instance().resolve(model)
 
-        # Load from cache
         cache = ModelCache.get_instance()
-        cached_model = cache.get_model(model)
-        if cached_model is None:
-            cache.load_model(model, model_path)
 
-        # Get audio duration
-        try:
-            audio_duration = get_audio_duration(file_path)
-        except Exception as e:
-            logger.error(f"Failed to get audio duration for {file_path}: {e}")
-            audio_duration = None
+        # Канонический WAV после convert_to_wav читается сразу в память (без ffmpeg):
+        # тот же буфер идёт в длительность, VAD и mlx_whisper
+        audio = read_wav_pcm(file_path)
+        if audio is not None:
+            audio_duration: Optional[float] = len(audio) / AUDIO_SAMPLE_RATE
+        else:
+            try:
+                audio_duration = get_audio_duration(file_path)
+            except Exception as e:
+                logger.error(f"Failed to get audio duration for {file_path}: {e}")
+                audio_duration = None
 
         # Prepare options
         transcribe_options: Dict[str, Any] = {
@@ -107,29 +173,70 @@ class WhisperEngine(TranscriptionEngine):
         if initial_prompt is not None:
             transcribe_options["initial_prompt"] = initial_prompt
 
+        def on_progress(done: int, total: Optional[int]) -> None:
+            # Whisper не сохраняет промежуточный результат: при drain доводим до конца
+            if cancel_token is not None:
+                cancel_token.raise_if_aborted()
+
+        # Модель ещё прогревается при старте — ждём её, а не весь сервер
+        from src.services.model_warmup import get_model_warmup
+
+        get_model_warmup().wait_ready(model, cancel_token)
+
         # Execute transcription
         start_time = time.time()
         try:
-            result = _mlx_transcribe(
-                audio=file_path,
-                path_or_hf_repo=model_path,
-                **transcribe_options,
-            )
+            if self._use_longform(audio_duration, params):
+                result = self._transcribe_longform(
+                    file_path, audio, model, model_path, params, transcribe_options,
+                    cancel_token, on_progress,
+                )
+            else:
+                result = self._transcribe_batched(
+                    file_path, audio, model, model_path, audio_duration, params, cancel_token
+                )
+            if result is None:
+                with mlx_slot(cancel_token):
+                    if cancel_token is not None:
+                        cancel_token.raise_if_cancelled()
+                    draft = self._draft_model(model, params)
+                    # Модель из кэша (загрузка только при промахе) — transcribe() её не перечитывает
+                    target = cache.activate(model, model_path)
+                    speculation: Any = nullcontext()
+                    if draft is not None:
+                        from src.services.whisper_speculative import get_speculative_decoder
+
+                        speculation = get_speculative_decoder().attach(target, draft)
+                    with _progress_hook(on_progress), speculation:
+                        result = _mlx_transcribe(
+                            audio=audio if audio is not None else file_path,
+                            path_or_hf_repo=model_path,
+                            **transcribe_options,
+                        )
+        except TranscriptionCancelled:
+            logger.info(f"Transcription cancelled for {file_path}")
+            raise
         except Exception as e:
             logger.error(f"Transcription failed for {file_path}: {e}")
             raise
 
         transcribe_duration = time.time() - start_time
+        cache.record_run(model, audio_duration, transcribe_duration)
         result["transcribe_duration"] = transcribe_duration  # type: ignore[assignment]
         if audio_duration is not None:
             result["audio_duration"] = audio_duration  # type: ignore[assignment]
 
-        # Save raw response before normalization
-        raw_json = None
-        try:
-            raw_json = json.dumps(result, ensure_ascii=False, indent=2)
-        except (TypeError, ValueError):
-            logger.warning("Failed to serialize Whisper raw response")
+        # Сырой ответ — сразу в сжатый артефакт, без промежуточной JSON-строки
+        raw_file = None
+        raw_path = params.get("raw_path")
+        if raw_path:
+            writer = RawArtifactWriter(raw_path)
+            try:
+                writer.write_json({"engine": self.name, "model": model}, result)
+                raw_file = writer.close()
+            except (TypeError, ValueError, OSError) as e:
+                writer.discard()
+                logger.warning(f"Failed to save Whisper raw response: {e}")
 
         # Форматируем текст из сегментов: [MM:SS]: Текст
         segments = result.get("segments")
@@ -145,54 +252,181 @@ class WhisperEngine(TranscriptionEngine):
             "text": formatted_text,
             "speaker_detected": False,
             "transcription_duration": round(transcribe_duration, 2),
-            "raw_response": raw_json,
+            "raw_response": None,
+            "raw_file": raw_file,
         }
 
+    @staticmethod
+    def _draft_model(model: str, params: Dict[str, Any]) -> Optional[Any]:
+        """Черновая модель для спекулятивного декодирования (speculative=true в запросе).
+
+        None — режим не запрошен, основная модель сама черновая или черновик не
+        загрузился (тогда декодирование идёт обычным путём). Вызывать под MLX_LOCK.
+        """
+        if not params.get("speculative") or model == WHISPER_DRAFT_MODEL:
+            return None
+        try:
+            draft_path = ModelRegistry.get_instance().resolve(WHISPER_DRAFT_MODEL)
+            return ModelCache.get_instance().load_model(WHISPER_DRAFT_MODEL, draft_path)
+        except Exception as e:
+            logger.warning(
+                f"Draft model '{WHISPER_DRAFT_MODEL}' unavailable, decoding without speculation: {e}"
+            )
+            return None
+
+    @staticmethod
+    def _use_longform(audio_duration: Optional[float], params: Dict[str, Any]) -> bool:
+        """Long-form режим: включён, аудио длинное, не нужны пословные таймстемпы."""
+        return (
+            WHISPER_LONGFORM
+            and audio_duration is not None
+            and audio_duration >= WHISPER_LONGFORM_MIN_SEC
+            and not params.get("word_timestamps")
+            and params.get("hallucination_silence_threshold") is None
+        )
 
-def _build_formatted_text_from_segments(
-    segments: list[dict],
-    *,
-    include_timestamps: bool = True,
-) -> str:
-    """Собрать текст из сегментов.
+    @staticmethod
+    def _transcribe_longform(
+        file_path: str,
+        audio: Optional[np.ndarray],
+        model: str,
+        model_path: str,
+        params: Dict[str, Any],
+        transcribe_options: Dict[str, Any],
+        cancel_token: Optional[CancellationToken],
+        on_progress: Callable[[int, Optional[int]], None],
+    ) -> Dict[str, Any]:
+        """Нарезать аудио по паузам на окна до 30 с и декодировать их пакетами.
+
+        Окна независимы: текст предыдущего окна не подаётся в следующее, зато
+        окна идут в WhisperBatcher пачками по WHISPER_BATCH_MAX_SIZE. Окно, не
+        прошедшее пороги качества, транскрибируется отдельно. Таймкоды
+        сдвигаются на начало окна.
+        """
+        from mlx_whisper.audio import load_audio
 
-    Спикеры определяются автоматически: если хотя бы один сегмент
-    имеет speaker != 0, рендерятся метки спикеров.
-    Иначе — текст без меток.
+        from src.services.whisper_batcher import BatchKey, get_whisper_batcher
+        from src.services.whisper_longform import (
+            SAMPLE_RATE, merge_chunk_results, plan_longform_chunks,
+        )
 
-    При include_timestamps=True — формат [MM:SS]: Текст.
-    При include_timestamps=False — только текст, без префикса.
-    """
-    # Автоопределение: спикеры есть, если хотя бы у одного сегмента
-    # speaker != 0
-    has_speakers = any(seg.get("speaker", 0) != 0 for seg in segments)
-
-    lines: list[str] = []
-    for seg in segments:
-        start = seg.get("start", 0)
-        speaker = seg.get("speaker", 0)
-        text = seg.get("text", "").strip()
-        if not text:
-            continue
-        if include_timestamps:
-            minutes = int(start) // 60
-            seconds = int(start) % 60
-            if has_speakers:
-                lines.append(f"[{minutes:02d}:{seconds:02d}] Спикер {speaker} : {text}")
-            else:
-                lines.append(f"[{minutes:02d}:{seconds:02d}]: {text}")
-        else:
-            lines.append(text)
-    return "\n".join(lines)
+        if audio is None:
+            audio = load_audio(file_path)
+        chunks = plan_longform_chunks(audio, WHISPER_LONGFORM_GAP_MS)
+        per_ms = SAMPLE_RATE // 1000
+        pieces = [audio[start_ms * per_ms:end_ms * per_ms] for start_ms, end_ms in chunks]
+        logger.info(f"Long-form transcription of {file_path}: {len(chunks)} chunks")
+
+        key = BatchKey(
+            model=model,
+            model_path=model_path,
+            task=params.get("task", "transcribe"),
+            language=params.get("language"),
+            initial_prompt=params.get("initial_prompt"),
+        )
+        results = get_whisper_batcher().transcribe_many(
+            key, pieces, params.get("no_speech_threshold"), cancel_token, on_done=on_progress
+        )
+        options = {**transcribe_options, "condition_on_previous_text": False}
+        for index, result in enumerate(results):
+            if result is not None:
+                continue
+            with mlx_slot(cancel_token):
+                ModelCache.get_instance().activate(model, model_path)
+                results[index] = _mlx_transcribe(
+                    audio=pieces[index], path_or_hf_repo=model_path, **options
+                )
+        return merge_chunk_results(chunks, results)
+
+    @staticmethod
+    def _transcribe_batched(
+        file_path: str,
+        audio: Optional[np.ndarray],
+        model: str,
+        model_path: str,
+        audio_duration: Optional[float],
+        params: Dict[str, Any],
+        cancel_token: Optional[CancellationToken],
+    ) -> Optional[Dict[str, Any]]:
+        """Короткое аудио при занятом MLX — в пакет WhisperBatcher.
+
+        None — задача идёт обычным путём (пакет не подходит или окно не
+        прошло пороги качества). Пословные таймстемпы и пропуск тишины
+        перед галлюцинациями требуют полного transcribe() и не пакетируются;
+        спекулятивное декодирование работает только в обычном пути.
+        """
+        if params.get("word_timestamps") or params.get("hallucination_silence_threshold") is not None:
+            return None
+        if params.get("speculative"):
+            return None
+        from src.services.whisper_batcher import BatchKey, get_whisper_batcher
+
+        batcher = get_whisper_batcher()
+        if not batcher.should_batch(audio_duration):
+            return None
+        from mlx_whisper.audio import load_audio
+
+        key = BatchKey(
+            model=model,
+            model_path=model_path,
+            task=params.get("task", "transcribe"),
+            language=params.get("language"),
+            initial_prompt=params.get("initial_prompt"),
+        )
+        if audio is None:
+            audio = load_audio(file_path)
+        result = batcher.transcribe(key, audio, params.get("no_speech_threshold"), cancel_token)
+        if result is None:
+            logger.info(f"Batched decoding of {file_path} needs fallback, transcribing alone")
+        return result
 
 
 def get_engine(mechanism: str = "omlx") -> TranscriptionEngine:
-    """Получить механизм транскрибации по имени."""
+    """Получить механизм транскрибации по имени.
+
+    Для oMLX учитывается circuit breaker бэкенда: пока цепь открыта,
+    задачи направляются в резервный механизм (get_fallback_engine).
+    Пробный запрос в half-open состоянии снова идёт в oMLX — при успехе
+    маршрутизация возвращается автоматически.
+    """
     if mechanism == "omlx":
+        from src.services.backend_health import get_breaker
         from src.services.omlx_engine import OMLXEngine
 
+        if not get_breaker("omlx").allow_request():
+            fallback = get_fallback_engine("omlx")
+            if fallback is not None:
+                logger.warning(
+                    f"oMLX circuit open, routing to fallback '{fallback.name}'"
+                )
+                return fallback
         return OMLXEngine()
-    return WhisperEngine()
+    return _local_engine(mechanism)
+
+
+def get_fallback_engine(mechanism: str) -> Optional[TranscriptionEngine]:
+    """Резервный механизм для mechanism; None если fallback не настроен."""
+    if mechanism == "omlx" and OMLX_FALLBACK_MECHANISM in ("whisper", "cpu"):
+        return _local_engine(OMLX_FALLBACK_MECHANISM, model=OMLX_FALLBACK_MODEL)
+    return None
+
+
+def create_local_engine(mechanism: str, model: Optional[str] = None) -> TranscriptionEngine:
+    """Локальный механизм в текущем процессе: cpu → CPUWhisperEngine, иначе WhisperEngine."""
+    if mechanism == "cpu":
+        from src.services.cpu_engine import CPUWhisperEngine
+
+        return CPUWhisperEngine(model=model)
+    return WhisperEngine(model=model)
+
+
+def _local_engine(mechanism: str, model: Optional[str] = None) -> TranscriptionEngine:
+    """Локальный механизм: в пуле процессов (INFERENCE_PROCESS_POOL) или в потоке API."""
+    if INFERENCE_PROCESS_POOL:
+        from src.services.inference_pool import PooledEngine
+
+        return PooledEngine(mechanism, model=model)
+    return create_local_engine(mechanism, model)
 
 
 # Backward-compatibility wrapper
@@ -204,6 +438,8 @@ def transcribe_audio(file_path: str, **params) -> Dict[str, Any]:
 
 def _clear_memory() -> None:
     """Очистить кэш MLX и запустить сборку мусора Python."""
+    import mlx.core as mx
+
     mx.clear_cache()
     gc.collect()
     logger.debug("Memory cleared")
@@ -0,0 +1,83 @@
+"""Long-form режим Whisper: нарезка аудио по паузам в независимые окна и склейка результата."""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.utils.chunking import plan_adaptive_chunks
+
+SAMPLE_RATE = 16000
+
+# Окно Whisper — предел длины чанка
+CHUNK_MAX_MS = 30_000
+
+# Кадр оценки громкости и порог речи (dBFS)
+_FRAME_MS = 100
+_SILENCE_DB = -40.0
+
+
+def speech_regions(
+    audio: np.ndarray,
+    gap_ms: int,
+    threshold_db: float = _SILENCE_DB,
+    frame_ms: int = _FRAME_MS,
+    pad_ms: int = _FRAME_MS,
+) -> List[Tuple[int, int]]:
+    """Участки речи (мс) в аудио 16 кГц float32: RMS по кадрам, паузы короче gap_ms склеиваются.
+
+    То же, что _detect_silence_chunks oMLX, но векторно по numpy-массиву.
+    Каждый участок расширяется на pad_ms в обе стороны: тихие начало и
+    конец слова, попавшие в соседний кадр ниже порога, не отрезаются.
+    """
+    frame = max(1, SAMPLE_RATE * frame_ms // 1000)
+    frames = len(audio) // frame
+    if len(audio) % frame:
+        frames += 1
+    padded = np.zeros(frames * frame, dtype=np.float32)
+    padded[: len(audio)] = audio
+    rms = np.sqrt(np.mean(np.square(padded.reshape(frames, frame)), axis=1))
+    with np.errstate(divide="ignore"):
+        loud = 20 * np.log10(rms) > threshold_db
+
+    regions: List[Tuple[int, int]] = []
+    total_ms = len(audio) * 1000 // SAMPLE_RATE
+    for index in np.flatnonzero(loud):
+        start_ms = max(int(index) * frame_ms - pad_ms, 0)
+        end_ms = min(int(index) * frame_ms + frame_ms + pad_ms, total_ms)
+        if regions and start_ms - regions[-1][1] <= gap_ms:
+            regions[-1] = (regions[-1][0], end_ms)
+        else:
+            regions.append((start_ms, end_ms))
+    return regions
+
+
+def plan_longform_chunks(audio: np.ndarray, gap_ms: int) -> List[Tuple[int, int]]:
+    """Границы независимых чанков (мс): до 30 секунд, разрез — в паузах между речью."""
+    return plan_adaptive_chunks(speech_regions(audio, gap_ms), CHUNK_MAX_MS, CHUNK_MAX_MS)
+
+
+def merge_chunk_results(
+    chunks: List[Tuple[int, int]],
+    results: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """Склеить результаты чанков: таймкоды со смещением чанка, сквозные id."""
+    segments: List[Dict[str, Any]] = []
+    languages: Dict[str, int] = {}
+    for (start_ms, _), result in zip(chunks, results):
+        offset = start_ms / 1000.0
+        for segment in result.get("segments") or []:
+            segment = dict(segment)
+            segment["start"] = round(float(segment.get("start", 0.0)) + offset, 3)
+            segment["end"] = round(float(segment.get("end", 0.0)) + offset, 3)
+            segment["seek"] = int(start_ms // 10)
+            segment["id"] = len(segments)
+            segments.append(segment)
+        language = result.get("language")
+        if language:
+            languages[language] = languages.get(language, 0) + 1
+    language: Optional[str] = max(languages, key=languages.get) if languages else None
+    return {
+        "text": "".join(segment.get("text", "") for segment in segments),
+        "segments": segments,
+        "language": language,
+    }
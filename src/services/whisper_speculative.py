@@ -0,0 +1,344 @@
+"""Спекулятивное декодирование Whisper: черновая модель предлагает токены, основная проверяет их одним проходом."""
+
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import replace
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import mlx.core as mx
+import numpy as np
+
+from src.config import WHISPER_SPECULATIVE_TOKENS
+
+
+@lru_cache(maxsize=None)
+def _mel_projection(src_mels: int, dst_mels: int) -> mx.array:
+    """Матрица (src_mels, dst_mels): мощность мел-полос src → dst (МНК по фильтрам)."""
+    from mlx_whisper.audio import mel_filters
+
+    src = np.array(mel_filters(src_mels), dtype=np.float64)
+    dst = np.array(mel_filters(dst_mels), dtype=np.float64)
+    weights = np.linalg.lstsq(src.T, dst.T, rcond=None)[0]
+    return mx.array(weights.astype(np.float32))
+
+
+def project_mel(mel: mx.array, n_mels: int) -> mx.array:
+    """Лог-мел окна (кадры, полосы) → то же окно в n_mels полосах.
+
+    Нормировка log_mel_spectrogram обращается в мощность, полосы пересчитываются
+    через фильтры и нормируются заново. Черновику хватает приближения: каждый
+    его токен всё равно проверяет основная модель.
+    """
+    if mel.shape[-1] == n_mels:
+        return mel
+    power = mx.power(10.0, mel.astype(mx.float32) * 4.0 - 4.0)
+    log_spec = mx.maximum(power @ _mel_projection(mel.shape[-1], n_mels), 1e-10).log10()
+    log_spec = mx.maximum(log_spec, log_spec.max() - 8.0)
+    return ((log_spec + 4.0) / 4.0).astype(mel.dtype)
+
+
+class _VocabMap:
+    """Перевод токенов между словарями основной и черновой моделей.
+
+    Текстовые токены общие; у large-v3/turbo на один язык больше, поэтому
+    спецтокены (языки, задачи, таймстемпы) сопоставляются по имени.
+    None — у модели нет такого токена.
+    """
+
+    def __init__(self, target_tokenizer: Any, draft_tokenizer: Any) -> None:
+        self.text_end = target_tokenizer.eot
+        self.identical = target_tokenizer.special_tokens == draft_tokenizer.special_tokens
+        target_special = target_tokenizer.special_tokens
+        draft_special = draft_tokenizer.special_tokens
+        self._to_draft = {
+            token: draft_special.get(name) for name, token in target_special.items()
+        }
+        self._to_target = {
+            token: target_special.get(name) for name, token in draft_special.items()
+        }
+
+    def to_draft(self, token: int) -> Optional[int]:
+        if self.identical or token < self.text_end:
+            return token
+        return self._to_draft.get(token)
+
+    def to_target(self, token: int) -> Optional[int]:
+        if self.identical or token < self.text_end:
+            return token
+        return self._to_target.get(token)
+
+
+def _attention(attn: Any, q: mx.array, k: mx.array, v: mx.array, mask: mx.array) -> mx.array:
+    """MultiHeadAttention.qkv_attention с маской (новые токены, кэш + новые токены)."""
+    n_batch, n_ctx, n_state = q.shape
+    scale = (n_state // attn.n_head) ** -0.25
+    q = q.reshape(*q.shape[:2], attn.n_head, -1).transpose(0, 2, 1, 3) * scale
+    k = k.reshape(*k.shape[:2], attn.n_head, -1).transpose(0, 2, 3, 1) * scale
+    v = v.reshape(*v.shape[:2], attn.n_head, -1).transpose(0, 2, 1, 3)
+    w = mx.softmax(q @ k + mask, axis=-1, precise=True)
+    return (w @ v).transpose(0, 2, 1, 3).reshape(n_batch, n_ctx, n_state)
+
+
+def _forward(model: Any, tokens: List[int], features: mx.array, kv_cache: Any) -> Tuple[mx.array, Any]:
+    """Проход декодера по новым токенам поверх kv-кэша; логиты (len(tokens), vocab).
+
+    TextDecoder.__call__ режет каузальную маску без учёта смещения кэша и с
+    кэшем принимает только один токен за шаг, поэтому блоки проходятся здесь.
+    """
+    import mlx.nn as nn
+
+    decoder = model.decoder
+    offset = kv_cache[0][0][0].shape[1] if kv_cache else 0
+    count = len(tokens)
+    x = (
+        decoder.token_embedding(mx.array([tokens]))
+        + decoder.positional_embedding[offset : offset + count]
+    )
+    # Новый токен видит весь кэш и новые токены до себя включительно
+    mask = decoder._mask[offset : offset + count, : offset + count]
+    new_cache = []
+    for index, block in enumerate(decoder.blocks):
+        self_kv, cross_kv = kv_cache[index] if kv_cache else (None, None)
+        attn = block.attn
+        hidden = block.attn_ln(x)
+        k, v = attn.key(hidden), attn.value(hidden)
+        if self_kv is not None:
+            k = mx.concatenate([self_kv[0], k], axis=1)
+            v = mx.concatenate([self_kv[1], v], axis=1)
+        x = x + attn.out(_attention(attn, attn.query(hidden), k, v, mask))
+        y, cross_kv, _ = block.cross_attn(block.cross_attn_ln(x), features, kv_cache=cross_kv)
+        x = x + y
+        x = x + block.mlp2(nn.gelu(block.mlp1(block.mlp_ln(x))))
+        new_cache.append(((k, v), cross_kv))
+    logits = decoder.token_embedding.as_linear(decoder.ln(x))
+    return logits[0], new_cache
+
+
+def _trim(kv_cache: Any, length: int) -> Any:
+    """Оставить в self-attention кэше первые length позиций (cross-attention не меняется)."""
+    return [((k[:, :length], v[:, :length]), cross) for (k, v), cross in kv_cache]
+
+
+def _pick(task: Any, logits: mx.array, context: List[int]) -> Tuple[int, float]:
+    """Жадный выбор токена, как GreedyDecoder: фильтры логитов, argmax, log-вероятность."""
+    logits = logits[None]
+    tokens = mx.array([context])
+    for logit_filter in task.logit_filters:
+        logits = logit_filter.apply(logits, tokens)
+    token = logits.argmax(axis=-1)
+    logprobs = logits - mx.logsumexp(logits, axis=-1, keepdims=True)
+    logprob = logprobs[0, token[0]]
+    mx.eval(token, logprob)
+    return int(token.item()), float(logprob.item())
+
+
+class SpeculativeDecoder:
+    """Жадное декодирование окна Whisper с черновой моделью.
+
+    Черновик (tiny/base) авторегрессивно предлагает до WHISPER_SPECULATIVE_TOKENS
+    токенов, основная модель считает логиты по всем сразу одним проходом
+    декодера и принимает совпавший с её argmax префикс плюс свой следующий
+    токен. Результат — тот же, что у жадного decode() основной модели (с
+    точностью до округления при почти равных логитах). Окна с температурой
+    выше нуля и пакеты декодируются обычным decode().
+    """
+
+    _instance: Optional["SpeculativeDecoder"] = None
+
+    def __init__(self, num_tokens: int = WHISPER_SPECULATIVE_TOKENS) -> None:
+        self.num_tokens = num_tokens
+        self._lock = threading.Lock()
+        self._windows = 0
+        self._fallback_windows = 0
+        self._drafted = 0
+        self._accepted = 0
+        self._generated = 0
+        self._target_passes = 0
+        self._decode_sec = 0.0
+
+    @classmethod
+    def get_instance(cls) -> "SpeculativeDecoder":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def reset(cls) -> None:
+        """Сбросить синглтон (для тестов)."""
+        cls._instance = None
+
+    @contextmanager
+    def attach(self, model: Any, draft: Any) -> Iterator[None]:
+        """На время mlx_whisper.transcribe() подменить model.decode спекулятивным.
+
+        Вызывать под MLX_LOCK: модель из кэша общая для всех задач.
+        """
+        def decode(mel: mx.array, options: Any = None, **kwargs: Any) -> Any:
+            return self.decode(model, draft, mel, options, **kwargs)
+
+        model.decode = decode
+        try:
+            yield
+        finally:
+            del model.decode
+
+    def decode(self, model: Any, draft: Any, mel: mx.array, options: Any = None, **kwargs: Any) -> Any:
+        """Замена Whisper.decode: жадные одиночные окна — спекулятивно, остальное — как обычно."""
+        from mlx_whisper.decoding import DecodingOptions, DecodingTask
+        from mlx_whisper.decoding import decode as plain_decode
+
+        options = options or DecodingOptions()
+        if kwargs:
+            options = replace(options, **kwargs)
+        single = mel.ndim == 2
+        greedy = (
+            options.temperature == 0
+            and options.beam_size is None
+            and options.language is not None
+            and options.task != "lang_id"
+        )
+        if not greedy or not (single or mel.shape[0] == 1) or self.num_tokens < 1:
+            with self._lock:
+                self._fallback_windows += 1
+            return plain_decode(model, mel, options)
+
+        target_task = DecodingTask(model, options)
+        vocab: Optional[_VocabMap] = None
+        try:
+            # От черновика нужны только токенизатор и фильтры логитов
+            draft_task = DecodingTask(draft, options)
+            vocab = _VocabMap(target_task.tokenizer, draft_task.tokenizer)
+        except ValueError:
+            pass
+        if vocab is None or None in [vocab.to_draft(t) for t in target_task.initial_tokens]:
+            # Например, язык есть только у основной модели
+            with self._lock:
+                self._fallback_windows += 1
+            return plain_decode(model, mel, options)
+
+        mel = mel if single else mel[0]
+        started = time.monotonic()
+        result = self._run(target_task, draft_task, vocab, mel)
+        with self._lock:
+            self._windows += 1
+            self._decode_sec += time.monotonic() - started
+        return result if single else [result]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "num_tokens": self.num_tokens,
+                "windows": self._windows,
+                "fallback_windows": self._fallback_windows,
+                "drafted": self._drafted,
+                "accepted": self._accepted,
+                "acceptance_rate": round(self._accepted / self._drafted, 3) if self._drafted else 0.0,
+                "tokens_per_pass": (
+                    round(self._generated / self._target_passes, 2) if self._target_passes else 0.0
+                ),
+                "decode_sec": round(self._decode_sec, 2),
+            }
+
+    def _run(self, target_task: Any, draft_task: Any, vocab: _VocabMap, mel: mx.array) -> Any:
+        """Цикл «черновик предлагает — основная модель проверяет» для одного окна."""
+        from mlx_whisper.decoding import DecodingResult, compression_ratio
+
+        model, draft = target_task.model, draft_task.model
+        tokenizer = target_task.tokenizer
+        eot = tokenizer.eot
+        n_ctx = target_task.n_ctx
+        sample_len = target_task.sample_len
+
+        features = target_task._get_audio_features(mel[None])
+        draft_features = draft_task._get_audio_features(project_mel(mel, draft.dims.n_mels)[None])
+
+        # Первый проход по начальным токенам: no_speech и первый токен, как в decode()
+        tokens = list(target_task.initial_tokens)
+        logits, kv_cache = _forward(model, tokens, features, None)
+        passes = 1
+        if tokenizer.no_speech is not None:
+            probs_at_sot = mx.softmax(logits[target_task.sot_index].astype(mx.float32), axis=-1)
+            no_speech_prob = float(probs_at_sot[tokenizer.no_speech].item())
+        else:
+            no_speech_prob = float("nan")
+        token, sum_logprob = _pick(target_task, logits[-1], tokens)
+        tokens.append(token)
+        generated = 1
+
+        draft_tokens = [vocab.to_draft(t) for t in tokens[:-1]]
+        draft_cache: Any = None
+        draft_len = 0
+        drafted = accepted = 0
+
+        while tokens[-1] != eot and generated < sample_len and len(tokens) <= n_ctx:
+            # Черновик: догоняет принятые токены и жадно предлагает продолжение
+            budget = min(self.num_tokens, sample_len - generated - 1, n_ctx - len(tokens))
+            proposals: List[int] = []
+            draft_tokens.append(vocab.to_draft(tokens[-1]))
+            pending = draft_tokens[draft_len:]
+            while len(proposals) < budget and None not in pending:
+                draft_logits, draft_cache = _forward(draft, pending, draft_features, draft_cache)
+                draft_len += len(pending)
+                draft_token, _ = _pick(draft_task, draft_logits[-1], draft_tokens)
+                proposal = vocab.to_target(draft_token)
+                if proposal is None:
+                    break
+                proposals.append(proposal)
+                draft_tokens.append(draft_token)
+                pending = [draft_token]
+                if proposal == eot:
+                    break
+
+            # Основная модель: логиты для последнего принятого токена и всех предложений
+            committed = len(tokens)
+            logits, kv_cache = _forward(model, [tokens[-1]] + proposals, features, kv_cache)
+            passes += 1
+            matched = 0
+            for index in range(len(proposals) + 1):
+                token, logprob = _pick(target_task, logits[index], tokens)
+                sum_logprob += logprob
+                tokens.append(token)
+                generated += 1
+                if token == eot or generated >= sample_len or len(tokens) > n_ctx:
+                    break
+                if index == len(proposals) or token != proposals[index]:
+                    break
+                matched += 1
+            drafted += len(proposals)
+            accepted += matched
+
+            # Кэши — только по принятому префиксу
+            kv_cache = _trim(kv_cache, len(tokens) - 1)
+            keep = min(draft_len, committed + matched)
+            if draft_cache is not None and keep < draft_len:
+                draft_cache = _trim(draft_cache, keep)
+            draft_len = keep
+            draft_tokens = draft_tokens[: committed + matched]
+
+        with self._lock:
+            self._drafted += drafted
+            self._accepted += accepted
+            self._generated += generated
+            self._target_passes += passes
+
+        sampled = tokens[target_task.sample_begin:]
+        if eot in sampled:
+            sampled = sampled[: sampled.index(eot)]
+        text = tokenizer.decode(sampled).strip()
+        return DecodingResult(
+            audio_features=features[0],
+            language=target_task.options.language,
+            tokens=sampled,
+            text=text,
+            avg_logprob=sum_logprob / (len(sampled) + 1),
+            no_speech_prob=no_speech_prob,
+            temperature=0.0,
+            compression_ratio=compression_ratio(text),
+        )
+
+
+def get_speculative_decoder() -> SpeculativeDecoder:
+    """Синглтон спекулятивного декодера Whisper."""
+    return SpeculativeDecoder.get_instance()
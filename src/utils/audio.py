@@ -1,11 +1,31 @@
 """Утилиты для работы с аудио."""
 import os
+import struct
 import subprocess
 import logging
 from typing import Optional
 
+import numpy as np
+
 from src.config import CONVERSION_TIMEOUT_SECONDS, CHUNK_SIZE, AUDIO_SAMPLE_RATE
 
+# Кодеки транспорта в oMLX: расширение файла, MIME и параметры ffmpeg
+TRANSPORT_FORMATS = {
+    "wav": (".wav", "audio/wav", ["-acodec", "pcm_s16le"]),
+    "flac": (".flac", "audio/flac", ["-c:a", "flac"]),
+    "opus": (".ogg", "audio/ogg", ["-c:a", "libopus"]),
+}
+
+_MIME_BY_EXT = {
+    ".wav": "audio/wav",
+    ".flac": "audio/flac",
+    ".ogg": "audio/ogg",
+    ".opus": "audio/ogg",
+    ".mp3": "audio/mpeg",
+    ".m4a": "audio/mp4",
+    ".webm": "audio/webm",
+}
+
 logger = logging.getLogger("mlx_whisper")
 
 
@@ -52,6 +72,47 @@ def convert_to_wav(input_path: str, output_path: str, remove_silence: bool = Tru
         raise RuntimeError(f"FFmpeg conversion failed: {e.stderr.decode()}")
 
 
+def encode_for_transport(wav_path: str, codec: str, bitrate: str = "32k") -> str:
+    """Сжать WAV для отправки в oMLX (flac/opus) рядом с исходным файлом.
+
+    Возвращает путь к сжатому файлу; для wav — исходный путь.
+    """
+    if codec not in TRANSPORT_FORMATS:
+        raise ValueError(f"Unsupported transport codec: {codec}")
+    ext, _, codec_args = TRANSPORT_FORMATS[codec]
+    if ext == ".wav":
+        return wav_path
+    output_path = f"{os.path.splitext(wav_path)[0]}_transport{ext}"
+    cmd = ["ffmpeg", "-y", "-i", wav_path, *codec_args]
+    if codec == "opus":
+        cmd += ["-b:a", bitrate]
+    cmd.append(output_path)
+
+    try:
+        subprocess.run(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True,
+            timeout=CONVERSION_TIMEOUT_SECONDS,
+        )
+    except subprocess.TimeoutExpired as e:
+        logger.error(f"Transport encoding timed out for {wav_path}: {e}")
+        raise RuntimeError(f"Transport encoding timed out after {CONVERSION_TIMEOUT_SECONDS} seconds")
+    except FileNotFoundError as e:
+        logger.error(f"FFmpeg not found for transport encoding of {wav_path}: {e}")
+        raise RuntimeError("FFmpeg not found. Please install ffmpeg.")
+    except subprocess.CalledProcessError as e:
+        logger.error(f"Transport encoding failed for {wav_path}: {e.stderr.decode()}")
+        raise RuntimeError(f"Transport encoding failed: {e.stderr.decode()}")
+    return output_path
+
+
+def audio_mime_type(file_path: str) -> str:
+    """MIME-тип аудиофайла по расширению (по умолчанию audio/wav)."""
+    return _MIME_BY_EXT.get(os.path.splitext(file_path)[1].lower(), "audio/wav")
+
+
 def validate_audio_file(file_path: str) -> bool:
     """Проверить, является ли файл валидным аудиофайлом."""
     cmd = [
@@ -86,3 +147,46 @@ def get_audio_duration(file_path: str) -> Optional[float]:
     except Exception:
         pass
     return None
+
+
+def read_wav_pcm(file_path: str, sample_rate: int = AUDIO_SAMPLE_RATE) -> Optional[np.ndarray]:
+    """Прочитать канонический WAV (PCM 16 бит, моно, sample_rate) в float32 без ffmpeg.
+
+    Отсчёты читаются через np.memmap и нормируются так же, как в
+    mlx_whisper.audio.load_audio (int16 / 32768). Для любого другого
+    формата (или ошибки чтения) — None: вызывающий декодирует файл через ffmpeg.
+    """
+    try:
+        with open(file_path, "rb") as f:
+            header = f.read(12)
+            if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+                return None
+            fmt = None
+            while True:
+                chunk = f.read(8)
+                if len(chunk) < 8:
+                    return None
+                chunk_id, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+                if chunk_id == b"fmt ":
+                    fmt = struct.unpack("<HHIIHH", f.read(16))
+                    f.seek(size - 16 + (size & 1), os.SEEK_CUR)
+                elif chunk_id == b"data":
+                    offset = f.tell()
+                    break
+                else:
+                    f.seek(size + (size & 1), os.SEEK_CUR)
+        file_size = os.path.getsize(file_path)
+    except (OSError, struct.error):
+        return None
+
+    if fmt is None:
+        return None
+    audio_format, channels, rate, _, _, bits = fmt
+    if audio_format != 1 or channels != 1 or rate != sample_rate or bits != 16:
+        return None
+    # ffmpeg, пишущий в поток, оставляет размер data = 0xFFFFFFFF — берём по файлу
+    samples = min(size, file_size - offset) // 2
+    if samples <= 0:
+        return np.zeros(0, dtype=np.float32)
+    pcm = np.memmap(file_path, dtype="<i2", mode="r", offset=offset, shape=(samples,))
+    return pcm.astype(np.float32) / 32768.0
@@ -0,0 +1,41 @@
+"""Планирование чанков аудио по участкам речи (общее для oMLX и long-form Whisper)."""
+
+from typing import List, Optional, Tuple
+
+
+def plan_chunks(
+    non_silent: List[Tuple[int, int]], max_chunk_ms: int
+) -> List[Tuple[int, int]]:
+    """Разбить участки речи на чанки не длиннее max_chunk_ms (мс, абсолютные границы)."""
+    chunks: List[Tuple[int, int]] = []
+    for start_ms, end_ms in non_silent:
+        for chunk_start in range(start_ms, end_ms, max_chunk_ms):
+            chunks.append((chunk_start, min(chunk_start + max_chunk_ms, end_ms)))
+    return chunks
+
+
+def plan_adaptive_chunks(
+    non_silent: List[Tuple[int, int]], target_ms: int, max_chunk_ms: int
+) -> List[Tuple[int, int]]:
+    """Сгруппировать участки речи в чанки ~target_ms с границами в паузах.
+
+    Граница ставится в паузе между участками, ближайшей к target_ms; участок
+    длиннее max_chunk_ms режется жёстко, как в plan_chunks.
+    """
+    regions = plan_chunks(non_silent, max_chunk_ms)
+    chunks: List[Tuple[int, int]] = []
+    current: Optional[Tuple[int, int]] = None
+    for start_ms, end_ms in regions:
+        if current is None:
+            current = (start_ms, end_ms)
+            continue
+        merged_len = end_ms - current[0]
+        # Закрыть чанк в этой паузе, если продление уводит дальше от цели
+        if merged_len > max_chunk_ms or abs(merged_len - target_ms) > abs(current[1] - current[0] - target_ms):
+            chunks.append(current)
+            current = (start_ms, end_ms)
+        else:
+            current = (current[0], end_ms)
+    if current is not None:
+        chunks.append(current)
+    return chunks
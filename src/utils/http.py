@@ -0,0 +1,117 @@
+"""HTTP-утилиты: прерываемые запросы через requests."""
+import socket
+import threading
+from typing import Any, Callable, Optional, Set
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+class RequestAborted(Exception):
+    """Запрос прерван вызовом AbortableSession.abort()."""
+    pass
+
+
+class _TrackingAdapter(HTTPAdapter):
+    """HTTPAdapter, запоминающий выданные пулом соединения, чтобы их можно было закрыть."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        self.connections: Set[Any] = set()
+        self.connections_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        adapter = self
+
+        def tracking(pool_cls: type) -> type:
+            class _TrackingPool(pool_cls):  # type: ignore[misc, valid-type]
+                def _get_conn(self, timeout: Optional[float] = None) -> Any:
+                    conn = super()._get_conn(timeout)
+                    with adapter.connections_lock:
+                        adapter.connections.add(conn)
+                    return conn
+
+            return _TrackingPool
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": tracking(HTTPConnectionPool),
+            "https": tracking(HTTPSConnectionPool),
+        }
+
+    def close_connections(self) -> None:
+        with self.connections_lock:
+            connections = list(self.connections)
+            self.connections.clear()
+        for conn in connections:
+            sock = getattr(conn, "sock", None)
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+class AbortableSession(requests.Session):
+    """requests.Session, чей запрос можно оборвать из другого потока.
+
+    abort() закрывает сокеты активных соединений — блокирующий recv()
+    в потоке запроса сразу завершается ошибкой, а сервер видит разрыв.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._adapter = _TrackingAdapter()
+        self._aborted = threading.Event()
+        self.mount("http://", self._adapter)
+        self.mount("https://", self._adapter)
+
+    @property
+    def aborted(self) -> bool:
+        return self._aborted.is_set()
+
+    def abort(self) -> None:
+        self._aborted.set()
+        self._adapter.close_connections()
+
+
+def run_abortable(
+    session: AbortableSession,
+    call: Callable[[AbortableSession], Any],
+    should_abort: Callable[[], bool],
+    poll_interval: float = 0.25,
+) -> Any:
+    """Выполнить call(session) в фоновом потоке, прерывая его, когда should_abort() истинно.
+
+    Raises RequestAborted если запрос был прерван; иначе возвращает результат
+    call или пробрасывает его исключение.
+    """
+    outcome: dict = {}
+
+    def run() -> None:
+        try:
+            outcome["result"] = call(session)
+        except BaseException as e:  # noqa: BLE001 — пробрасываем в вызывающий поток
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run, name="http-request", daemon=True)
+    thread.start()
+    while True:
+        thread.join(timeout=poll_interval)
+        if not thread.is_alive():
+            break
+        if should_abort():
+            session.abort()
+            thread.join(timeout=poll_interval)
+            raise RequestAborted("HTTP request aborted")
+
+    if "error" in outcome:
+        if session.aborted:
+            raise RequestAborted("HTTP request aborted") from outcome["error"]
+        raise outcome["error"]
+    return outcome["result"]
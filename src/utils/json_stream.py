@@ -0,0 +1,274 @@
+"""Потоковый разбор JSON: элементы массива, строки и поля объекта без загрузки всего текста.
+
+Сканеры принимают текст кусками через feed(). В памяти держится только
+незавершённый элемент массива или неразобранный хвост escape-
+последовательности, поэтому потребление не зависит от размера документа.
+Когда значение закончилось, done=True, а текст после него лежит в leftover.
+"""
+
+import json
+import re
+from typing import Any, Callable, List, Optional, Tuple
+
+# Следующий значимый символ вне строки / внутри строки
+_STRUCTURAL_RE = re.compile(r'["{}\[\],]')
+_STRING_SPECIAL_RE = re.compile(r'["\\]')
+# Незавершённая escape-последовательность в конце куска: "\", "\u12" или high surrogate
+# вместе с началом low surrogate после него ("\ud83d", "\ud83d\", "\ud83d\ude0") —
+# половины суррогатной пары декодируются только вместе
+_PARTIAL_ESCAPE_RE = re.compile(
+    r'\\u[dD][89abAB][0-9a-fA-F]{2}(?:\\(?:u[0-9a-fA-F]{0,3})?)?$|\\(?:u[0-9a-fA-F]{0,3})?$'
+)
+
+_WHITESPACE = " \t\r\n"
+
+
+class _ValueScanner:
+    """Находит конец одного JSON-значения с учётом вложенности и строк."""
+
+    def __init__(self) -> None:
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def scan(self, text: str, i: int) -> int:
+        """Индекс сразу за концом значения или -1, если значение продолжается.
+
+        Скаляр (число, true/null) заканчивается перед ',', '}' или ']'.
+        """
+        n = len(text)
+        while i < n:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    i += 1
+                    continue
+                match = _STRING_SPECIAL_RE.search(text, i)
+                if match is None:
+                    return -1
+                i = match.start()
+                if text[i] == "\\":
+                    self._escape = True
+                else:
+                    self._in_string = False
+                    if self._depth == 0:
+                        return i + 1
+                i += 1
+                continue
+            match = _STRUCTURAL_RE.search(text, i)
+            if match is None:
+                return -1
+            i = match.start()
+            char = text[i]
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    return i
+                self._depth -= 1
+                if self._depth == 0:
+                    return i + 1
+            elif self._depth == 0:
+                return i
+            i += 1
+        return -1
+
+
+class ArrayStream:
+    """Выделяет элементы JSON-массива по мере поступления текста.
+
+    Текст до открывающей '[' пропускается. feed() возвращает исходные тексты
+    завершённых элементов; partial — текст незавершённого элемента
+    (обрезанный хвост, если массив так и не закрылся).
+    """
+
+    def __init__(self) -> None:
+        self.started = False
+        self.done = False
+        self.leftover = ""
+        self._parts: List[str] = []
+        self._scanner: Optional[_ValueScanner] = None
+
+    @property
+    def partial(self) -> str:
+        return "".join(self._parts)
+
+    def feed(self, text: str) -> List[str]:
+        items: List[str] = []
+        if self.done:
+            self.leftover += text
+            return items
+        i, n = 0, len(text)
+        while i < n:
+            if not self.started:
+                j = text.find("[", i)
+                if j < 0:
+                    break
+                self.started = True
+                i = j + 1
+                continue
+            if self._scanner is None:
+                while i < n and text[i] in _WHITESPACE + ",":
+                    i += 1
+                if i >= n:
+                    break
+                if text[i] == "]":
+                    self.done = True
+                    self.leftover = text[i + 1:]
+                    break
+                self._scanner = _ValueScanner()
+            end = self._scanner.scan(text, i)
+            if end < 0:
+                self._parts.append(text[i:])
+                break
+            self._parts.append(text[i:end])
+            element = "".join(self._parts).strip()
+            self._parts = []
+            self._scanner = None
+            if element:
+                items.append(element)
+            i = end
+        return items
+
+
+class StringStream:
+    """Декодирует JSON-строку кусками; feed() получает текст после открывающей кавычки."""
+
+    def __init__(self) -> None:
+        self.done = False
+        self.leftover = ""
+        self._pending = ""
+
+    def feed(self, text: str) -> str:
+        if self.done:
+            self.leftover += text
+            return ""
+        raw = self._pending + text
+        self._pending = ""
+        body = raw
+        i = 0
+        while True:
+            match = _STRING_SPECIAL_RE.search(raw, i)
+            if match is None:
+                break
+            i = match.start()
+            if raw[i] == "\\":
+                i += 2
+                continue
+            body = raw[:i]
+            self.done = True
+            self.leftover = raw[i + 1:]
+            break
+        if not self.done:
+            # Escape-последовательность разрезана границей куска — ждём продолжения
+            partial = _PARTIAL_ESCAPE_RE.search(body)
+            if partial is not None and not _escaped_backslash(body, partial.start()):
+                self._pending = body[partial.start():]
+                body = body[:partial.start()]
+        return json.loads(f'"{body}"') if body else ""
+
+
+def _escaped_backslash(text: str, pos: int) -> bool:
+    """Экранирован ли обратный слэш в позиции pos (нечётное число слэшей перед ним)."""
+    count = 0
+    while pos - count > 0 and text[pos - count - 1] == "\\":
+        count += 1
+    return count % 2 == 1
+
+
+class ObjectStream:
+    """Разбирает поля JSON-объекта, передавая нужные значения потребителям.
+
+    select(key, first_char) возвращает ArrayStream (значение начинается с '['),
+    StringStream (с '"') или None — тогда значение пропускается без
+    накопления. feed() возвращает пары (key, результат feed() потребителя).
+    """
+
+    def __init__(self, select: Callable[[str, str], Any]) -> None:
+        self.done = False
+        self.leftover = ""
+        self._select = select
+        self._state = "start"
+        self._key: Optional[StringStream] = None
+        self._key_parts: List[str] = []
+        self._field = ""
+        self._consumer: Any = None
+        self._skipper: Optional[_ValueScanner] = None
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        results: List[Tuple[str, Any]] = []
+        if self.done:
+            self.leftover += text
+            return results
+        while text and not self.done:
+            text = self._step(text, results)
+        if self.done:
+            self.leftover = text
+        return results
+
+    def _step(self, text: str, results: List[Tuple[str, Any]]) -> str:
+        state = self._state
+        if state == "consume":
+            value = self._consumer.feed(text)
+            if value:
+                results.append((self._field, value))
+            if not self._consumer.done:
+                return ""
+            self._state = "comma"
+            return self._consumer.leftover
+        if state == "skip":
+            end = self._skipper.scan(text, 0)
+            if end < 0:
+                return ""
+            self._state = "comma"
+            return text[end:]
+        if state == "key_string":
+            self._key_parts.append(self._key.feed(text))
+            if not self._key.done:
+                return ""
+            self._field = "".join(self._key_parts)
+            self._state = "colon"
+            return self._key.leftover
+
+        stripped = text.lstrip(_WHITESPACE)
+        if not stripped:
+            return ""
+        char = stripped[0]
+        if state == "start":
+            if char != "{":
+                raise ValueError(f"Expected '{{' at start of JSON object, got {char!r}")
+            self._state = "key"
+            return stripped[1:]
+        if state == "key":
+            if char == '"':
+                self._key = StringStream()
+                self._key_parts = []
+                self._state = "key_string"
+                return stripped[1:]
+            if char == "}":
+                self.done = True
+                return stripped[1:]
+            raise ValueError(f"Expected key in JSON object, got {char!r}")
+        if state == "colon":
+            if char != ":":
+                raise ValueError(f"Expected ':' after key {self._field!r}")
+            self._state = "value"
+            return stripped[1:]
+        if state == "value":
+            self._consumer = self._select(self._field, char)
+            if self._consumer is None:
+                self._skipper = _ValueScanner()
+                self._state = "skip"
+                return stripped
+            self._state = "consume"
+            return stripped[1:] if isinstance(self._consumer, StringStream) else stripped
+        # comma
+        if char == ",":
+            self._state = "key"
+            return stripped[1:]
+        if char == "}":
+            self.done = True
+            return stripped[1:]
+        raise ValueError(f"Expected ',' or '}}' in JSON object, got {char!r}")
@@ -0,0 +1,149 @@
+"""Потоковая запись сырых ответов движков в сжатый артефакт задачи ({name}_raw.jsonl.gz)."""
+
+import codecs
+import gzip
+import json
+import logging
+import os
+import threading
+from typing import IO, Any, Dict, Optional, Union
+
+from src.config import RAW_RESPONSE_GZIP_LEVEL
+
+logger = logging.getLogger("mlx_whisper")
+
+RAW_ARTIFACT_SUFFIX = "_raw.jsonl.gz"
+
+# Размер куска при копировании тела ответа в артефакт
+_COPY_BYTES = 64 * 1024
+
+
+def raw_artifact_path(job_dir: str, base_name: str) -> str:
+    """Путь сырого артефакта задачи рядом с txt/segments."""
+    return os.path.join(job_dir, f"{base_name}{RAW_ARTIFACT_SUFFIX}")
+
+
+class RawArtifactWriter:
+    """Пишет сырые ответы построчно в gzip: {"<meta>": ..., "response": <ответ>}.
+
+    Ответ не собирается в строку: объект сериализуется через json.dump
+    (кусками iterencode), а тело HTTP-ответа копируется из файла кусками.
+    Записи из параллельных потоков (чанки oMLX) сериализуются блокировкой.
+    append=True дописывает новый gzip-member к существующему артефакту
+    (resume split-транскрипции), иначе артефакт перезаписывается.
+    """
+
+    def __init__(self, path: str, append: bool = False) -> None:
+        self.path = path
+        self._append = append
+        self._lock = threading.Lock()
+        self._file: Optional[IO[str]] = None
+        self.records = 0
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+    def write_json(self, meta: Dict[str, Any], value: Any) -> None:
+        """Записать объект как ответ (json.dump — без промежуточной строки)."""
+        with self._lock:
+            out = self._open()
+            out.write(self._header(meta))
+            json.dump(value, out, ensure_ascii=False, default=str)
+            out.write("}\n")
+            self.records += 1
+
+    def write_body(
+        self,
+        meta: Dict[str, Any],
+        body: Union[str, IO[bytes]],
+        parsed: bool = False,
+    ) -> None:
+        """Записать тело ответа (строка или бинарный файл, который закрывается).
+
+        Тело, которое вызывающий уже разобрал (parsed=True), или строка с
+        валидным JSON вставляется как есть. Иначе (обрезанный ответ, не JSON,
+        непроверенный файл) тело пишется JSON-строкой с пометкой
+        "truncated": true — строка артефакта всегда остаётся валидным JSON.
+        """
+        verbatim = parsed or (isinstance(body, str) and _is_json(body))
+        if not verbatim:
+            meta = {**meta, "truncated": True}
+        with self._lock:
+            out = self._open()
+            out.write(self._header(meta))
+            if not verbatim:
+                out.write('"')
+            if isinstance(body, str):
+                out.write(body if verbatim else _escape(body))
+            else:
+                decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+                try:
+                    while True:
+                        chunk = body.read(_COPY_BYTES)
+                        if not chunk:
+                            break
+                        text = decoder.decode(chunk)
+                        out.write(text if verbatim else _escape(text))
+                    tail = decoder.decode(b"", final=True)
+                    out.write(tail if verbatim else _escape(tail))
+                finally:
+                    body.close()
+            if not verbatim:
+                out.write('"')
+            out.write("}\n")
+            self.records += 1
+
+    def close(self) -> Optional[str]:
+        """Закрыть артефакт; имя файла, если в него что-то записано."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self.records or (self._append and os.path.exists(self.path)):
+                return self.name
+            return None
+
+    def discard(self) -> None:
+        """Закрыть и удалить артефакт (сериализация не удалась)."""
+        with self._lock:
+            if self._file is not None:
+                try:
+                    self._file.close()
+                except OSError:
+                    pass
+                self._file = None
+            self.records = 0
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def _open(self) -> IO[str]:
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = gzip.open(
+                self.path,
+                "at" if self._append else "wt",
+                encoding="utf-8",
+                compresslevel=RAW_RESPONSE_GZIP_LEVEL,
+            )
+        return self._file
+
+    @staticmethod
+    def _header(meta: Dict[str, Any]) -> str:
+        head = json.dumps(meta, ensure_ascii=False)[:-1]
+        return f'{head}, "response": ' if meta else '{"response": '
+
+
+def _is_json(text: str) -> bool:
+    try:
+        json.loads(text)
+    except ValueError:
+        return False
+    return True
+
+
+def _escape(text: str) -> str:
+    """Содержимое JSON-строки без кавычек (куски экранируются независимо)."""
+    return json.dumps(text, ensure_ascii=False)[1:-1]
@@ -0,0 +1,146 @@
+"""Тесты admission control (src/services/admission.py, src/api/middleware.py)."""
+
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _snapshot(**overrides):
+    snapshot = {
+        "queued": 0,
+        "max_size": 20,
+        "workers": 2,
+        "pending_jobs": 0,
+        "pending_audio_sec": 0.0,
+        "rtf": 0.5,
+        "backlog_sec": 0.0,
+        "shutdown": False,
+    }
+    snapshot.update(overrides)
+    return snapshot
+
+
+class TestEvaluateAdmission:
+    """Тесты evaluate_admission()."""
+
+    def test_accepts_idle_queue(self):
+        from src.services.admission import evaluate_admission
+
+        decision = evaluate_admission(_snapshot(), content_length=1024, free_disk_bytes=10 ** 12)
+        assert decision.accepted is True
+
+    def test_full_queue_returns_429_with_retry_after(self):
+        from src.services.admission import evaluate_admission
+
+        decision = evaluate_admission(
+            _snapshot(queued=20, pending_jobs=22, backlog_sec=440.0)
+        )
+        assert decision.accepted is False
+        assert decision.status_code == 429
+        # Один слот освобождается в среднем через backlog / pending_jobs
+        assert decision.retry_after == 20
+
+    def test_low_disk_returns_503(self):
+        from src.services.admission import evaluate_admission
+
+        decision = evaluate_admission(
+            _snapshot(), content_length=100 * 1024 * 1024, free_disk_bytes=50 * 1024 * 1024
+        )
+        assert decision.accepted is False
+        assert decision.status_code == 503
+        assert decision.retry_after >= 30
+
+    def test_shutdown_returns_503(self):
+        from src.services.admission import evaluate_admission
+
+        decision = evaluate_admission(_snapshot(shutdown=True))
+        assert decision.status_code == 503
+
+    def test_tenant_quota_returns_429(self):
+        from src.services.admission import evaluate_admission
+
+        decision = evaluate_admission(_snapshot(), tenant_depth=3, tenant_quota=3)
+        assert decision.status_code == 429
+
+    def test_backlog_limit_retry_after_from_excess(self):
+        import src.services.admission as admission
+
+        with patch.object(admission, "ADMISSION_MAX_BACKLOG_SEC", 600.0):
+            decision = admission.evaluate_admission(
+                _snapshot(pending_jobs=3, backlog_sec=1500.0)
+            )
+        assert decision.status_code == 429
+        assert decision.retry_after == 900
+
+    def test_queued_audio_limit(self):
+        import src.services.admission as admission
+
+        with patch.object(admission, "ADMISSION_MAX_QUEUED_AUDIO_SEC", 3600.0):
+            decision = admission.evaluate_admission(
+                _snapshot(pending_jobs=2, pending_audio_sec=7200.0, backlog_sec=1800.0)
+            )
+        assert decision.status_code == 429
+        # (7200 - 3600) * rtf 0.5 / 2 воркера
+        assert decision.retry_after == 900
+
+
+class TestAdmissionMiddleware:
+    """Middleware отвечает до того, как роут прочитает тело."""
+
+    @pytest.fixture
+    def client(self):
+        from fastapi import FastAPI, Request
+        from fastapi.testclient import TestClient
+
+        from src.api.middleware import admission_middleware
+
+        app = FastAPI()
+        app.middleware("http")(admission_middleware)
+        handler = MagicMock(return_value={"status": "queued"})
+
+        @app.post("/api/v1/transcribe")
+        async def transcribe(request: Request):
+            await request.body()
+            return handler()
+
+        return TestClient(app), handler
+
+    def test_rejects_without_reading_body(self, client):
+        from src.services.admission import AdmissionDecision
+
+        test_client, handler = client
+        decision = AdmissionDecision(False, 429, "Queue is full, try again later", 42)
+        with (
+            patch("src.api.middleware.check_admission", return_value=decision),
+            patch("src.services.transcription_queue.get_transcription_manager"),
+        ):
+            response = test_client.post("/api/v1/transcribe", content=b"x" * 1024)
+
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "42"
+        handler.assert_not_called()
+
+    def test_passes_through_when_accepted(self, client):
+        from src.services.admission import AdmissionDecision
+
+        test_client, handler = client
+        with (
+            patch("src.api.middleware.check_admission", return_value=AdmissionDecision(True)),
+            patch("src.services.transcription_queue.get_transcription_manager"),
+        ):
+            response = test_client.post("/api/v1/transcribe", content=b"x")
+
+        assert response.status_code == 200
+        handler.assert_called_once()
+
+    def test_oversized_content_length_returns_413(self, client):
+        test_client, handler = client
+        with patch("src.api.middleware.MAX_FILE_SIZE", 10):
+            response = test_client.post("/api/v1/transcribe", content=b"x" * 100)
+
+        assert response.status_code == 413
+        handler.assert_not_called()
@@ -0,0 +1,184 @@
+"""Тесты circuit breaker (src/services/backend_health.py) и маршрутизации get_engine."""
+
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers():
+    from src.services.backend_health import reset_breakers
+
+    reset_breakers()
+    yield
+    reset_breakers()
+
+
+def _breaker(**kwargs):
+    from src.services.backend_health import CircuitBreaker
+
+    params = {"window": 10, "min_calls": 4, "error_rate": 0.5, "open_sec": 30.0}
+    params.update(kwargs)
+    return CircuitBreaker("omlx", **params)
+
+
+class TestCircuitBreaker:
+    def test_opens_when_error_rate_reached(self):
+        breaker = _breaker()
+        breaker.record_success(1.0)
+        breaker.record_failure("boom")
+        breaker.record_success(1.0)
+        assert breaker.state == "closed"
+        breaker.record_failure("boom")
+        assert breaker.state == "open"
+        assert breaker.allow_request() is False
+
+    def test_min_calls_prevents_early_open(self):
+        breaker = _breaker()
+        breaker.record_failure("boom")
+        breaker.record_failure("boom")
+        assert breaker.state == "closed"
+
+    def test_half_open_allows_single_probe_and_fails_back(self):
+        breaker = _breaker(min_calls=1, error_rate=1.0)
+        breaker.record_failure("down", now=100.0)
+        assert breaker.allow_request(now=110.0) is False
+
+        assert breaker.allow_request(now=131.0) is True
+        assert breaker.state == "half_open"
+        # Пока пробный запрос не завершился, остальные идут в fallback
+        assert breaker.allow_request(now=132.0) is False
+
+        breaker.record_success(2.0)
+        assert breaker.state == "closed"
+        assert breaker.allow_request(now=133.0) is True
+
+    def test_failed_probe_reopens(self):
+        breaker = _breaker(min_calls=1, error_rate=1.0)
+        breaker.record_failure("down", now=100.0)
+        assert breaker.allow_request(now=131.0) is True
+        breaker.record_failure("still down", now=131.5)
+        assert breaker.state == "open"
+        assert breaker.allow_request(now=140.0) is False
+
+    def test_slow_calls_count_as_failures(self):
+        breaker = _breaker(min_calls=2, error_rate=0.5, slow_call_sec=5.0)
+        breaker.record_success(1.0)
+        breaker.record_success(12.0)
+        assert breaker.state == "open"
+        assert "slow call" in breaker.stats()["last_error"]
+
+
+class TestEngineRouting:
+    def test_open_circuit_routes_omlx_to_fallback(self, monkeypatch):
+        import src.services.whisper_engines as engines
+        from src.services.backend_health import get_breaker
+
+        monkeypatch.setattr(engines, "OMLX_FALLBACK_MECHANISM", "whisper")
+        monkeypatch.setattr(engines, "OMLX_FALLBACK_MODEL", "small")
+        breaker = get_breaker("omlx")
+        for _ in range(10):
+            breaker.record_failure("connection refused")
+
+        engine = engines.get_engine("omlx")
+        assert type(engine).__name__ == "WhisperEngine"
+        assert engine.resolve_model("oMLX-ASR-8bit") == "small"
+
+        breaker.reset()
+        assert type(engines.get_engine("omlx")).__name__ == "OMLXEngine"
+
+    def test_no_fallback_configured_keeps_omlx(self, monkeypatch):
+        import src.services.whisper_engines as engines
+        from src.services.backend_health import get_breaker
+
+        monkeypatch.setattr(engines, "OMLX_FALLBACK_MECHANISM", "")
+        breaker = get_breaker("omlx")
+        for _ in range(10):
+            breaker.record_failure("connection refused")
+        assert type(engines.get_engine("omlx")).__name__ == "OMLXEngine"
+
+    def test_omlx_post_records_backend_health(self):
+        import requests
+
+        import src.services.omlx_engine as omlx_module
+        from src.services.backend_health import get_breaker
+        from src.services.omlx_engine import OMLXEngine
+
+        engine = OMLXEngine()
+        with (
+            patch.object(omlx_module, "OMLX_BASE_URL", "http://omlx.invalid"),
+            patch("src.services.omlx_engine.requests.post",
+                  side_effect=requests.ConnectionError("refused")),
+        ):
+            for _ in range(5):
+                with pytest.raises(requests.ConnectionError):
+                    engine._post("http://omlx.invalid/audio/transcriptions", {}, {}, {})
+
+        stats = get_breaker("omlx").stats()
+        assert stats["state"] == "open"
+        assert stats["error_rate"] == 1.0
+
+
+def test_worker_reroutes_job_to_fallback_on_backend_failure(tmp_path, monkeypatch):
+    """oMLX падает посреди задачи — задача завершается на fallback, metadata отражает это."""
+    import requests
+
+    from src.services.transcription_queue import TranscriptionQueueManager
+    from src.services.whisper_engines import WhisperEngine
+
+    monkeypatch.setattr("src.utils.files.DATA_UPLOADS_DIR", str(tmp_path))
+    monkeypatch.setattr("src.services.job_manager.DATA_UPLOADS_DIR", str(tmp_path))
+    monkeypatch.setattr("src.models.transcription._clear_memory", lambda: None)
+    TranscriptionQueueManager.reset()
+
+    primary = MagicMock()
+    primary.name = "omlx"
+    primary.transcribe.side_effect = requests.ConnectionError("connection refused")
+    fallback = WhisperEngine(model="small")
+    fallback.transcribe = MagicMock(
+        return_value={"text": "local", "segments": [], "raw_response": None}
+    )
+
+    mgr = TranscriptionQueueManager(workers=1, max_size=5)
+    try:
+        with (
+            patch("src.services.transcription_queue.get_engine", return_value=primary),
+            patch("src.services.transcription_queue.get_fallback_engine", return_value=fallback),
+            patch("src.services.transcription_queue._sanitize_result", side_effect=lambda r: r),
+        ):
+            mgr.submit({
+                "job_id": "reroute-job", "wav_path": "/tmp/a.wav",
+                "params": {"mechanism": "omlx", "model": "oMLX-ASR-8bit"},
+            })
+            mgr._queue.join()
+
+        meta = mgr._meta.load("reroute-job")
+        assert meta["status"] == "completed"
+        assert meta["engine_used"] == "whisper"
+        assert meta["model_used"] == "small"
+        assert meta["fallback"] is True
+    finally:
+        mgr.shutdown()
+        TranscriptionQueueManager.reset()
+
+
+def test_model_not_found_is_not_backend_failure():
+    """Ненайденная модель — ошибка запроса: цепь не открывается, fallback не нужен."""
+    import requests
+
+    from src.services.omlx_engine import OMLXModelNotFoundError, is_backend_failure
+
+    assert is_backend_failure(requests.ConnectionError("refused"))
+    assert not is_backend_failure(OMLXModelNotFoundError("Модель 'X' не найдена"))
+
+
+def test_fallback_is_disabled_by_default():
+    from src import config
+
+    if "OMLX_FALLBACK_MECHANISM" in os.environ:
+        pytest.skip("OMLX_FALLBACK_MECHANISM задан в окружении")
+    assert config.OMLX_FALLBACK_MECHANISM == ""
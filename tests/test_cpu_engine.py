@@ -0,0 +1,154 @@
+"""Тесты для CPUWhisperEngine: faster-whisper подменён фейковым модулем."""
+
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services.cpu_engine import CPUWhisperEngine, cpu_model_path  # noqa: E402
+
+
+def _segment(index, start, end, text, words=None):
+    return SimpleNamespace(
+        id=index + 1, seek=0, start=start, end=end, text=text, tokens=[1, 2],
+        temperature=0.0, avg_logprob=-0.2, compression_ratio=1.1, no_speech_prob=0.01,
+        words=words,
+    )
+
+
+@pytest.fixture
+def faster_whisper(monkeypatch):
+    """Фейковый faster_whisper: WhisperModel запоминает аргументы, transcribe — генератор."""
+    CPUWhisperEngine.reset()
+    model = MagicMock()
+    model.segments = [_segment(0, 0.0, 2.0, " Привет."), _segment(1, 61.0, 63.5, " Мир.")]
+
+    def transcribe(audio, **options):
+        model.calls.append((audio, options))
+        return iter(model.segments), SimpleNamespace(language="ru")
+
+    model.calls = []
+    model.transcribe.side_effect = transcribe
+    whisper_model = MagicMock(return_value=model)
+    monkeypatch.setitem(sys.modules, "faster_whisper", SimpleNamespace(WhisperModel=whisper_model))
+    monkeypatch.setattr("src.services.cpu_engine.read_wav_pcm", lambda path: None)
+    monkeypatch.setattr("src.services.cpu_engine.get_audio_duration", lambda path: 64.0)
+    yield SimpleNamespace(model=model, WhisperModel=whisper_model)
+    CPUWhisperEngine.reset()
+
+
+def test_get_engine_cpu():
+    from src.services.whisper_engines import get_engine
+
+    assert type(get_engine("cpu")).__name__ == "CPUWhisperEngine"
+
+
+def test_cpu_fallback_for_omlx(monkeypatch):
+    from src.services import whisper_engines
+
+    monkeypatch.setattr(whisper_engines, "OMLX_FALLBACK_MECHANISM", "cpu")
+    monkeypatch.setattr(whisper_engines, "OMLX_FALLBACK_MODEL", "small")
+
+    engine = whisper_engines.get_fallback_engine("omlx")
+
+    assert engine.name == "cpu"
+    assert engine.resolve_model("vibevoice") == "small"
+
+
+def test_returns_unified_result(faster_whisper):
+    result = CPUWhisperEngine().transcribe("/tmp/a.wav", model="small", language="ru")
+
+    assert result["text"] == "[00:00]: Привет.\n[01:01]: Мир."
+    assert [s["id"] for s in result["segments"]] == [0, 1]
+    assert result["segments"][1]["start"] == 61.0
+    assert result["speaker_detected"] is False
+    assert result["raw_file"] is None
+    audio, options = faster_whisper.model.calls[0]
+    assert audio == "/tmp/a.wav"
+    assert (options["language"], options["task"], options["beam_size"]) == ("ru", "transcribe", 1)
+    assert "no_speech_threshold" not in options
+
+
+def test_model_is_loaded_once_with_cpu_settings(faster_whisper, monkeypatch):
+    monkeypatch.setattr("src.services.cpu_engine.CPU_WHISPER_THREADS", 6)
+
+    engine = CPUWhisperEngine()
+    engine.transcribe("/tmp/a.wav", model="large")
+    engine.transcribe("/tmp/b.wav", model="large")
+
+    faster_whisper.WhisperModel.assert_called_once()
+    args, kwargs = faster_whisper.WhisperModel.call_args
+    assert args[0] == "large-v3"
+    assert (kwargs["device"], kwargs["compute_type"], kwargs["cpu_threads"]) == ("cpu", "int8", 6)
+
+
+def test_word_timestamps_are_normalized(faster_whisper):
+    word = SimpleNamespace(word=" Привет.", start=0.1, end=0.9, probability=0.97)
+    faster_whisper.model.segments = [_segment(0, 0.0, 1.0, " Привет.", words=[word])]
+
+    result = CPUWhisperEngine().transcribe("/tmp/a.wav", word_timestamps=True)
+
+    assert result["segments"][0]["words"] == [
+        {"word": " Привет.", "start": 0.1, "end": 0.9, "probability": 0.97}
+    ]
+    assert faster_whisper.model.calls[0][1]["word_timestamps"] is True
+
+
+def test_abort_stops_between_segments(faster_whisper):
+    from src.services.whisper_engines import CancellationToken, TranscriptionCancelled
+
+    token = CancellationToken()
+    consumed = []
+
+    def segments():
+        for segment in [_segment(0, 0.0, 1.0, " раз"), _segment(1, 1.0, 2.0, " два")]:
+            consumed.append(segment.text)
+            token.cancel()
+            yield segment
+
+    faster_whisper.model.segments = segments()
+
+    with pytest.raises(TranscriptionCancelled):
+        CPUWhisperEngine().transcribe("/tmp/a.wav", cancel_token=token)
+    assert consumed == [" раз"]
+
+
+def test_missing_package_raises_import_error(monkeypatch):
+    CPUWhisperEngine.reset()
+    monkeypatch.setitem(sys.modules, "faster_whisper", None)
+    monkeypatch.setattr("src.services.cpu_engine.read_wav_pcm", lambda path: None)
+    monkeypatch.setattr("src.services.cpu_engine.get_audio_duration", lambda path: 1.0)
+
+    with pytest.raises(ImportError, match="pip install faster-whisper"):
+        CPUWhisperEngine().transcribe("/tmp/a.wav", model="small")
+
+
+def test_local_ctranslate2_model_is_preferred(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.services.cpu_engine.MODELS_DIR", str(tmp_path))
+    (tmp_path / "faster-whisper-small").mkdir()
+
+    assert cpu_model_path("small") == str(tmp_path / "faster-whisper-small")
+    assert cpu_model_path("turbo") == "large-v3-turbo"
+    assert cpu_model_path("medium") == "medium"
+
+
+def test_cpu_engine_imports_without_mlx():
+    """CPU-движок и маршрутизация импортируются на машине без MLX."""
+    import subprocess
+
+    code = (
+        "import sys\n"
+        "for name in ('mlx', 'mlx.core', 'mlx_whisper'):\n"
+        "    sys.modules[name] = None\n"
+        "from src.services.cpu_engine import CPUWhisperEngine\n"
+        "from src.services.whisper_engines import get_engine\n"
+        "assert get_engine('cpu').name == 'cpu'\n"
+    )
+    root = os.path.join(os.path.dirname(__file__), "..")
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
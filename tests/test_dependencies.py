@@ -0,0 +1,84 @@
+"""Тесты зависимостей аутентификации (src/api/dependencies.py)."""
+
+import asyncio
+import os
+import sys
+
+import pytest
+from fastapi import HTTPException
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.api import dependencies  # noqa: E402
+
+
+class TestVerifyAdminKey:
+    def test_rejects_when_no_admin_key_configured(self, monkeypatch):
+        monkeypatch.setattr(dependencies, "ADMIN_API_KEY", None)
+        monkeypatch.setattr(dependencies, "API_KEYS", {"t1": {"tenant": "acme"}})
+
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(dependencies.verify_admin_key("t1"))
+        assert exc.value.status_code == 403
+
+    def test_tenant_key_is_not_admin(self, monkeypatch):
+        monkeypatch.setattr(dependencies, "ADMIN_API_KEY", "root")
+        monkeypatch.setattr(dependencies, "API_KEYS", {"t1": {"tenant": "acme"}})
+
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(dependencies.verify_admin_key("t1"))
+        assert exc.value.status_code == 401
+
+    def test_accepts_admin_key(self, monkeypatch):
+        monkeypatch.setattr(dependencies, "ADMIN_API_KEY", "root")
+
+        assert asyncio.run(dependencies.verify_admin_key("root")) == "root"
+
+
+def test_retry_failed_chunks_is_scoped_to_tenant(monkeypatch):
+    from unittest.mock import MagicMock
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from src.api.router import router
+
+    monkeypatch.setattr(dependencies, "API_KEY", None)
+    monkeypatch.setattr(dependencies, "API_KEYS", {"k1": {"tenant": "acme"}, "k2": {"tenant": "other"}})
+    job_manager = MagicMock()
+    job_manager.return_value.load.return_value = {"tenant": "acme", "status": "failed"}
+    monkeypatch.setattr("src.services.job_manager.JobManager", job_manager)
+    service = MagicMock()
+    service.return_value.retry_failed_chunks.return_value = True
+    monkeypatch.setattr("src.services.transcription_service.TranscriptionService", service)
+    monkeypatch.setattr(
+        "src.services.transcription_queue.get_transcription_manager", lambda: MagicMock()
+    )
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    url = "/api/v1/jobs/job-1/retry-failed-chunks"
+
+    assert client.post(url).status_code == 401
+    assert client.post(url, headers={"X-API-Key": "k2"}).status_code == 404
+    service.return_value.retry_failed_chunks.assert_not_called()
+    assert client.post(url, headers={"X-API-Key": "k1"}).status_code == 200
+    service.return_value.retry_failed_chunks.assert_called_once_with("job-1")
+
+
+class TestResolveTenant:
+    def test_keyless_request_rejected_when_keys_configured(self, monkeypatch):
+        monkeypatch.setattr(dependencies, "API_KEY", None)
+        monkeypatch.setattr(dependencies, "API_KEYS", {"k1": {"tenant": "acme"}})
+        monkeypatch.setattr(dependencies, "TENANT_ALLOW_ANONYMOUS", False)
+
+        assert dependencies.resolve_tenant(None) is None
+
+    def test_keyless_request_maps_to_default_when_allowed(self, monkeypatch):
+        monkeypatch.setattr(dependencies, "API_KEY", None)
+        monkeypatch.setattr(dependencies, "API_KEYS", {"k1": {"tenant": "acme"}})
+        monkeypatch.setattr(dependencies, "TENANT_ALLOW_ANONYMOUS", True)
+
+        assert dependencies.resolve_tenant(None) == dependencies.DEFAULT_TENANT
+        assert dependencies.resolve_tenant("k1") == "acme"
+        assert dependencies.resolve_tenant("wrong") is None
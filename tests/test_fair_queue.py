@@ -0,0 +1,160 @@
+"""Тесты для FairQueue (weighted fair-share по тенантам)."""
+
+import os
+import sys
+import threading
+from dataclasses import dataclass
+from queue import Empty, Full
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+@dataclass
+class _Item:
+    name: str
+    tenant: str
+
+
+def _make_queue(maxsize=0, **policies):
+    from src.services.fair_queue import FairQueue, TenantPolicy
+
+    return FairQueue(
+        maxsize=maxsize,
+        policies={"default": TenantPolicy(), **{k: TenantPolicy(**v) for k, v in policies.items()}},
+    )
+
+
+def test_bulk_tenant_does_not_starve_others():
+    """Тенант с 10 задачами не блокирует задачу другого тенанта."""
+    q = _make_queue()
+    for i in range(10):
+        q.put_nowait(_Item(f"bulk-{i}", "bulk"))
+    q.put_nowait(_Item("small-0", "small"))
+
+    first_two = {q.get_nowait().tenant, q.get_nowait().tenant}
+    assert first_two == {"bulk", "small"}
+
+
+def test_weights_control_dispatch_share():
+    """Тенант с весом 3 получает втрое больше слотов, чем тенант с весом 1."""
+    q = _make_queue(heavy={"weight": 3.0}, light={"weight": 1.0})
+    for i in range(12):
+        q.put_nowait(_Item(f"h-{i}", "heavy"))
+        q.put_nowait(_Item(f"l-{i}", "light"))
+
+    order = [q.get_nowait().tenant for _ in range(8)]
+    assert order.count("heavy") == 6
+    assert order.count("light") == 2
+
+
+def test_fifo_within_tenant():
+    q = _make_queue()
+    for i in range(3):
+        q.put_nowait(_Item(f"job-{i}", "a"))
+    assert [q.get_nowait().name for _ in range(3)] == ["job-0", "job-1", "job-2"]
+
+
+def test_concurrency_cap_skips_tenant_until_release():
+    """При исчерпании max_concurrent задачи тенанта не выдаются до release()."""
+    q = _make_queue(capped={"max_concurrent": 1})
+    q.put_nowait(_Item("c-0", "capped"))
+    q.put_nowait(_Item("c-1", "capped"))
+
+    assert q.get_nowait().name == "c-0"
+    with pytest.raises(Empty):
+        q.get(timeout=0.05)
+
+    q.release("capped")
+    assert q.get_nowait().name == "c-1"
+
+
+def test_queue_quota_rejects_with_full():
+    from src.services.fair_queue import TenantQuotaExceeded
+
+    q = _make_queue(quota={"max_queued": 2})
+    q.put_nowait(_Item("q-0", "quota"))
+    q.put_nowait(_Item("q-1", "quota"))
+    with pytest.raises(TenantQuotaExceeded):
+        q.put_nowait(_Item("q-2", "quota"))
+    # Другие тенанты не затронуты квотой
+    q.put_nowait(_Item("other", "default"))
+    assert issubclass(TenantQuotaExceeded, Full)
+
+
+def test_queue_quota_holds_under_concurrent_puts():
+    """Проверка квоты и вставка атомарны: параллельные put не превышают max_queued."""
+    from src.services.fair_queue import TenantQuotaExceeded
+
+    q = _make_queue(quota={"max_queued": 3})
+    barrier = threading.Barrier(16)
+    rejected = []
+
+    def submit(i):
+        barrier.wait()
+        try:
+            q.put(_Item(f"q-{i}", "quota"))
+        except TenantQuotaExceeded:
+            rejected.append(i)
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert q.qsize() == 3
+    assert len(rejected) == 13
+    assert q.unfinished_tasks == 3
+
+
+def test_stats_report_depth_and_wait():
+    q = _make_queue()
+    q.put_nowait(_Item("a-0", "a"))
+    q.put_nowait(_Item("a-1", "a"))
+    q.get_nowait()
+
+    stats = q.stats()["a"]
+    assert stats["queued"] == 1
+    assert stats["running"] == 1
+    assert stats["dispatched"] == 1
+    assert stats["avg_wait_sec"] >= 0.0
+
+
+def test_parse_api_keys():
+    from src.config import _parse_api_keys
+
+    keys = _parse_api_keys("k1:team-a:2:1:5|k2:team-b|broken")
+    assert keys["k1"] == {"tenant": "team-a", "weight": 2.0, "max_concurrent": 1, "max_queued": 5}
+    assert keys["k2"]["tenant"] == "team-b"
+    assert "broken" not in keys
+
+
+def test_eligible_respects_concurrency_cap():
+    q = _make_queue(capped={"max_concurrent": 1})
+    for i in range(3):
+        q.put_nowait(_Item(f"c-{i}", "capped"))
+    q.put_nowait(_Item("free-0", "free"))
+    assert q.eligible() == 2
+
+    q.get_nowait()
+    q.get_nowait()
+    # Слот capped занят — его оставшиеся задачи выдать нельзя
+    assert q.eligible() == 0
+
+
+def test_get_matching_takes_only_matching_heads():
+    q = _make_queue(capped={"max_concurrent": 1})
+    q.put_nowait(_Item("short-a", "a"))
+    q.put_nowait(_Item("long-b", "b"))
+    q.put_nowait(_Item("short-b", "b"))
+    q.put_nowait(_Item("short-c1", "capped"))
+    q.put_nowait(_Item("short-c2", "capped"))
+
+    taken = q.get_matching(lambda item: item.name.startswith("short"), limit=5)
+
+    # short-b стоит за неподходящей головой (FIFO тенанта), short-c2 — сверх max_concurrent
+    assert sorted(item.name for item in taken) == ["short-a", "short-c1"]
+    assert q.qsize() == 3
+    assert q.get_matching(lambda item: True, limit=1)[0].name == "long-b"
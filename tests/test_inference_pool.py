@@ -0,0 +1,266 @@
+"""Тесты пула процессов инференса: настоящие spawn-процессы с тестовым обработчиком."""
+
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services import inference_pool  # noqa: E402
+from src.services.inference_pool import (  # noqa: E402
+    InferencePool,
+    InferenceWorkerCrashed,
+    PooledEngine,
+)
+from src.services.whisper_engines import CancellationToken, TranscriptionCancelled  # noqa: E402
+
+
+def _handler(mechanism, model, file_path, params, cancel_token):
+    """Обработчик в процессе инференса: поведение задаётся file_path."""
+    if file_path == "boom":
+        raise ValueError("bad audio")
+    if file_path == "crash":
+        os._exit(3)
+    if file_path == "wait":
+        # Кооперативная отмена: движок видит токен процесса
+        cancel_token.wait(30)
+        cancel_token.raise_if_cancelled()
+    if file_path == "hang":
+        time.sleep(30)
+    return {"pid": os.getpid(), "mechanism": mechanism, "model": model, "params": params}
+
+
+@pytest.fixture(scope="module")
+def shared_pool():
+    # Запуск процесса (spawn + импорт src) занимает секунды — пул общий на модуль
+    pool = InferencePool(processes=1, max_jobs=0, max_rss_mb=0, handler=_handler)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.fixture
+def pool(shared_pool):
+    shared_pool._max_jobs = 0
+    shared_pool._max_rss_mb = 0
+    return shared_pool
+
+
+def _pid(pool):
+    return pool.run("whisper", None, "ok", {})["pid"]
+
+
+def test_jobs_run_in_long_lived_process(pool):
+    first = pool.run("whisper", "small", "ok", {"language": "ru"})
+    second = pool.run("cpu", None, "ok", {})
+
+    assert first["pid"] != os.getpid()
+    assert first["pid"] == second["pid"]
+    assert first["params"] == {"language": "ru"}
+    assert (second["mechanism"], second["model"]) == ("cpu", None)
+    worker = pool.get_stats()["workers"][0]
+    assert worker["jobs"] >= 2
+    assert worker["rss_mb"] > 0
+
+
+def test_engine_error_is_propagated_and_worker_kept(pool):
+    pid = _pid(pool)
+
+    with pytest.raises(ValueError, match="bad audio"):
+        pool.run("whisper", None, "boom", {})
+
+    assert _pid(pool) == pid
+
+
+def test_crash_fails_job_and_restarts_worker(pool):
+    pid = _pid(pool)
+    crashed = pool.get_stats()["crashed"]
+
+    with pytest.raises(InferenceWorkerCrashed, match="exit code 3"):
+        pool.run("whisper", None, "crash", {})
+
+    assert _pid(pool) != pid
+    assert pool.get_stats()["crashed"] == crashed + 1
+
+
+def test_worker_is_recycled_after_max_jobs(pool):
+    pid = _pid(pool)
+    recycled = pool.get_stats()["recycled"]
+    pool._max_jobs = pool.get_stats()["workers"][0]["jobs"] + 1
+
+    assert _pid(pool) == pid
+    assert _pid(pool) != pid
+    assert pool.get_stats()["recycled"] == recycled + 1
+
+
+def test_recycle_above_rss_threshold(monkeypatch):
+    pool = InferencePool(processes=1, max_jobs=0, max_rss_mb=100, handler=_handler)
+    replaced = []
+    monkeypatch.setattr(pool, "_replace", lambda worker, kind: replaced.append(kind))
+    worker = SimpleNamespace(busy=True, jobs=1, rss=50 * 1024 * 1024, process=SimpleNamespace(pid=1))
+
+    pool._release(worker)
+    assert pool._idle.get_nowait() is worker
+    worker.rss = 200 * 1024 * 1024
+    pool._release(worker)
+
+    assert replaced == ["recycled"]
+    assert pool._idle.empty()
+
+
+def test_cancel_is_forwarded_then_unresponsive_worker_is_killed(pool, monkeypatch):
+    pid = _pid(pool)
+    token = CancellationToken()
+    threading.Timer(0.3, token.cancel).start()
+
+    with pytest.raises(TranscriptionCancelled):
+        pool.run("whisper", None, "wait", {}, cancel_token=token)
+    # Кооперативная отмена: процесс остановил задачу сам и остался в пуле
+    assert _pid(pool) == pid
+
+    monkeypatch.setattr(inference_pool, "_ABORT_GRACE_SEC", 0.5)
+    killed = pool.get_stats()["killed"]
+    token = CancellationToken()
+    threading.Timer(0.3, token.cancel, args=("timeout",)).start()
+
+    with pytest.raises(TranscriptionCancelled, match="timeout"):
+        pool.run("whisper", None, "hang", {}, cancel_token=token)
+
+    assert pool.get_stats()["killed"] == killed + 1
+    assert _pid(pool) != pid
+
+
+def test_pooled_engine_routes_through_pool(monkeypatch):
+    calls = []
+
+    class _Pool:
+        def run(self, mechanism, model, file_path, params, cancel_token):
+            calls.append((mechanism, model, file_path, params, cancel_token))
+            return {"text": "ok"}
+
+    monkeypatch.setattr(inference_pool, "get_inference_pool", lambda: _Pool())
+    token = CancellationToken()
+
+    engine = PooledEngine("cpu", model="small")
+    result = engine.transcribe("/tmp/a.wav", language="ru", cancel_token=token)
+
+    assert result == {"text": "ok"}
+    assert calls == [("cpu", "small", "/tmp/a.wav", {"language": "ru"}, token)]
+    assert engine.name == "cpu"
+    assert engine.resolve_model("turbo") == "small"
+
+
+def test_get_engine_uses_pool_when_enabled(monkeypatch):
+    from src.services import whisper_engines
+
+    assert type(whisper_engines.get_engine("whisper")).__name__ == "WhisperEngine"
+
+    monkeypatch.setattr(whisper_engines, "INFERENCE_PROCESS_POOL", True)
+    monkeypatch.setattr(whisper_engines, "OMLX_FALLBACK_MECHANISM", "whisper")
+    monkeypatch.setattr(whisper_engines, "OMLX_FALLBACK_MODEL", "turbo")
+
+    assert isinstance(whisper_engines.get_engine("whisper"), PooledEngine)
+    assert whisper_engines.get_engine("cpu").name == "cpu"
+    fallback = whisper_engines.get_fallback_engine("omlx")
+    assert isinstance(fallback, PooledEngine)
+    assert fallback.resolve_model("vibevoice") == "turbo"
+    assert type(whisper_engines.create_local_engine("whisper")).__name__ == "WhisperEngine"
+
+
+def test_query_reaches_every_worker(pool):
+    pid = _pid(pool)
+
+    (reply,) = pool.query("warmup")
+    assert reply == {"pid": pid, "result": {"ready": True, "models": {}}}
+    (reply,) = pool.query("no-such-query")
+    assert "no-such-query" in reply["error"]
+
+
+def test_warmup_status_is_ready_while_any_worker_is_warm(monkeypatch):
+    pool = InferencePool(processes=2, handler=_handler)
+    replies = [
+        {"pid": 1, "result": {"ready": True, "models": {"turbo": {"state": "ready"}}}},
+        {"pid": 2, "result": {"ready": False, "models": {"turbo": {"state": "loading"}}}},
+    ]
+    monkeypatch.setattr(pool, "query", lambda name: [dict(reply) for reply in replies])
+
+    status = pool.get_warmup_status()
+    assert status["ready"] is True
+    assert [worker["ready"] for worker in status["workers"]] == [True, False]
+
+    replies[0] = {"pid": 1, "error": "Inference worker pid=1 did not answer 'warmup' in 2.0s"}
+    status = pool.get_warmup_status()
+    assert status["ready"] is False
+    assert status["workers"][0]["models"] == {}
+
+
+def test_health_ready_uses_pool_warm_state(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from src.api.router import router
+
+    status = {"ready": False, "workers": [{"pid": 7, "ready": False, "models": {}}]}
+    # src.api.router как атрибут пакета — это APIRouter, модуль берётся из sys.modules
+    monkeypatch.setattr(sys.modules["src.api.router"], "INFERENCE_PROCESS_POOL", True)
+    monkeypatch.setattr(
+        inference_pool, "get_inference_pool", lambda: SimpleNamespace(get_warmup_status=lambda: status)
+    )
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+
+    response = client.get("/api/v1/health/ready")
+    assert response.status_code == 503
+    assert response.json()["workers"][0]["pid"] == 7
+    status["ready"] = True
+    assert client.get("/api/v1/health/ready").status_code == 200
+
+
+def test_cache_stats_come_from_worker_process(pool):
+    (reply,) = pool.query("cache_stats")
+
+    assert reply["pid"] != os.getpid()
+    assert reply["result"]["count"] == 0
+
+
+def test_cache_endpoints_are_forwarded_to_workers(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from src.api.router import router
+
+    calls = []
+
+    def query(name, *args, timeout=None):
+        calls.append((name, args, timeout))
+        if name == "cache_stats":
+            return [{"pid": 7, "result": {"count": 1}}, {"pid": 8, "result": {"count": 0}}]
+        if name == "whisper_stats":
+            return [{"pid": 7, "error": "Inference worker pid=7 died"}]
+        return [{"pid": 7, "result": None}]
+
+    monkeypatch.setattr(sys.modules["src.api.router"], "INFERENCE_PROCESS_POOL", True)
+    monkeypatch.setattr(inference_pool, "get_inference_pool", lambda: SimpleNamespace(query=query))
+    monkeypatch.setattr(
+        "src.models.model_registry.ModelRegistry.resolve", lambda self, name: f"models/whisper-{name}"
+    )
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+
+    assert client.get("/api/v1/cache/models").json() == {
+        "workers": [{"pid": 7, "count": 1}, {"pid": 8, "count": 0}]
+    }
+    response = client.post("/api/v1/cache/preload", params={"model": "turbo"})
+    assert response.status_code == 200
+    assert response.json()["workers"] == [7]
+    assert ("preload", ("turbo", "models/whisper-turbo"), None) in calls
+    assert client.post("/api/v1/cache/clear").status_code == 200
+    assert calls[-1][0] == "cache_clear"
+    response = client.get("/api/v1/whisper/stats")
+    assert response.status_code == 500
+    assert "pid=7" in response.json()["detail"]
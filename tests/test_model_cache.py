@@ -0,0 +1,110 @@
+"""Тесты для ModelCache: LRU-вытеснение по бюджету памяти и статистика."""
+
+import os
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    """Кэш с бюджетом 100 МБ; загрузка весов подменена, размер модели — её атрибут size."""
+    import src.models.model_cache as cache_module
+    from src.models.model_cache import ModelCache
+
+    loads = []
+
+    def fake_load(model_path, dtype, quantization=None):
+        loads.append((model_path, dtype))
+        return MagicMock(size=int(model_path.rsplit("-", 1)[1]) * MB)
+
+    monkeypatch.setattr(cache_module, "MODEL_CACHE_MAX_MB", 100)
+    monkeypatch.setattr(cache_module, "_load_weights", fake_load)
+    monkeypatch.setattr(cache_module, "_model_nbytes", lambda model: model.size)
+    ModelCache.reset()
+    instance = ModelCache.get_instance()
+    instance.loads = loads
+    yield instance
+    ModelCache.reset()
+
+
+def test_hit_returns_same_instance_without_reload(cache):
+    first = cache.load_model("turbo", "models/whisper-40")
+    second = cache.load_model("turbo", "models/whisper-40")
+
+    assert first is second
+    assert cache.loads == [("models/whisper-40", "float16")]
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+    assert stats["models"][0]["size_mb"] == 40.0
+
+
+def test_models_are_keyed_by_dtype(cache):
+    half = cache.load_model("turbo", "models/whisper-10")
+    full = cache.load_model("turbo", "models/whisper-10", dtype="float32")
+
+    assert half is not full
+    assert cache.get_model("turbo", "float32") is full
+    assert cache.get_stats()["loaded_models"] == ["turbo", "turbo"]
+
+
+def test_least_recently_used_model_is_evicted_over_budget(cache):
+    cache.load_model("small", "models/whisper-40")
+    cache.load_model("medium", "models/whisper-50")
+    cache.load_model("small", "models/whisper-40")  # small становится последним использованным
+    cache.load_model("large", "models/whisper-30")
+
+    assert cache.get_model("medium") is None
+    assert cache.get_model("small") is not None
+    stats = cache.get_stats()
+    assert stats["loaded_models"] == ["small", "large"]
+    assert stats["evictions"] == 1
+    assert stats["memory_mb"] == 70.0
+
+
+def test_model_larger_than_budget_is_kept_alone(cache):
+    cache.load_model("small", "models/whisper-40")
+    huge = cache.load_model("large", "models/whisper-150")
+
+    assert cache.get_stats()["loaded_models"] == ["large"]
+    assert cache.get_model("large") is huge
+
+
+def test_activate_binds_model_to_mlx_whisper(cache):
+    from mlx_whisper.transcribe import ModelHolder
+
+    model = cache.activate("turbo", "models/whisper-20")
+    try:
+        assert ModelHolder.model is model
+        assert ModelHolder.model_path == "models/whisper-20"
+
+        cache.clear_model("turbo")
+        assert ModelHolder.model is None
+    finally:
+        ModelHolder.model = None
+        ModelHolder.model_path = None
+
+
+def test_stats_report_quantization_and_rtf(cache, monkeypatch):
+    import src.models.model_cache as cache_module
+
+    monkeypatch.setattr(
+        cache_module, "quantization_for",
+        lambda name: {"bits": 4, "group_size": 64} if name == "large" else None,
+    )
+    cache.load_model("large", "models/whisper-30")
+    cache.load_model("small", "models/whisper-10")
+    cache.record_run("large", audio_sec=60.0, elapsed_sec=6.0)
+    cache.record_run("large", audio_sec=40.0, elapsed_sec=4.0)
+    cache.record_run("small", audio_sec=None, elapsed_sec=1.0)
+
+    models = {entry["name"]: entry for entry in cache.get_stats()["models"]}
+    assert models["large"]["quantization"] == {"bits": 4, "group_size": 64}
+    assert models["large"]["rtf"] == 0.1
+    assert models["small"]["quantization"] is None
+    assert models["small"]["rtf"] is None
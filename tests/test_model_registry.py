@@ -0,0 +1,184 @@
+"""Тесты для ModelRegistry: сканирование MODELS_DIR, резолв путей, загрузка весов."""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+TINY_DIMS = {
+    "n_mels": 8,
+    "n_audio_ctx": 4,
+    "n_audio_state": 8,
+    "n_audio_head": 2,
+    "n_audio_layer": 1,
+    "n_vocab": 16,
+    "n_text_ctx": 4,
+    "n_text_state": 8,
+    "n_text_head": 2,
+    "n_text_layer": 1,
+}
+
+
+def _make_model(models_dir, dirname, dtype="float32"):
+    """Каталог модели с config.json и весами крошечного Whisper."""
+    import mlx.core as mx
+    from mlx.utils import tree_flatten
+    from mlx_whisper import whisper
+
+    model = whisper.Whisper(whisper.ModelDimensions(**TINY_DIMS), getattr(mx, dtype))
+    model_dir = os.path.join(models_dir, dirname)
+    os.makedirs(model_dir)
+    with open(os.path.join(model_dir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump({"model_type": "whisper", **TINY_DIMS}, f)
+    weights = {name: value.astype(getattr(mx, dtype)) for name, value in tree_flatten(model.parameters())}
+    mx.save_safetensors(os.path.join(model_dir, "weights.safetensors"), weights)
+    return model_dir
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    import src.models.model_registry as registry_module
+    from src.models.model_registry import ModelRegistry
+
+    monkeypatch.setattr(registry_module, "MODELS_DIR", str(tmp_path))
+    ModelRegistry.reset()
+    yield ModelRegistry.get_instance()
+    ModelRegistry.reset()
+
+
+def test_scan_records_model_metadata(registry, tmp_path):
+    model_dir = _make_model(str(tmp_path), "whisper-tiny", dtype="float16")
+    os.makedirs(tmp_path / "not-a-model")
+
+    models = registry.list()
+
+    assert len(models) == 1
+    info = models[0]
+    assert info["name"] == "tiny"
+    assert info["path"] == model_dir
+    assert info["architecture"] == "whisper"
+    assert info["dtype"] == "float16"
+    assert info["dims"]["n_text_layer"] == 1
+    assert info["size_bytes"] == os.path.getsize(os.path.join(model_dir, "weights.safetensors"))
+
+
+def test_resolve_by_alias_directory_and_hub_fallback(registry, tmp_path):
+    model_dir = _make_model(str(tmp_path), "whisper-tiny")
+
+    assert registry.resolve("tiny") == model_dir
+    assert registry.resolve("whisper-tiny") == model_dir
+    assert registry.resolve("large") == "mlx-community/whisper-large"
+
+
+def test_resolve_rejects_unknown_remote_model(registry, tmp_path):
+    _make_model(str(tmp_path), "whisper-large-v3-q4")
+
+    assert registry.resolve("large-v3-q4").endswith("whisper-large-v3-q4")
+    with pytest.raises(ValueError, match="Unknown model 'no-such'"):
+        registry.resolve("no-such")
+
+
+def test_directory_is_scanned_once(registry, tmp_path):
+    registry.scan()
+    _make_model(str(tmp_path), "whisper-tiny")
+
+    assert registry.get("tiny") is None
+    registry.scan(force=True)
+    assert registry.get("tiny") is not None
+
+
+def test_load_whisper_model_casts_local_weights(registry, tmp_path):
+    import mlx.core as mx
+    from mlx.utils import tree_flatten
+    from mlx_whisper.load_models import load_model
+    from src.models.model_registry import load_whisper_model
+
+    model_dir = _make_model(str(tmp_path), "whisper-tiny")
+
+    # Штатный загрузчик оставляет веса в dtype файла (float32)
+    model = load_whisper_model(model_dir, "float16")
+    reference = load_model(model_dir, dtype=mx.float16)
+
+    params = dict(tree_flatten(model.parameters()))
+    expected = dict(tree_flatten(reference.parameters()))
+    assert params.keys() == expected.keys()
+    for name, value in params.items():
+        assert value.dtype == mx.float16
+        assert mx.array_equal(value, expected[name].astype(mx.float16)).item()
+
+
+QUANT_DIMS = {**TINY_DIMS, "n_audio_state": 64, "n_text_state": 64}
+
+
+def _make_quantizable_model(models_dir, dirname):
+    """Модель с размерностями, кратными group_size квантования."""
+    import mlx.core as mx
+    from mlx.utils import tree_flatten
+    from mlx_whisper import whisper
+
+    model = whisper.Whisper(whisper.ModelDimensions(**QUANT_DIMS), mx.float32)
+    model_dir = os.path.join(models_dir, dirname)
+    os.makedirs(model_dir)
+    with open(os.path.join(model_dir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump({"model_type": "whisper", **QUANT_DIMS}, f)
+    mx.save_safetensors(
+        os.path.join(model_dir, "weights.safetensors"), dict(tree_flatten(model.parameters()))
+    )
+    return model_dir
+
+
+def test_parse_model_quantization():
+    from src.config import _parse_model_quantization
+
+    assert _parse_model_quantization("large:4:32|turbo:8| |bad") == {
+        "large": {"bits": 4, "group_size": 32},
+        "turbo": {"bits": 8, "group_size": 64},
+    }
+
+
+def test_registry_records_requested_quantization(registry, tmp_path, monkeypatch):
+    import src.models.model_registry as registry_module
+
+    monkeypatch.setattr(
+        registry_module,
+        "MODEL_QUANTIZATION",
+        {"tiny": {"bits": 4, "group_size": 64}, "base": {"bits": 5, "group_size": 64}},
+    )
+    _make_model(str(tmp_path), "whisper-tiny")
+    _make_model(str(tmp_path), "whisper-base")
+
+    assert registry.get("tiny").quantize == {"bits": 4, "group_size": 64}
+    assert registry.get("base").quantize is None
+
+
+def test_quantized_weights_are_persisted_and_reused(registry, tmp_path, monkeypatch):
+    import mlx.core as mx
+    import mlx.nn as nn
+    from mlx.utils import tree_flatten
+
+    import src.models.model_registry as registry_module
+    from src.models.model_registry import load_whisper_model, quantized_dir
+
+    model_dir = _make_quantizable_model(str(tmp_path), "whisper-tiny")
+    spec = {"bits": 4, "group_size": 64}
+
+    first = load_whisper_model(model_dir, "float16", spec)
+
+    assert isinstance(first.decoder.blocks[0].mlp1, nn.QuantizedLinear)
+    saved = quantized_dir(model_dir, spec)
+    with open(os.path.join(saved, "config.json"), encoding="utf-8") as f:
+        assert json.load(f)["quantization"] == {"group_size": 64, "bits": 4}
+    # Каталог квантованных весов не становится отдельной моделью реестра
+    assert [info["name"] for info in registry_module.ModelRegistry.get_instance().list()] == ["tiny"]
+
+    monkeypatch.setattr(
+        registry_module, "_quantize", lambda *a: pytest.fail("weights must come from disk")
+    )
+    second = load_whisper_model(model_dir, "float16", spec)
+
+    expected = dict(tree_flatten(first.parameters()))
+    for name, value in tree_flatten(second.parameters()):
+        assert mx.array_equal(value, expected[name]).item(), name
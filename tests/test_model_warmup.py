@@ -0,0 +1,125 @@
+"""Тесты для ModelWarmup: фоновый прогрев, ожидание модели, /health/ready."""
+
+import os
+import sys
+import threading
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+@pytest.fixture
+def warmup():
+    from src.services.model_warmup import ModelWarmup
+
+    ModelWarmup.reset()
+    yield ModelWarmup.get_instance()
+    ModelWarmup.reset()
+
+
+@pytest.fixture
+def gate():
+    """Прогрев каждой модели ждёт, пока тест не откроет gate; модель 'broken' падает."""
+    from src.services.model_warmup import ModelWarmup
+
+    release = threading.Event()
+
+    def fake_warm(name):
+        assert release.wait(5)
+        if name == "broken":
+            raise RuntimeError("no weights")
+
+    with patch.object(ModelWarmup, "_warm", staticmethod(fake_warm)):
+        yield release
+
+
+def test_wait_ready_blocks_until_model_is_warm(warmup, gate):
+    warmup.start(["turbo"])
+    assert warmup.get_status()["turbo"]["state"] in ("pending", "loading")
+    assert warmup.wait_ready("turbo", timeout=0.3) is False
+    assert not warmup.is_ready()
+
+    gate.set()
+    assert warmup.wait_ready("turbo", timeout=5) is True
+    status = warmup.get_status()["turbo"]
+    assert status["state"] == "ready"
+    assert status["warmup_sec"] is not None
+    assert warmup.is_ready()
+
+
+def test_model_outside_warmup_does_not_wait(warmup, gate):
+    warmup.start(["turbo"])
+
+    assert warmup.wait_ready("small", timeout=0.1) is True
+    gate.set()
+
+
+def test_failed_warmup_releases_waiters(warmup, gate):
+    warmup.start(["broken"])
+    gate.set()
+
+    assert warmup.wait_ready("broken", timeout=5) is True
+    status = warmup.get_status()["broken"]
+    assert status["state"] == "failed"
+    assert status["error"] == "no weights"
+
+
+def test_wait_ready_raises_on_cancel(warmup, gate):
+    from src.services.whisper_engines import CancellationToken, TranscriptionCancelled
+
+    token = CancellationToken()
+    token.cancel()
+    warmup.start(["turbo"])
+    try:
+        with pytest.raises(TranscriptionCancelled):
+            warmup.wait_ready("turbo", cancel_token=token)
+    finally:
+        gate.set()
+
+
+def test_warm_runs_dummy_decode_under_mlx_lock(warmup):
+    import src.services.model_warmup as warmup_module
+    from src.services.whisper_engines import MLX_LOCK
+
+    calls = []
+
+    def fake_transcribe(audio, path_or_hf_repo, **options):
+        calls.append((audio.shape, path_or_hf_repo, MLX_LOCK.locked(), options["language"]))
+        return {"text": "", "segments": []}
+
+    with (
+        patch.object(warmup_module, "_mlx_transcribe", side_effect=fake_transcribe),
+        patch.object(warmup_module.ModelCache, "get_instance") as get_cache,
+        patch.object(warmup_module.ModelRegistry, "get_instance") as get_registry,
+    ):
+        get_registry.return_value.resolve.return_value = "models/whisper-turbo"
+        warmup.start(["turbo"])
+        assert warmup.wait_ready("turbo", timeout=5)
+
+    get_cache.return_value.activate.assert_called_once_with("turbo", "models/whisper-turbo")
+    assert calls == [((16000,), "models/whisper-turbo", True, "en")]
+    assert warmup.get_status()["turbo"]["state"] == "ready"
+
+
+def test_health_ready_reports_warm_state(warmup, gate):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from src.api.router import router
+
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    warmup.start(["turbo"])
+
+    response = client.get("/api/v1/health/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "warming_up"
+    assert client.get("/api/v1/health/live").status_code == 200
+
+    gate.set()
+    warmup.wait_ready("turbo", timeout=5)
+    response = client.get("/api/v1/health/ready")
+    assert response.status_code == 200
+    assert response.json()["models"]["turbo"]["state"] == "ready"
@@ -608,3 +608,897 @@ class TestSplitAndTranscribe:
 
             # Должен быть 1 чанк
             assert len(captured_segments) == 1
+
+
+# =============================================================================
+# TestCancellation
+# =============================================================================
+
+class TestCancellation:
+    """Отмена через cancel_token в OMLXEngine."""
+
+    def test_cancel_aborts_in_flight_request(self):
+        """Отмена обрывает зависший HTTP-запрос за секунды, а не по timeout."""
+        import threading
+        import time
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        import src.services.omlx_engine as omlx_module
+        from src.services.omlx_engine import OMLXEngine
+        from src.services.whisper_engines import CancellationToken, TranscriptionCancelled
+
+        class SlowHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                time.sleep(30)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+        engine = OMLXEngine()
+        engine._cancel_token = CancellationToken()
+        threading.Timer(0.5, engine._cancel_token.cancel).start()
+        try:
+            with patch.object(omlx_module, "OMLX_BASE_URL", base_url):
+                started = time.monotonic()
+                with pytest.raises(TranscriptionCancelled):
+                    engine._transcribe_segment(b"RIFF")
+                assert time.monotonic() - started < 5
+        finally:
+            server.shutdown()
+
+    def test_split_checks_token_between_chunks(self):
+        """Отменённый токен останавливает разбивку до отправки следующего чанка."""
+        from pydub import AudioSegment
+        from src.services.omlx_engine import OMLXEngine
+        from src.services.whisper_engines import CancellationToken, TranscriptionCancelled
+
+        engine = OMLXEngine()
+        engine._cancel_token = CancellationToken()
+        engine._cancel_token.cancel()
+
+        mock_audio = MagicMock()
+        mock_audio.frame_rate = 44100
+        mock_audio.channels = 1
+        mock_audio.sample_width = 2
+        mock_audio.raw_data = (b"\xe8\x03" * 100)
+        mock_audio.__getitem__ = lambda self, key: AudioSegment.empty()
+
+        with patch("pydub.AudioSegment.from_file", return_value=mock_audio):
+            engine._transcribe_segment = MagicMock()
+            with pytest.raises(TranscriptionCancelled):
+                engine._split_and_transcribe("/tmp/test.wav")
+            engine._transcribe_segment.assert_not_called()
+
+
+class TestCheckpointResume:
+    """Сохранение готовых чанков и resume split-транскрипции."""
+
+    @staticmethod
+    def _mock_audio():
+        from pydub import AudioSegment
+
+        mock_audio = MagicMock()
+        mock_audio.__getitem__ = lambda self, key: AudioSegment.empty()
+        return mock_audio
+
+    @staticmethod
+    def _segment_result(text):
+        return {"segments": [{"start": 0.0, "end": 0.5, "text": text, "speaker": 0}],
+                "text": text, "raw_response": None}
+
+    def test_resume_sends_only_missing_chunks(self, tmp_path):
+        import src.services.omlx_engine as omlx_module
+        from src.services.omlx_engine import OMLXEngine
+        from src.services.whisper_engines import CancellationToken, TranscriptionCancelled
+
+        checkpoint_dir = str(tmp_path / "chunks")
+        calls = []
+
+        def first_run(audio_bytes, language=None, model=None):
+            calls.append(len(calls))
+            if len(calls) == 2:
+                # Остановка после второго чанка (drain между чанками)
+                engine._cancel_token.cancel("drain")
+            return self._segment_result(f"chunk-{len(calls) - 1}")
+
+        engine = OMLXEngine()
+        engine._cancel_token = CancellationToken()
+        engine._checkpoint_dir = checkpoint_dir
+        with (
+            patch("pydub.AudioSegment.from_file", return_value=self._mock_audio()),
+            patch.object(omlx_module, "_detect_silence_chunks", return_value=[(0, 3000)]),
+            patch.object(omlx_module, "OMLX_MAX_AUDIO_DURATION_SEC", 1),
+        ):
+            engine._transcribe_segment = MagicMock(side_effect=first_run)
+            with pytest.raises(TranscriptionCancelled):
+                engine._split_and_transcribe("/tmp/test.wav")
+            assert sorted(p.name for p in (tmp_path / "chunks").iterdir()) == [
+                "chunk_0000.json", "chunk_0001.json", "plan.json"
+            ]
+
+            resumed = OMLXEngine()
+            resumed._checkpoint_dir = checkpoint_dir
+            resumed._transcribe_segment = MagicMock(return_value=self._segment_result("chunk-2"))
+            # План берётся из checkpoint, нарезка заново не выполняется
+            with patch.object(omlx_module, "_detect_silence_chunks") as detect:
+                result = resumed._split_and_transcribe("/tmp/test.wav")
+                detect.assert_not_called()
+
+        resumed._transcribe_segment.assert_called_once()
+        assert [s["text"] for s in result["segments"]] == ["chunk-0", "chunk-1", "chunk-2"]
+        assert [s["start"] for s in result["segments"]] == [0.0, 1.0, 2.0]
+
+    def test_drain_does_not_abort_in_flight_request(self):
+        from src.services.whisper_engines import CancellationToken
+
+        token = CancellationToken()
+        token.cancel("drain")
+        assert token.cancelled is True
+        assert token.aborted is False
+        # Пользовательская отмена перекрывает drain
+        token.cancel("cancelled")
+        assert token.reason == "cancelled"
+        assert token.aborted is True
+
+
+class TestChunkRetry:
+    """Повторы чанков и политика частичных сбоев в split-режиме."""
+
+    @staticmethod
+    def _split(engine, chunk_count=3):
+        import src.services.omlx_engine as omlx_module
+
+        return (
+            patch("pydub.AudioSegment.from_file", return_value=TestCheckpointResume._mock_audio()),
+            patch.object(omlx_module, "_detect_silence_chunks", return_value=[(0, chunk_count * 1000)]),
+            patch.object(omlx_module, "OMLX_MAX_AUDIO_DURATION_SEC", 1),
+            patch.object(omlx_module, "OMLX_CHUNK_RETRY_BACKOFF_SEC", 0),
+        )
+
+    @staticmethod
+    def _http_error(status):
+        import requests
+
+        response = requests.Response()
+        response.status_code = status
+        return requests.HTTPError(f"{status} error", response=response)
+
+    def test_transient_error_is_retried(self):
+        import requests
+
+        from src.services.omlx_engine import OMLXEngine
+
+        engine = OMLXEngine()
+        ok = TestCheckpointResume._segment_result("ok")
+        engine._transcribe_segment = MagicMock(
+            side_effect=[ok, requests.ConnectionError("reset"), self._http_error(503), ok, ok]
+        )
+        patches = self._split(engine)
+        with patches[0], patches[1], patches[2], patches[3]:
+            result = engine._split_and_transcribe("/tmp/test.wav")
+
+        assert engine._transcribe_segment.call_count == 5
+        report = result["chunk_report"]
+        assert report["retried_chunks"] == [{"index": 1, "start": 1.0, "end": 2.0, "retries": 2}]
+        assert report["failed_chunks"] == []
+
+    def test_client_error_fails_job_without_retry(self):
+        from src.services.omlx_engine import ChunkFailedError, OMLXEngine
+
+        engine = OMLXEngine()
+        engine._transcribe_segment = MagicMock(
+            side_effect=[TestCheckpointResume._segment_result("ok"), self._http_error(400)]
+        )
+        patches = self._split(engine)
+        with patches[0], patches[1], patches[2], patches[3]:
+            with pytest.raises(ChunkFailedError) as exc_info:
+                engine._split_and_transcribe("/tmp/test.wav")
+
+        assert engine._transcribe_segment.call_count == 2
+        assert exc_info.value.chunk_report["failed_chunks"][0]["index"] == 1
+        assert "Chunk 2/3" in str(exc_info.value)
+
+    def test_skip_policy_marks_gap_and_retry_sends_only_gap(self, tmp_path):
+        import requests
+
+        import src.services.omlx_engine as omlx_module
+        from src.services.omlx_engine import OMLXEngine
+
+        checkpoint_dir = str(tmp_path / "chunks")
+        engine = OMLXEngine()
+        engine._checkpoint_dir = checkpoint_dir
+
+        def flaky(audio_bytes, language=None, model=None):
+            if flaky.calls in (1, 2, 3):
+                flaky.calls += 1
+                raise requests.Timeout("read timeout")
+            flaky.calls += 1
+            return TestCheckpointResume._segment_result(f"call-{flaky.calls}")
+
+        flaky.calls = 0
+        engine._transcribe_segment = MagicMock(side_effect=flaky)
+        patches = self._split(engine)
+        with (
+            patches[0], patches[1], patches[2], patches[3],
+            patch.object(omlx_module, "OMLX_CHUNK_FAILURE_POLICY", "skip"),
+        ):
+            result = engine._split_and_transcribe("/tmp/test.wav")
+            assert result["chunk_report"]["failed_chunks"][0]["index"] == 1
+            assert [s["start"] for s in result["segments"]] == [0.0, 2.0]
+
+            retry = OMLXEngine()
+            retry._checkpoint_dir = checkpoint_dir
+            retry._transcribe_segment = MagicMock(
+                return_value=TestCheckpointResume._segment_result("filled")
+            )
+            retried = retry._split_and_transcribe("/tmp/test.wav")
+
+        retry._transcribe_segment.assert_called_once()
+        assert [s["start"] for s in retried["segments"]] == [0.0, 1.0, 2.0]
+        assert retried["chunk_report"]["failed_chunks"] == []
+
+
+class TestHedging:
+    """Хеджирование медленных запросов чанков."""
+
+    @pytest.fixture(autouse=True)
+    def _reset_chunk_latency(self):
+        from src.services.omlx_engine import chunk_latency
+
+        chunk_latency.reset()
+        yield
+        chunk_latency.reset()
+
+    @staticmethod
+    def _warm_up(samples=10, latency_per_sec=0.01):
+        from src.services.omlx_engine import chunk_latency
+
+        for _ in range(samples):
+            chunk_latency.start_request()
+            chunk_latency.record(latency_per_sec, 1.0)
+
+    @staticmethod
+    def _slow_primary(seen_tokens):
+        from src.services.whisper_engines import TranscriptionCancelled
+
+        def segment(audio_bytes, language=None, model=None, base_url=None, cancel_token=None):
+            seen_tokens.append((base_url, cancel_token))
+            if base_url == "http://primary":
+                # Висит, пока попытку не оборвут
+                cancel_token.wait(5)
+                raise TranscriptionCancelled(cancel_token.reason or "cancelled")
+            return TestCheckpointResume._segment_result("hedge")
+
+        return segment
+
+    def test_no_hedge_without_latency_samples(self):
+        import src.services.omlx_engine as omlx_module
+        from src.services.omlx_engine import OMLXEngine, chunk_latency
+
+        engine = OMLXEngine()
+        engine._transcribe_segment = MagicMock(return_value=TestCheckpointResume._segment_result("ok"))
+        with patch.object(omlx_module, "OMLX_HEDGE_ENABLED", True):
+            engine._request_chunk(b"wav", None, None, 1.0)
+
+        engine._transcribe_segment.assert_called_once_with(b"wav", language=None, model=None)
+        assert chunk_latency.stats()["hedges"] == 0
+        assert chunk_latency.stats()["samples"] == 1
+
+    def test_slow_primary_is_hedged_and_loser_cancelled(self):
+        import src.services.omlx_engine as omlx_module
+        from src.services.omlx_engine import OMLXEngine, chunk_latency
+
+        self._warm_up()
+        seen = []
+        engine = OMLXEngine()
+        engine._transcribe_segment = MagicMock(side_effect=self._slow_primary(seen))
+        with (
+            patch.object(omlx_module, "OMLX_HEDGE_ENABLED", True),
+            patch.object(omlx_module, "OMLX_HEDGE_BUDGET", 1.0),
+            patch.object(omlx_module, "OMLX_BASE_URL", "http://primary"),
+            patch.object(omlx_module, "OMLX_HEDGE_BASE_URL", "http://replica"),
+        ):
+            result = engine._request_chunk(b"wav", None, None, 1.0)
+
+        assert result["segments"][0]["text"] == "hedge"
+        assert [url for url, _ in seen] == ["http://primary", "http://replica"]
+        primary_token = seen[0][1]
+        assert primary_token.wait(1)
+        assert primary_token.reason == "hedge lost"
+        stats = chunk_latency.stats()
+        assert stats["hedges"] == 1
+        assert stats["hedge_wins"] == 1
+
+    def test_losing_attempt_raw_body_is_closed(self):
+        import io
+        import threading
+        import time
+
+        import src.services.omlx_engine as omlx_module
+        from src.services.omlx_engine import OMLXEngine
+
+        self._warm_up()
+        bodies = {}
+        primary_done = threading.Event()
+
+        def segment(audio_bytes, language=None, model=None, base_url=None, cancel_token=None):
+            result = TestCheckpointResume._segment_result(base_url)
+            result["raw_body"] = bodies[base_url] = io.BytesIO(b"{}")
+            if base_url == "http://primary":
+                # Медленный ответ приходит уже после победы дубля
+                cancel_token.wait(5)
+                primary_done.set()
+            return result
+
+        engine = OMLXEngine()
+        engine._transcribe_segment = MagicMock(side_effect=segment)
+        with (
+            patch.object(omlx_module, "OMLX_HEDGE_ENABLED", True),
+            patch.object(omlx_module, "OMLX_HEDGE_BUDGET", 1.0),
+            patch.object(omlx_module, "OMLX_BASE_URL", "http://primary"),
+            patch.object(omlx_module, "OMLX_HEDGE_BASE_URL", "http://replica"),
+        ):
+            result = engine._hedged_segment(b"wav", None, None, 1.0, delay=0.01)
+
+        assert result["segments"][0]["text"] == "http://replica"
+        assert not result["raw_body"].closed
+        assert primary_done.wait(1)
+        for _ in range(50):
+            if bodies["http://primary"].closed:
+                break
+            time.sleep(0.02)
+        assert bodies["http://primary"].closed
+
+    def test_budget_exhausted_waits_for_primary(self):
+        import src.services.omlx_engine as omlx_module
+        from src.services.omlx_engine import OMLXEngine, chunk_latency
+
+        self._warm_up()
+        engine = OMLXEngine()
+        calls = []
+
+        def segment(audio_bytes, language=None, model=None, base_url=None, cancel_token=None):
+            calls.append(base_url)
+            import time
+
+            time.sleep(0.3)
+            return TestCheckpointResume._segment_result("primary")
+
+        engine._transcribe_segment = MagicMock(side_effect=segment)
+        with (
+            patch.object(omlx_module, "OMLX_HEDGE_ENABLED", True),
+            patch.object(omlx_module, "OMLX_HEDGE_BUDGET", 0.0),
+        ):
+            result = engine._hedged_segment(b"wav", None, None, 1.0, delay=0.01)
+
+        assert result["segments"][0]["text"] == "primary"
+        assert len(calls) == 1
+        assert chunk_latency.stats()["hedges"] == 0
+
+    def test_job_cancel_aborts_both_attempts(self):
+        import src.services.omlx_engine as omlx_module
+        from src.services.omlx_engine import OMLXEngine
+        from src.services.whisper_engines import CancellationToken, TranscriptionCancelled
+
+        self._warm_up()
+        seen = []
+
+        def segment(audio_bytes, language=None, model=None, base_url=None, cancel_token=None):
+            seen.append(cancel_token)
+            cancel_token.wait(5)
+            raise TranscriptionCancelled(cancel_token.reason or "cancelled")
+
+        engine = OMLXEngine()
+        engine._cancel_token = CancellationToken()
+        engine._transcribe_segment = MagicMock(side_effect=segment)
+        engine._cancel_token.cancel("timeout")
+        with (
+            patch.object(omlx_module, "OMLX_HEDGE_ENABLED", True),
+            pytest.raises(TranscriptionCancelled),
+        ):
+            engine._hedged_segment(b"wav", None, None, 1.0, delay=0.01)
+
+        assert seen and all(token.wait(1) for token in seen)
+
+
+class TestAdaptiveChunking:
+    """Размер чанков по измеренной пропускной способности oMLX."""
+
+    @pytest.fixture(autouse=True)
+    def _reset_latency(self):
+        from src.services.omlx_engine import chunk_latency
+
+        chunk_latency.reset()
+        yield
+        chunk_latency.reset()
+
+    def test_boundaries_snap_to_nearest_pause(self):
+        from src.utils.chunking import plan_adaptive_chunks
+
+        speech = [(0, 40_000), (42_000, 70_000), (73_000, 130_000), (131_000, 150_000)]
+        chunks = plan_adaptive_chunks(speech, target_ms=60_000, max_chunk_ms=3_000_000)
+
+        # 70 с ближе к цели 60 с, чем 40 с; границы — только в паузах
+        assert chunks == [(0, 70_000), (73_000, 130_000), (131_000, 150_000)]
+
+    def test_long_region_is_cut_at_max(self):
+        from src.utils.chunking import plan_adaptive_chunks
+
+        chunks = plan_adaptive_chunks([(0, 250_000)], target_ms=60_000, max_chunk_ms=100_000)
+        assert chunks == [(0, 100_000), (100_000, 200_000), (200_000, 250_000)]
+
+    def test_target_follows_throughput_and_concurrency(self):
+        import src.services.omlx_engine as omlx_module
+        from src.services.omlx_engine import _target_chunk_sec, chunk_latency
+
+        with (
+            patch.object(omlx_module, "OMLX_MAX_AUDIO_DURATION_SEC", 3000),
+            patch.object(omlx_module, "OMLX_MIN_CHUNK_SEC", 60),
+            patch.object(omlx_module, "OMLX_TARGET_CHUNK_LATENCY_SEC", 120),
+            patch.object(omlx_module, "OMLX_CHUNK_CONCURRENCY", 1),
+        ):
+            # Нет наблюдений — статический потолок
+            assert _target_chunk_sec(7200) == 3000
+            for _ in range(5):
+                chunk_latency.record(10.0, 100.0)  # 0.1 с обработки на секунду аудио
+            assert _target_chunk_sec(7200) == 1200
+            with patch.object(omlx_module, "OMLX_CHUNK_CONCURRENCY", 4):
+                assert _target_chunk_sec(2000) == 500
+                # Не меньше OMLX_MIN_CHUNK_SEC
+                assert _target_chunk_sec(100) == 60
+
+    def test_parallel_split_keeps_order_and_records_plan(self):
+        import threading
+        import time
+
+        import src.services.omlx_engine as omlx_module
+        from src.services.omlx_engine import OMLXEngine
+
+        audio = TestCheckpointResume._mock_audio()
+        audio.__len__ = lambda self: 4000
+        active = {"now": 0, "peak": 0}
+        lock = threading.Lock()
+
+        def segment(audio_bytes, language=None, model=None):
+            with lock:
+                active["now"] += 1
+                active["peak"] = max(active["peak"], active["now"])
+            time.sleep(0.05)
+            with lock:
+                active["now"] -= 1
+            return TestCheckpointResume._segment_result("chunk")
+
+        engine = OMLXEngine()
+        engine._transcribe_segment = MagicMock(side_effect=segment)
+        with (
+            patch("pydub.AudioSegment.from_file", return_value=audio),
+            patch.object(omlx_module, "_detect_silence_chunks",
+                         return_value=[(0, 900), (1000, 1900), (2000, 2900), (3000, 4000)]),
+            patch.object(omlx_module, "OMLX_ADAPTIVE_CHUNKING", True),
+            patch.object(omlx_module, "OMLX_CHUNK_CONCURRENCY", 4),
+            patch.object(omlx_module, "OMLX_MAX_AUDIO_DURATION_SEC", 3000),
+            patch.object(omlx_module, "OMLX_MIN_CHUNK_SEC", 1),
+        ):
+            result = engine._split_and_transcribe("/tmp/test.wav")
+
+        assert engine._transcribe_segment.call_count == 4
+        assert active["peak"] > 1
+        assert [s["start"] for s in result["segments"]] == [0.0, 1.0, 2.0, 3.0]
+        plan = result["chunk_report"]["plan"]
+        assert plan["adaptive"] is True
+        assert plan["target_chunk_sec"] == 1
+        assert plan["concurrency"] == 4
+        assert plan["chunks"] == [[0.0, 0.9], [1.0, 1.9], [2.0, 2.9], [3.0, 4.0]]
+
+
+class TestWindowStitching:
+    """Окна с перекрытием: планирование и склейка на границах."""
+
+    @staticmethod
+    def _seg(start, end, text, speaker=0):
+        return {"start": start, "end": end, "text": text, "speaker": speaker}
+
+    def test_windows_overlap(self):
+        from src.services.omlx_engine import _plan_windows
+
+        assert _plan_windows(25_000, 10_000, 2_000) == [
+            (0, 10_000), (8_000, 18_000), (16_000, 25_000)
+        ]
+
+    def test_duplicates_dropped_and_cut_words_kept(self):
+        from src.services.omlx_engine import _stitch_windows
+
+        first = [
+            self._seg(0.0, 7.5, "first sentence"),
+            self._seg(8.2, 9.0, "in the overlap"),
+            self._seg(9.4, 10.0, "cut at the"),
+        ]
+        second = [
+            self._seg(8.0, 8.9, "the overlap"),
+            self._seg(9.4, 11.0, "cut at the boundary"),
+            self._seg(11.5, 15.0, "tail"),
+        ]
+        stitched = _stitch_windows([((0, 10_000), first), ((8_000, 18_000), second)])
+
+        assert [s["text"] for s in stitched] == [
+            "first sentence", "in the overlap", "cut at the boundary", "tail"
+        ]
+
+    def test_speakers_follow_overlap_alignment(self):
+        from src.services.omlx_engine import _stitch_windows
+
+        # Во втором окне бэкенд пронумеровал спикеров наоборот
+        first = [self._seg(0.0, 4.0, "hello there", 0), self._seg(8.1, 9.5, "general kenobi", 1)]
+        second = [self._seg(8.1, 9.5, "general kenobi", 0), self._seg(10.0, 12.0, "you are a bold one", 0),
+                  self._seg(12.5, 14.0, "indeed", 1)]
+        stitched = _stitch_windows([((0, 10_000), first), ((8_000, 18_000), second)])
+
+        assert [(s["text"], s["speaker"]) for s in stitched] == [
+            ("hello there", 0), ("general kenobi", 1), ("you are a bold one", 1), ("indeed", 0)
+        ]
+
+    def test_window_mode_split_records_plan(self):
+        import src.services.omlx_engine as omlx_module
+        from src.services.omlx_engine import OMLXEngine
+
+        audio = TestCheckpointResume._mock_audio()
+        audio.__len__ = lambda self: 25_000
+        engine = OMLXEngine()
+        engine._transcribe_segment = MagicMock(side_effect=[
+            {"segments": [self._seg(0.0, 9.9, "one")], "text": "one", "raw_response": None},
+            {"segments": [self._seg(0.0, 1.9, "one"), self._seg(2.5, 9.0, "two")], "text": "", "raw_response": None},
+            {"segments": [self._seg(3.0, 8.0, "three")], "text": "three", "raw_response": None},
+        ])
+        with (
+            patch("pydub.AudioSegment.from_file", return_value=audio),
+            patch.object(omlx_module, "OMLX_SPLIT_MODE", "window"),
+            patch.object(omlx_module, "OMLX_WINDOW_SEC", 10),
+            patch.object(omlx_module, "OMLX_WINDOW_OVERLAP_SEC", 2),
+        ):
+            result = engine._split_and_transcribe("/tmp/test.wav")
+
+        assert [s["text"] for s in result["segments"]] == ["one", "two", "three"]
+        plan = result["chunk_report"]["plan"]
+        assert plan["mode"] == "window"
+        assert plan["chunks"] == [[0.0, 10.0], [8.0, 18.0], [16.0, 25.0]]
+
+
+class TestPacking:
+    """Разнесение сегментов склеенного запроса по клипам."""
+
+    def test_segments_split_back_by_offset_map(self):
+        from src.services.omlx_engine import _unpack_segments
+
+        offsets = [("a", 0, 10_000), ("b", 11_500, 21_500), ("c", 23_000, 30_000)]
+        segments = [
+            {"start": 0.5, "end": 9.8, "text": "a1", "speaker": 0},
+            {"start": 11.6, "end": 15.0, "text": "b1", "speaker": 1},
+            {"start": 15.2, "end": 21.9, "text": "b2", "speaker": 0},
+            {"start": 23.1, "end": 29.0, "text": "c1", "speaker": 0},
+        ]
+        result = _unpack_segments(segments, offsets, gap_ms=1500)
+
+        assert [s["text"] for s in result["a"]] == ["a1"]
+        assert [(s["start"], s["end"]) for s in result["b"]] == [(0.1, 3.5), (3.7, 10.0)]
+        assert result["c"][0]["start"] == 0.1
+
+
+    def test_packed_response_is_recorded_for_each_job(self, tmp_path):
+        import gzip
+        import io
+
+        from src.services.omlx_engine import OMLXEngine
+
+        body = json.dumps([{"Start": 0, "End": 0.5, "Speaker": 0, "Content": "x"}]).encode()
+        result = {"segments": [], "raw_body": io.BytesIO(body)}
+        offsets = [("a", 0, 10_000), ("b", 11_500, 21_500)]
+        raw_paths = {"a": str(tmp_path / "a_raw.jsonl.gz"), "b": str(tmp_path / "b_raw.jsonl.gz")}
+
+        raw_files = OMLXEngine()._store_packed_raw(result, raw_paths, offsets, "oMLX-ASR")
+
+        assert raw_files == {"a": "a_raw.jsonl.gz", "b": "b_raw.jsonl.gz"}
+        with gzip.open(raw_paths["b"], "rt", encoding="utf-8") as f:
+            record = json.loads(f.readline())
+        assert (record["clip_start"], record["clip_end"]) == (11.5, 21.5)
+        assert record["response"][0]["Content"] == "x"
+        assert "raw_body" not in result
+
+
+class TestTransportCodec:
+    """Сжатый транспорт аудио в oMLX."""
+
+    def test_transcribe_sends_prepared_transport_file(self, tmp_path):
+        from src.services.omlx_engine import OMLXEngine
+
+        transport = tmp_path / "audio_transport.flac"
+        transport.write_bytes(b"fLaC")
+        engine = OMLXEngine()
+        engine._transcribe_file = MagicMock(return_value={"segments": [], "text": "", "raw_response": None})
+        with patch("src.services.omlx_engine.get_audio_duration", return_value=30.0):
+            engine.transcribe("/tmp/test.wav", transport_path=str(transport))
+
+        engine._transcribe_file.assert_called_once_with(str(transport), language=None, model=None)
+
+    def test_chunks_are_encoded_with_configured_codec(self):
+        import src.services.omlx_engine as omlx_module
+        from src.services.omlx_engine import OMLXEngine
+
+        captured = {}
+
+        def capture_post(url, files=None, data=None, headers=None, **kwargs):
+            captured["file"] = files["file"]
+            response = MagicMock(status_code=200, text="[]")
+            return response
+
+        segment = MagicMock()
+        segment.export.side_effect = lambda buf, **kwargs: buf.write(b"OggS")
+        engine = OMLXEngine()
+        with (
+            patch.object(omlx_module, "OMLX_TRANSPORT_CODEC", "opus"),
+            patch.object(omlx_module, "OMLX_OPUS_BITRATE", "24k"),
+            patch("src.services.omlx_engine.requests.post", side_effect=capture_post),
+        ):
+            payload = omlx_module._export_chunk(segment)
+            engine._transcribe_segment(payload)
+
+        segment.export.assert_called_once()
+        assert segment.export.call_args.kwargs == {"format": "ogg", "codec": "libopus", "bitrate": "24k"}
+        name, _, mime = captured["file"]
+        assert (name, mime) == ("segment.ogg", "audio/ogg")
+
+    def test_encode_for_transport_builds_ffmpeg_command(self):
+        from src.utils.audio import encode_for_transport
+
+        with patch("src.utils.audio.subprocess.run") as run:
+            assert encode_for_transport("/data/job/a.wav", "flac") == "/data/job/a_transport.flac"
+            assert encode_for_transport("/data/job/a.wav", "opus", "16k") == "/data/job/a_transport.ogg"
+            assert encode_for_transport("/data/job/a.wav", "wav") == "/data/job/a.wav"
+
+        flac_cmd, opus_cmd = (call.args[0] for call in run.call_args_list)
+        assert flac_cmd[-3:] == ["-c:a", "flac", "/data/job/a_transport.flac"]
+        assert opus_cmd[-5:] == ["-c:a", "libopus", "-b:a", "16k", "/data/job/a_transport.ogg"]
+
+
+# =============================================================================
+# TestStreamingResponse
+# =============================================================================
+
+class TestStreamingResponse:
+    """Потоковый разбор ответа oMLX (_ResponseParser, _spool_body)."""
+
+    VIBEVOICE = [
+        {"Start": 0, "End": 1.5, "Speaker": 0, "Content": 'он сказал "привет" \\ 😀'},
+        {"Start": 1.5, "End": 3.0, "Speaker": 1, "Content": "[скобки] {и} запятые, ок"},
+    ]
+    WHISPER = [{"start": 0.0, "end": 2.0, "text": "one"}, {"start": 2.0, "end": 4.0, "text": "two"}]
+
+    @staticmethod
+    def _parse(body: str, size: int):
+        from src.services.omlx_engine import _ResponseParser
+
+        parser = _ResponseParser()
+        for i in range(0, len(body), size):
+            parser.feed(body[i:i + size])
+        return parser.close()
+
+    @pytest.mark.parametrize("size", [1, 3, 7, 4096])
+    @pytest.mark.parametrize("ensure_ascii", [True, False])
+    def test_matches_normalize_segments(self, size, ensure_ascii):
+        from src.services.omlx_engine import _normalize_segments
+
+        inner = json.dumps(self.VIBEVOICE, ensure_ascii=ensure_ascii)
+        bodies = [
+            inner,
+            {"text": inner, "language": "ru", "meta": {"x": [1, "]}"]}},
+            {"text": "one two", "segments": self.WHISPER},
+            {"segments": self.WHISPER, "text": inner},
+            {"text": inner, "segments": self.VIBEVOICE},
+            {"text": "plain", "language": "ru"},
+        ]
+        for body in bodies:
+            raw = body if isinstance(body, str) else json.dumps(body, ensure_ascii=ensure_ascii)
+            assert self._parse(raw, size) == _normalize_segments(json.loads(raw))
+
+    def test_truncated_text_field_keeps_complete_segments_and_repairs_tail(self):
+        inner = json.dumps(self.VIBEVOICE, separators=(",", ":"))
+        truncated = inner[: inner.rfind("запятые")]
+        body = json.dumps({"text": truncated, "language": "ru"})
+
+        segments = self._parse(body, 5)
+
+        assert [s["speaker"] for s in segments] == [0, 1]
+        assert segments[0]["text"] == self.VIBEVOICE[0]["Content"]
+        assert segments[1]["text"].startswith("[скобки]")
+
+    def test_surrogate_pair_split_at_any_offset(self):
+        from src.services.omlx_engine import _ResponseParser
+        from src.utils.json_stream import StringStream
+
+        raw = json.dumps("a😀b")[1:]  # "a\ud83d\ude00b" + закрывающая кавычка
+        for cut in range(1, len(raw)):
+            stream = StringStream()
+            assert stream.feed(raw[:cut]) + stream.feed(raw[cut:]) == "a😀b", cut
+            assert stream.done
+
+        inner = json.dumps([{"Start": 0, "End": 1, "Speaker": 0, "Content": "a😀b"}], ensure_ascii=False)
+        body = json.dumps({"text": inner})
+        for cut in range(1, len(body)):
+            parser = _ResponseParser()
+            parser.feed(body[:cut])
+            parser.feed(body[cut:])
+            (segment,) = parser.close()
+            assert segment["text"] == "a😀b", cut
+
+    @pytest.mark.parametrize("body", ['{"text": "[{\\"Start\\"', '[{"start": 1}', '{"text" 1}', "", "[1] x"])
+    def test_malformed_outer_json_raises_value_error(self, body):
+        with pytest.raises(ValueError):
+            self._parse(body, 4)
+
+    def test_spooled_response_is_streamed_from_disk(self):
+        import requests
+        from io import BytesIO
+
+        import src.services.omlx_engine as omlx_module
+        from src.services.omlx_engine import OMLXEngine
+
+        payload = json.dumps({"text": json.dumps(self.VIBEVOICE * 200), "language": "ru"})
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = BytesIO(payload.encode("utf-8"))
+
+        with (
+            patch.object(omlx_module, "OMLX_RESPONSE_SPOOL_MAX_BYTES", 1024),
+            patch.object(omlx_module, "_RESPONSE_READ_BYTES", 1000),
+        ):
+            spooled = omlx_module._spool_body(response)
+            # Тело больше порога — лежит во временном файле, а не в памяти
+            assert spooled.spooled_body._rolled
+            result = OMLXEngine()._parse_response(spooled)
+
+        assert len(result["segments"]) == 400
+        assert result["segments"][1]["text"] == self.VIBEVOICE[1]["Content"]
+        assert result["raw_response"] is None
+        assert spooled.spooled_body.closed
+
+    def test_error_body_is_read_before_session_closes(self):
+        import requests
+        from io import BytesIO
+
+        from src.services.omlx_engine import _spool_body
+
+        response = requests.Response()
+        response.status_code = 404
+        response.raw = BytesIO(b'{"error": {"type": "not_found_error"}}')
+
+        spooled = _spool_body(response)
+        response.raw = None
+
+        assert spooled.json()["error"]["type"] == "not_found_error"
+        assert not hasattr(spooled, "spooled_body")
+
+
+# =============================================================================
+# TestRawArtifact
+# =============================================================================
+
+class TestRawArtifact:
+    """Сырые ответы oMLX пишутся в {name}_raw.jsonl.gz, в результате — только имя файла."""
+
+    @staticmethod
+    def _read(path):
+        import gzip
+
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_split_chunks_are_recorded_and_resume_appends(self, tmp_path):
+        import src.services.omlx_engine as omlx_module
+        from src.services.omlx_engine import OMLXEngine
+        from src.services.whisper_engines import CancellationToken, TranscriptionCancelled
+
+        raw_path = tmp_path / "test_raw.jsonl.gz"
+        params = {"checkpoint_dir": str(tmp_path / "chunks"), "raw_path": str(raw_path)}
+        sent = []
+
+        def post(url, files=None, data=None, headers=None, **kwargs):
+            sent.append(len(sent))
+            body = json.dumps([{"Start": 0, "End": 0.5, "Speaker": 0, "Content": f"chunk-{len(sent) - 1}"}])
+            if len(sent) == 2:
+                token.cancel("drain")
+            return MagicMock(status_code=200, text=body)
+
+        token = CancellationToken()
+        with (
+            patch("pydub.AudioSegment.from_file", return_value=TestCheckpointResume._mock_audio()),
+            patch.object(omlx_module, "_detect_silence_chunks", return_value=[(0, 3000)]),
+            patch.object(omlx_module, "get_audio_duration", return_value=3.0),
+            patch.object(omlx_module, "OMLX_MAX_AUDIO_DURATION_SEC", 1),
+            patch.object(omlx_module, "OMLX_ENABLED", True),
+            patch.object(omlx_module, "OMLX_BASE_URL", "http://test"),
+            patch("src.services.omlx_engine.requests.post", side_effect=post),
+            patch.object(omlx_module.AbortableSession, "post", side_effect=post),
+        ):
+            with pytest.raises(TranscriptionCancelled):
+                OMLXEngine().transcribe("/tmp/test.wav", cancel_token=token, **params)
+            assert [r["chunk"]["index"] for r in self._read(raw_path)] == [0, 1]
+
+            result = OMLXEngine().transcribe("/tmp/test.wav", **params)
+
+        assert result["raw_file"] == "test_raw.jsonl.gz"
+        assert result["raw_response"] is None
+        records = self._read(raw_path)
+        assert [r["chunk"]["index"] for r in records] == [0, 1, 2]
+        assert records[2]["response"][0]["Content"] == "chunk-2"
+
+    def test_whole_file_response_recorded_from_spool(self, tmp_path):
+        import requests
+        from io import BytesIO
+
+        import src.services.omlx_engine as omlx_module
+        from src.services.omlx_engine import OMLXEngine
+
+        body = json.dumps({"text": json.dumps([{"Start": 0, "End": 1, "Speaker": 1, "Content": "привет"}])})
+
+        def post(url, files=None, data=None, headers=None, **kwargs):
+            response = requests.Response()
+            response.status_code = 200
+            response.raw = BytesIO(body.encode("utf-8"))
+            return response
+
+        audio = tmp_path / "a.wav"
+        audio.write_bytes(b"RIFF")
+        raw_path = tmp_path / "a_raw.jsonl.gz"
+        with (
+            patch.object(omlx_module, "get_audio_duration", return_value=3.0),
+            patch.object(omlx_module, "OMLX_ENABLED", True),
+            patch.object(omlx_module, "OMLX_BASE_URL", "http://test"),
+            patch("src.services.omlx_engine.requests.post", side_effect=post),
+        ):
+            result = OMLXEngine().transcribe(str(audio), raw_path=str(raw_path))
+
+        assert result["raw_file"] == "a_raw.jsonl.gz"
+        assert result["segments"][0]["text"] == "привет"
+        (record,) = self._read(raw_path)
+        assert record["engine"] == "omlx"
+        assert json.loads(record["response"]["text"])[0]["Content"] == "привет"
+
+    def test_unparseable_body_is_stored_as_string(self, tmp_path):
+        from io import BytesIO
+
+        from src.utils.raw_artifact import RawArtifactWriter
+
+        raw_path = tmp_path / "a_raw.jsonl.gz"
+        writer = RawArtifactWriter(str(raw_path))
+        writer.write_body({"chunk": 0}, '[{"Content": "обре')
+        writer.write_body({"chunk": 1}, "Internal error")
+        writer.write_body({"chunk": 2}, BytesIO('{"text": "x"'.encode("utf-8")))
+        writer.write_body({"chunk": 3}, '[{"Content": "ok"}]')
+        writer.close()
+
+        records = self._read(raw_path)
+        assert [r.get("truncated") for r in records] == [True, True, True, None]
+        assert records[0]["response"] == '[{"Content": "обре'
+        assert records[1]["response"] == "Internal error"
+        assert records[2]["response"] == '{"text": "x"'
+        assert records[3]["response"] == [{"Content": "ok"}]
+
+    def test_no_artifact_without_raw_path(self):
+        import src.services.omlx_engine as omlx_module
+        from src.services.omlx_engine import OMLXEngine
+
+        with (
+            patch.object(omlx_module, "get_audio_duration", return_value=3.0),
+            patch.object(omlx_module, "OMLX_ENABLED", True),
+            patch.object(omlx_module, "OMLX_BASE_URL", "http://test"),
+            patch("src.services.omlx_engine.requests.post", return_value=MagicMock(status_code=200, text="[]")),
+            patch("builtins.open", MagicMock()),
+        ):
+            result = OMLXEngine().transcribe("/tmp/a.wav")
+
+        assert result["raw_file"] is None
@@ -1,5 +1,6 @@
 """Тесты для TranscriptionQueueManager."""
 
+import json
 import os
 import sys
 from unittest.mock import MagicMock, patch
@@ -224,9 +225,10 @@ def test_cancel_nonexistent():
 
 
 def test_worker_saves_raw_response():
-    """Worker сохраняет raw_response в {name}_raw.json."""
+    """Worker сохраняет строковый raw_response в сжатый {name}_raw.jsonl.gz."""
+    import gzip
+
     from src.services.transcription_queue import TranscriptionQueueManager
-    from src.services.job_manager import JobStatus
 
     mgr = TranscriptionQueueManager(workers=1, max_size=5)
     try:
@@ -241,6 +243,7 @@ def test_worker_saves_raw_response():
         with (
             patch("src.services.transcription_queue.get_engine", return_value=mock_engine),
             patch("src.services.transcription_queue._sanitize_result", side_effect=lambda r: r),
+            patch("src.services.transcription_queue.RAW_RESPONSE_RETENTION", True),
         ):
             mgr.submit({
                 "job_id": "raw-test-job",
@@ -249,14 +252,49 @@ def test_worker_saves_raw_response():
             })
             mgr._queue.join()
 
-        # Проверить наличие raw.json
+        # Проверить наличие raw-артефакта
         assert _test_dir is not None
         job_dir = os.path.join(_test_dir, "raw-test-job")
-        raw_files = [f for f in os.listdir(job_dir) if f.endswith("_raw.json")]
-        assert len(raw_files) == 1
-        with open(os.path.join(job_dir, raw_files[0])) as f:
-            content = f.read()
-        assert '"segments"' in content
+        raw_files = [f for f in os.listdir(job_dir) if f.endswith("_raw.jsonl.gz")]
+        assert raw_files == ["test_raw.jsonl.gz"]
+        with gzip.open(os.path.join(job_dir, raw_files[0]), "rt", encoding="utf-8") as f:
+            record = json.loads(f.readline())
+        assert record["response"]["segments"] == [{"start": 0, "end": 1}]
+    finally:
+        mgr.shutdown()
+
+
+def test_worker_passes_raw_path_and_records_raw_file(monkeypatch):
+    """При RAW_RESPONSE_RETENTION движок получает raw_path, в metadata — только имя артефакта."""
+    from src.services.transcription_queue import TranscriptionQueueManager
+
+    assert _test_dir is not None
+    monkeypatch.setattr("src.services.job_manager.DATA_UPLOADS_DIR", _test_dir)
+    mgr = TranscriptionQueueManager(workers=1, max_size=5)
+    try:
+        mock_engine = MagicMock()
+        mock_engine.transcribe.return_value = {
+            "text": "test",
+            "segments": [],
+            "raw_response": None,
+            "raw_file": "test_raw.jsonl.gz",
+        }
+
+        with (
+            patch("src.services.transcription_queue.get_engine", return_value=mock_engine),
+            patch("src.services.transcription_queue.RAW_RESPONSE_RETENTION", True),
+        ):
+            mgr.submit({
+                "job_id": "raw-path-job",
+                "wav_path": "/tmp/test.wav",
+                "params": {"model": "turbo", "original_filename": "test.wav"},
+            })
+            mgr._queue.join()
+
+        raw_path = mock_engine.transcribe.call_args.kwargs["raw_path"]
+        assert raw_path == os.path.join(_test_dir, "raw-path-job", "test_raw.jsonl.gz")
+        metadata = mgr._meta.load("raw-path-job")
+        assert metadata["raw_file"] == "test_raw.jsonl.gz"
     finally:
         mgr.shutdown()
 
@@ -292,3 +330,651 @@ def test_worker_skips_raw_response_when_none():
         assert len(raw_files) == 0
     finally:
         mgr.shutdown()
+
+
+def test_cancel_running_job_frees_worker():
+    """DELETE во время транскрипции прерывает engine и освобождает воркер."""
+    import threading
+
+    from src.services.transcription_queue import TranscriptionQueueManager
+    from src.services.whisper_engines import TranscriptionCancelled
+
+    started = threading.Event()
+
+    def slow_transcribe(file_path, **params):
+        if file_path == "/tmp/slow.wav":
+            started.set()
+            token = params["cancel_token"]
+            # Движок проверяет токен между окнами/чанками
+            while not token.wait(0.05):
+                pass
+            raise TranscriptionCancelled(token.reason)
+        return {"text": "fast", "segments": [], "raw_response": None}
+
+    mgr = TranscriptionQueueManager(workers=1, max_size=5)
+    try:
+        mock_engine = MagicMock()
+        mock_engine.transcribe.side_effect = slow_transcribe
+        with (
+            patch("src.services.transcription_queue.get_engine", return_value=mock_engine),
+            patch("src.services.transcription_queue._sanitize_result", side_effect=lambda r: r),
+        ):
+            mgr.submit({"job_id": "slow-job", "wav_path": "/tmp/slow.wav", "params": {}})
+            mgr.submit({"job_id": "next-job", "wav_path": "/tmp/fast.wav", "params": {}})
+            assert started.wait(5)
+
+            assert mgr.cancel_job("slow-job") is True
+            mgr._queue.join()
+
+        assert mgr._meta.load("slow-job")["status"] == "cancelled"
+        assert mgr._meta.load("next-job")["status"] == "completed"
+    finally:
+        mgr.shutdown()
+
+
+def _wait_for(predicate, timeout=5.0):
+    import time
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def _cooperative_transcribe(release=None):
+    """Движок, который ждёт отмены по токену (как whisper/oMLX между окнами)."""
+    from src.services.whisper_engines import TranscriptionCancelled
+
+    def transcribe(file_path, **params):
+        token = params["cancel_token"]
+        if file_path == "/tmp/hang.wav" and token is not None:
+            while not token.wait(0.02):
+                if release is not None and release.is_set():
+                    break
+            raise TranscriptionCancelled(token.reason)
+        return {"text": "ok", "segments": [], "raw_response": None}
+
+    return transcribe
+
+
+def test_job_deadline_scales_with_duration():
+    import src.services.transcription_queue as tq
+
+    mgr = tq.TranscriptionQueueManager(workers=1, max_size=5)
+    try:
+        with (
+            patch.object(tq, "TRANSCRIPTION_TIMEOUT_SECONDS", 3600),
+            patch.object(tq, "WATCHDOG_BASE_TIMEOUT_SEC", 120.0),
+            patch.object(tq, "WATCHDOG_TIMEOUT_RTF", 1.0),
+        ):
+            assert mgr.job_deadline(60.0) == 180.0
+            assert mgr.job_deadline(7200.0) == 3600.0
+            # Длительность неизвестна — общий таймаут
+            assert mgr.job_deadline(0.0) == 3600.0
+    finally:
+        mgr.shutdown()
+
+
+def test_watchdog_fails_overdue_job():
+    """Задача сверх дедлайна отменяется watchdog'ом и помечается failed, воркер свободен."""
+    from src.services.transcription_queue import TranscriptionQueueManager
+
+    mgr = TranscriptionQueueManager(workers=1, max_size=5)
+    try:
+        mock_engine = MagicMock()
+        mock_engine.transcribe.side_effect = _cooperative_transcribe()
+        with (
+            patch("src.services.transcription_queue.get_engine", return_value=mock_engine),
+            patch("src.services.transcription_queue._sanitize_result", side_effect=lambda r: r),
+            patch.object(mgr, "job_deadline", return_value=0.05),
+        ):
+            mgr.submit({"job_id": "hang-job", "wav_path": "/tmp/hang.wav", "params": {}})
+            mgr.submit({"job_id": "next-job", "wav_path": "/tmp/ok.wav", "params": {}})
+            assert _wait_for(lambda: mgr.worker_states()[0]["job_id"] == "hang-job")
+            assert _wait_for(lambda: mgr.check_deadlines() == ["hang-job"])
+            mgr._queue.join()
+
+        meta = mgr._meta.load("hang-job")
+        assert meta["status"] == "failed"
+        assert "timed out" in meta["error"]
+        assert mgr._meta.load("next-job")["status"] == "completed"
+    finally:
+        mgr.shutdown()
+
+
+def test_watchdog_requeues_overdue_job(monkeypatch):
+    """WATCHDOG_ON_TIMEOUT=requeue: задача возвращается в очередь со свежим токеном."""
+    import src.services.transcription_queue as tq
+
+    monkeypatch.setattr(tq, "WATCHDOG_ON_TIMEOUT", "requeue")
+    monkeypatch.setattr(tq, "WATCHDOG_MAX_REQUEUES", 1)
+    calls = []
+
+    def transcribe(file_path, **params):
+        calls.append(file_path)
+        if len(calls) == 1:
+            return _cooperative_transcribe()("/tmp/hang.wav", **params)
+        return {"text": "ok", "segments": [], "raw_response": None}
+
+    mgr = tq.TranscriptionQueueManager(workers=1, max_size=5)
+    try:
+        mock_engine = MagicMock()
+        mock_engine.transcribe.side_effect = transcribe
+        with (
+            patch("src.services.transcription_queue.get_engine", return_value=mock_engine),
+            patch("src.services.transcription_queue._sanitize_result", side_effect=lambda r: r),
+            patch.object(mgr, "job_deadline", return_value=0.05),
+        ):
+            mgr.submit({"job_id": "retry-job", "wav_path": "/tmp/a.wav", "params": {}})
+            assert _wait_for(lambda: mgr.worker_states()[0]["job_id"] == "retry-job")
+            assert _wait_for(lambda: mgr.check_deadlines() == ["retry-job"])
+            assert _wait_for(lambda: mgr._meta.load("retry-job")["status"] == "completed")
+
+        assert len(calls) == 2
+        assert mgr._meta.load("retry-job")["attempt"] == 1
+    finally:
+        mgr.shutdown()
+
+
+def test_watchdog_reports_stuck_worker():
+    """Воркер, не реагирующий на отмену дольше grace-периода, виден как stuck."""
+    import threading
+
+    import src.services.transcription_queue as tq
+
+    release = threading.Event()
+    entered = threading.Event()
+
+    def ignore_token(file_path, **params):
+        entered.set()
+        release.wait(5)
+        return {"text": "late", "segments": [], "raw_response": None}
+
+    mgr = tq.TranscriptionQueueManager(workers=1, max_size=5)
+    try:
+        mock_engine = MagicMock()
+        mock_engine.transcribe.side_effect = ignore_token
+        with (
+            patch("src.services.transcription_queue.get_engine", return_value=mock_engine),
+            patch("src.services.transcription_queue._sanitize_result", side_effect=lambda r: r),
+            patch.object(mgr, "job_deadline", return_value=10.0),
+            patch.object(tq, "WATCHDOG_STUCK_GRACE_SEC", 30.0),
+        ):
+            mgr.submit({"job_id": "stuck-job", "wav_path": "/tmp/stuck.wav", "params": {}})
+            assert entered.wait(5)
+            start = mgr._active[0]["started"]
+
+            assert mgr.check_deadlines(now=start + 5) == []
+            assert mgr.check_deadlines(now=start + 11) == ["stuck-job"]
+            state = mgr.worker_states(now=start + 20)[0]
+            assert state["overdue"] is True and state["stuck"] is False
+            mgr.check_deadlines(now=start + 50)
+            assert mgr.worker_states(now=start + 50)[0]["stuck"] is True
+
+            release.set()
+            mgr._queue.join()
+
+        assert mgr._meta.load("stuck-job")["status"] == "failed"
+        assert mgr.worker_states()[0]["job_id"] is None
+    finally:
+        release.set()
+        mgr.shutdown()
+
+
+def _blocking_engine(release):
+    """Движок, держащий воркер занятым до release (задачи с путём /tmp/block*)."""
+
+    def transcribe(file_path, **params):
+        if file_path.startswith("/tmp/block"):
+            release.wait(5)
+        return {"text": "ok", "segments": [], "raw_response": None}
+
+    engine = MagicMock()
+    engine.transcribe.side_effect = transcribe
+    return engine
+
+
+def test_resize_starts_and_stops_workers():
+    from src.services.transcription_queue import TranscriptionQueueManager
+
+    mgr = TranscriptionQueueManager(workers=1, max_size=5, min_workers=1, max_workers=3)
+    try:
+        state = mgr.resize(workers=3)
+        assert state["workers"] == 3
+        assert _wait_for(lambda: mgr.scaling_state()["running_workers"] == 3)
+
+        # За границы max_workers не выходим
+        assert mgr.resize(workers=10)["workers"] == 3
+
+        mgr.resize(workers=1)
+        assert _wait_for(lambda: mgr.scaling_state()["running_workers"] == 1)
+    finally:
+        mgr.shutdown()
+
+
+def test_repeated_resize_does_not_accumulate_worker_futures():
+    from src.services.transcription_queue import TranscriptionQueueManager
+
+    mgr = TranscriptionQueueManager(workers=1, max_size=5, min_workers=1, max_workers=3)
+    try:
+        for _ in range(5):
+            mgr.resize(workers=3)
+            assert _wait_for(lambda: mgr.scaling_state()["running_workers"] == 3)
+            mgr.resize(workers=1)
+            assert _wait_for(lambda: mgr.scaling_state()["running_workers"] == 1)
+
+        # Завершённые воркеры отбрасываются при следующем запуске
+        assert len(mgr._worker_futures) <= 5
+    finally:
+        mgr.shutdown()
+
+
+def test_scale_down_lets_busy_worker_finish():
+    """Уменьшение пула не прерывает задачу: воркер завершает её и только потом выходит."""
+    import threading
+
+    from src.services.transcription_queue import TranscriptionQueueManager
+
+    release = threading.Event()
+    mgr = TranscriptionQueueManager(workers=2, max_size=5, min_workers=1, max_workers=2)
+    try:
+        with (
+            patch("src.services.transcription_queue.get_engine",
+                  return_value=_blocking_engine(release)),
+            patch("src.services.transcription_queue._sanitize_result", side_effect=lambda r: r),
+        ):
+            mgr.submit({"job_id": "block-a", "wav_path": "/tmp/block-a.wav", "params": {}})
+            mgr.submit({"job_id": "block-b", "wav_path": "/tmp/block-b.wav", "params": {}})
+            assert _wait_for(lambda: len(mgr._active) == 2)
+
+            mgr.resize(workers=1)
+            assert mgr.scaling_state()["running_workers"] == 2
+            release.set()
+            mgr._queue.join()
+
+            assert _wait_for(lambda: mgr.scaling_state()["running_workers"] == 1)
+        assert mgr._meta.load("block-a")["status"] == "completed"
+        assert mgr._meta.load("block-b")["status"] == "completed"
+    finally:
+        release.set()
+        mgr.shutdown()
+
+
+def test_autoscale_up_on_backlog_and_down_when_idle(monkeypatch):
+    import threading
+
+    import src.services.transcription_queue as tq
+
+    monkeypatch.setattr(tq, "AUTOSCALE_IDLE_SEC", 60.0)
+    release = threading.Event()
+    mgr = tq.TranscriptionQueueManager(workers=1, max_size=5, min_workers=1, max_workers=3)
+    try:
+        with (
+            patch("src.services.transcription_queue.get_engine",
+                  return_value=_blocking_engine(release)),
+            patch("src.services.transcription_queue._sanitize_result", side_effect=lambda r: r),
+        ):
+            for i in range(3):
+                mgr.submit({"job_id": f"block-{i}", "wav_path": f"/tmp/block-{i}.wav", "params": {}})
+            assert _wait_for(lambda: len(mgr._active) == 1)
+
+            # Одна задача в работе, две ждут — добавляем два воркера
+            assert mgr.autoscale_tick() == 3
+            assert _wait_for(lambda: len(mgr._active) == 3)
+
+            release.set()
+            mgr._queue.join()
+            assert _wait_for(lambda: not mgr._active)
+
+        assert mgr.autoscale_tick(now=1000.0) == 3
+        assert mgr.autoscale_tick(now=1030.0) == 3
+        assert mgr.autoscale_tick(now=1061.0) == 1
+    finally:
+        release.set()
+        mgr.shutdown()
+
+
+def test_autoscale_holds_when_backend_slow(monkeypatch):
+    import threading
+
+    import src.services.transcription_queue as tq
+
+    monkeypatch.setattr(tq, "AUTOSCALE_MAX_RTF", 1.0)
+    release = threading.Event()
+    mgr = tq.TranscriptionQueueManager(workers=1, max_size=5, min_workers=1, max_workers=3)
+    try:
+        with (
+            patch("src.services.transcription_queue.get_engine",
+                  return_value=_blocking_engine(release)),
+            patch("src.services.transcription_queue._sanitize_result", side_effect=lambda r: r),
+        ):
+            mgr.submit({"job_id": "block-0", "wav_path": "/tmp/block-0.wav", "params": {}})
+            mgr.submit({"job_id": "block-1", "wav_path": "/tmp/block-1.wav", "params": {}})
+            assert _wait_for(lambda: len(mgr._active) == 1)
+
+            mgr._rtf = 2.5
+            assert mgr.autoscale_tick() == 1
+            mgr._rtf = 0.5
+            assert mgr.autoscale_tick() == 2
+            release.set()
+            mgr._queue.join()
+    finally:
+        release.set()
+        mgr.shutdown()
+
+
+def test_drain_interrupts_split_job_and_resume_requeues(monkeypatch, tmp_path):
+    """Drain: новые задачи отклоняются, активная останавливается между чанками и
+    продолжается после resume_intake()."""
+    import threading
+
+    from src.services.transcription_queue import TranscriptionQueueManager
+    from src.services.whisper_engines import TranscriptionCancelled
+
+    monkeypatch.setattr("src.services.job_manager.DATA_UPLOADS_DIR", str(tmp_path))
+    wav_path = tmp_path / "audio.wav"
+    wav_path.write_bytes(b"RIFF")
+    in_chunk = threading.Event()
+    attempts = []
+
+    def chunked_transcribe(file_path, **params):
+        token = params["cancel_token"]
+        attempts.append(params["checkpoint_dir"])
+        if len(attempts) == 1:
+            in_chunk.set()
+            # Текущий чанк дорабатывается, следующий не начинается
+            while not token.cancelled:
+                token.wait(0.02)
+            token.raise_if_aborted()
+            raise TranscriptionCancelled(token.reason)
+        return {"text": "resumed", "segments": [], "raw_response": None}
+
+    mgr = TranscriptionQueueManager(workers=1, max_size=5)
+    try:
+        mock_engine = MagicMock()
+        mock_engine.transcribe.side_effect = chunked_transcribe
+        with (
+            patch("src.services.transcription_queue.get_engine", return_value=mock_engine),
+            patch("src.services.transcription_queue._sanitize_result", side_effect=lambda r: r),
+        ):
+            mgr.submit({"job_id": "long-job", "wav_path": str(wav_path), "params": {}})
+            assert in_chunk.wait(5)
+
+            assert mgr.drain(timeout=5) is True
+            assert mgr.load_snapshot()["draining"] is True
+            assert mgr.submit({"job_id": "late-job", "wav_path": str(wav_path), "params": {}}) is False
+            assert mgr._meta.load("long-job")["status"] == "queued"
+
+            assert mgr.resume_intake() == 1
+            assert _wait_for(lambda: mgr._meta.load("long-job")["status"] == "completed")
+
+        assert attempts[0] == attempts[1]
+        assert attempts[0].endswith(os.path.join("long-job", "chunks"))
+    finally:
+        mgr.shutdown()
+
+
+def test_recover_jobs_requeues_unfinished(monkeypatch, tmp_path):
+    """После рестарта задачи QUEUED/PROCESSING из metadata возвращаются в очередь."""
+    from src.services.job_manager import JobManager, JobStatus
+    from src.services.transcription_queue import TranscriptionQueueManager
+
+    monkeypatch.setattr("src.services.job_manager.DATA_UPLOADS_DIR", str(tmp_path))
+    wav_path = tmp_path / "audio.wav"
+    wav_path.write_bytes(b"RIFF")
+    meta = JobManager()
+    meta.create(job_id="was-running", wav_path=str(wav_path), params={"mechanism": "omlx"},
+                tenant="team-a")
+    meta.update_status("was-running", JobStatus.PROCESSING)
+    meta.create(job_id="lost-audio", wav_path=str(tmp_path / "missing.wav"), params={})
+    meta.create(job_id="done", wav_path=str(wav_path), params={})
+    meta.update_status("done", JobStatus.COMPLETED)
+
+    mgr = TranscriptionQueueManager(workers=1, max_size=5)
+    try:
+        mock_engine = MagicMock()
+        mock_engine.transcribe.return_value = {"text": "ok", "segments": [], "raw_response": None}
+        with (
+            patch("src.services.transcription_queue.get_engine", return_value=mock_engine),
+            patch("src.services.transcription_queue._sanitize_result", side_effect=lambda r: r),
+        ):
+            assert mgr.recover_jobs() == 1
+            mgr._queue.join()
+
+        assert mock_engine.transcribe.call_args.kwargs["file_path"] == str(wav_path)
+        assert meta.load("was-running")["status"] == "completed"
+        assert meta.load("lost-audio")["status"] == "failed"
+        assert mgr._queue.stats()["team-a"]["dispatched"] == 1
+    finally:
+        mgr.shutdown()
+
+
+def test_retry_failed_chunks_requeues_partial_job(monkeypatch, tmp_path):
+    from src.services.job_manager import JobManager, JobStatus
+    from src.services.transcription_queue import TranscriptionQueueManager
+
+    monkeypatch.setattr("src.services.job_manager.DATA_UPLOADS_DIR", _test_dir)
+    wav_path = tmp_path / "audio.wav"
+    wav_path.write_bytes(b"RIFF")
+    meta = JobManager()
+    meta.create(job_id="partial-job", wav_path=str(wav_path), params={"mechanism": "omlx"})
+    meta.update_status(
+        "partial-job", JobStatus.COMPLETED, partial=True,
+        failed_chunks=[{"index": 1, "start": 60.0, "end": 120.0, "error": "timeout"}],
+    )
+    meta.create(job_id="whole-file-job", wav_path=str(wav_path), params={})
+    meta.update_status("whole-file-job", JobStatus.FAILED, error="boom")
+
+    mgr = TranscriptionQueueManager(workers=1, max_size=5)
+    try:
+        with pytest.raises(ValueError):
+            mgr.retry_failed_chunks("partial-job")
+
+        os.makedirs(os.path.join(_test_dir, "partial-job", "chunks"))
+        with open(os.path.join(_test_dir, "partial-job", "chunks", "plan.json"), "w") as f:
+            f.write('{"chunks": [[0, 60000], [60000, 120000]]}')
+
+        mock_engine = MagicMock()
+        mock_engine.transcribe.return_value = {
+            "text": "ok", "segments": [], "raw_response": None,
+            "chunk_report": {"chunks_total": 2, "retried_chunks": [], "failed_chunks": []},
+        }
+        with (
+            patch("src.services.transcription_queue.get_engine", return_value=mock_engine),
+            patch("src.services.transcription_queue._sanitize_result", side_effect=lambda r: r),
+        ):
+            assert mgr.retry_failed_chunks("partial-job") is True
+            mgr._queue.join()
+
+        result = meta.load("partial-job")
+        assert result["status"] == "completed"
+        assert result["partial"] is False
+        assert result["failed_chunks"] == []
+        # Задача без split-checkpoint — перезапускать частями нечего
+        with pytest.raises(ValueError):
+            mgr.retry_failed_chunks("whole-file-job")
+    finally:
+        mgr.shutdown()
+
+
+def _enable_packing(monkeypatch, window=1.0):
+    import src.services.transcription_queue as tq
+
+    monkeypatch.setattr(tq, "OMLX_PACKING_ENABLED", True)
+    monkeypatch.setattr(tq, "OMLX_PACK_MAX_CLIP_SEC", 30)
+    monkeypatch.setattr(tq, "OMLX_PACK_MAX_JOBS", 8)
+    monkeypatch.setattr(tq, "OMLX_PACK_MAX_AUDIO_SEC", 600)
+    monkeypatch.setattr(tq, "OMLX_PACK_WINDOW_SEC", window)
+
+
+def _submit_clip(mgr, job_id, duration, model="oMLX-ASR"):
+    return mgr.submit({
+        "job_id": job_id,
+        "wav_path": f"/tmp/{job_id}.wav",
+        "duration": duration,
+        "params": {"mechanism": "omlx", "model": model, "original_filename": f"{job_id}.wav"},
+    })
+
+
+def test_short_omlx_jobs_are_packed_into_one_request(monkeypatch, tmp_path):
+    from src.services.job_manager import JobManager
+    from src.services.transcription_queue import TranscriptionQueueManager
+
+    monkeypatch.setattr("src.services.job_manager.DATA_UPLOADS_DIR", str(tmp_path))
+    _enable_packing(monkeypatch)
+
+    def packed(clips, **params):
+        return {
+            job_id: {"text": f"text {job_id}", "raw_response": None,
+                     "segments": [{"start": 0.0, "end": 1.0, "text": job_id, "speaker": 0}]}
+            for job_id, _ in clips
+        }
+
+    engine = MagicMock()
+    engine.name = "omlx"
+    engine.transcribe_packed.side_effect = packed
+    mgr = TranscriptionQueueManager(workers=1, max_size=5)
+    try:
+        with (
+            patch("src.services.transcription_queue.get_engine", return_value=engine),
+            patch("src.services.transcription_queue._sanitize_result", side_effect=lambda r: r),
+        ):
+            for job_id in ("clip-a", "clip-b", "clip-c"):
+                assert _submit_clip(mgr, job_id, 10.0)
+            assert _submit_clip(mgr, "long", 120.0)
+            mgr._queue.join()
+
+        engine.transcribe_packed.assert_called_once()
+        assert [key for key, _ in engine.transcribe_packed.call_args.args[0]] == [
+            "clip-a", "clip-b", "clip-c"
+        ]
+        engine.transcribe.assert_called_once()
+        meta = JobManager()
+        for job_id in ("clip-a", "clip-b", "clip-c"):
+            job = meta.load(job_id)
+            assert job["status"] == "completed"
+            assert job["packed_with"] == sorted({"clip-a", "clip-b", "clip-c"} - {job_id})
+            with open(os.path.join(str(tmp_path), job_id, f"{job_id}.txt"), encoding="utf-8") as f:
+                assert f.read() == f"text {job_id}"
+    finally:
+        mgr.shutdown()
+
+
+def test_failed_pack_falls_back_to_single_requests(monkeypatch, tmp_path):
+    from src.services.job_manager import JobManager
+    from src.services.transcription_queue import TranscriptionQueueManager
+
+    monkeypatch.setattr("src.services.job_manager.DATA_UPLOADS_DIR", str(tmp_path))
+    _enable_packing(monkeypatch)
+
+    engine = MagicMock()
+    engine.name = "omlx"
+    engine.transcribe_packed.side_effect = ConnectionError("reset")
+    engine.transcribe.return_value = {"text": "single", "segments": [], "raw_response": None}
+    mgr = TranscriptionQueueManager(workers=1, max_size=5)
+    try:
+        with (
+            patch("src.services.transcription_queue.get_engine", return_value=engine),
+            patch("src.services.transcription_queue._sanitize_result", side_effect=lambda r: r),
+        ):
+            assert _submit_clip(mgr, "clip-a", 10.0)
+            assert _submit_clip(mgr, "clip-b", 10.0)
+            mgr._queue.join()
+
+        assert engine.transcribe.call_count == 2
+        meta = JobManager()
+        assert meta.load("clip-a")["status"] == "completed"
+        assert meta.load("clip-b")["status"] == "completed"
+    finally:
+        mgr.shutdown()
+
+
+def test_cancelling_any_packed_job_aborts_the_request(monkeypatch, tmp_path):
+    """Отмена не первой задачи пачки обрывает запрос; остальные идут по одной."""
+    from src.services.job_manager import JobManager
+    from src.services.transcription_queue import TranscriptionQueueManager
+    from src.services.whisper_engines import TranscriptionCancelled
+
+    monkeypatch.setattr("src.services.job_manager.DATA_UPLOADS_DIR", str(tmp_path))
+    _enable_packing(monkeypatch, window=0.3)
+    mgr = TranscriptionQueueManager(workers=1, max_size=5)
+
+    def packed(clips, **params):
+        mgr.cancel_job("clip-b")
+        assert params["cancel_token"].wait(5)
+        raise TranscriptionCancelled(params["cancel_token"].reason)
+
+    engine = MagicMock()
+    engine.name = "omlx"
+    engine.transcribe_packed.side_effect = packed
+    engine.transcribe.return_value = {"text": "single", "segments": [], "raw_response": None}
+    try:
+        with (
+            patch("src.services.transcription_queue.get_engine", return_value=engine),
+            patch("src.services.transcription_queue._sanitize_result", side_effect=lambda r: r),
+        ):
+            for job_id in ("clip-a", "clip-b", "clip-c"):
+                assert _submit_clip(mgr, job_id, 10.0)
+            mgr._queue.join()
+
+        meta = JobManager()
+        assert meta.load("clip-b")["status"] == "cancelled"
+        assert meta.load("clip-a")["status"] == "completed"
+        assert meta.load("clip-c")["status"] == "completed"
+        assert engine.transcribe.call_count == 2
+    finally:
+        mgr.shutdown()
+
+
+def test_transport_encoding_overlaps_queue_wait(monkeypatch, tmp_path):
+    """flac-копия готовится при постановке в очередь и передаётся движку oMLX."""
+    import src.services.transcription_queue as tq
+    from src.services.transcription_queue import TranscriptionQueueManager
+
+    monkeypatch.setattr("src.services.job_manager.DATA_UPLOADS_DIR", str(tmp_path))
+    monkeypatch.setattr(tq, "OMLX_TRANSPORT_CODEC", "flac")
+    encoded = str(tmp_path / "audio_transport.flac")
+    encode = MagicMock(return_value=encoded)
+    monkeypatch.setattr(tq, "encode_for_transport", encode)
+
+    mgr = TranscriptionQueueManager(workers=1, max_size=5)
+    try:
+        engine = MagicMock()
+        engine.transcribe.return_value = {"text": "ok", "segments": [], "raw_response": None}
+        with (
+            patch("src.services.transcription_queue.get_engine", return_value=engine),
+            patch("src.services.transcription_queue._sanitize_result", side_effect=lambda r: r),
+        ):
+            assert mgr.submit({"job_id": "omlx-job", "wav_path": "/tmp/a.wav",
+                               "params": {"mechanism": "omlx"}})
+            assert mgr.submit({"job_id": "whisper-job", "wav_path": "/tmp/b.wav",
+                               "params": {"mechanism": "whisper"}})
+            mgr._queue.join()
+
+        encode.assert_called_once_with("/tmp/a.wav", "flac", tq.OMLX_OPUS_BITRATE)
+        calls = {c.kwargs["file_path"]: c.kwargs for c in engine.transcribe.call_args_list}
+        assert calls["/tmp/a.wav"]["transport_path"] == encoded
+        assert "transport_path" not in calls["/tmp/b.wav"]
+        assert mgr._transport == {}
+    finally:
+        mgr.shutdown()
+
+
+def test_passthrough_uses_original_only_for_accepted_formats(monkeypatch):
+    import src.services.transcription_queue as tq
+    from src.services.transcription_queue import TranscriptionQueueManager
+
+    monkeypatch.setattr(tq, "OMLX_TRANSPORT_CODEC", "passthrough")
+    mgr = TranscriptionQueueManager(workers=1, max_size=5)
+    try:
+        mgr._prepare_transport("mp3-job", "/tmp/a.wav", {"mechanism": "omlx"}, "/tmp/call.MP3")
+        mgr._prepare_transport("aiff-job", "/tmp/b.wav", {"mechanism": "omlx"}, "/tmp/call.aiff")
+        mgr._prepare_transport("no-original", "/tmp/c.wav", {"mechanism": "omlx"})
+
+        assert mgr._transport_path("mp3-job") == "/tmp/call.MP3"
+        assert mgr._transport_path("aiff-job") is None
+        assert mgr._transport_path("no-original") is None
+    finally:
+        mgr.shutdown()
@@ -0,0 +1,214 @@
+"""Тесты для WhisperBatcher: сборка пакетов, разбор окна, маршрутизация в WhisperEngine."""
+
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services.whisper_batcher import BatchKey, WhisperBatcher, _to_transcript  # noqa: E402
+
+KEY = BatchKey("turbo", "models/whisper-turbo", "transcribe", None, None)
+
+# Таймстемп-токены начинаются с 100 (шаг 0.02 с), eot = 50
+TS = 100
+EOT = 50
+
+
+class FakeTokenizer:
+    timestamp_begin = TS
+    eot = EOT
+
+    def decode(self, tokens):
+        return "".join(f" w{t}" for t in tokens)
+
+
+def _result(tokens, avg_logprob=-0.2, compression_ratio=1.2, no_speech_prob=0.01):
+    return SimpleNamespace(
+        tokens=tokens,
+        language="ru",
+        avg_logprob=avg_logprob,
+        compression_ratio=compression_ratio,
+        no_speech_prob=no_speech_prob,
+        temperature=0.0,
+    )
+
+
+@pytest.fixture
+def batches():
+    """Декодирование подменено: записывает размеры пакетов, результат — длина аудио."""
+    sizes = []
+
+    def fake_decode(key, items):
+        sizes.append((key, len(items)))
+        return [{"text": str(len(item.audio)), "segments": []} for item in items]
+
+    with patch.object(WhisperBatcher, "_decode", staticmethod(fake_decode)):
+        yield sizes
+
+
+def _audio(seconds):
+    return np.zeros(int(16000 * seconds), dtype=np.float32)
+
+
+class TestBatching:
+    def test_items_are_decoded_in_one_batch(self, batches):
+        batcher = WhisperBatcher(max_size=3, wait_ms=5000)
+
+        futures = [batcher.submit(KEY, _audio(n)) for n in (1, 2, 3)]
+
+        assert [f.result(timeout=5)["text"] for f in futures] == ["16000", "32000", "48000"]
+        assert batches == [(KEY, 3)]
+        stats = batcher.get_stats()
+        assert (stats["batches"], stats["items"], stats["avg_batch_size"]) == (1, 3, 3.0)
+
+    def test_request_limit_follows_worker_count(self, monkeypatch):
+        import src.services.whisper_batcher as batcher_module
+
+        monkeypatch.setattr(batcher_module, "TRANSCRIBER_MAX_WORKERS", 3)
+        assert WhisperBatcher(max_size=8).get_stats()["request_limit"] == 2
+        monkeypatch.setattr(batcher_module, "TRANSCRIBER_MAX_WORKERS", 16)
+        assert WhisperBatcher(max_size=8).get_stats()["request_limit"] == 8
+
+    def test_latency_budget_flushes_partial_batch(self, batches):
+        batcher = WhisperBatcher(max_size=8, wait_ms=20)
+
+        assert batcher.submit(KEY, _audio(1)).result(timeout=5)["text"] == "16000"
+        assert batches == [(KEY, 1)]
+
+    def test_different_keys_are_not_mixed(self, batches):
+        batcher = WhisperBatcher(max_size=2, wait_ms=50)
+        other = KEY._replace(language="en")
+
+        futures = [
+            batcher.submit(KEY, _audio(1)),
+            batcher.submit(other, _audio(1)),
+            batcher.submit(KEY, _audio(1)),
+        ]
+        for future in futures:
+            future.result(timeout=5)
+
+        assert set(batches) == {(KEY, 2), (other, 1)}
+
+    def test_decode_error_is_propagated_to_all_items(self):
+        def failing(key, items):
+            raise RuntimeError("metal error")
+
+        batcher = WhisperBatcher(max_size=2, wait_ms=5000)
+        with patch.object(WhisperBatcher, "_decode", staticmethod(failing)):
+            futures = [batcher.submit(KEY, _audio(1)) for _ in range(2)]
+            for future in futures:
+                with pytest.raises(RuntimeError, match="metal error"):
+                    future.result(timeout=5)
+
+    def test_cancel_removes_queued_item(self, batches):
+        from src.services.whisper_engines import CancellationToken, TranscriptionCancelled
+
+        token = CancellationToken()
+        token.cancel()
+        batcher = WhisperBatcher(max_size=8, wait_ms=300)
+
+        with pytest.raises(TranscriptionCancelled):
+            batcher.transcribe(KEY, _audio(1), cancel_token=token)
+        assert batcher.submit(KEY, _audio(2)).result(timeout=5)["text"] == "32000"
+        assert batches == [(KEY, 1)]
+
+    def test_should_batch_only_short_audio_while_mlx_busy(self):
+        from src.services.whisper_engines import MLX_LOCK
+
+        batcher = WhisperBatcher(max_size=8, wait_ms=50)
+        assert batcher.should_batch(5.0) is False
+        with MLX_LOCK:
+            assert batcher.should_batch(5.0) is True
+            assert batcher.should_batch(45.0) is False
+            assert batcher.should_batch(None) is False
+            assert WhisperBatcher(max_size=1).should_batch(5.0) is False
+
+
+class TestToTranscript:
+    def test_segments_split_on_timestamp_pairs(self):
+        tokens = [TS, 1, 2, TS + 50, TS + 50, 3, TS + 100]
+
+        result = _to_transcript(_result(tokens), FakeTokenizer(), 3.0, None)
+
+        assert [(s["start"], s["end"], s["text"]) for s in result["segments"]] == [
+            (0.0, 1.0, " w1 w2"),
+            (1.0, 2.0, " w3"),
+        ]
+        assert [s["id"] for s in result["segments"]] == [0, 1]
+        assert result["text"] == " w1 w2 w3"
+        assert result["language"] == "ru"
+
+    def test_unfinished_last_segment_runs_to_end_of_audio(self):
+        tokens = [TS, 1, TS + 50, TS + 50, 2, 3]
+
+        segments = _to_transcript(_result(tokens), FakeTokenizer(), 2.5, None)["segments"]
+
+        assert [(s["start"], s["end"], s["text"]) for s in segments] == [
+            (0.0, 1.0, " w1"),
+            (1.0, 2.5, " w2 w3"),
+        ]
+
+    def test_silence_gives_empty_transcript(self):
+        result = _to_transcript(
+            _result([TS, 1, TS + 10], avg_logprob=-1.5, no_speech_prob=0.9),
+            FakeTokenizer(), 1.0, None,
+        )
+
+        assert result == {"text": "", "segments": [], "language": "ru"}
+
+    def test_quality_failure_requests_fallback(self):
+        tokenizer = FakeTokenizer()
+        assert _to_transcript(_result([TS, 1, TS + 10], compression_ratio=3.0), tokenizer, 1.0, None) is None
+        assert _to_transcript(_result([TS, 1, TS + 10], avg_logprob=-1.4), tokenizer, 1.0, None) is None
+
+
+class TestWhisperEngineRouting:
+    @pytest.fixture
+    def engine(self, monkeypatch):
+        from src.services import whisper_engines
+
+        cache = MagicMock()
+        monkeypatch.setattr(whisper_engines.ModelCache, "get_instance", lambda: cache)
+        monkeypatch.setattr(whisper_engines, "get_audio_duration", lambda _: 4.0)
+        mlx_transcribe = MagicMock(return_value={"text": "solo", "segments": []})
+        monkeypatch.setattr(whisper_engines, "_mlx_transcribe", mlx_transcribe)
+        batcher = MagicMock()
+        batcher.should_batch.return_value = True
+        monkeypatch.setattr(
+            "src.services.whisper_batcher.get_whisper_batcher", lambda: batcher
+        )
+        monkeypatch.setattr("mlx_whisper.audio.load_audio", lambda path: _audio(4))
+        return SimpleNamespace(
+            engine=whisper_engines.WhisperEngine(), batcher=batcher, solo=mlx_transcribe
+        )
+
+    def test_short_job_goes_to_batch(self, engine):
+        engine.batcher.transcribe.return_value = {
+            "text": " привет",
+            "segments": [{"start": 0.0, "end": 1.0, "text": " привет"}],
+        }
+
+        result = engine.engine.transcribe("/tmp/a.wav", model="turbo", language="ru")
+
+        engine.solo.assert_not_called()
+        key = engine.batcher.transcribe.call_args.args[0]
+        assert (key.model, key.language, key.task) == ("turbo", "ru", "transcribe")
+        assert result["segments"][0]["text"] == " привет"
+
+    def test_batch_fallback_transcribes_alone(self, engine):
+        engine.batcher.transcribe.return_value = None
+
+        engine.engine.transcribe("/tmp/a.wav", model="turbo")
+
+        engine.solo.assert_called_once()
+
+    def test_word_timestamps_are_not_batched(self, engine):
+        engine.engine.transcribe("/tmp/a.wav", model="turbo", word_timestamps=True)
+
+        engine.batcher.transcribe.assert_not_called()
+        engine.solo.assert_called_once()
@@ -87,6 +87,34 @@ class TestWhisperEngineTranscribe:
         assert isinstance(result["transcription_duration"], float)
         assert isinstance(result["segments"], list)
 
+    def test_raw_result_is_streamed_to_artifact(
+        self, mock_model_cache, mock_mlx_transcribe, mock_audio_duration, tmp_path
+    ):
+        import gzip
+        import json
+
+        from src.services.whisper_engines import WhisperEngine
+
+        raw_path = tmp_path / "test_raw.jsonl.gz"
+        result = WhisperEngine().transcribe("/tmp/test.wav", model="turbo", raw_path=str(raw_path))
+
+        assert result["raw_response"] is None
+        assert result["raw_file"] == "test_raw.jsonl.gz"
+        with gzip.open(raw_path, "rt", encoding="utf-8") as f:
+            record = json.loads(f.readline())
+        assert record["engine"] == "whisper"
+        assert record["response"]["segments"][1]["text"] == "мир"
+
+    def test_no_raw_artifact_without_raw_path(
+        self, mock_model_cache, mock_mlx_transcribe, mock_audio_duration
+    ):
+        from src.services.whisper_engines import WhisperEngine
+
+        result = WhisperEngine().transcribe("/tmp/test.wav")
+
+        assert result["raw_response"] is None
+        assert result["raw_file"] is None
+
     def test_passes_language_parameter(self, mock_model_cache, mock_mlx_transcribe, mock_audio_duration):
         from src.services.whisper_engines import WhisperEngine
 
@@ -332,6 +360,70 @@ class TestWhisperEngineTranscribe:
         assert result["text"] == ""
 
 
+class TestPcmInput:
+    """Канонический WAV читается в массив без ffmpeg и передаётся в mlx_whisper."""
+
+    @staticmethod
+    def _write_wav(path, samples, channels=1, rate=16000):
+        import wave
+
+        import numpy as np
+
+        with wave.open(str(path), "wb") as f:
+            f.setnchannels(channels)
+            f.setsampwidth(2)
+            f.setframerate(rate)
+            f.writeframes(np.asarray(samples, dtype="<i2").tobytes())
+
+    def test_read_wav_pcm_matches_ffmpeg_normalization(self, tmp_path):
+        import numpy as np
+
+        from src.utils.audio import read_wav_pcm
+
+        samples = np.array([0, 16384, -32768, 32767], dtype=np.int16)
+        path = tmp_path / "a.wav"
+        self._write_wav(path, samples)
+
+        audio = read_wav_pcm(str(path))
+
+        assert audio.dtype == np.float32
+        assert np.array_equal(audio, samples.astype(np.float32) / 32768.0)
+
+    def test_read_wav_pcm_rejects_other_formats(self, tmp_path):
+        from src.utils.audio import read_wav_pcm
+
+        stereo = tmp_path / "stereo.wav"
+        self._write_wav(stereo, [0, 0, 1, 1], channels=2)
+        resampled = tmp_path / "44k.wav"
+        self._write_wav(resampled, [0, 1], rate=44100)
+        other = tmp_path / "a.mp3"
+        other.write_bytes(b"ID3 not a wav")
+
+        assert read_wav_pcm(str(stereo)) is None
+        assert read_wav_pcm(str(resampled)) is None
+        assert read_wav_pcm(str(other)) is None
+        assert read_wav_pcm(str(tmp_path / "missing.wav")) is None
+
+    def test_engine_passes_array_and_skips_ffprobe(self, tmp_path, monkeypatch):
+        import numpy as np
+
+        from src.services import whisper_engines
+
+        path = tmp_path / "job.wav"
+        self._write_wav(path, np.zeros(16000 * 3, dtype=np.int16))
+        monkeypatch.setattr(whisper_engines.ModelCache, "get_instance", lambda: MagicMock())
+        ffprobe = MagicMock(return_value=99.0)
+        monkeypatch.setattr(whisper_engines, "get_audio_duration", ffprobe)
+        mlx_transcribe = MagicMock(return_value={"text": "", "segments": []})
+        monkeypatch.setattr(whisper_engines, "_mlx_transcribe", mlx_transcribe)
+
+        whisper_engines.WhisperEngine().transcribe(str(path), model="turbo")
+
+        ffprobe.assert_not_called()
+        audio = mlx_transcribe.call_args.kwargs["audio"]
+        assert isinstance(audio, np.ndarray) and audio.shape == (48000,)
+
+
 class TestTranscribeAudioBackwardCompat:
     """Тесты обратной совместимости: transcribe_audio()."""
 
@@ -404,3 +496,41 @@ class TestClearMemory:
 
         mx_clear.assert_called_once()
         gc_collect.assert_called_once()
+
+
+class TestWhisperEngineCancellation:
+    """Отмена WhisperEngine через progress callback между окнами."""
+
+    def test_cancel_between_windows(self, monkeypatch):
+        import sys as _sys
+
+        from src.services.whisper_engines import (
+            CancellationToken,
+            TranscriptionCancelled,
+            WhisperEngine,
+        )
+
+        cache = MagicMock()
+        cache.get_model.return_value = {"loaded": True}
+        monkeypatch.setattr("src.services.whisper_engines.ModelCache.get_instance", lambda: cache)
+        monkeypatch.setattr("src.services.whisper_engines.get_audio_duration", lambda _: 90.0)
+
+        token = CancellationToken()
+        windows_done = []
+
+        def fake_transcribe(audio, **kwargs):
+            # Имитируем цикл mlx_whisper: tqdm.update() после каждого окна
+            module = _sys.modules["mlx_whisper.transcribe"]
+            with module.tqdm.tqdm(total=3, unit="frames") as pbar:
+                for window in range(3):
+                    windows_done.append(window)
+                    if window == 0:
+                        token.cancel()
+                    pbar.update(1)
+            return {"segments": []}
+
+        monkeypatch.setattr("src.services.whisper_engines._mlx_transcribe", fake_transcribe)
+
+        with pytest.raises(TranscriptionCancelled):
+            WhisperEngine().transcribe("/tmp/test.wav", cancel_token=token)
+        assert windows_done == [0]
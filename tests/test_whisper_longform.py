@@ -0,0 +1,132 @@
+"""Тесты long-form режима Whisper: нарезка по паузам, склейка, маршрутизация в WhisperEngine."""
+
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services.whisper_longform import (  # noqa: E402
+    merge_chunk_results,
+    plan_longform_chunks,
+    speech_regions,
+)
+
+SR = 16000
+
+
+def _signal(*parts):
+    """Аудио из частей (секунды, речь?): речь — синус 0.3, пауза — нули."""
+    t = np.arange(SR, dtype=np.float32) / SR
+    second = (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    chunks = []
+    for seconds, loud in parts:
+        piece = np.tile(second, int(np.ceil(seconds)))[: int(seconds * SR)]
+        chunks.append(piece if loud else np.zeros_like(piece))
+    return np.concatenate(chunks)
+
+
+class TestSpeechRegions:
+    def test_pause_longer_than_gap_splits_regions(self):
+        audio = _signal((2, True), (1, False), (1, True))
+
+        assert speech_regions(audio, gap_ms=500) == [(0, 2100), (2900, 4000)]
+
+    def test_region_is_padded_by_one_frame(self):
+        audio = _signal((1, False), (1, True), (1, False))
+
+        assert speech_regions(audio, gap_ms=500) == [(900, 2100)]
+        assert speech_regions(audio, gap_ms=500, pad_ms=0) == [(1000, 2000)]
+
+    def test_short_pause_is_merged(self):
+        audio = _signal((2, True), (1, False), (1, True))
+
+        assert speech_regions(audio, gap_ms=1500) == [(0, 4000)]
+
+    def test_silence_has_no_regions(self):
+        assert speech_regions(np.zeros(SR * 3, dtype=np.float32), gap_ms=500) == []
+
+
+def test_chunks_fit_whisper_window_and_cut_in_pauses():
+    audio = _signal((20, True), (1, False), (20, True), (1, False), (45, True))
+
+    chunks = plan_longform_chunks(audio, gap_ms=500)
+
+    assert all(end - start <= 30_000 for start, end in chunks)
+    assert chunks[0] == (0, 20_100)
+    assert chunks[1] == (20_900, 41_100)
+    assert chunks[-1][1] == 87_000
+
+
+def test_merge_offsets_timestamps_and_renumbers():
+    chunks = [(0, 10_000), (12_500, 20_000)]
+    results = [
+        {"segments": [{"id": 0, "start": 0.0, "end": 4.0, "text": " раз"}], "language": "ru"},
+        {"segments": [{"id": 0, "start": 1.0, "end": 2.5, "text": " два"}], "language": "ru"},
+    ]
+
+    merged = merge_chunk_results(chunks, results)
+
+    assert [(s["id"], s["start"], s["end"]) for s in merged["segments"]] == [
+        (0, 0.0, 4.0),
+        (1, 13.5, 15.0),
+    ]
+    assert merged["text"] == " раз два"
+    assert merged["language"] == "ru"
+
+
+class TestWhisperEngineLongform:
+    @pytest.fixture
+    def engine(self, monkeypatch):
+        from src.services import whisper_engines
+
+        monkeypatch.setattr(whisper_engines, "WHISPER_LONGFORM", True)
+        monkeypatch.setattr(whisper_engines, "WHISPER_LONGFORM_MIN_SEC", 60.0)
+        monkeypatch.setattr(whisper_engines.ModelCache, "get_instance", lambda: MagicMock())
+        monkeypatch.setattr(whisper_engines, "get_audio_duration", lambda _: 87.0)
+        audio = _signal((20, True), (1, False), (20, True), (1, False), (45, True))
+        monkeypatch.setattr("mlx_whisper.audio.load_audio", lambda path: audio)
+        solo = MagicMock(return_value={
+            "segments": [{"start": 0.5, "end": 1.0, "text": " соло"}], "language": "ru",
+        })
+        monkeypatch.setattr(whisper_engines, "_mlx_transcribe", solo)
+        batcher = MagicMock()
+        monkeypatch.setattr("src.services.whisper_batcher.get_whisper_batcher", lambda: batcher)
+        return SimpleNamespace(engine=whisper_engines.WhisperEngine(), batcher=batcher, solo=solo)
+
+    def test_chunks_are_batched_and_merged_with_offsets(self, engine):
+        def transcribe_many(key, pieces, threshold, cancel_token, on_done=None):
+            results = [
+                {"segments": [{"start": 0.0, "end": 1.0, "text": f" чанк{i}"}], "language": "ru"}
+                for i in range(len(pieces))
+            ]
+            results[1] = None  # окно не прошло пороги качества
+            return results
+
+        engine.batcher.transcribe_many.side_effect = transcribe_many
+
+        result = engine.engine.transcribe("/tmp/long.wav", model="turbo", language="ru")
+
+        pieces = engine.batcher.transcribe_many.call_args.args[1]
+        assert all(len(piece) <= 30 * SR for piece in pieces)
+        engine.solo.assert_called_once()
+        assert engine.solo.call_args.kwargs["condition_on_previous_text"] is False
+        starts = [s["start"] for s in result["segments"]]
+        # Второй чанк начинается на кадр раньше паузы (20.9 с) + 0.5 с сегмента
+        assert starts[:2] == [0.0, 21.4]
+        assert result["segments"][1]["text"] == " соло"
+
+    def test_short_audio_is_not_longform(self, engine, monkeypatch):
+        from src.services import whisper_engines
+
+        monkeypatch.setattr(whisper_engines, "get_audio_duration", lambda _: 30.0)
+        engine.batcher.should_batch.return_value = False
+
+        engine.engine.transcribe("/tmp/short.wav", model="turbo")
+
+        engine.batcher.transcribe_many.assert_not_called()
+        assert engine.solo.call_args.kwargs["audio"] == "/tmp/short.wav"
@@ -0,0 +1,189 @@
+"""Тесты спекулятивного декодирования Whisper: совпадение с жадным decode(), словари, маршрутизация."""
+
+import math
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services.whisper_speculative import (  # noqa: E402
+    SpeculativeDecoder,
+    _VocabMap,
+    project_mel,
+)
+
+
+def _model(n_mels, n_vocab, seed):
+    """Случайный крошечный Whisper с настоящим словарём (n_vocab 51866 — как у large-v3)."""
+    import mlx.core as mx
+    from mlx_whisper import whisper
+
+    mx.random.seed(seed)
+    dims = whisper.ModelDimensions(
+        n_mels=n_mels, n_audio_ctx=1500, n_audio_state=16, n_audio_head=2, n_audio_layer=1,
+        n_vocab=n_vocab, n_text_ctx=448, n_text_state=16, n_text_head=2, n_text_layer=2,
+    )
+    return whisper.Whisper(dims, mx.float32)
+
+
+@pytest.fixture(scope="module")
+def models():
+    return SimpleNamespace(target=_model(128, 51866, 0), draft=_model(80, 51865, 1))
+
+
+@pytest.fixture
+def mel():
+    import mlx.core as mx
+
+    return mx.array(np.random.default_rng(0).standard_normal((3000, 128)).astype(np.float32) * 0.3)
+
+
+@pytest.fixture
+def decoder():
+    SpeculativeDecoder.reset()
+    yield SpeculativeDecoder.get_instance()
+    SpeculativeDecoder.reset()
+
+
+def _options(**kwargs):
+    from mlx_whisper.decoding import DecodingOptions
+
+    return DecodingOptions(language="ru", temperature=0.0, fp16=False, sample_len=24, **kwargs)
+
+
+def _same(a, b):
+    return (math.isnan(a) and math.isnan(b)) or math.isclose(a, b, rel_tol=1e-4, abs_tol=1e-5)
+
+
+class TestMatchesGreedy:
+    @pytest.mark.parametrize("prompt", [None, [50365, 1000, 2000, 50400]])
+    def test_tokens_equal_plain_decode(self, models, mel, decoder, prompt):
+        from mlx_whisper.decoding import decode
+
+        options = _options(prompt=prompt)
+        expected = decode(models.target, mel, options)
+
+        result = decoder.decode(models.target, models.draft, mel, options)
+
+        assert result.tokens == expected.tokens
+        assert result.text == expected.text
+        assert _same(result.avg_logprob, expected.avg_logprob)
+        assert _same(result.no_speech_prob, expected.no_speech_prob)
+        stats = decoder.get_stats()
+        assert stats["windows"] == 1
+        assert stats["drafted"] > 0
+
+    def test_identical_draft_accepts_everything(self, models, mel, decoder):
+        from mlx_whisper.decoding import decode
+
+        options = _options()
+        expected = decode(models.target, mel, options)
+
+        result = decoder.decode(models.target, models.target, mel, options)
+
+        assert result.tokens == expected.tokens
+        stats = decoder.get_stats()
+        assert stats["acceptance_rate"] == 1.0
+        assert stats["tokens_per_pass"] > 1.0
+
+    def test_sampling_uses_plain_decode(self, models, mel, decoder):
+        from mlx_whisper.decoding import DecodingOptions
+
+        options = DecodingOptions(language="ru", temperature=0.4, fp16=False)
+        with patch("mlx_whisper.decoding.decode", return_value="plain") as plain:
+            result = decoder.decode(models.target, models.draft, mel, options)
+
+        assert result == "plain"
+        plain.assert_called_once()
+        assert decoder.get_stats()["fallback_windows"] == 1
+
+    def test_attach_replaces_decode_only_inside(self, models, mel, decoder):
+        with decoder.attach(models.target, models.draft):
+            result = models.target.decode(mel, _options())
+        assert decoder.get_stats()["windows"] == 1
+        assert "decode" not in vars(models.target)
+        assert result.language == "ru"
+
+
+def test_vocab_map_aligns_special_tokens_by_name():
+    from mlx_whisper.tokenizer import get_tokenizer
+
+    v3 = get_tokenizer(True, num_languages=100, language="ru", task="transcribe")
+    v2 = get_tokenizer(True, num_languages=99, language="ru", task="transcribe")
+
+    vocab = _VocabMap(v3, v2)
+
+    assert vocab.to_draft(1234) == 1234
+    assert vocab.to_draft(v3.timestamp_begin + 50) == v2.timestamp_begin + 50
+    assert vocab.to_target(v2.transcribe) == v3.transcribe
+    assert vocab.to_draft(v3.special_tokens["<|yue|>"]) is None
+
+
+def test_project_mel_approximates_other_filterbank():
+    import mlx.core as mx
+    from mlx_whisper.audio import log_mel_spectrogram
+
+    t = np.arange(16000 * 3) / 16000
+    audio = (0.3 * np.sin(2 * np.pi * 220 * t) + 0.1 * np.sin(2 * np.pi * 1800 * t)).astype(np.float32)
+    mel_128 = log_mel_spectrogram(audio, n_mels=128)
+
+    projected = project_mel(mel_128, 80)
+
+    assert projected.shape == (mel_128.shape[0], 80)
+    assert float(mx.abs(projected - log_mel_spectrogram(audio, n_mels=80)).mean()) < 0.05
+    assert project_mel(mel_128, 128) is mel_128
+
+
+class TestWhisperEngineSpeculative:
+    @pytest.fixture
+    def engine(self, monkeypatch):
+        from src.services import whisper_engines
+
+        cache = MagicMock()
+        monkeypatch.setattr(whisper_engines.ModelCache, "get_instance", lambda: cache)
+        monkeypatch.setattr(whisper_engines, "get_audio_duration", lambda _: 4.0)
+        monkeypatch.setattr(whisper_engines, "WHISPER_DRAFT_MODEL", "base")
+        speculative = MagicMock()
+        monkeypatch.setattr("src.services.whisper_speculative.get_speculative_decoder", lambda: speculative)
+        mlx_transcribe = MagicMock(return_value={"text": "solo", "segments": []})
+        monkeypatch.setattr(whisper_engines, "_mlx_transcribe", mlx_transcribe)
+        batcher = MagicMock()
+        batcher.should_batch.return_value = True
+        batcher.transcribe.return_value = {"text": "batch", "segments": []}
+        monkeypatch.setattr("src.services.whisper_batcher.get_whisper_batcher", lambda: batcher)
+        return SimpleNamespace(
+            engine=whisper_engines.WhisperEngine(), cache=cache,
+            speculative=speculative, batcher=batcher, solo=mlx_transcribe,
+        )
+
+    def test_speculative_request_attaches_draft(self, engine):
+        engine.engine.transcribe("/tmp/a.wav", model="turbo", speculative=True)
+
+        engine.batcher.transcribe.assert_not_called()
+        engine.solo.assert_called_once()
+        draft_name = engine.cache.load_model.call_args.args[0]
+        assert draft_name == "base"
+        engine.speculative.attach.assert_called_once_with(
+            engine.cache.activate.return_value, engine.cache.load_model.return_value
+        )
+
+    def test_plain_request_has_no_draft(self, engine):
+        engine.batcher.should_batch.return_value = False
+
+        engine.engine.transcribe("/tmp/a.wav", model="turbo")
+
+        engine.cache.load_model.assert_not_called()
+        engine.speculative.attach.assert_not_called()
+
+    def test_missing_draft_falls_back_to_plain_decoding(self, engine):
+        engine.cache.load_model.side_effect = OSError("no weights")
+
+        engine.engine.transcribe("/tmp/a.wav", model="turbo", speculative=True)
+
+        engine.solo.assert_called_once()
+        engine.speculative.attach.assert_not_called()